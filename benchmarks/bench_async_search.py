@@ -0,0 +1,85 @@
+"""
+Stage-by-stage latency of CartSearchEngine.perform_search versus perform_search_async.
+
+Runs offline: query refinement, embeddings and Firestore writes are stubbed
+with fixed latencies (tests/search_fixtures.py), and the vector index is the
+exact backend over stub embeddings of data/processed/products.json. Stage times overlap in the async
+pipeline, so they add up to more than its total.
+
+Usage:
+    python benchmarks/bench_async_search.py --queries 10 --llm-latency 0.4 --embedding-latency 0.1 --db-latency 0.03
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import warnings
+
+import numpy as np
+
+from tests.search_fixtures import WRITES, local_engine
+
+QUERIES = [
+    "blue ceramic vase", "ginger jar with lid", "floral table decor", "wireless headphones",
+    "cotton dish towels", "mason jar mug", "artificial flowers", "round cotton rug",
+    "canvas wall art", "silicone watch band",
+]
+STAGES = ["query_log", "refinement", "context", "query_embedding", "unified_embedding",
+          "bm25", "vector", "fusion", "logging", "total"]
+
+
+def run(args, records, use_async):
+    engine = local_engine(records, dim=args.dim, embedding_latency=args.embedding_latency,
+                          llm_latency=args.llm_latency)
+    WRITES.reset(latency=args.db_latency)
+    timings = []
+
+    async def search_all():
+        for query in queries:
+            await engine.perform_search_async(query)
+            timings.append(dict(engine.last_timings))
+        await engine.flush_writes()
+
+    queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if use_async:
+            asyncio.run(search_all())
+        else:
+            for query in queries:
+                engine.perform_search(query)
+                timings.append(dict(engine.last_timings))
+    return {stage: np.mean([t.get(stage, 0.0) for t in timings]) for stage in STAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Seconds per query refinement call.")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="Seconds per embedding call.")
+    parser.add_argument("--db-latency", type=float, default=0.03, help="Seconds per Firestore write.")
+    args = parser.parse_args()
+
+    with open(os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")) as f:
+        records = json.load(f)[:args.products]
+
+    sync_ms = run(args, records, use_async=False)
+    async_ms = run(args, records, use_async=True)
+
+    print(f"{len(records)} products, {args.queries} queries, llm={args.llm_latency}s "
+          f"embedding={args.embedding_latency}s db write={args.db_latency}s")
+    print(f"{'stage (mean ms)':>18} {'sync':>9} {'async':>9}")
+    for stage in STAGES:
+        print(f"{stage:>18} {sync_ms[stage]:>9.1f} {async_ms[stage]:>9.1f}")
+    print(f"speedup: {sync_ms['total'] / async_ms['total']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
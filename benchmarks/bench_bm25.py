@@ -0,0 +1,129 @@
+"""
+Benchmark SparseBM25Index against rank_bm25.BM25Okapi on synthetic catalogs.
+
+Documents are drawn from a Zipf-like vocabulary so that head terms have long
+postings lists, which is the worst case for an inverted index.
+
+Usage:
+    python benchmarks/bench_bm25.py --sizes 10000 100000 1000000 --queries 50
+
+The save/load columns time SparseBM25Index.save and a memory-mapped load.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.modules.retrieval.sparse_bm25 import SparseBM25Index
+
+
+def synthetic_corpus(n_docs, vocab_size, mean_length, rng):
+    """Return flat (doc, term) token arrays for a synthetic catalog."""
+    ranks = np.arange(1, vocab_size + 1)
+    probs = 1.0 / ranks ** 1.1
+    probs /= probs.sum()
+
+    lengths = np.maximum(rng.poisson(mean_length, n_docs), 1)
+    doc_of_token = np.repeat(np.arange(n_docs), lengths)
+    term_of_token = rng.choice(vocab_size, size=len(doc_of_token), p=probs)
+    return doc_of_token, term_of_token, lengths, probs
+
+
+def build_sparse_index(doc_of_token, term_of_token, lengths, vocab_size):
+    """Count (doc, term) pairs with NumPy and feed them to SparseBM25Index.from_arrays."""
+    pair = doc_of_token.astype(np.int64) * vocab_size + term_of_token
+    pairs, tfs = np.unique(pair, return_counts=True)
+    # Synthetic term names sort the same way as their ids when zero padded
+    vocabulary = np.array([f"t{i:07d}" for i in range(vocab_size)])
+    return SparseBM25Index.from_arrays(
+        vocabulary=vocabulary,
+        term_ids=pairs % vocab_size,
+        postings=pairs // vocab_size,
+        term_freqs=tfs,
+        doc_lengths=lengths,
+        keys=[f"P{i}" for i in range(len(lengths))],
+    )
+
+
+def build_reference_documents(doc_of_token, term_of_token, lengths):
+    vocabulary = {}
+    split_points = np.cumsum(lengths)[:-1]
+    documents = []
+    for terms in np.split(term_of_token, split_points):
+        documents.append([vocabulary.setdefault(t, f"t{t:07d}") for t in terms.tolist()])
+    return documents
+
+
+def time_queries(fn, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.median(latencies)), float(np.mean(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--vocab-size", type=int, default=50_000)
+    parser.add_argument("--mean-length", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--baseline-limit", type=int, default=100_000,
+                        help="Skip rank_bm25 above this catalog size (it is too slow to build).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'docs':>10} {'build s':>9} {'save s':>7} {'load ms':>8} "
+          f"{'sparse p50 ms':>14} {'rank_bm25 p50 ms':>17} {'speedup':>8}")
+
+    for n_docs in args.sizes:
+        doc_of_token, term_of_token, lengths, probs = synthetic_corpus(
+            n_docs, args.vocab_size, args.mean_length, rng
+        )
+        start = time.perf_counter()
+        index = build_sparse_index(doc_of_token, term_of_token, lengths, args.vocab_size)
+        build_seconds = time.perf_counter() - start
+
+        tmp_dir = tempfile.mkdtemp()
+        index_path = os.path.join(tmp_dir, "bm25_index")
+        start = time.perf_counter()
+        index.save(index_path)
+        save_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        index = SparseBM25Index.load(index_path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        queries = [
+            [f"t{t:07d}" for t in rng.choice(args.vocab_size, size=rng.integers(2, 5), p=probs)]
+            for _ in range(args.queries)
+        ]
+        sparse_p50, _ = time_queries(lambda q: index.top_k(q, args.top_k), queries)
+
+        baseline = "skipped"
+        speedup = ""
+        if n_docs <= args.baseline_limit:
+            from rank_bm25 import BM25Okapi
+
+            reference = BM25Okapi(build_reference_documents(doc_of_token, term_of_token, lengths))
+            reference_p50, _ = time_queries(
+                lambda q: reference.get_scores(q).argsort()[::-1][:args.top_k], queries
+            )
+            baseline = f"{reference_p50:.2f}"
+            speedup = f"{reference_p50 / sparse_p50:.0f}x"
+
+        print(f"{n_docs:>10} {build_seconds:>9.1f} {save_seconds:>7.2f} {load_ms:>8.2f} "
+              f"{sparse_p50:>14.2f} {baseline:>17} {speedup:>8}")
+        del index
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
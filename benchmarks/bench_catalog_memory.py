@@ -0,0 +1,68 @@
+"""
+Memory of a list of Product models versus a ProductCatalog holding the same data.
+
+Usage:
+    python benchmarks/bench_catalog_memory.py --products 5000 --dim 1536
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import gc
+import tracemalloc
+
+import numpy as np
+
+from src.models.catalog import ProductCatalog
+from src.models.product import Product
+
+
+def synthetic_records(n, dim, rng):
+    for i in range(n):
+        yield {
+            "productId": f"B{i:09d}",
+            "productTitle": f"Wireless over-ear headphones model {i} with noise cancelling",
+            "productDescription": "Comfortable headphones with 30 hours of battery life. " * 4,
+            "productBulletPoint": "Bluetooth 5.0; USB-C charging; foldable design",
+            "productBrand": f"Brand{i % 300}",
+            "productColor": ("Black", "White", "Red")[i % 3],
+            "productLocale": "us",
+            "embedding": rng.normal(size=dim).tolist(),
+        }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    # Records are generated inside each measurement, as documents streamed from
+    # Firestore would be, so the embedding floats are owned by what is built
+    def records():
+        return synthetic_records(args.products, args.dim, np.random.default_rng(0))
+
+    products, list_bytes = measure(lambda: [Product(**record) for record in records()])
+    del products
+    catalog, catalog_bytes = measure(lambda: ProductCatalog.from_records(records()))
+
+    print(f"{args.products} products, dim={args.dim}")
+    print(f"{'layout':>16} {'MB':>9} {'KB/product':>11}")
+    for name, size in (("List[Product]", list_bytes), ("ProductCatalog", catalog_bytes)):
+        print(f"{name:>16} {size / 2**20:>9.1f} {size / 1024 / args.products:>11.1f}")
+    print(f"reduction: {list_bytes / catalog_bytes:.1f}x "
+          f"(catalog arrays alone: {catalog.nbytes / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
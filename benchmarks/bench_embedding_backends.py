@@ -0,0 +1,89 @@
+"""
+Per-query embedding latency (p50/p99) of the remote and the local backend.
+
+The remote backend is StubEmbeddingService with a simulated network
+round-trip: each call sleeps for a log-normal latency with the given median
+and spread, which gives the long tail of a hosted API. The local backend is
+LocalEmbeddingService (sentence-transformers on the CPU), measured in fp32
+and with int8 dynamic quantization; it is skipped when torch or
+sentence-transformers are not installed. Queries are the raw and refined
+queries of data/processed/query_logs.json, embedded one at a time as on the
+query path, after a short warm-up.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py --queries 500 --remote-median 0.12 --threads 2
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import importlib.util
+import json
+import time
+
+import numpy as np
+
+from src.services.local_embedding_service import LocalEmbeddingService
+from src.services.stub_services import StubEmbeddingService
+
+
+class RemoteStub(StubEmbeddingService):
+    """StubEmbeddingService whose latency varies per call, like a network round-trip."""
+
+    def __init__(self, median: float, sigma: float, seed: int = 0):
+        super().__init__(dim=1536)
+        self.median = median
+        self.sigma = sigma
+        self.rng = np.random.default_rng(seed)
+
+    def embed_sentences(self, sentences):
+        time.sleep(self.median * float(np.exp(self.sigma * self.rng.standard_normal())))
+        return super().embed_sentences(sentences)
+
+
+def load_queries():
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "query_logs.json")
+    with open(path) as f:
+        logs = json.load(f)
+    return [text for log in logs for text in (log["rawQuery"], log["refinedQuery"]) if text]
+
+
+def measure(service, queries, n, warmup=5):
+    for query in queries[:warmup]:
+        service.embed_sentences([query])
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        service.embed_sentences([queries[i % len(queries)]])
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--remote-median", type=float, default=0.12, help="Median remote round-trip in seconds.")
+    parser.add_argument("--remote-sigma", type=float, default=0.4, help="Log-normal spread of the round-trip.")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--threads", type=int, default=None, help="Torch CPU threads for the local backend.")
+    args = parser.parse_args()
+
+    queries = load_queries()
+    backends = [("remote (stub)", RemoteStub(args.remote_median, args.remote_sigma))]
+    if importlib.util.find_spec("torch") and importlib.util.find_spec("sentence_transformers"):
+        for quantize in (False, True):
+            service = LocalEmbeddingService(args.model, num_threads=args.threads, quantize=quantize)
+            backends.append((f"local {'int8' if quantize else 'fp32'}", service))
+    else:
+        print("torch / sentence-transformers not installed: skipping the local backend\n")
+
+    print(f"{'backend':<16}{'dim':>6}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, service in backends:
+        latencies = measure(service, queries, args.queries)
+        print(f"{name:<16}{service.embedding_dim:>6}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 99):>10.2f}{latencies.mean():>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
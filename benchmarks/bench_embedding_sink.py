@@ -0,0 +1,92 @@
+"""
+Per-query write payload and latency of each query-embedding sink policy.
+
+For every policy a QueryLog document is written through the in-memory fake
+Firestore client from the tests. Payload is the stored document size by
+Firestore's size rules (strings: UTF-8 bytes + 1, numbers and timestamps: 8,
+field names: bytes + 1, plus the document name and 32 bytes); store and write
+are mean microseconds per query for the sink and for the document update.
+
+Usage:
+    python benchmarks/bench_embedding_sink.py --queries 2000 --dim 1536
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.models.query_log import QueryLog
+from src.services.embedding_sink import SINKS, create_sink
+from tests.fake_firestore import FakeFirestoreClient
+
+
+def value_size(value):
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(len(key.encode("utf-8")) + 1 + value_size(item) for key, item in value.items())
+    raise TypeError(f"Unsupported value {type(value).__name__}")
+
+
+def document_size(collection, doc_id, data):
+    name_size = len(collection.encode("utf-8")) + 1 + len(doc_id.encode("utf-8")) + 1 + 16
+    return name_size + value_size(data) + 32
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embedding_lists = embeddings.tolist()
+    shard_dir = tempfile.mkdtemp()
+
+    print(f"{args.queries} queries, dim={args.dim}")
+    print(f"{'policy':>8} {'payload B':>10} {'store us':>9} {'write us':>9}")
+    for name in SINKS:
+        sink = create_sink(name, directory=shard_dir, embedding_dim=args.dim) if name == "shard" else create_sink(name)
+        client = FakeFirestoreClient()
+        collection = client.collection("QueryLogs")
+        store_seconds = write_seconds = 0.0
+        payload = 0
+
+        for i, embedding in enumerate(embedding_lists):
+            log = QueryLog(logId=f"L{i:08d}", userId="U00001", sessionId="S00001",
+                           rawQuery="wireless headphones", refinedQuery="wireless bluetooth headphones",
+                           timestamp=datetime.now(timezone.utc))
+
+            start = time.perf_counter()
+            inline, ref = sink.store(embedding)
+            store_seconds += time.perf_counter() - start
+
+            log.embedding, log.embedding_ref = inline, ref
+            document = log.model_dump(by_alias=True, exclude_none=True)
+            start = time.perf_counter()
+            collection.document(log.id).set(document)
+            write_seconds += time.perf_counter() - start
+            payload += document_size("QueryLogs", log.id, document)
+
+        n = args.queries
+        print(f"{name:>8} {payload / n:>10.0f} {store_seconds / n * 1e6:>9.1f} {write_seconds / n * 1e6:>9.1f}")
+    shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
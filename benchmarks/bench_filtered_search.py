@@ -0,0 +1,97 @@
+"""
+Filtered retrieval over data/processed/products.json: filters pushed down into
+the retrievers against filtering the top-k of an unfiltered search.
+
+For each filter, every query is searched through the offline BM25 retriever
+of tests/search_fixtures.py and through ProductSearchEngine (stub embeddings
+of the titles, ``--backend``), asking for ``--k`` results. Post-filtering
+discards the hits outside the filter, so it usually returns fewer than k;
+pushdown scores only the matching products and returns k whenever k of them
+exist. Reported: mean results per query and median milliseconds per query.
+
+Usage:
+    python benchmarks/bench_filtered_search.py --k 10 --backend annoy
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from src.models.catalog import ProductCatalog
+from src.modules.retrieval.bm25_retriever import BM25CandidateRetriever
+from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
+from src.services.stub_services import StubEmbeddingService
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+QUERIES = ["ceramic vase", "organic baby clothes", "phone case", "stainless steel water bottle",
+           "wooden toy", "led desk lamp", "running shoes", "kitchen storage"]
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backend", default="annoy", help="Vector backend of ProductSearchEngine.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA, "products.json")) as f:
+        records = json.load(f)
+    service = StubEmbeddingService(dim=64)
+    catalog = ProductCatalog.from_records(
+        {**record, "bulletPoint": record.get("bullet_point"), "embedding": service.embed(record["title"]).tolist()}
+        for record in records
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        bm25 = BM25CandidateRetriever(catalog)
+        vectors = ProductSearchEngine(64, f"{tempfile.mkdtemp()}/products.ann", catalog, backend=args.backend)
+    query_vectors = [service.embed(query) for query in QUERIES]
+
+    brands = Counter(brand for brand in catalog.columns["brand"] if brand)
+    filters = [("locale", {"locale": catalog.columns["locale"][0]}),
+               ("top brand", {"brand": brands.most_common(1)[0][0]}),
+               ("rare brand", {"brand": brands.most_common()[-1][0]})]
+
+    print(f"{len(catalog)} products, k={args.k}, vector backend {args.backend}")
+    print(f"{'filter':<12}{'matches':>9}  {'retriever':<8}{'post n':>8}{'post ms':>9}{'push n':>8}{'push ms':>9}")
+    for name, filter_ in filters:
+        allowed = {product_id for product_id, *values in catalog.rows("id", *filter_)
+                   if all(str(value).lower() == accepted.lower() for value, accepted in zip(values, filter_.values()))}
+        retrievers = [
+            ("bm25", lambda q, v, filters=None: bm25.retrieve(q, args.k, filters)),
+            ("vector", lambda q, v, filters=None: vectors.search(v, args.k, filters)),
+        ]
+        for retriever, search in retrievers:
+            def post():
+                return [[hit for hit in search(q, v) if hit["product_id"] in allowed]
+                        for q, v in zip(QUERIES, query_vectors)]
+
+            def push():
+                return [search(q, v, filter_) for q, v in zip(QUERIES, query_vectors)]
+
+            post_n = np.mean([len(hits) for hits in post()])
+            push_n = np.mean([len(hits) for hits in push()])
+            post_ms = median_ms(post, args.repeat) / len(QUERIES)
+            push_ms = median_ms(push, args.repeat) / len(QUERIES)
+            print(f"{name:<12}{len(allowed):>9}  {retriever:<8}{post_n:>8.1f}{post_ms:>9.3f}{push_n:>8.1f}{push_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Scaling of build_indexes.py with the number of workers on a synthetic catalog.
+
+Products get Zipf-distributed words from a synthetic vocabulary (an 8-word
+title, a 40-word description and 12 words of bullet points) and random
+unit embeddings. For every worker count the BM25 index (forked tokenizer
+processes plus merge) and the Annoy forest (``--n-trees`` trees built on
+that many threads) are rebuilt from scratch. Reported: seconds per phase and
+the speed-up over one worker.
+
+Speed-up is bounded by the cores actually available (os.cpu_count() is
+printed) and by the single-process phases: the postings merge, the index
+save and Annoy's add_item loop.
+
+Usage:
+    python benchmarks/bench_index_build.py --products 1000000 --workers 1 2 4 8
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from build_indexes import build_indexes
+from src.models.catalog import ProductCatalog, StringColumn
+
+
+def synthetic_catalog(n_products, dim, vocab_size=50_000, seed=0):
+    """Catalog of ``n_products`` products with Zipf-distributed text and random embeddings."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i:x}" for i in range(vocab_size)])
+    probs = 1.0 / np.arange(1, vocab_size + 1) ** 1.1
+    probs /= probs.sum()
+
+    def texts(n_words):
+        drawn = words[rng.choice(vocab_size, size=(n_products, n_words), p=probs)]
+        return [" ".join(row) for row in drawn.tolist()]
+
+    values = {
+        "id": [f"P{i:08d}" for i in range(n_products)],
+        "title": texts(8),
+        "description": texts(40),
+        "bulletPoint": texts(12),
+        "brand": [f"brand{i}" for i in rng.integers(0, 500, n_products)],
+        "color": [None] * n_products,
+        "locale": ["us"] * n_products,
+    }
+    columns = {name: StringColumn.from_values(column) for name, column in values.items()}
+    embeddings = rng.normal(size=(n_products, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return ProductCatalog(columns, embeddings, np.ones(n_products, dtype=bool))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--n-trees", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = synthetic_catalog(args.products, args.dim)
+    print(f"{len(catalog)} synthetic products generated in {time.perf_counter() - start:.1f} s; "
+          f"{os.cpu_count()} cores")
+
+    phases = ["bm25_tokenize", "bm25_merge", "bm25_save", "vector_build"]
+    print(f"{'workers':<9}" + "".join(f"{phase:>15}" for phase in phases) + f"{'total':>10}{'speed-up':>10}")
+    baseline = None
+    for workers in args.workers:
+        path = tempfile.mkdtemp()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                timings = build_indexes(catalog, f"{path}/bm25_index", f"{path}/products.ann", workers,
+                                        backend="annoy", n_trees=args.n_trees)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+        total = sum(timings.values())
+        baseline = baseline or total
+        print(f"{workers:<9}" + "".join(f"{timings[phase]:>15.2f}" for phase in phases)
+              + f"{total:>10.2f}{baseline / total:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Startup time of loading the product catalog, with and without a local snapshot.
+
+Products live in the in-memory fake Firestore client from the tests, which
+deep-copies every document it returns but adds no network latency, so against
+real Firestore the gap between a full stream and a snapshot start is larger.
+
+Rows:
+    Product.load_all      stream + pydantic validation of every document (previous startup path)
+    catalog, full stream  ProductCatalog.load_all without a snapshot
+    snapshot, cold        first start: full stream + snapshot write
+    snapshot, warm        later start: snapshot load + fetch of changed documents
+
+Usage:
+    python benchmarks/bench_product_startup.py --products 20000 --dim 1536 --changed 50
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.models.catalog import ProductCatalog
+from src.models.product import Product, UPDATED_AT
+from tests.fake_firestore import FakeFirestoreClient
+
+
+def populate(client, n, dim, rng):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    collection = client.collection("Products")
+    for i in range(n):
+        collection.documents[f"B{i:09d}"] = {
+            "id": f"B{i:09d}",
+            "title": f"Wireless over-ear headphones model {i}",
+            "description": "Comfortable headphones with 30 hours of battery life.",
+            "bulletPoint": "Bluetooth 5.0; USB-C charging",
+            "brand": f"Brand{i % 300}",
+            "color": "Black",
+            "locale": "us",
+            "embedding": rng.normal(size=dim).tolist(),
+            UPDATED_AT: start + timedelta(seconds=i),
+        }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--changed", type=int, default=50, help="Documents edited between the two snapshot starts.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    client = FakeFirestoreClient()
+    populate(client, args.products, args.dim, rng)
+    snapshot_path = os.path.join(tempfile.mkdtemp(), "product_snapshot")
+
+    def product_load_all():
+        docs = client.collection("Products").stream()
+        return [Product(**{"productId": doc.id, **doc.to_dict()}) for doc in docs]
+
+    rows = []
+    _, seconds = timed(product_load_all)
+    rows.append(("Product.load_all", seconds, client.reads))
+
+    client.reads = 0
+    _, seconds = timed(lambda: ProductCatalog.load_all(client=client))
+    rows.append(("catalog, full stream", seconds, client.reads))
+
+    client.reads = 0
+    _, seconds = timed(lambda: ProductCatalog.load_all(snapshot_path=snapshot_path, client=client))
+    rows.append(("snapshot, cold", seconds, client.reads))
+
+    now = datetime.now(timezone.utc)
+    for product_id in rng.choice(list(client.collection("Products").documents), args.changed, replace=False):
+        client.collection("Products").document(product_id).update({"title": "Edited", UPDATED_AT: now})
+    client.reads = 0
+    catalog, seconds = timed(lambda: ProductCatalog.load_all(snapshot_path=snapshot_path, client=client))
+    rows.append((f"snapshot, warm ({args.changed} changed)", seconds, client.reads))
+
+    print(f"{args.products} products, dim={args.dim}")
+    print(f"{'startup':>32} {'seconds':>8} {'docs read':>10}")
+    for name, seconds, reads in rows:
+        print(f"{name:>32} {seconds:>8.2f} {reads:>10}")
+    shutil.rmtree(os.path.dirname(snapshot_path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
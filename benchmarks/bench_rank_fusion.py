@@ -0,0 +1,97 @@
+"""
+Fusion time of two retriever lists at 1k-100k candidates each.
+
+Compares the previous dict-based fuse_candidates (per-candidate dicts, merge
+in Python, full sort), the current fuse_candidates wrapper (same dict API on
+top of rank_fusion) and rank_fusion.fuse_ranked on (position, score) arrays,
+for each strategy. The two lists overlap by half. Times are the median of
+``--repeat`` runs in milliseconds.
+
+Usage:
+    python benchmarks/bench_rank_fusion.py --sizes 1000 10000 100000 --top-n 10
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from src.modules.fusion.fuse import fuse_candidates
+from src.modules.fusion.rank_fusion import FUSION_STRATEGIES, fuse_ranked
+from src.utils.normalization import normalize_scores
+
+
+def previous_fuse_candidates(bm25_candidates, vector_candidates, beta=0.5, top_n=None):
+    """fuse_candidates before rank_fusion (validation omitted)."""
+    norm_bm25 = normalize_scores([cand["score"] for cand in bm25_candidates], mode='min-max')
+    for idx, cand in enumerate(bm25_candidates):
+        cand["norm_BM25"] = norm_bm25[idx]
+    norm_vector = normalize_scores([cand["score"] for cand in vector_candidates], mode='min-max')
+    for idx, cand in enumerate(vector_candidates):
+        cand["norm_Vector"] = norm_vector[idx]
+
+    merged = {}
+    for cand in bm25_candidates:
+        merged[cand["product_id"]] = {"product_id": cand["product_id"], "norm_BM25": cand["norm_BM25"],
+                                      "norm_Vector": 0.0}
+    for cand in vector_candidates:
+        pid = cand["product_id"]
+        if pid in merged:
+            merged[pid]["norm_Vector"] = cand["norm_Vector"]
+        else:
+            merged[pid] = {"product_id": pid, "norm_BM25": 0.0, "norm_Vector": cand["norm_Vector"]}
+
+    final_candidates = [{"product_id": pid, "score": round(beta * s["norm_BM25"] + (1 - beta) * s["norm_Vector"], 3)}
+                        for pid, s in merged.items()]
+    final_candidates.sort(key=lambda x: x["score"], reverse=True)
+    return final_candidates[:top_n] if top_n is not None else final_candidates
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'candidates':>10}  {'implementation':<28}{'ms':>10}{'speedup':>10}")
+    for size in args.sizes:
+        bm25_positions = rng.permutation(2 * size)[:size]
+        vector_positions = np.concatenate([bm25_positions[:size // 2], 2 * size + np.arange(size - size // 2)])
+        bm25 = (bm25_positions, rng.gamma(2.0, 5.0, size))
+        vector = (vector_positions, rng.random(size))
+        bm25_dicts = [{"product_id": f"P{p}", "score": float(s)} for p, s in zip(*bm25)]
+        vector_dicts = [{"product_id": f"P{p}", "score": float(s)} for p, s in zip(*vector)]
+
+        def previous():
+            # It adds keys to its inputs, so give it fresh copies; the copy time is subtracted below
+            previous_fuse_candidates(copy.deepcopy(bm25_dicts), copy.deepcopy(vector_dicts), 0.65, args.top_n)
+
+        copy_ms = median_ms(lambda: (copy.deepcopy(bm25_dicts), copy.deepcopy(vector_dicts)), args.repeat)
+        baseline = median_ms(previous, args.repeat) - copy_ms
+        rows = [("previous fuse_candidates", baseline),
+                ("fuse_candidates (dicts)", median_ms(
+                    lambda: fuse_candidates(bm25_dicts, vector_dicts, 0.65, args.top_n), args.repeat))]
+        for strategy in FUSION_STRATEGIES:
+            rows.append((f"fuse_ranked {strategy}", median_ms(
+                lambda: fuse_ranked([bm25, vector], [0.65, 0.35], strategy, args.top_n), args.repeat)))
+        for name, ms in rows:
+            print(f"{size:>10}  {name:<28}{ms:>10.3f}{baseline / ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
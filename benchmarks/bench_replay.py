@@ -0,0 +1,239 @@
+"""
+Replay recorded sessions through CartSearchEngine.perform_search and fail on regressions.
+
+The workload is the sessions of data/processed/sessions.json (queries in the
+order of data/processed/query_logs.json, users from users.json), plus
+``--scale - 1`` synthetic copies per session: each copy belongs to its own
+user and swaps some queries for the leading words of a catalog product title,
+chosen with a fixed seed. Every run replays the same searches.
+
+Everything runs offline and deterministically (tests/search_fixtures.py): stub
+LLM refinement sleeping ``--llm-latency`` seconds, stub embeddings sleeping
+``--embedding-latency`` seconds and Firestore writes sleeping ``--db-latency``
+seconds. At each concurrency level the sessions are shared out over that many
+threads, each searching with its own engine over the shared indexes.
+
+Reported: p50/p95/p99 per pipeline stage (milliseconds, from the concurrency-1
+run), QPS and end-to-end percentiles per concurrency level, and the peak
+resident set size. ``--output`` saves them as JSON; ``--baseline`` compares
+against a saved run and exits with status 1 when a p95 latency, the QPS or
+the peak RSS regressed by more than its threshold.
+
+Usage:
+    python benchmarks/bench_replay.py --output replay.json
+    python benchmarks/bench_replay.py --baseline replay.json --max-latency-increase 0.2
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import queue
+import resource
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from src.models import Preferences, UserProfile
+from tests.search_fixtures import WRITES, LocalCartSearchEngine, LocalSession, local_engine
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+STAGES = ["query_log", "refinement", "bm25", "query_embedding", "context", "unified_embedding", "vector", "fusion",
+          "logging", "total"]
+PERCENTILES = (50, 95, 99)
+
+
+def load_workload(scale, seed=0):
+    """
+    Sessions to replay, as (UserProfile without embedding, [query]) pairs.
+
+    Args:
+        scale (int): Copies of every recorded session; copies after the first are synthetic.
+        seed (int): Seed of the synthetic query choice.
+
+    Returns:
+        tuple: (sessions, product records).
+    """
+    with open(os.path.join(DATA, "products.json")) as f:
+        records = json.load(f)
+    with open(os.path.join(DATA, "users.json")) as f:
+        users = {user["userId"]: user for user in json.load(f)}
+    with open(os.path.join(DATA, "sessions.json")) as f:
+        recorded = json.load(f)
+    with open(os.path.join(DATA, "query_logs.json")) as f:
+        logs = sorted(json.load(f), key=lambda log: log["timestamp"])
+
+    queries = {}
+    for log in logs:
+        queries.setdefault(log["sessionId"], []).append(log["rawQuery"])
+
+    rng = np.random.default_rng(seed)
+    titles = [record["title"] for record in records if record.get("title")]
+    sessions = []
+    for copy in range(scale):
+        for session in recorded:
+            user = users[session["userId"]]
+            texts = queries.get(session["sessionId"]) or [query["text"] for query in session["queries"]]
+            if copy:
+                texts = [" ".join(titles[rng.integers(len(titles))].split()[:4]) if rng.random() < 0.5 else text
+                         for text in texts]
+            profile = UserProfile(userId=f"{user['userId']}-{copy}", name=user["name"], email=user["email"],
+                                  preferences=Preferences(**user.get("preferences", {})))
+            sessions.append((profile, texts))
+    return sessions, records
+
+
+def replay(base, sessions, concurrency):
+    """
+    Replay every session, sharing them out over ``concurrency`` threads.
+
+    Returns:
+        tuple: (elapsed seconds, list of last_timings dicts, one per search).
+    """
+    work = queue.Queue()
+    for session in sessions:
+        work.put(session)
+    timings, lock = [], threading.Lock()
+
+    def worker():
+        engine = LocalCartSearchEngine(embedding_service=base.embedding_service, openai_client=base.openai_client)
+        for name in ("catalog", "bm25_retriever", "search_engine", "reranker", "_search_initialized"):
+            setattr(engine, name, getattr(base, name))
+        while True:
+            try:
+                user, texts = work.get_nowait()
+            except queue.Empty:
+                return
+            engine.current_user = user.model_copy(update={"embedding": base.current_user.embedding})
+            engine.current_session = LocalSession.create(user.id)
+            for text in texts:
+                engine.perform_search(text)
+                with lock:
+                    timings.append(dict(engine.last_timings))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, timings
+
+
+def percentiles(values):
+    return {f"p{q}": float(np.percentile(values, q)) for q in PERCENTILES}
+
+
+def run(args):
+    sessions, records = load_workload(args.scale, args.seed)
+    results = {"config": {key: getattr(args, key) for key in
+                          ("scale", "seed", "dim", "llm_latency", "embedding_latency", "db_latency", "concurrency")},
+               "python": platform.python_version(), "searches": sum(len(texts) for _, texts in sessions),
+               "concurrency": {}}
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        base = local_engine(records, dim=args.dim, embedding_latency=args.embedding_latency,
+                            llm_latency=args.llm_latency)
+        WRITES.reset(latency=args.db_latency)
+        for concurrency in args.concurrency:
+            elapsed, timings = replay(base, sessions, concurrency)
+            WRITES.reset(latency=args.db_latency)
+            if "stages" not in results:
+                results["stages"] = {stage: percentiles([t.get(stage, 0.0) for t in timings]) for stage in STAGES}
+            results["concurrency"][str(concurrency)] = {"qps": len(timings) / elapsed,
+                                                        **percentiles([t["total"] for t in timings])}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["peak_rss_mb"] = maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    return results
+
+
+def regressions(baseline, current, max_latency_increase, max_qps_drop, max_rss_increase, min_latency_ms):
+    """
+    Differences from a saved run that exceed the thresholds.
+
+    Latencies compare p95 per stage and per concurrency level; stages whose
+    p95 stays under ``min_latency_ms`` in both runs are too small to judge.
+
+    Returns:
+        list: One message per regression; empty when within every threshold.
+    """
+    found = []
+
+    def check_latency(name, before, after):
+        if max(before, after) >= min_latency_ms and after > before * (1 + max_latency_increase):
+            found.append(f"{name} p95 {before:.1f} -> {after:.1f} ms (+{100 * (after / before - 1):.0f}%)")
+
+    for stage, values in baseline.get("stages", {}).items():
+        if stage in current["stages"]:
+            check_latency(f"stage {stage}", values["p95"], current["stages"][stage]["p95"])
+    for level, values in baseline.get("concurrency", {}).items():
+        if level not in current["concurrency"]:
+            continue
+        check_latency(f"concurrency {level}", values["p95"], current["concurrency"][level]["p95"])
+        before, after = values["qps"], current["concurrency"][level]["qps"]
+        if after < before * (1 - max_qps_drop):
+            found.append(f"concurrency {level} QPS {before:.1f} -> {after:.1f} (-{100 * (1 - after / before):.0f}%)")
+    before, after = baseline.get("peak_rss_mb"), current["peak_rss_mb"]
+    if before and after > before * (1 + max_rss_increase):
+        found.append(f"peak RSS {before:.0f} -> {after:.0f} MB (+{100 * (after / before - 1):.0f}%)")
+    return found
+
+
+def report(results):
+    print(f"{results['searches']} searches per level; stage latency at concurrency {results['config']['concurrency'][0]}")
+    print(f"{'stage':<20}" + "".join(f"{f'p{q} ms':>10}" for q in PERCENTILES))
+    for stage, values in results["stages"].items():
+        print(f"{stage:<20}" + "".join(f"{values[f'p{q}']:>10.1f}" for q in PERCENTILES))
+    print(f"\n{'concurrency':<20}{'QPS':>10}" + "".join(f"{f'p{q} ms':>10}" for q in PERCENTILES))
+    for level, values in results["concurrency"].items():
+        print(f"{level:<20}{values['qps']:>10.1f}" + "".join(f"{values[f'p{q}']:>10.1f}" for q in PERCENTILES))
+    print(f"\npeak RSS {results['peak_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=22, help="copies of every recorded session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--embedding-latency", type=float, default=0.01)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-latency-increase", type=float, default=0.25, help="allowed relative p95 increase")
+    parser.add_argument("--max-qps-drop", type=float, default=0.15, help="allowed relative QPS drop")
+    parser.add_argument("--max-rss-increase", type=float, default=0.25, help="allowed relative peak RSS increase")
+    parser.add_argument("--min-latency-ms", type=float, default=1.0,
+                        help="p95 below which stage latencies are not compared")
+    args = parser.parse_args()
+
+    results = run(args)
+    report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(f"Warning: baseline ran with {baseline.get('config')}, not {results['config']}")
+        found = regressions(baseline, results, args.max_latency_increase, args.max_qps_drop,
+                            args.max_rss_increase, args.min_latency_ms)
+        if found:
+            print("\nRegressions against " + args.baseline + ":\n  " + "\n  ".join(found))
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Latency and quality of the two-stage search (deep candidate pool + CandidateReranker)
+against fusing the top search_K of each retriever.
+
+Latency: CandidateReranker over ``--pool`` BM25 and ``--pool`` vector
+candidates of data/processed/products.json, on (position, score) arrays and
+through the dict API used by CartSearchEngine, in milliseconds.
+
+Quality: the queries of data/processed/query_logs.json are replayed session
+by session, as their users (data/processed/users.json), through the offline
+engine of tests/search_fixtures.py. Their logged final results serve as
+relevance labels for recall@K and MRR. The engine has no network access, so
+query refinement echoes the query and embeddings are stub vectors: the vector
+retriever contributes noise, and the comparison mostly measures what the
+deeper BM25 pool and the preference/session features add.
+
+Usage:
+    python benchmarks/bench_reranker.py --pool 200 --repeat 500
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import json
+import time
+import warnings
+from itertools import groupby
+
+import numpy as np
+
+from src.models import UserProfile
+from src.modules.fusion.reranker import CandidateReranker
+from tests.search_fixtures import LocalSession, local_engine
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+
+
+def load(name):
+    with open(os.path.join(DATA, name)) as f:
+        return json.load(f)
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def bench_latency(engine, users, args):
+    reranker = CandidateReranker(engine.catalog)
+    rng = np.random.default_rng(0)
+    n = len(engine.catalog)
+    bm25 = (rng.choice(n, args.pool, replace=False), rng.gamma(2.0, 5.0, args.pool))
+    vector = (rng.choice(n, args.pool, replace=False), rng.random(args.pool))
+    ids = engine.catalog.columns["id"]
+    bm25_dicts = [{"product_id": ids[p], "score": float(s)} for p, s in zip(*bm25)]
+    vector_dicts = [{"product_id": ids[p], "score": float(s)} for p, s in zip(*vector)]
+    preferences = users[0].preferences
+    session = ["organic baby clothes", "aden + anais swaddles"]
+
+    rows = [
+        ("rerank (arrays)", lambda: reranker.rerank([bm25, vector], [0.65, 0.35], preferences, session, 10)),
+        ("rerank_candidates (dicts)", lambda: reranker.rerank_candidates(
+            [bm25_dicts, vector_dicts], [0.65, 0.35], preferences, session, 10)),
+    ]
+    print(f"Reranking {2 * args.pool} candidates ({n} products)")
+    print(f"{'':<28}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, fn in rows:
+        for _ in range(10):
+            fn()
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        p50, p99 = percentiles(samples)
+        print(f"{name:<28}{p50:>10.3f}{p99:>10.3f}")
+
+
+def replay(records, users, logs, pool):
+    """Search every logged query in session order; returns (labels, result ids, fusion ms) per query."""
+    outcomes = []
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        engine = local_engine(records)
+        if pool:
+            engine.reranker = CandidateReranker(engine.catalog)
+            engine.candidate_pool_size = pool
+        for session_id, session_logs in groupby(sorted(logs, key=lambda log: (log["sessionId"], log["timestamp"])),
+                                                key=lambda log: log["sessionId"]):
+            session_logs = list(session_logs)
+            engine.current_user = users[session_logs[0]["userId"]]
+            engine.current_session = LocalSession.create(engine.current_user.id)
+            for log in session_logs:
+                results = engine.perform_search(log["rawQuery"])
+                outcomes.append((log["finalResults"], [result["product_id"] for result in results],
+                                 engine.last_timings["fusion"]))
+    return outcomes
+
+
+def quality(outcomes, k):
+    recalls, reciprocal_ranks = [], []
+    for labels, ranked, _ in outcomes:
+        recalls.append(len(set(labels) & set(ranked[:k])) / len(labels))
+        hits = [rank for rank, product_id in enumerate(ranked[:k], 1) if product_id in labels]
+        reciprocal_ranks.append(1.0 / hits[0] if hits else 0.0)
+    return np.mean(recalls), np.mean(reciprocal_ranks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool", type=int, default=200, help="Candidates per retriever in the two-stage search.")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    records = load("products.json")
+    users = {record["userId"]: UserProfile(**record) for record in load("users.json")}
+    logs = load("query_logs.json")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = local_engine(records)
+    bench_latency(engine, list(users.values()), args)
+
+    print(f"\nQuality on {len(logs)} logged queries")
+    print(f"{'pipeline':<28}{'recall@10':>10}{'MRR@10':>10}{'fusion ms':>11}")
+    for name, pool in (("fuse top 10 of each", 0), (f"pool {args.pool} + rerank", args.pool)):
+        outcomes = replay(records, users, logs, pool)
+        recall, mrr = quality(outcomes, 10)
+        fusion_ms = np.mean([ms for _, _, ms in outcomes])
+        print(f"{name:<28}{recall:>10.3f}{mrr:>10.3f}{fusion_ms:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Throughput of ProductSearchEngine-style batched search versus one query per call.
+
+For each backend, the same query matrix is answered twice: with a Python loop
+over ``search`` and with one ``search_batch`` call. Throughput is reported in
+queries per second.
+
+Usage:
+    python benchmarks/bench_search_batch.py --items 20000 --queries 2000 --dim 1536 --k 10
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+
+import numpy as np
+
+from src.modules.retrieval.vector_backends import AnnoyBackend, ExactBackend
+
+
+def queries_per_second(fn, n_queries):
+    start = time.perf_counter()
+    fn()
+    return n_queries / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-trees", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.items, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    backends = [ExactBackend(args.dim), AnnoyBackend(args.dim, n_trees=args.n_trees, n_threads=args.threads)]
+    print(f"{args.items} items, {args.queries} queries, dim={args.dim}, k={args.k}, threads={args.threads}")
+    print(f"{'backend':>8} {'loop qps':>10} {'batch qps':>10} {'speedup':>8}")
+    for backend in backends:
+        backend.build(vectors)
+        loop_qps = queries_per_second(lambda: [backend.search(q, args.k) for q in queries], args.queries)
+        batch_qps = queries_per_second(lambda: backend.search_batch(queries, args.k), args.queries)
+        print(f"{backend.name:>8} {loop_qps:>10.0f} {batch_qps:>10.0f} {batch_qps / loop_qps:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Catalog tokenization with the shared TextAnalyzer versus the former NLTK pipeline.
+
+The NLTK column is the old BM25CandidateRetriever.preprocess_text (lowercase,
+strip ASCII punctuation, word_tokenize, stopword filter). word_tokenize also
+splits sentences with punkt; without the punkt data the Treebank word
+tokenizer alone is timed, which flatters NLTK. The build column times
+SparseBM25Index.from_documents on the analyzer's tokens. NLTK is no longer a
+dependency of the search engine; install it to run this comparison. With
+--min-speedup the script exits with status 1 when the analyzer is not at
+least that many times faster than NLTK (about 10x on an idle machine).
+
+Usage:
+    python benchmarks/bench_text_analysis.py --repeat 5
+    python benchmarks/bench_text_analysis.py --min-speedup 5
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import re
+import string
+import time
+
+from src.modules.retrieval.bm25_retriever import join_text
+from src.modules.retrieval.sparse_bm25 import SparseBM25Index
+from src.utils.text_analysis import STOPWORDS, analyzer
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+
+
+def nltk_tokenizer():
+    """The old tokenizer, and whether it includes punkt sentence splitting."""
+    from nltk.tokenize import NLTKWordTokenizer, word_tokenize
+
+    punctuation = re.compile(f"[{re.escape(string.punctuation)}]")
+    try:
+        word_tokenize("probe")
+        tokenize, punkt = word_tokenize, True
+    except LookupError:
+        tokenize, punkt = NLTKWordTokenizer().tokenize, False
+    return (lambda text: [token for token in tokenize(punctuation.sub("", text.lower())) if token not in STOPWORDS],
+            punkt)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-speedup", type=float, default=None,
+                        help="exit with status 1 if the analyzer is less than this many times faster than NLTK")
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA, "products.json")) as f:
+        texts = [join_text(r["title"], r.get("description"), r.get("bullet_point")) for r in json.load(f)]
+    old_tokens, punkt = nltk_tokenizer()
+
+    nltk_s, _ = best_of(lambda: [old_tokens(text) for text in texts], max(1, args.repeat // 2))
+    analyzer_s, documents = best_of(lambda: [analyzer.tokens(text) for text in texts], args.repeat)
+    build_s, _ = best_of(lambda: SparseBM25Index.from_documents(documents, [str(i) for i in range(len(texts))]),
+                         args.repeat)
+
+    print(f"{len(texts)} products, {sum(map(len, documents))} tokens")
+    print(f"{'NLTK' + ('' if punkt else ' (no punkt)'):<24}{1000 * nltk_s:>10.1f} ms")
+    print(f"{'TextAnalyzer':<24}{1000 * analyzer_s:>10.1f} ms  ({nltk_s / analyzer_s:.1f}x)")
+    print(f"{'BM25 build':<24}{1000 * build_s:>10.1f} ms")
+    if args.min_speedup is not None and nltk_s / analyzer_s < args.min_speedup:
+        print(f"Regression: TextAnalyzer is only {nltk_s / analyzer_s:.1f}x faster than NLTK, "
+              f"expected {args.min_speedup:.1f}x")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Cost of one Gradio UI search before and after the single-pass, streaming pipeline.
+
+Previous: the UI ran its own copy of the pipeline and then created a second
+query log and refined the query again to show the refined query text (it
+also re-read the user profile twice from Firestore, which is not simulated
+here). Current: CartSearchEngine.search_stream runs the pipeline once and
+yields the BM25 hits before the vector stage starts.
+
+Both run on the offline engine of tests/search_fixtures.py over
+data/processed/products.json, with stub LLM and embedding calls sleeping
+``--llm-latency`` and ``--embedding-latency`` seconds and query-log writes
+sleeping ``--write-latency`` seconds. Reported per search: time until the
+first results can be shown, total time, LLM calls, embedding calls and
+Firestore writes.
+
+Usage:
+    python benchmarks/bench_ui_search.py --llm-latency 0.3 --embedding-latency 0.05 --write-latency 0.02
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import json
+import time
+import warnings
+
+import numpy as np
+
+from tests.search_fixtures import WRITES, local_engine
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+
+
+def previous_ui_search(engine, query):
+    """The UI search before search_stream; returns (seconds to first results, fused titles)."""
+    start = time.perf_counter()
+    # CartSearchEngineUI._run_ui_search
+    query_log = engine._create_query_log(query)
+    refined_query = engine._preprocess_query(query_log, engine.current_user)
+    query_embedding = engine._generate_query_embeddings(query_log)
+    context_vector = engine._build_session_context(alpha=engine.context_alpha)
+    unified_vector = engine._generate_unified_embedding(query_embedding, context_vector,
+                                                        alpha=engine.context_fusion_beta)
+    bm25_results = engine.bm25_retriever.retrieve(refined_query, engine._retrieval_depth())
+    vector_results = engine.search_engine.search(unified_vector, engine._retrieval_depth())
+    fused_results = engine._fuse_search_results(bm25_results, vector_results, beta=engine.retrieval_fusion_beta,
+                                                top_n=engine.search_K)
+    engine._display_and_log_results(query_log, bm25_results, vector_results, fused_results, engine.catalog)
+    # handle_search then logged and refined the query a second time for the refined query text
+    query_log = engine._create_query_log(query)
+    engine._preprocess_query(query_log, engine.current_user)
+    return time.perf_counter() - start
+
+
+def current_ui_search(engine, query):
+    start = time.perf_counter()
+    first = None
+    for _ in engine.search_stream(query):
+        if first is None:
+            first = time.perf_counter() - start
+    return first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--write-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA, "products.json")) as f:
+        records = json.load(f)
+    with open(os.path.join(DATA, "query_logs.json")) as f:
+        queries = [log["rawQuery"] for log in json.load(f)]
+
+    print(f"{len(queries)} queries; LLM {1000 * args.llm_latency:.0f} ms, embedding "
+          f"{1000 * args.embedding_latency:.0f} ms, write {1000 * args.write_latency:.0f} ms")
+    print(f"{'pipeline':<12}{'first ms':>10}{'total ms':>10}{'LLM':>6}{'embed':>7}{'writes':>8}")
+    for name, run in (("previous", previous_ui_search), ("current", current_ui_search)):
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            engine = local_engine(records, embedding_latency=args.embedding_latency, llm_latency=args.llm_latency)
+            WRITES.reset(latency=args.write_latency)
+            first, total = [], []
+            for query in queries:
+                start = time.perf_counter()
+                first.append(run(engine, query))
+                total.append(time.perf_counter() - start)
+        calls = len(queries)
+        print(f"{name:<12}{1000 * np.mean(first):>10.0f}{1000 * np.mean(total):>10.0f}"
+              f"{engine.openai_client.calls / calls:>6.1f}{engine.embedding_service.calls / calls:>7.1f}"
+              f"{len(WRITES.entries) / calls:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
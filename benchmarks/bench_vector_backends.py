@@ -0,0 +1,80 @@
+"""
+Compare vector backends on latency and recall@k against exact ground truth.
+
+Vectors are drawn around random cluster centres, which is closer to real
+embeddings than uniform noise (uniform noise makes every neighbour equally far).
+
+Usage:
+    python benchmarks/bench_vector_backends.py --sizes 10000 50000 --dim 1536 --k 10
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+
+import numpy as np
+
+from src.modules.retrieval.vector_backends import AnnoyBackend, ExactBackend
+
+
+def clustered_vectors(n, dim, rng, n_clusters=100, spread=1.5):
+    centres = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    return centres[labels] + spread * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def measure(backend, queries, k):
+    latencies, hits = [], []
+    for query in queries:
+        start = time.perf_counter()
+        positions, _ = backend.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits.append(positions)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), hits
+
+
+def recall(hits, truth):
+    return float(np.mean([len(set(h.tolist()) & set(t.tolist())) / len(t) for h, t in zip(hits, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--n-trees", type=int, default=100)
+    parser.add_argument("--search-k", type=int, nargs="+", default=[-1, 10_000],
+                        help="Annoy search_k values to try (-1 is Annoy's default, n_trees * k).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'items':>8} {'backend':>22} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'recall@' + str(args.k):>10}")
+
+    for n in args.sizes:
+        vectors = clustered_vectors(n, args.dim, rng)
+        queries = vectors[rng.integers(0, n, args.queries)] + 0.3 * rng.normal(size=(args.queries, args.dim))
+        queries = queries.astype(np.float32)
+
+        exact = ExactBackend(args.dim)
+        start = time.perf_counter()
+        exact.build(vectors)
+        exact_build = time.perf_counter() - start
+        p50, p99, truth = measure(exact, queries, args.k)
+        print(f"{n:>8} {'exact':>22} {exact_build:>8.1f} {p50:>8.2f} {p99:>8.2f} {1.0:>10.3f}")
+
+        annoy = AnnoyBackend(args.dim, n_trees=args.n_trees)
+        start = time.perf_counter()
+        annoy.build(vectors)
+        annoy_build = time.perf_counter() - start
+        for search_k in args.search_k:
+            annoy.search_k = search_k
+            p50, p99, hits = measure(annoy, queries, args.k)
+            label = f"annoy(search_k={search_k})"
+            print(f"{n:>8} {label:>22} {annoy_build:>8.1f} {p50:>8.2f} {p99:>8.2f} {recall(hits, truth):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure memory and recall@k of quantized vector backends against exact float32 search.
+
+Recall is measured with and without the float32 rescore step. Pass --vectors to
+evaluate real product embeddings exported as an (n, dim) .npy file; otherwise
+clustered synthetic vectors are used.
+
+Usage:
+    python benchmarks/eval_quantization.py --items 50000 --dim 1536 --k 10 --rescore 0 200
+    python benchmarks/eval_quantization.py --vectors product_embeddings.npy
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_vector_backends import clustered_vectors, recall
+from src.modules.retrieval.vector_backends import ExactBackend, create_backend
+
+
+def python_list_bytes(dim):
+    """Approximate heap cost of one embedding stored as List[float] on a Product."""
+    vector = [float(i) + 0.5 for i in range(dim)]
+    return sys.getsizeof(vector) + sum(sys.getsizeof(x) for x in vector)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", help="Optional .npy file of product embeddings.")
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 200])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = clustered_vectors(args.items, args.dim, rng)
+    n, dim = vectors.shape
+    queries = vectors[rng.integers(0, n, args.queries)] + 0.3 * rng.normal(size=(args.queries, dim))
+    queries = queries.astype(np.float32)
+
+    exact = ExactBackend(dim)
+    exact.build(vectors)
+    truth, _ = exact.search_batch(queries, args.k)
+
+    list_bytes = python_list_bytes(dim)
+    print(f"{n} vectors, dim={dim}, k={args.k}; List[float] embedding ~ {list_bytes / 1024:.1f} KB each")
+    print(f"{'backend':>8} {'rescore':>8} {'bytes/vec':>10} {'vs float32':>11} {'vs list':>8} "
+          f"{'recall@' + str(args.k):>10} {'batch ms/q':>11}")
+
+    float32_bytes = exact.vectors.nbytes / n
+    start = time.perf_counter()
+    exact.search_batch(queries, args.k)
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+    print(f"{'float32':>8} {'-':>8} {float32_bytes:>10.0f} {1.0:>10.1f}x {list_bytes / float32_bytes:>7.1f}x "
+          f"{1.0:>10.3f} {exact_ms:>11.2f}")
+
+    for name in ("float16", "int8"):
+        for rescore in args.rescore:
+            backend = create_backend(name, dim, rescore=rescore)
+            backend.build(vectors)
+            start = time.perf_counter()
+            positions, _ = backend.search_batch(queries, args.k)
+            ms_per_query = (time.perf_counter() - start) * 1000 / args.queries
+
+            bytes_per_vector = backend.store.nbytes / n
+            print(f"{name:>8} {rescore:>8} {bytes_per_vector:>10.0f} "
+                  f"{float32_bytes / bytes_per_vector:>10.1f}x {list_bytes / bytes_per_vector:>7.1f}x "
+                  f"{recall(positions, truth):>10.3f} {ms_per_query:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
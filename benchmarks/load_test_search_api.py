@@ -0,0 +1,171 @@
+"""
+Load test of cart_search_api with stubbed LLM and embedding services.
+
+The service is started with ``--workers`` pre-forked workers over indexes of
+data/processed/products.json (stub embeddings of the titles, offline BM25 of
+tests/search_fixtures.py), sessions kept in worker memory and the users of
+data/processed/users.json. Query refinement and embedding calls sleep
+``--llm-latency`` and ``--embedding-latency`` seconds like their network
+round-trips, and query-log writes only go to memory.
+
+``--clients`` threads each open a session and search the logged queries of
+data/processed/query_logs.json back to back over one keep-alive connection
+for ``--duration`` seconds. Reported: requests per second, error count and
+client-side latency percentiles in milliseconds.
+
+Usage:
+    python benchmarks/load_test_search_api.py --workers 4 --clients 32 --duration 30
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+
+from cart_search_api import SearchIndexes, SearchService, serve
+from src.models import UserProfile
+from src.modules.fusion.reranker import CandidateReranker
+from src.services.stub_services import StubEmbeddingService, StubOpenAIClient
+from tests.search_fixtures import SESSIONS, LocalCartSearchEngine, LocalSession, local_engine
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+DIM = 64
+
+
+def load(name):
+    with open(os.path.join(DATA, name)) as f:
+        return json.load(f)
+
+
+class LoadTestSession(LocalSession):
+    """LocalSession with a fresh id per session, so clients of the same user do not share one."""
+
+    @classmethod
+    def create(cls, user_id: str) -> "LoadTestSession":
+        session = cls(id=f"S-{user_id}-{uuid.uuid4().hex[:8]}", user_id=user_id,
+                      start_time=datetime.now(timezone.utc))
+        SESSIONS[session.id] = session.model_copy(deep=True)
+        return session
+
+
+def run_server(args):
+    """Server process: build the indexes, then pre-fork the workers (their output is discarded)."""
+    sys.stdout = open(os.devnull, "w")
+    warnings.simplefilter("ignore")
+    engine = local_engine(load("products.json"), dim=DIM)
+    indexes = SearchIndexes(engine.catalog, engine.bm25_retriever, engine.search_engine,
+                            CandidateReranker(engine.catalog))
+    embedder = StubEmbeddingService(dim=DIM)
+    # Ids upper-cased as SearchService.start_session looks them up
+    users = {record["userId"].upper(): UserProfile(**{
+        **record, "userId": record["userId"].upper(),
+        "userEmbedding": embedder.embed(" ".join(record["preferences"]["interests"])).tolist(),
+    }) for record in load("users.json")}
+
+    def make_service(indexes, worker):
+        return SearchService(indexes, StubEmbeddingService(dim=DIM, latency=args.embedding_latency),
+                             StubOpenAIClient(latency=args.llm_latency), users=users.get,
+                             sessions=LoadTestSession, engine_class=LocalCartSearchEngine)
+
+    serve(indexes, make_service, port=args.port, workers=args.workers)
+
+
+def request(connection, method, path, body=None):
+    connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read() or b"null")
+
+
+def wait_until_healthy(port, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1.0)
+            if request(connection, "GET", "/healthz")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Search API did not come up on port {port}")
+
+
+def client(port, user_id, queries, stop_at, latencies, errors):
+    """One user: a session and back-to-back searches on one keep-alive connection."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30.0)
+    status, body = request(connection, "POST", "/session", {"user_id": user_id})
+    if status != 200:
+        errors.append(status)
+        return
+    session_id = body["session_id"]
+    i = 0
+    while time.monotonic() < stop_at:
+        query = queries[i % len(queries)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            status, _ = request(connection, "POST", "/search", {"session_id": session_id, "query": query})
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30.0)
+            continue
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load.")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per query refinement.")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Seconds per embedding call.")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = multiprocessing.get_context("fork").Process(target=run_server, args=(args,), daemon=False)
+    server.start()
+    try:
+        wait_until_healthy(args.port)
+        user_ids = [record["userId"] for record in load("users.json")]
+        queries = [log["rawQuery"] for log in load("query_logs.json")]
+
+        latencies, errors = [], []
+        stop_at = time.monotonic() + args.duration
+        threads = [threading.Thread(target=client, args=(args.port, user_ids[i % len(user_ids)],
+                                                         queries[i % len(queries):] + queries[:i % len(queries)],
+                                                         stop_at, latencies, errors))
+                   for i in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.join()
+
+    samples = np.array(latencies) * 1000
+    print(f"{args.workers} workers, {args.clients} clients, {args.duration:.0f}s, "
+          f"LLM {1000 * args.llm_latency:.0f} ms, embedding {1000 * args.embedding_latency:.0f} ms")
+    print(f"requests {len(samples)}  errors {len(errors)}  RPS {len(samples) / elapsed:.1f}")
+    if len(samples):
+        print(f"{'':<10}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+        print(f"{'ms':<10}" + "".join(f"{np.percentile(samples, q):>9.1f}" for q in (50, 95, 99, 100)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Rebuild the BM25 and vector indexes of the product catalog on every core.
+
+BM25: the catalog is tokenized by a pool of forked worker processes, one
+shard at a time, and their partial postings are merged into one index
+(build_bm25_index). Vector: Annoy builds its trees on ``--workers`` threads;
+the exact and quantized backends are a single matrix copy.
+
+The indexes are written where CartSearchEngine and cart_search_api.py look
+for them (bm25_index, products.ann) with the fingerprints they check, so the
+next start loads them instead of rebuilding.
+
+Usage:
+    python build_indexes.py --workers 8
+    python build_indexes.py --snapshot product_snapshot --offline --backend annoy --n-trees 100
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+import argparse
+import time
+from typing import Dict
+
+from src.models.catalog import ProductCatalog
+from src.modules.retrieval.bm25_retriever import build_bm25_index, catalog_fingerprint
+from src.modules.retrieval.vector_retrieval_model import EXACT_BACKEND_LIMIT, ProductSearchEngine
+from src.modules.retrieval.vector_backends import BACKENDS
+from src.utils.text_analysis import analyzer
+
+
+def build_indexes(catalog: ProductCatalog, bm25_path: str = "bm25_index", index_path: str = "products.ann",
+                  workers: int = 1, backend: str = "auto", n_trees: int = 100) -> Dict[str, float]:
+    """
+    Build and save both indexes of a catalog.
+
+    Args:
+        catalog (ProductCatalog): Catalog to index.
+        bm25_path (str): Directory of the BM25 index.
+        index_path (str): Vector index file (sidecars are written next to it).
+        workers (int): Processes tokenizing for BM25 and threads building the Annoy trees.
+        backend (str): Vector backend, or "auto" to choose like ProductSearchEngine.
+        n_trees (int): Annoy trees.
+
+    Returns:
+        Dict[str, float]: Seconds spent per phase.
+    """
+    timings = {}
+    index = build_bm25_index(catalog, analyzer, workers, timings=timings)
+
+    start = time.perf_counter()
+    index.fingerprint = catalog_fingerprint(catalog, analyzer.signature)
+    index.save(bm25_path)
+    timings["bm25_save"] = time.perf_counter() - start
+
+    if catalog.has_embedding.any():
+        if backend == "auto":
+            backend = "exact" if catalog.has_embedding.sum() < EXACT_BACKEND_LIMIT else "annoy"
+        options = {"n_trees": n_trees, "n_threads": workers} if backend == "annoy" else {}
+        start = time.perf_counter()
+        ProductSearchEngine.build_index(catalog, index_path, backend=backend, **options)
+        timings["vector_build"] = time.perf_counter() - start
+    else:
+        print("No product embeddings, skipping the vector index")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", default="product_snapshot", help="product snapshot directory")
+    parser.add_argument("--offline", action="store_true",
+                        help="index the snapshot as is, without fetching changes from Firestore")
+    parser.add_argument("--bm25-path", default="bm25_index")
+    parser.add_argument("--index-path", default="products.ann")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backend", default="auto", choices=["auto", *BACKENDS])
+    parser.add_argument("--n-trees", type=int, default=100)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.offline:
+        catalog, _ = ProductCatalog.load(args.snapshot)
+    else:
+        catalog = ProductCatalog.load_all(snapshot_path=args.snapshot)
+    timings = {"catalog_load": time.perf_counter() - start}
+
+    timings.update(build_indexes(catalog, args.bm25_path, args.index_path, args.workers, args.backend,
+                                 args.n_trees))
+    print(f"{len(catalog)} products, {args.workers} workers")
+    for phase, seconds in timings.items():
+        print(f"{phase:<16}{seconds:>9.2f} s")
+    print(f"{'total':<16}{sum(timings.values()):>9.2f} s")
+
+
+if __name__ == "__main__":
+    main()
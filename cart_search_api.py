@@ -0,0 +1,451 @@
+"""
+HTTP search service for many concurrent users.
+
+The master process loads the read-only search state once (SearchIndexes:
+catalog, BM25 and vector indexes, reranker) and pre-forks uvicorn workers
+that all accept on one listening socket. The workers share those indexes
+copy-on-write, and memory-mapped saved indexes through the page cache;
+gc.freeze() before the fork keeps the garbage collector from touching (and
+so copying) the pages of the loaded objects.
+
+Everything with threads, sockets or open files (embedding and LLM clients,
+query-log writer, refinement cache) is created in each worker after the
+fork (SearchService). The user and session of a request live in a per-worker
+CartSearchEngine view over the shared indexes. Any worker may serve any
+session: every search re-reads the session from Firestore, so queries added
+through other workers are seen. Searches of one session are serialized within
+a worker only; concurrent searches of one session on different workers each
+append their query, in no particular order.
+
+Endpoints:
+    GET    /healthz                  liveness and index size
+    GET    /metrics                  stage latency histograms of this worker (OpenMetrics text)
+    POST   /session                  {"user_id"} -> new session
+    DELETE /session/{session_id}     end a session
+    POST   /search                   {"session_id", "query", "filters"} -> results
+
+Usage:
+    python cart_search_api.py --workers 4 --port 8000
+"""
+import os
+# Firestore talks gRPC; let its channels survive the pre-fork
+os.environ.setdefault("GRPC_ENABLE_FORK_SUPPORT", "true")
+
+import argparse
+import asyncio
+import gc
+import signal
+import socket
+import threading
+import traceback
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from cart_search_engine import CartSearchEngine
+from src.models.catalog import ProductCatalog
+from src.models.session import Session
+from src.models.user import UserProfile
+from src.modules.fusion.reranker import CandidateReranker
+from src.modules.preprocessor.preprocessor import QueryPreprocessor
+from src.modules.preprocessor.prompt_builder import PromptBuilder
+from src.modules.preprocessor.refinement_cache import RefinementCache
+from src.modules.retrieval.attribute_index import check_filters
+from src.modules.retrieval.bm25_retriever import BM25CandidateRetriever
+from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
+from src.services.cached_embedding_service import CachedEmbeddingService
+from src.services.embedding_backends import configured_embedding_service
+from src.services.openai_client import OpenAIClient
+from src.services.query_log_writer import QueryLogWriter
+from src.utils.tracing import tracer
+
+
+class SearchIndexes:
+    """
+    Read-only search state shared by every worker process.
+
+    Nothing here is modified while serving, so after a fork the pages stay
+    shared between the master and the workers.
+    """
+
+    def __init__(self, catalog: ProductCatalog, bm25_retriever, search_engine: ProductSearchEngine,
+                 reranker: Optional[CandidateReranker] = None):
+        """
+        Args:
+            catalog (ProductCatalog): Product metadata for both retrievers and the results.
+            bm25_retriever: Keyword retriever with ``retrieve(refined_query, top_k, filters)``.
+            search_engine (ProductSearchEngine): Vector index over the catalog.
+            reranker (Optional[CandidateReranker]): Second-stage reranker; None fuses search_K per retriever.
+        """
+        self.catalog = catalog
+        self.bm25_retriever = bm25_retriever
+        self.search_engine = search_engine
+        self.reranker = reranker
+
+    @classmethod
+    def load(cls, snapshot_path: str = "product_snapshot", index_path: str = "products.ann",
+             bm25_path: str = "bm25_index", rerank: bool = True) -> "SearchIndexes":
+        """Load the catalog and indexes the way CartSearchEngine does, reusing saved indexes."""
+        catalog = ProductCatalog.load_all(snapshot_path=snapshot_path)
+        search_engine = ProductSearchEngine(embedding_dim=catalog.embedding_dim, index_path=index_path,
+                                            products=catalog)
+        # The vector index now holds the embeddings; keep only product metadata in memory
+        search_engine.release_product_embeddings()
+        bm25_retriever = BM25CandidateRetriever(catalog, index_path=bm25_path)
+        return cls(catalog, bm25_retriever, search_engine, CandidateReranker(catalog) if rerank else None)
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.search_engine.embedding_dim
+
+    def attach(self, engine: CartSearchEngine):
+        """Point an engine at the shared indexes instead of loading its own."""
+        engine.catalog = self.catalog
+        engine.bm25_retriever = self.bm25_retriever
+        engine.search_engine = self.search_engine
+        engine.reranker = self.reranker
+        engine._search_initialized = True
+
+    @staticmethod
+    def freeze():
+        """Move every object allocated so far out of the garbage collector's reach before forking."""
+        gc.collect()
+        gc.freeze()
+
+
+class SearchService:
+    """
+    Per-worker search service: the services of one process and the sessions it serves.
+
+    Each session gets its own CartSearchEngine view (user, session, timings)
+    over the shared SearchIndexes and the worker's services; searches of one
+    session run one at a time, different sessions run concurrently. Views are
+    kept in an LRU of ``max_sessions``; an evicted or unknown session is
+    reloaded through ``sessions.load``. Other workers may have changed a cached
+    session, so each search reloads it too and replaces the cached copy (and
+    its incremental context state) when the stored one differs.
+    """
+
+    def __init__(self, indexes: SearchIndexes, embedding_service, openai_client, query_log_writer=None,
+                 refinement_cache: Optional[RefinementCache] = None, users=UserProfile.get, sessions=Session,
+                 engine_class=CartSearchEngine, max_sessions: int = 10_000):
+        """
+        Args:
+            indexes (SearchIndexes): Shared read-only indexes.
+            embedding_service: Query and context embedding service.
+            openai_client: LLM client for query refinement.
+            query_log_writer (Optional[QueryLogWriter]): Buffered query-log writer; None writes directly.
+            refinement_cache (Optional[RefinementCache]): Cache of LLM refinements.
+            users: ``user_id -> UserProfile or None``.
+            sessions: Session class providing ``create(user_id)`` and ``load(session_id)``.
+            engine_class: CartSearchEngine (sub)class the session views are made of.
+            max_sessions (int): Session views kept in memory.
+
+        Raises:
+            ValueError: If the embedding service does not match the vector index.
+        """
+        if embedding_service.embedding_dim != indexes.embedding_dim:
+            raise ValueError(
+                f"The vector index has {indexes.embedding_dim} dimensions but the embedding backend "
+                f"produces {embedding_service.embedding_dim}."
+            )
+        self.indexes = indexes
+        self.embedding_service = embedding_service
+        self.openai_client = openai_client
+        self.query_log_writer = query_log_writer
+        self.refinement_cache = refinement_cache
+        self.users = users
+        self.sessions = sessions
+        self.engine_class = engine_class
+        self.max_sessions = max_sessions
+        # Stateless apart from its clients, so one preprocessor serves every session
+        self.query_preprocessor = QueryPreprocessor(prompt_builder=PromptBuilder(), openai_client=openai_client,
+                                                    cache=refinement_cache)
+        self._views: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_worker(cls, indexes: SearchIndexes, worker: int = 0) -> "SearchService":
+        """
+        Production services of one worker process.
+
+        The embedding cache stays in memory: its on-disk tier assumes a single writer.
+        """
+        return cls(
+            indexes,
+            embedding_service=CachedEmbeddingService(configured_embedding_service()),
+            openai_client=OpenAIClient(),
+            query_log_writer=QueryLogWriter(spill_path=f"query_log_spill.{worker}.jsonl"),
+            refinement_cache=RefinementCache(path="refinement_cache.sqlite"),
+        )
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def _view(self, user: UserProfile, session: Session) -> CartSearchEngine:
+        engine = self.engine_class(embedding_service=self.embedding_service, openai_client=self.openai_client,
+                                   query_log_writer=self.query_log_writer, refinement_cache=self.refinement_cache)
+        self.indexes.attach(engine)
+        engine.query_preprocessor = self.query_preprocessor
+        engine.current_user = user
+        engine.current_session = session
+        return engine
+
+    def _remember(self, engine: CartSearchEngine) -> tuple:
+        with self._lock:
+            entry = self._views.setdefault(engine.current_session.id, (engine, asyncio.Lock()))
+            self._views.move_to_end(engine.current_session.id)
+            while len(self._views) > self.max_sessions:
+                self._views.popitem(last=False)
+        return entry
+
+    def _session_view(self, session_id: str) -> tuple:
+        """
+        (engine, lock) of a session, loading the session if this worker does not hold it.
+
+        Raises:
+            KeyError: If the session does not exist or has ended.
+        """
+        with self._lock:
+            entry = self._views.get(session_id)
+            if entry is not None:
+                self._views.move_to_end(session_id)
+                return entry
+        session = self._load_session(session_id)
+        user = self.users(session.user_id)
+        if user is None:
+            raise KeyError(f"User {session.user_id} not found")
+        return self._remember(self._view(user, session))
+
+    def _load_session(self, session_id: str) -> Session:
+        """
+        Stored state of an open session.
+
+        Raises:
+            KeyError: If the session does not exist or has ended.
+        """
+        try:
+            session = self.sessions.load(session_id)
+        except ValueError:
+            raise KeyError(f"Session {session_id} not found")
+        if session.end_time is not None:
+            raise KeyError(f"Session {session_id} has ended")
+        return session
+
+    def _refresh_session(self, engine: CartSearchEngine):
+        """
+        Replace a view's session with the stored one if another worker changed it.
+
+        Raises:
+            KeyError: If the session was deleted or ended meanwhile.
+        """
+        cached = engine.current_session
+        stored = self._load_session(cached.id)
+        if [(q.id, q.timestamp) for q in stored.queries] != [(q.id, q.timestamp) for q in cached.queries]:
+            # The cached incremental context state belongs to the old query list
+            engine.current_session = stored
+
+    def start_session(self, user_id: str) -> Session:
+        """
+        Start a session for a user.
+
+        Raises:
+            KeyError: If the user does not exist.
+        """
+        user = self.users(user_id.strip().upper())
+        if user is None:
+            raise KeyError(f"User {user_id} not found")
+        session = self.sessions.create(user_id=user.id)
+        self._remember(self._view(user, session))
+        return session
+
+    def end_session(self, session_id: str) -> Session:
+        """
+        End a session and flush its query logs.
+
+        Raises:
+            KeyError: If the session does not exist or has already ended.
+        """
+        engine, _ = self._session_view(session_id)
+        with self._lock:
+            self._views.pop(session_id, None)
+        engine.terminate_session()
+        return engine.current_session
+
+    async def search(self, session_id: str, query: str, filters: Optional[Dict] = None) -> dict:
+        """
+        Run a search in a session.
+
+        Args:
+            session_id (str): Session started with start_session.
+            query (str): Query as typed by the user.
+            filters (Optional[Dict]): Attribute filter, as in CartSearchEngine.perform_search.
+
+        Returns:
+            dict: Results with product id, title and score, and the stage timings in milliseconds.
+
+        Raises:
+            KeyError: If the session does not exist or has ended.
+            ValueError: If the filter is invalid or no retriever returned anything.
+        """
+        check_filters(filters)
+        engine, lock = await asyncio.to_thread(self._session_view, session_id)
+        async with lock:
+            await asyncio.to_thread(self._refresh_session, engine)
+            results = await engine.perform_search_async(query, filters)
+            timings = dict(engine.last_timings)
+        catalog = self.indexes.catalog
+        return {
+            "session_id": session_id,
+            "results": [{"product_id": result["product_id"],
+                         "title": catalog.value("title", catalog.position(result["product_id"])),
+                         "score": result["score"]} for result in results],
+            "timings": timings,
+        }
+
+    async def close(self):
+        """Wait for background query-log writes and release the worker's services."""
+        with self._lock:
+            engines = [engine for engine, _ in self._views.values()]
+        for engine in engines:
+            await engine.flush_writes()
+        if self.query_log_writer is not None:
+            self.query_log_writer.close()
+        if self.refinement_cache is not None:
+            self.refinement_cache.close()
+
+
+class SessionRequest(BaseModel):
+    user_id: str
+
+
+class SearchRequest(BaseModel):
+    session_id: str
+    query: str = Field(..., min_length=1)
+    filters: Optional[Dict[str, Union[str, List[str]]]] = None
+
+
+def create_app(service: SearchService):
+    """FastAPI application serving one SearchService."""
+    from fastapi import FastAPI, HTTPException, Response
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await service.close()
+
+    app = FastAPI(title="CART Search API", lifespan=lifespan)
+
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok", "pid": os.getpid(), "products": len(service.indexes.catalog),
+                "sessions": len(service)}
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(tracer.export_openmetrics(),
+                        media_type="application/openmetrics-text; version=1.0.0; charset=utf-8")
+
+    # Session calls block on Firestore, so they are plain functions run on FastAPI's thread pool
+    @app.post("/session")
+    def start_session(request: SessionRequest):
+        try:
+            session = service.start_session(request.user_id)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
+        return {"session_id": session.id, "user_id": session.user_id, "start_time": session.start_time}
+
+    @app.delete("/session/{session_id}")
+    def end_session(session_id: str):
+        try:
+            session = service.end_session(session_id)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
+        return {"session_id": session.id, "end_time": session.end_time, "queries": len(session.queries)}
+
+    @app.post("/search")
+    async def search(request: SearchRequest):
+        try:
+            return await service.search(request.session_id, request.query, request.filters)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return app
+
+
+def _run_worker(sock: socket.socket, indexes: SearchIndexes, make_service, worker: int, log_level: str):
+    import uvicorn
+
+    app = create_app(make_service(indexes, worker))
+    uvicorn.Server(uvicorn.Config(app, log_level=log_level, access_log=False)).run(sockets=[sock])
+
+
+def serve(indexes: SearchIndexes, make_service=SearchService.for_worker, host: str = "127.0.0.1",
+          port: int = 8000, workers: int = 1, log_level: str = "warning"):
+    """
+    Serve the indexes with pre-forked uvicorn workers sharing one listening socket.
+
+    Args:
+        indexes (SearchIndexes): Loaded indexes, shared by the workers.
+        make_service: ``(indexes, worker number) -> SearchService``, called in each worker after the fork.
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        workers (int): Worker processes; 1 serves from this process.
+        log_level (str): uvicorn log level.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        _run_worker(sock, indexes, make_service, 0, log_level)
+        return
+
+    indexes.freeze()
+    children = []
+    for worker in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # A worker must never return into the master's loop
+            try:
+                _run_worker(sock, indexes, make_service, worker, log_level)
+                os._exit(0)
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+        children.append(pid)
+    sock.close()
+    print(f"Serving on http://{host}:{port} with {workers} workers (pids {', '.join(map(str, children))})")
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    indexes = SearchIndexes.load()
+    serve(indexes, host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
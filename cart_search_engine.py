@@ -3,47 +3,84 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
 from pydantic import ValidationError
 from datetime import datetime, timezone
 import numpy as np
 
 from src.models.user import UserProfile
 from src.models.session import Session
-from src.models.product import Product
+from src.models.catalog import ProductCatalog
 from src.models.query_log import QueryLog
+from src.models.search_result import RankedProduct, SearchResult
 # from src.models.unified_embedding import UnifiedEmbedding
 
-from src.services.embedding_service import EmbeddingService
+from src.services.embedding_backends import configured_embedding_service
+from src.services.cached_embedding_service import CachedEmbeddingService
 from src.services.openai_client import OpenAIClient
+from src.services.query_log_writer import QueryLogWriter
+from src.services.embedding_sink import Float16Sink
 from src.modules.preprocessor.preprocessor import QueryPreprocessor
 from src.modules.preprocessor.prompt_builder import PromptBuilder
-from src.modules.Dynamic_context_modelling.session_graph_builder import ContextEmbedder
-from src.modules.Dynamic_context_modelling.fusion import VectorFuser
+from src.modules.preprocessor.refinement_cache import RefinementCache
+from src.modules.dynamic_context_modelling.session_graph_builder import ContextEmbedder
+from src.modules.dynamic_context_modelling.fusion import VectorFuser
 
+from src.modules.retrieval.attribute_index import check_filters
 from src.modules.retrieval.bm25_retriever import BM25CandidateRetriever
 from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
 from src.modules.fusion.fuse import fuse_candidates
+from src.modules.fusion.reranker import CandidateReranker
+from src.utils.tracing import tracer
+
+# Query-log writes issued while set are collected here instead of hitting Firestore
+_deferred_writes = contextvars.ContextVar("deferred_writes", default=None)
 
 
 class CartSearchEngine:
-    def __init__(self):
+    def __init__(self, embedding_service=None, openai_client=None, query_log_writer=None, embedding_sink=None,
+                 refinement_cache=None, deterministic_refinement=False):
         """
         Parameters:
+        - embedding_service: Optional embedding service, defaults to the configured backend on first search
+        - openai_client: Optional client for query refinement, defaults to OpenAIClient
+        - query_log_writer: Optional QueryLogWriter buffering query-log writes, created on first search
+        - embedding_sink: EmbeddingSink deciding how query embeddings are logged, defaults to float16 base64
+        - refinement_cache: Optional RefinementCache of LLM refinements, created on first search
+        - deterministic_refinement: Refine at temperature 0 and pin cached refinements
         - current_user: UserProfile object for the current user
         - current_session: Session object for the current session
         - search_components: Dictionary containing initialized search components
         - context_alpha: Float for session vs user context balance
+        - context_decay_rate: Float per-minute decay of earlier session transitions (0 disables)
         - context_fusion_beta: Float for query vs context balance for unified embedding
         - search_K: Integer for number of results to retrieve
         - retrieval_fusion_beta: Float for fusion weight for BM25 and vector results
+        - last_timings: Milliseconds spent in each stage of the last search, plus "total"
         """
         self.current_user = None
         self.current_session = None
         self.search_components = None
         self.context_alpha = 0.65            
+        self.context_decay_rate = 0.0
         self.context_fusion_beta = 0.65      
         self.search_K = 10                  
         self.retrieval_fusion_beta = 0.65
+        self.retrieval_fusion_strategy = "min-max"
+        self.candidate_pool_size = 200        # Results per retriever reranked down to search_K; 0 fuses search_K each
+        self.reranker = None
+        self.embedding_service = embedding_service
+        self.openai_client = openai_client
+        self.query_log_writer = query_log_writer
+        self.embedding_sink = embedding_sink or Float16Sink()
+        self.refinement_cache = refinement_cache
+        self.deterministic_refinement = deterministic_refinement
+        self.query_preprocessor = None
+        self.last_timings = {}
+        self._pending_writes = set()
     
     def run(self):
         print("🛒 CART Search Engine")
@@ -72,6 +109,8 @@ class CartSearchEngine:
               f"started at {self.current_session.start_time}")
     
     def terminate_session(self):
+        if self.query_log_writer is not None:
+            self.query_log_writer.flush()
         self.current_session.terminate()
         print(f"\nSession terminated at {self.current_session.end_time} with {len(self.current_session.queries)} queries.")
     
@@ -125,48 +164,264 @@ class CartSearchEngine:
             if self.current_session and not self.current_session.end_time:
                 self.terminate_session()
 
-    def perform_search(self, raw_query):
-        """Main search pipeline executor"""
-        ## 1. Query logging
-        query_log = self._create_query_log(raw_query)
-        print(f"\nQuery log {query_log.id} added at {query_log.timestamp}")
-        print(f"# Queries in Session: {len(self.current_session.queries)}")
+    def perform_search(self, raw_query, filters=None):
+        """
+        Main search pipeline executor
+
+        Args:
+            raw_query (str): Query as typed by the user.
+            filters (dict): Optional attribute filter pushed down into both retrievers,
+                e.g. {"brand": ["nike", "adidas"], "locale": "us"}.
+
+        Returns:
+            list: Fused results, {"product_id", "score"} dicts, best first.
+
+        Raises:
+            ValueError: If the filter names an attribute that cannot be filtered on.
+        """
+        result = self.search(raw_query, filters)
+        return [{"product_id": product.product_id, "score": product.score} for product in result.results]
+
+    def search(self, raw_query, filters=None) -> SearchResult:
+        """Run the search pipeline once and return the complete SearchResult (see search_stream)."""
+        for result in self.search_stream(raw_query, filters):
+            pass
+        return result
+
+    def search_stream(self, raw_query, filters=None):
+        """
+        Run the search pipeline once, yielding a SearchResult as soon as the
+        BM25 hits are known and again once the vector hits are fused in.
+
+        BM25 only needs the refined query, so it runs before query embedding,
+        session context and vector search, and a UI can show its hits while
+        those stages run.
+
+        Args:
+            raw_query (str): Query as typed by the user.
+            filters (dict): Optional attribute filter, as in perform_search.
+
+        Yields:
+            SearchResult: The BM25-only result, then the complete one.
+
+        Raises:
+            ValueError: If the filter names an attribute that cannot be filtered on.
+        """
+        # Every step of the pipeline runs in one private context, so the trace's
+        # spans survive the yields and never leak into the caller's context
+        context = contextvars.copy_context()
+        stream = self._search_stream(raw_query, filters)
+        try:
+            while True:
+                try:
+                    result = context.run(next, stream)
+                except StopIteration:
+                    return
+                yield result
+        finally:
+            context.run(stream.close)
+
+    def _search_stream(self, raw_query, filters):
+        """The pipeline behind search_stream, as one traced "search" span."""
+        with tracer.span("search"):
+            check_filters(filters)
+            start = time.perf_counter()
+            self.last_timings = {}
+            depth = self._retrieval_depth()
+
+            ## 1. Query logging
+            with self._timed("query_log"):
+                query_log = self._create_query_log(raw_query)
+            print(f"\nQuery log {query_log.id} added at {query_log.timestamp}")
+            print(f"# Queries in Session: {len(self.current_session.queries)}")
+
+            ## 2. Query pre-processing
+            with self._timed("refinement"):
+                refined_query = self._preprocess_query(query_log, self.current_user)
+            print(f"Refined search query: {query_log.refined_query}")
+
+            ## 6a. BM25 retrieval (first results)
+            with self._timed("bm25"):
+                bm25_results = self.bm25_retriever.retrieve(refined_query, depth, filters)
+            yield self._search_result(query_log, bm25_results, [], bm25_results[:self.search_K])
+
+            ## 3. Embedding generation
+            with self._timed("query_embedding"):
+                query_embedding = self._generate_query_embeddings(query_log)
+            # print(f"Query Vector: {query_log.embedding}")
+
+            ## 4. Session context processing (Session + User)
+            with self._timed("context"):
+                context_vector = self._build_session_context(alpha=self.context_alpha)
+            # print(f"Context Vector: {context_vector}")
+
+            ## 5. Unified Context Embedding (context + query embeddings)
+            with self._timed("unified_embedding"):
+                unified_vector = self._generate_unified_embedding(query_embedding, context_vector, alpha=self.context_fusion_beta)
+            # print(f"Unified Context Vector: {unified_vector}")
+
+            ## 6b. Vector retrieval
+            with self._timed("vector"):
+                vector_results = self.search_engine.search(unified_vector, depth, filters)
+
+            ## 7. Result fusion
+            with self._timed("fusion"):
+                fused_results = self._fuse_search_results(bm25_results, vector_results, beta=self.retrieval_fusion_beta, top_n=self.search_K)
 
-        ## 2. Query pre-processing
-        refined_query = self._preprocess_query(query_log, self.current_user)
-        print(f"Refined search query: {query_log.refined_query}")
+            ## 8. Final logging
+            with self._timed("logging"):
+                self._display_and_log_results(query_log, bm25_results, vector_results, fused_results, self.catalog)
 
-        ## 3. Embedding generation
-        query_embedding = self._generate_query_embeddings(query_log)
-        # print(f"Query Vector: {query_log.embedding}")
+            self.last_timings["total"] = (time.perf_counter() - start) * 1000
+            yield self._search_result(query_log, bm25_results, vector_results, fused_results, complete=True)
 
-        ## 4. Session context processing (Session + User)
-        context_vector = self._build_session_context(alpha=self.context_alpha)
-        # print(f"Context Vector: {context_vector}")
+    async def perform_search_async(self, raw_query, filters=None):
+        """
+        Asynchronous version of perform_search returning the same fused results.
+
+        Blocking calls run on worker threads so independent stages overlap:
+        the session context is built while the LLM refines the query, BM25
+        starts as soon as the refined query is known and runs alongside query
+        embedding and vector search, and query-log writes are collected and
+        committed in the background after the results are returned. Call
+        flush_writes() to wait for them.
+
+        Args:
+            raw_query (str): Query as typed by the user.
+            filters (dict): Optional attribute filter, as in perform_search.
+
+        Returns:
+            list: Fused results, as returned by perform_search.
+
+        Raises:
+            ValueError: If the filter names an attribute that cannot be filtered on.
+        """
+        check_filters(filters)
+        with tracer.span("search", mode="async"):
+            start = time.perf_counter()
+            self.last_timings = {}
+            writes = []
+            token = _deferred_writes.set(writes)
+            try:
+                ## 1. Query logging (the session query feeds the context, so it stays on the critical path)
+                query_log = await self._run_stage("query_log", self._create_query_log, raw_query)
+                print(f"\nQuery log {query_log.id} added at {query_log.timestamp}")
+                print(f"# Queries in Session: {len(self.current_session.queries)}")
+
+                ## 2 + 4. Query refinement and session context, concurrently
+                refinement = asyncio.create_task(
+                    self._run_stage("refinement", self._preprocess_query, query_log, self.current_user))
+                context = asyncio.create_task(
+                    self._run_stage("context", self._build_session_context, self.context_alpha))
+                refined_query = await refinement
+                print(f"Refined search query: {query_log.refined_query}")
 
-        ## 5. Unified Context Embedding (context + query embeddings)
-        unified_vector = self._generate_unified_embedding(query_embedding, context_vector, alpha=self.context_fusion_beta)
-        # print(f"Unified Context Vector: {unified_vector}")
+                ## 6a. BM25 only needs the refined query
+                bm25 = asyncio.create_task(
+                    self._run_stage("bm25", self.bm25_retriever.retrieve, refined_query,
+                                    self._retrieval_depth(), filters))
 
-        ## 6. Dual retrieval
-        bm25_results, vector_results = self._retrieve_results(refined_query, unified_vector)
+                ## 3. Embedding generation
+                query_embedding = await self._run_stage("query_embedding", self._generate_query_embeddings, query_log)
 
-        ## 7. Result fusion
-        fused_results = self._fuse_search_results(bm25_results, vector_results, beta=self.retrieval_fusion_beta, top_n=self.search_K)
+                ## 5. Unified Context Embedding (context + query embeddings)
+                context_vector = await context
+                with self._timed("unified_embedding"):
+                    unified_vector = self._generate_unified_embedding(query_embedding, context_vector, alpha=self.context_fusion_beta)
 
-        ## 8. Final logging
-        self._display_and_log_results(query_log, bm25_results, vector_results, fused_results, self.product_lookup)
+                ## 6b. Vector retrieval
+                vector_results = await self._run_stage("vector", self.search_engine.search, unified_vector,
+                                                       self._retrieval_depth(), filters)
+                bm25_results = await bm25
 
-        # return bm25_results, vector_results, fused_results
+                ## 7. Result fusion
+                with self._timed("fusion"):
+                    fused_results = self._fuse_search_results(bm25_results, vector_results, beta=self.retrieval_fusion_beta, top_n=self.search_K)
+
+                ## 8. Final logging (writes are only collected here)
+                with self._timed("logging"):
+                    self._display_and_log_results(query_log, bm25_results, vector_results, fused_results, self.catalog)
+            finally:
+                _deferred_writes.reset(token)
+
+            self.last_timings["total"] = (time.perf_counter() - start) * 1000
+            task = asyncio.create_task(asyncio.to_thread(self._apply_writes, writes))
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+            return fused_results
+
+    async def flush_writes(self):
+        """Wait for query-log writes still running in the background."""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes)
+
+    @contextmanager
+    def _timed(self, stage):
+        """Record the wall time of a block in last_timings (milliseconds) and trace it as a stage span."""
+        start = time.perf_counter()
+        try:
+            with tracer.span(f"stage.{stage}"):
+                yield
+        finally:
+            self.last_timings[stage] = (time.perf_counter() - start) * 1000
+
+    async def _run_stage(self, stage, fn, *args):
+        """Run a blocking stage on a worker thread and record its wall time."""
+        start = time.perf_counter()
+        try:
+            with tracer.span(f"stage.{stage}"):
+                return await asyncio.to_thread(fn, *args)
+        finally:
+            self.last_timings[stage] = (time.perf_counter() - start) * 1000
+
+    def _persist(self, write, *args):
+        """Apply a query-log write now, or collect it when running perform_search_async."""
+        deferred = _deferred_writes.get()
+        if deferred is not None:
+            deferred.append((write, args))
+        else:
+            with tracer.span(f"query_log.{write.__name__}"):
+                write(*args)
+
+    @staticmethod
+    def _apply_writes(writes):
+        """Apply collected writes in order; the log document is created before it is updated."""
+        for write, args in writes:
+            try:
+                with tracer.span(f"query_log.{write.__name__}"):
+                    write(*args)
+            except Exception as e:
+                print(f"Query log write failed: {str(e)}")
 
     def _initialize_search_components(self):
         """One-time initialization of search resources"""
         if not hasattr(self, '_search_initialized'):
-            self.products = Product.load_all()
-            self.product_lookup = {product.id: product for product in self.products}
-            self.search_engine = ProductSearchEngine(embedding_dim=1536, index_path="products.ann", products=self.products)
-            self.embedding_service = EmbeddingService()
-            self.bm25_retriever = BM25CandidateRetriever(self.products)
+            # One columnar catalog shared by both retrievers and the result display
+            self.catalog = ProductCatalog.load_all(snapshot_path="product_snapshot")
+            if self.embedding_service is None:
+                # Profile text and earlier session queries are re-embedded on every search; serve them from cache
+                self.embedding_service = CachedEmbeddingService(configured_embedding_service(), path="embedding_cache")
+            # Query vectors must live in the same space as the product vectors in the index
+            embedding_dim = self.embedding_service.embedding_dim
+            if self.catalog.has_embedding.any() and self.catalog.embedding_dim != embedding_dim:
+                raise ValueError(
+                    f"Product embeddings have {self.catalog.embedding_dim} dimensions but the embedding backend "
+                    f"produces {embedding_dim}. Re-embed the products with the configured backend "
+                    f"(python one_time_product_embedding.py --all)."
+                )
+            self.search_engine = ProductSearchEngine(embedding_dim=embedding_dim, index_path="products.ann",
+                                                     products=self.catalog)
+            # The vector index now holds the embeddings; keep only product metadata in memory
+            self.search_engine.release_product_embeddings()
+            if self.refinement_cache is None:
+                # Shared by worker processes; head queries are refined once per preference profile
+                self.refinement_cache = RefinementCache(path="refinement_cache.sqlite")
+            if self.query_log_writer is None:
+                # Query-log updates are merged in memory and committed in batches off the request path
+                self.query_log_writer = QueryLogWriter(spill_path="query_log_spill.jsonl")
+            self.bm25_retriever = BM25CandidateRetriever(self.catalog, index_path="bm25_index")
+            if self.candidate_pool_size and self.reranker is None:
+                self.reranker = CandidateReranker(self.catalog)
             self._search_initialized = True
     
     def _create_query_log(self, raw_query, query=None):
@@ -181,22 +436,30 @@ class CartSearchEngine:
             timestamp = datetime.now(timezone.utc)
             print("Warning: No queries in session, using current time")
 
-        return QueryLog.create(
+        query_log = QueryLog.create(
             user_id=self.current_user.id,
             session_id=self.current_session.id,
             raw_query=raw_query,
-            timestamp=timestamp
+            timestamp=timestamp,
+            save=False,
+            writer=self.query_log_writer
         )
+        self._persist(query_log.save)
+        return query_log
 
     def _preprocess_query(self, query_log, user):
         """Handle query refinement and normalization"""
-        preprocessor = QueryPreprocessor(
-            prompt_builder=PromptBuilder(),
-            openai_client=OpenAIClient()
-        )
-        refined_query = preprocessor.preprocess(query_log, user)
+        if self.query_preprocessor is None:
+            self.query_preprocessor = QueryPreprocessor(
+                prompt_builder=PromptBuilder(),
+                openai_client=self.openai_client or OpenAIClient(),
+                cache=self.refinement_cache,
+                deterministic=self.deterministic_refinement
+            )
+        refined_query = self.query_preprocessor.preprocess(query_log, user)
         normalized_query = refined_query.get("normalized_query")
-        query_log.update_refined_query(normalized_query)
+        query_log.refined_query = normalized_query
+        self._persist(query_log.update_refined_query, normalized_query)
         
         return normalized_query
     
@@ -222,8 +485,13 @@ class CartSearchEngine:
             if not isinstance(embedding, list) or not all(isinstance(x, float) for x in embedding):
                 raise TypeError("Invalid embedding format - expected list of floats")
                 
-            # 5. Update and return
-            query_log.update_embedding(embedding)
+            # 5. Log it through the embedding sink (a failing sink must not fail the search)
+            try:
+                stored, ref = self.embedding_sink.store(embedding)
+                query_log.embedding, query_log.embedding_ref = stored, ref
+                self._persist(query_log.update_embedding, stored, ref)
+            except Exception as e:
+                print(f"Storing query embedding failed: {str(e)}")
             return embedding
             
         except Exception as e:
@@ -244,7 +512,9 @@ class CartSearchEngine:
                 return {uid: self.current_user.embedding}
 
             # Compute fused context via ContextEmbedder.
-            context_embedder = ContextEmbedder(embedding_service=self.embedding_service, alpha=self.context_alpha)
+            # The embedder folds only new transitions into the state kept on the session
+            context_embedder = ContextEmbedder(embedding_service=self.embedding_service, alpha=self.context_alpha,
+                                               decay_rate=self.context_decay_rate)
             context_vectors = context_embedder.embed_single_user_and_session(
                 user=self.current_user, session=self.current_session, fuse=True
             )
@@ -280,26 +550,56 @@ class CartSearchEngine:
         
         return unified_embedding
     
-    def _retrieve_results(self, refined_query, unified_embedding=None):
-        """Execute dual retrieval strategies"""
-        bm25 = self.bm25_retriever.retrieve(refined_query, self.search_K)
-        vector = self.search_engine.search(unified_embedding, self.search_K)
-        
-        return bm25, vector
-    
+    def _retrieval_depth(self):
+        """Results requested from each retriever: the deep candidate pool when reranking, else search_K"""
+        if self.reranker is not None:
+            return max(self.candidate_pool_size, self.search_K)
+        return self.search_K
+
+    def _ranked(self, results):
+        """RankedProducts, with catalog titles, of {"product_id", "score"} results."""
+        ranked = []
+        for result in results:
+            product_id = result["product_id"]
+            title = (self.catalog.value("title", self.catalog.position(product_id))
+                     if product_id in self.catalog else "Unknown Title")
+            ranked.append(RankedProduct(product_id=product_id, title=title, score=result["score"]))
+        return ranked
+
+    def _search_result(self, query_log, bm25_results, vector_results, fused, complete=False):
+        """SearchResult of the pipeline so far; retriever lists are cut to search_K"""
+        return SearchResult(
+            query_log_id=query_log.id,
+            raw_query=query_log.raw_query,
+            refined_query=query_log.refined_query or "",
+            bm25=self._ranked(bm25_results[:self.search_K]),
+            vector=self._ranked(vector_results[:self.search_K]),
+            results=self._ranked(fused),
+            timings=dict(self.last_timings),
+            complete=complete,
+        )
+
     def _fuse_search_results(self, bm25_results, vector_results, beta=0.5, top_n=5):
-        """Fuse BM25 and vector results"""
+        """Fuse BM25 and vector results, reranking the candidate pool when a reranker is set"""
         if len(bm25_results) == 0 and len(vector_results) == 0:
             raise ValueError("Neither BM25 nor Vector results are available.")
+        elif self.reranker is not None:
+            # Earlier queries of the session; the last one is the current query
+            session_queries = [query.text for query in self.current_session.queries[:-1]]
+            preferences = self.current_user.preferences if self.current_user else None
+            return self.reranker.rerank_candidates([bm25_results, vector_results], [beta, 1 - beta],
+                                                   preferences, session_queries, top_n)
         elif len(bm25_results) == 0:
             return vector_results
         elif len(vector_results) == 0:
             return bm25_results
         else:
-            return fuse_candidates(bm25_results, vector_results, beta, top_n)
+            return fuse_candidates(bm25_results, vector_results, beta, top_n, strategy=self.retrieval_fusion_strategy)
     
     def _display_and_log_results(self, query_log, bm25_results, vector_results, fused, product_mapping=None):
         """Display and log search results into query log"""
+        # Only the first search_K of a deep candidate pool are logged
+        bm25_results, vector_results = bm25_results[:self.search_K], vector_results[:self.search_K]
         bm25_products = [
             product_mapping.get(pid["product_id"] if isinstance(pid, dict) else pid, "Unknown Title").title
             for pid in bm25_results
@@ -319,7 +619,7 @@ class CartSearchEngine:
             print(f"{i+1}. {product}")
 
         # Update query log with titles
-        query_log.update_results(bm25_products,vector_products, final_products)
+        self._persist(query_log.update_results, bm25_products, vector_products, final_products)
 
 if __name__ == "__main__":
     # E.g., U78644, U88542, U78644, U91979, U69670, U45178
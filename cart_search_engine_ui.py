@@ -1,7 +1,9 @@
+import re
+
 import gradio as gr
 
 from cart_search_engine import CartSearchEngine
-from src.models import UserProfile
+from src.models import SearchResult, UserProfile
 
 ## SAMPLE USER IDs:  U78644, U88542, U78644, U91979, U69670, U45178
 
@@ -39,8 +41,7 @@ class CartSearchEngineUI(CartSearchEngine):
 
                 self.create_session()
                 self._initialize_search_components()
-                user_profile = UserProfile.get(user_id)
-                user_preferences = self.get_user_preferences(user_profile)
+                user_preferences = self.get_user_preferences(self.current_user)
 
                 pref_html = """
                 <div style="font-family:Arial,sans-serif; font-size:14px; margin-bottom:10px;">
@@ -63,82 +64,27 @@ class CartSearchEngineUI(CartSearchEngine):
                 outputs=[login_section, search_section, login_msg, username_state, preferences_display]
             )
 
-            # Search logic
+            # Search logic: a generator, so Gradio streams the BM25 hits first and replaces them with the fused results
             def handle_search(query, user_id):
                 if not user_id or not query:
-                    return "<div style='color:red;'>⚠️ Please enter both User ID and Search Query.</div>"
-
-                if not app.verify_user(user_id):
-                    return "<div style='color:red;'>❌ Invalid User ID. Please try again.</div>"
-
-                # Run the search pipeline
-                results = app._run_ui_search(query)
-
-                ## Get refined query from query log
-                query_log = app._create_query_log(query)
-                refined_query = app._preprocess_query(query_log, app.current_user)
-
-                if not results:
-                    return "<div style='color:gray;'>😕 No results found.</div>"
-
-                # Get user preferences (replace with your real preference loader)
-                user_preferences = app.get_user_preferences(UserProfile.get(user_id))  # <-- This should return a dict like:
-
-                import re
-
-                def highlight_match(text, prefs):
-                    def apply_highlight(input_text, patterns, style):
-                        for word in patterns:
-                            regex = re.compile(rf'\b({re.escape(word)})\b', re.IGNORECASE)
-                            input_text = regex.sub(
-                                lambda match: f"<span style='{style}'>{match.group(1)}</span>",
-                                input_text
-                            )
-                        return input_text
-
-                    text = apply_highlight(
-                        text,
-                        prefs.get("favorite_brands", []),
-                        "background:#FDE68A; padding:2px 6px; border-radius:6px;"
-                    )
-                    text = apply_highlight(
-                        text,
-                        prefs.get("favorite_colors", []),
-                        "background:#E0F2FE; padding:2px 6px; border-radius:6px; color:#0369A1;"
-                    )
-                    text = apply_highlight(
-                        text,
-                        prefs.get("favorite_categories", []),
-                        "background:#DCFCE7; padding:2px 6px; border-radius:6px; color:#15803D;"
-                    )
-
-                    return text
-
-                # HTML layout
-                html = """
-                <h3 style="margin-top: 10px; color:#4F46E5; font-size:18px;">🔎 Top Matches Found</h3>
-                <div style='display:flex; flex-direction:column; gap:12px; padding-top:10px; font-family:Arial,sans-serif;'>
-                """
-
-                for i, title in enumerate(results[:self.search_K], 1):
-                    highlighted_title = highlight_match(title, user_preferences)
-                    html += f"""
-                    <div style="
-                        background: #ffffff;
-                        border-left: 5px solid #4F46E5;
-                        border-radius: 10px;
-                        padding: 14px 18px;
-                        box-shadow: 0 2px 6px rgba(0,0,0,0.05);
-                        transition: transform 0.2s ease;
-                    " onmouseover="this.style.transform='scale(1.02)'" onmouseout="this.style.transform='scale(1)'">
-                        <div style="font-size: 15.5px;">
-                             <strong>{i}. {highlighted_title}</strong>
-                        </div>
-                    </div>
-                    """
-
-                html += "</div>"
-                return html, gr.update(visible=True, value=f"<div><strong>Refined Query:</strong> {refined_query}</div>")
+                    yield ("<div style='color:red;'>⚠️ Please enter both User ID and Search Query.</div>",
+                           gr.update())
+                    return
+
+                if self.current_user is None or self.current_user.id != user_id.upper():
+                    yield "<div style='color:red;'>❌ Invalid User ID. Please try again.</div>", gr.update()
+                    return
+
+                user_preferences = self.get_user_preferences(self.current_user)
+                try:
+                    for result in self.search_stream(query):
+                        if result.results:
+                            yield (self.render_results(result, user_preferences),
+                                   gr.update(visible=True,
+                                             value=f"<div><strong>Refined Query:</strong> {result.refined_query}</div>"))
+                except ValueError:
+                    # Neither retriever found anything
+                    yield "<div style='color:gray;'>😕 No results found.</div>", gr.update()
 
             search_btn.click(
                 fn=handle_search,
@@ -169,62 +115,69 @@ class CartSearchEngineUI(CartSearchEngine):
             "favorite_categories": user.preferences.interests
         }
 
-    def _display_and_log_results(self, query_log, bm25_results, vector_results, fused, product_mapping=None):
-        """Display and log search results into query log"""
-        bm25_products = [
-            product_mapping.get(pid["product_id"] if isinstance(pid, dict) else pid, "Unknown Title").title
-            for pid in bm25_results
-        ]
-        vector_products = [
-            product_mapping.get(pid["product_id"] if isinstance(pid, dict) else pid, "Unknown Title").title
-            for pid in vector_results
-        ]
-        final_products = [
-            product_mapping.get(pid["product_id"] if isinstance(pid, dict) else pid, "Unknown Title").title
-            for pid in fused
-        ]
-
-        # Update query log with titles
-        query_log.update_results(bm25_products, vector_products, final_products)
-
-        return final_products
-
-    def _run_ui_search(self, query):
-        """Main search pipeline executor"""
-        ## 1. Query logging
-        query_log = self._create_query_log(query)
-        print(f"\nQuery log {query_log.id} added at {query_log.timestamp}")
-        print(f"# Queries in Session: {len(self.current_session.queries)}")
-
-        ## 2. Query pre-processing
-        refined_query = self._preprocess_query(query_log, self.current_user)
-        print(f"Refined search query: {query_log.refined_query}")
-
-        ## 3. Embedding generation
-        query_embedding = self._generate_query_embeddings(query_log)
-        print(f"Query Vector: {query_log.embedding}")
-
-        ## 4. Session context processing (Session + User)
-        context_vector = self._build_session_context(alpha=self.context_alpha)
-        print(f"Context Vector: {context_vector}")
-
-        ## 5. Unified Context Embedding (context + query embeddings)
-        unified_vector = self._generate_unified_embedding(query_embedding, context_vector,
-                                                          alpha=self.context_fusion_beta)
-        print(f"Unified Context Vector: {unified_vector}")
-
-        ## 6. Dual retrieval
-        bm25_results, vector_results = self._retrieve_results(refined_query, unified_vector)
-
-        ## 7. Result fusion
-        fused_results = self._fuse_search_results(bm25_results, vector_results, beta=self.retrieval_fusion_beta,
-                                                  top_n=self.search_K)
-
-        ## 8. Final logging
-        products = self._display_and_log_results(query_log, bm25_results, vector_results, fused_results,
-                                                 self.product_lookup)
-
-        return products
+    @staticmethod
+    def highlight_match(text, prefs):
+        def apply_highlight(input_text, patterns, style):
+            for word in patterns:
+                regex = re.compile(rf'\b({re.escape(word)})\b', re.IGNORECASE)
+                input_text = regex.sub(
+                    lambda match: f"<span style='{style}'>{match.group(1)}</span>",
+                    input_text
+                )
+            return input_text
+
+        text = apply_highlight(
+            text,
+            prefs.get("favorite_brands", []),
+            "background:#FDE68A; padding:2px 6px; border-radius:6px;"
+        )
+        text = apply_highlight(
+            text,
+            prefs.get("favorite_colors", []),
+            "background:#E0F2FE; padding:2px 6px; border-radius:6px; color:#0369A1;"
+        )
+        text = apply_highlight(
+            text,
+            prefs.get("favorite_categories", []),
+            "background:#DCFCE7; padding:2px 6px; border-radius:6px; color:#15803D;"
+        )
+
+        return text
+
+    def render_results(self, result: SearchResult, user_preferences) -> str:
+        """HTML list of a SearchResult: keyword matches while the vector stage runs, then the fused results"""
+        if result.complete:
+            heading = "🔎 Top Matches Found"
+            footer = f"Found in {result.timings.get('total', 0.0):.0f} ms"
+        else:
+            heading = "🔎 Keyword Matches"
+            footer = "Personalising results…"
+
+        # HTML layout
+        html = f"""
+        <h3 style="margin-top: 10px; color:#4F46E5; font-size:18px;">{heading}</h3>
+        <div style='display:flex; flex-direction:column; gap:12px; padding-top:10px; font-family:Arial,sans-serif;'>
+        """
+
+        for i, product in enumerate(result.results[:self.search_K], 1):
+            highlighted_title = self.highlight_match(product.title, user_preferences)
+            html += f"""
+            <div style="
+                background: #ffffff;
+                border-left: 5px solid #4F46E5;
+                border-radius: 10px;
+                padding: 14px 18px;
+                box-shadow: 0 2px 6px rgba(0,0,0,0.05);
+                transition: transform 0.2s ease;
+            " onmouseover="this.style.transform='scale(1.02)'" onmouseout="this.style.transform='scale(1)'">
+                <div style="font-size: 15.5px;">
+                     <strong>{i}. {highlighted_title}</strong>
+                </div>
+            </div>
+            """
+
+        html += f"</div><div style='color:#6B7280; font-size:12px; padding-top:8px;'>{footer}</div>"
+        return html
 
 
 if __name__ == "__main__":
@@ -6,3 +6,13 @@ from dotenv import load_dotenv
 FIREBASE_CREDENTIALS_PATH = "config/firebase_cart_admin.json"
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Embedding backend for queries, profiles and products: "openai" or "local" (see src/services/embedding_backends.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# Model of that backend; unset keeps the backend's default
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL") or None
+
+# Share of searches traced into latency histograms, in [0, 1] (see src/utils/tracing.py)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+# JSON-lines file receiving every span of the sampled searches; unset disables it
+TRACE_PATH = os.getenv("TRACE_PATH") or None
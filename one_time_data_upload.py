@@ -3,11 +3,12 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 import json
+from datetime import datetime, timezone
 from pathlib import Path
 from tqdm import tqdm
 from google.cloud.firestore import Client
 from src.db.firebase_client import db  # Make sure Firebase is initialized here
-from src.models.product import Product
+from src.models.product import Product, UPDATED_AT
 
 def upload_products(json_path: Path, batch_size: int = 500):
     # Load products from JSON
@@ -31,6 +32,7 @@ def upload_products(json_path: Path, batch_size: int = 500):
                 
                 # Prepare Firestore data WITH ALIASES
                 firestore_data = product.dict(by_alias=False)
+                firestore_data[UPDATED_AT] = datetime.now(timezone.utc)
                 
                 # Use product.id (class field) as document ID
                 doc_ref = products_ref.document(product.id)
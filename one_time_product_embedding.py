@@ -2,75 +2,92 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
+import argparse
 import traceback
-from tqdm import tqdm
 
-from src.models.product import Product
+from src.models.catalog import ProductCatalog
 from src.modules.preprocessor.preprocessor import QueryPreprocessor
-from src.services.embedding_service import EmbeddingService
+from src.services.embedding_backends import EMBEDDING_BACKENDS, configured_embedding_service
+from src.services.embedding_backfill import EmbeddingBackfill
 
-def process_all_products():
-    """Batch process all products to generate and store embeddings"""
+# Firestore fields of the embedded text, in product_embedding_text order
+TEXT_FIELDS = ("productTitle", "productDescription", "productBulletPoint", "productColor", "productBrand")
+
+
+def product_embedding_text(title, description, bullet_point, color, brand) -> str:
+    """Structured product text that is embedded for vector search."""
+    text_components = [
+        title,
+        description,
+        bullet_point,
+        f"Color: {color}" if color else None,
+        f"Brand: {brand}" if brand else None
+    ]
+    return " ".join(
+        QueryPreprocessor.normalize_tokenize(str(part))
+        for part in text_components
+        if part is not None
+    )
+
+
+def all_product_texts(client=None):
+    """(product_id, text) for every product; only the text fields are read, not the old embeddings."""
+    if client is None:
+        from src.db.firebase_client import db as client
+    for doc in client.collection("Products").select(list(TEXT_FIELDS)).stream():
+        record = doc.to_dict()
+        yield doc.id, product_embedding_text(*(record.get(field) for field in TEXT_FIELDS))
+
+
+def process_all_products(checkpoint_path: str = "product_embedding.ckpt", concurrency: int = 4,
+                         backend: str = None, model: str = None, reembed_all: bool = False):
+    """Backfill embeddings for every product that does not have one yet (or for every product)"""
     try:
-        # Initialize services
-        embedding_service = EmbeddingService()
-        processed_count = 0
-        error_count = 0
-        
-        # Load all products
-        products = Product.load_all()
-        print(f"Loaded {len(products)} products for processing")
-        
-        # Create progress bar
-        with tqdm(total=len(products), desc="Processing products") as pbar:
-            for product in products:
-                try:
-                    # Skip products with existing embeddings
-                    if product.embedding:
-                        pbar.update(1)
-                        continue
-                    
-                    # Prepare text components with structured formatting
-                    text_components = [
-                        product.title,
-                        product.description,
-                        product.bulletPoint,
-                        f"Color: {product.color}" if product.color else None,
-                        f"Brand: {product.brand}" if product.brand else None
-                    ]
-                    
-                    # Clean and combine text
-                    clean_text = " ".join(
-                        QueryPreprocessor.normalize_tokenize(str(part))
-                        for part in text_components
-                        if part is not None
-                    )
-                    
-                    # Generate and store embedding
-                    if clean_text.strip():
-                        embedding = embedding_service.embed_sentences([clean_text])[0]
-                        product.update_embedding(embedding)
-                        processed_count += 1
-                    else:
-                        print(f"\nWarning: Empty text for product {product.id}")
-                    
-                    pbar.update(1)
-                    
-                except Exception as e:
-                    error_count += 1
-                    print(f"\nError processing {product.id}: {str(e)}")
-                    traceback.print_exc()
-                    continue
+        embedding_service = configured_embedding_service(backend, model)
+        if reembed_all:
+            # Switching backends changes the vector size, so every product is embedded again
+            print(f"Re-embedding all products with {embedding_service.model}")
+            jobs = all_product_texts()
+            skipped = 0
+        else:
+            catalog = ProductCatalog.load_all()
+            missing = ~catalog.has_embedding
+            print(f"Loaded {len(catalog)} products, {int(missing.sum())} without embeddings")
+
+            rows = catalog.rows("id", "title", "description", "bulletPoint", "color", "brand")
+            jobs = (
+                (product_id, product_embedding_text(*fields))
+                for (product_id, *fields), needs_embedding in zip(rows, missing)
+                if needs_embedding
+            )
+            skipped = len(catalog) - int(missing.sum())
+
+        backfill = EmbeddingBackfill(embedding_service, concurrency=concurrency, checkpoint_path=checkpoint_path)
+        report = backfill.run(jobs)
 
         # Print final report
         print(f"\nProcessing complete!")
-        print(f"Successfully processed: {processed_count}")
-        print(f"Failed to process: {error_count}")
-        print(f"Skipped (existing embeddings): {len(products) - processed_count - error_count}")
+        print(f"Successfully processed: {report['embedded']}")
+        print(f"Already done in an earlier run: {report['resumed']}")
+        print(f"Failed to process: {report['failed']}")
+        print(f"Embedding requests: {report['requests']} ({report['retries']} retries), "
+              f"batch commits: {report['commits']}")
+        print(f"Skipped (existing embeddings): {skipped}")
 
     except Exception as e:
         print(f"Fatal error in processing pipeline: {str(e)}")
         traceback.print_exc()
 
+
 if __name__ == "__main__":
-    process_all_products()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Embed products that have no embedding yet.")
+    parser.add_argument("--checkpoint", default="product_embedding.ckpt",
+                        help="Progress file; rerun with the same path to resume an interrupted backfill.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--backend", choices=list(EMBEDDING_BACKENDS),
+                        help="Embedding backend (default: EMBEDDING_BACKEND from the environment).")
+    parser.add_argument("--model", help="Model of the backend (default: EMBEDDING_MODEL or the backend's default).")
+    parser.add_argument("--all", action="store_true",
+                        help="Re-embed every product, e.g. after switching backends; use a new --checkpoint.")
+    args = parser.parse_args()
+    process_all_products(args.checkpoint, args.concurrency, args.backend, args.model, args.all)
@@ -2,18 +2,19 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
+import argparse
 import traceback
 from tqdm import tqdm
 
 from src.models.user import UserProfile
 from src.modules.preprocessor.preprocessor import QueryPreprocessor
-from src.services.embedding_service import EmbeddingService
+from src.services.embedding_backends import EMBEDDING_BACKENDS, configured_embedding_service
 
-def process_all_users():
+def process_all_users(backend=None, model=None, reembed_all=False):
     """Batch process all users to generate and store embeddings"""
     try:
         # Initialize services
-        embedding_service = EmbeddingService()
+        embedding_service = configured_embedding_service(backend, model)
         processed_count = 0
         error_count = 0
         
@@ -26,7 +27,7 @@ def process_all_users():
             for user in users:
                 try:
                     # Skip products with existing embeddings
-                    if user.embedding:
+                    if user.embedding and not reembed_all:
                         pbar.update(1)
                         continue
                     
@@ -70,4 +71,10 @@ def process_all_users():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    process_all_users()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Embed the preferences of users that have no embedding yet.")
+    parser.add_argument("--backend", choices=list(EMBEDDING_BACKENDS),
+                        help="Embedding backend (default: EMBEDDING_BACKEND from the environment).")
+    parser.add_argument("--model", help="Model of the backend (default: EMBEDDING_MODEL or the backend's default).")
+    parser.add_argument("--all", action="store_true", help="Re-embed every user, e.g. after switching backends.")
+    args = parser.parse_args()
+    process_all_users(args.backend, args.model, args.all)
\ No newline at end of file
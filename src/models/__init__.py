@@ -2,16 +2,21 @@ __all__ = [
     'UserProfile',
     'Preferences',
     'Product',
+    'ProductCatalog',
     'Session',
     'QueryNode',
     'Transition',
     'QueryLog',
     'RetrievalResults',
+    'RankedProduct',
+    'SearchResult',
     'UnifiedEmbedding'
 ]
 
 from .user import UserProfile, Preferences
 from .product import Product
+from .catalog import ProductCatalog
 from .session import Session, QueryNode, Transition
 from .query_log import QueryLog, RetrievalResults
+from .search_result import RankedProduct, SearchResult
 from .unified_embedding import UnifiedEmbedding
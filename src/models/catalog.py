@@ -0,0 +1,624 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+import json
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.models.product import Product, UPDATED_AT
+
+
+class StringColumn:
+    """
+    Column of optional strings stored as one UTF-8 byte buffer plus offsets.
+
+    Value i is ``buffer[offsets[i]:offsets[i + 1]]`` decoded, or None where
+    ``present[i]`` is False. Three NumPy arrays per column replace one Python
+    str object per value. ``append`` grows the arrays geometrically, so they
+    may hold spare capacity past the values; the properties trim it.
+    """
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray, present: np.ndarray):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._present = present
+        self._size = len(present)
+
+    @classmethod
+    def from_values(cls, values: Sequence[Optional[str]]) -> "StringColumn":
+        encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        present = np.array([value is not None for value in values], dtype=bool)
+        return cls(buffer, offsets, present)
+
+    @property
+    def buffer(self) -> np.ndarray:
+        return self._buffer[:self._offsets[self._size]]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets[:self._size + 1]
+
+    @property
+    def present(self) -> np.ndarray:
+        return self._present[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, position: int) -> Optional[str]:
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError(f"Position {position} is out of range for a column of {self._size} values")
+        if not self._present[position]:
+            return None
+        return self._buffer[self._offsets[position]:self._offsets[position + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return self.values()
+
+    def values(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Optional[str]]:
+        """Values at positions start..stop - 1, decoding only that part of the buffer."""
+        stop = self._size if stop is None else min(stop, self._size)
+        offsets = self._offsets[start:stop + 1].tolist() if start < stop else []
+        if not offsets:
+            return
+        data = self._buffer[offsets[0]:offsets[-1]].tobytes()
+        base = offsets[0]
+        for i, present in enumerate(self._present[start:stop].tolist()):
+            yield data[offsets[i] - base:offsets[i + 1] - base].decode("utf-8") if present else None
+
+    @property
+    def nbytes(self) -> int:
+        return self.buffer.nbytes + self.offsets.nbytes + self.present.nbytes
+
+    def take(self, positions: np.ndarray) -> "StringColumn":
+        """Return a new column with the values at ``positions``, in that order, without decoding them."""
+        positions = np.asarray(positions, dtype=np.int64)
+        starts, stops = self._offsets[positions], self._offsets[positions + 1]
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(stops - starts, out=offsets[1:])
+        if not len(positions):
+            return StringColumn(np.array([], dtype=np.uint8), offsets, np.array([], dtype=bool))
+        # One slice per run of consecutive positions; dropping a few rows keeps the runs long
+        breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+        runs = zip(np.concatenate(([0], breaks)).tolist(), np.concatenate((breaks, [len(positions)])).tolist())
+        buffer = np.concatenate([self._buffer[starts[first]:stops[last - 1]] for first, last in runs])
+        return StringColumn(buffer, offsets, self._present[positions])
+
+    def concat(self, values: Sequence[Optional[str]]) -> "StringColumn":
+        """Return a new column with ``values`` appended."""
+        tail = StringColumn.from_values(values)
+        return StringColumn(
+            np.concatenate([self.buffer, tail.buffer]),
+            np.concatenate([self.offsets, tail.offsets[1:] + self.offsets[-1]]),
+            np.concatenate([self.present, tail.present]),
+        )
+
+    def append(self, values: Sequence[Optional[str]]):
+        """Append ``values`` in place; the arrays grow geometrically, so appends are amortized O(len(values))."""
+        tail = StringColumn.from_values(values)
+        size, used = self._size, int(self._offsets[self._size])
+        self._buffer = _reserve(self._buffer, used, used + len(tail.buffer))
+        self._offsets = _reserve(self._offsets, size + 1, size + 1 + len(tail))
+        self._present = _reserve(self._present, size, size + len(tail))
+        self._buffer[used:used + len(tail.buffer)] = tail.buffer
+        self._offsets[size + 1:size + 1 + len(tail)] = tail.offsets[1:] + used
+        self._present[size:size + len(tail)] = tail.present
+        self._size += len(tail)
+
+
+def _reserve(array: np.ndarray, used: int, needed: int) -> np.ndarray:
+    """``array`` if it is writable and has room for ``needed`` rows, else a larger copy of its first ``used`` rows."""
+    if len(array) >= needed and array.flags.writeable and not isinstance(array, np.memmap):
+        return array
+    grown = np.zeros((max(needed, 2 * len(array), 16), *array.shape[1:]), dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
+
+
+# Documents updated this long before a snapshot's high-water mark are fetched again
+SNAPSHOT_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class HighWaterMark:
+    """Tracks the latest ``updatedAt`` seen across product documents."""
+
+    def __init__(self, value: Optional[datetime] = None):
+        self.value = value
+
+    def observe(self, record: dict) -> dict:
+        updated_at = record.get(UPDATED_AT)
+        if isinstance(updated_at, str):
+            updated_at = datetime.fromisoformat(updated_at)
+        if isinstance(updated_at, datetime) and (self.value is None or updated_at > self.value):
+            self.value = updated_at
+        return record
+
+    def track(self, records: Iterable[dict]) -> Iterator[dict]:
+        for record in records:
+            yield self.observe(record)
+
+
+class ProductCatalog:
+    """
+    Columnar product catalog shared by BM25, vector search and result display.
+
+    Text fields live in StringColumns and embeddings in a single (n, dim)
+    float32 matrix with a ``has_embedding`` mask, so a large catalog costs a
+    handful of arrays instead of one pydantic model (and ~1536 boxed floats)
+    per product. Position -> id is a column lookup and id -> position a dict
+    lookup. ``Product`` models are only materialized on demand, e.g. for the
+    final results being displayed.
+
+    Changes cost O(changed products): ``remove`` tombstones rows, ``update``
+    tombstones the old rows and appends the new versions, and ``extend``
+    appends into arrays with spare capacity. Tombstoned rows are dropped by
+    ``compact``, which runs once they exceed ``compaction_ratio`` of the live
+    products, or before a whole-catalog view (``len``, ``ids``, ``rows``,
+    ``columns``, ``embeddings``, ``has_embedding``, ``save``) is read. A
+    compaction renumbers positions and increments ``generation``; lookups by
+    id always see the current positions.
+
+    Usage:
+        catalog = ProductCatalog.load_all()
+        position = catalog.position("B0883DXZYV")
+        product = catalog.get("B0883DXZYV")          # Product or None
+        for title, description in catalog.rows("title", "description"):
+            ...
+    """
+
+    COLUMNS = ("id", "title", "description", "bulletPoint", "brand", "color", "locale")
+    FORMAT_VERSION = 1
+
+    def __init__(self, columns: Dict[str, StringColumn], embeddings: Optional[np.ndarray] = None,
+                 has_embedding: Optional[np.ndarray] = None, compaction_ratio: float = 0.2):
+        """
+        Args:
+            columns (Dict[str, StringColumn]): One column per name in COLUMNS, all the same length.
+            embeddings (Optional[np.ndarray]): (n, dim) float32 matrix; rows without an embedding are zero.
+            has_embedding (Optional[np.ndarray]): (n,) mask of rows with a real embedding.
+            compaction_ratio (float): Compact once tombstoned rows exceed this share of the live products.
+        """
+        n = len(columns["id"])
+        if any(len(columns[name]) != n for name in self.COLUMNS):
+            raise ValueError("All catalog columns must have the same length")
+        self._columns = columns
+        self._embeddings = embeddings if embeddings is not None else np.zeros((n, 0), dtype=np.float32)
+        self._has_embedding = has_embedding if has_embedding is not None else np.zeros(n, dtype=bool)
+        self._rows = n
+        self._live: Optional[np.ndarray] = None  # Row mask, allocated on the first removal
+        self._num_removed = 0
+        self.compaction_ratio = compaction_ratio
+        self.generation = 0
+        self._lock = threading.RLock()
+        self._positions = {product_id: position for position, product_id in enumerate(columns["id"])}
+        if len(self._positions) != n:
+            raise ValueError("Product ids in a catalog must be unique")
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "ProductCatalog":
+        """
+        Build a catalog from product dictionaries without validating each one into a Product.
+
+        Keys may be field names ("title") or Firestore aliases ("productTitle");
+        embeddings may be lists or JSON strings, as accepted by Product.
+
+        Args:
+            records (Iterable[dict]): Product documents.
+
+        Returns:
+            ProductCatalog: The catalog, in record order.
+        """
+        aliases = {name: field.alias for name, field in Product.model_fields.items()}
+        values = {name: [] for name in cls.COLUMNS}
+        embedding_rows = []
+        for record in records:
+            for name in cls.COLUMNS:
+                value = record.get(name, record.get(aliases[name]))
+                values[name].append(str(value) if value is not None else None)
+            embedding = Product.parse_embedding(record.get("embedding"))
+            # Convert right away so the boxed floats of each document can be freed
+            embedding_rows.append(np.asarray(embedding, dtype=np.float32) if embedding else None)
+
+        if any(value is None for value in values["id"]):
+            raise ValueError("Every product record needs an id")
+        return cls.from_columns(values, embedding_rows)
+
+    @classmethod
+    def from_products(cls, products: Iterable[Product]) -> "ProductCatalog":
+        """
+        Build a catalog from Product models.
+
+        Args:
+            products (Iterable[Product]): Products, in catalog order.
+
+        Returns:
+            ProductCatalog: The catalog.
+        """
+        values = {name: [] for name in cls.COLUMNS}
+        embedding_rows = []
+        for product in products:
+            for name in cls.COLUMNS:
+                values[name].append(getattr(product, name))
+            embedding_rows.append(np.asarray(product.embedding, dtype=np.float32) if product.embedding else None)
+        return cls.from_columns(values, embedding_rows)
+
+    @classmethod
+    def from_columns(cls, values: Dict[str, Sequence[Optional[str]]],
+                     embedding_rows: Sequence[Optional[np.ndarray]]) -> "ProductCatalog":
+        """Build a catalog from per-column value lists and per-row embeddings (None for missing)."""
+        columns = {name: StringColumn.from_values(values[name]) for name in cls.COLUMNS}
+        embeddings, has_embedding = cls._stack_embeddings(embedding_rows)
+        return cls(columns, embeddings, has_embedding)
+
+    @staticmethod
+    def _stack_embeddings(rows: Sequence[Optional[np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        dims = {len(row) for row in rows if row is not None}
+        if len(dims) > 1:
+            raise ValueError(f"Product embeddings have different dimensions: {sorted(dims)}")
+        dim = dims.pop() if dims else 0
+
+        embeddings = np.zeros((len(rows), dim), dtype=np.float32)
+        has_embedding = np.zeros(len(rows), dtype=bool)
+        for position, row in enumerate(rows):
+            if row is not None:
+                embeddings[position] = row
+                has_embedding[position] = True
+        return embeddings, has_embedding
+
+    @classmethod
+    def load_all(cls, snapshot_path: Optional[str] = None, client=None) -> "ProductCatalog":
+        """
+        Load every product from Firestore straight into columns.
+
+        With ``snapshot_path``, the first call streams the whole collection and
+        writes a snapshot there; later calls load the snapshot and only fetch the
+        documents changed since it was written (see ``sync``).
+
+        Args:
+            snapshot_path (Optional[str]): Snapshot directory, or None to always stream everything.
+            client: Firestore client, defaults to the shared one from src.db.firebase_client.
+
+        Returns:
+            ProductCatalog: The current catalog.
+        """
+        if client is None:
+            from src.db.firebase_client import db as client
+
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                catalog, high_water_mark = cls.load(snapshot_path)
+            except Exception as e:
+                print(f"Error loading product snapshot: {str(e)}, streaming all products...")
+            else:
+                new_high_water_mark, changes = catalog.sync(client, high_water_mark)
+                if changes:
+                    catalog.save(snapshot_path, new_high_water_mark)
+                return catalog
+
+        high_water_mark = HighWaterMark()
+        docs = client.collection("Products").stream()
+        catalog = cls.from_records(high_water_mark.track({"productId": doc.id, **doc.to_dict()} for doc in docs))
+        if snapshot_path:
+            catalog.save(snapshot_path, high_water_mark.value)
+        return catalog
+
+    def sync(self, client, high_water_mark: Optional[datetime]) -> Tuple[Optional[datetime], int]:
+        """
+        Apply the Firestore changes made since a snapshot was taken.
+
+        Documents whose ``updatedAt`` is after the high-water mark (minus
+        SNAPSHOT_CLOCK_SKEW, to tolerate writers with slightly different clocks)
+        are re-read. Deleted and brand-new documents are found by listing the
+        collection's document ids, which does not read document data, so new
+        documents without ``updatedAt`` are picked up too. Edits to existing
+        documents that do not set ``updatedAt`` are not detected.
+
+        Args:
+            client: Firestore client.
+            high_water_mark (Optional[datetime]): Latest ``updatedAt`` in the snapshot.
+
+        Returns:
+            Tuple[Optional[datetime], int]: New high-water mark and number of changed products.
+        """
+        collection = client.collection("Products")
+        tracker = HighWaterMark(high_water_mark)
+
+        changed = {}
+        if high_water_mark is not None:
+            query = collection.where(UPDATED_AT, ">", high_water_mark - SNAPSHOT_CLOCK_SKEW)
+            for doc in query.stream():
+                changed[doc.id] = tracker.observe({"productId": doc.id, **doc.to_dict()})
+
+        current_ids = {ref.id for ref in collection.list_documents()}
+        removed = [product_id for product_id in self._positions if product_id not in current_ids]
+        for product_id in current_ids - set(self._positions) - set(changed):
+            doc = collection.document(product_id).get()
+            if doc.exists:
+                changed[doc.id] = tracker.observe({"productId": doc.id, **doc.to_dict()})
+
+        products = [Product(**record) for record in changed.values()]
+        # Documents re-read because of the clock-skew window are usually unchanged
+        products = [product for product in products if not self._matches(product)]
+        if removed:
+            self.remove(removed)
+        updated = [product for product in products if product.id in self._positions]
+        if updated:
+            self.update(updated)
+        added = [product for product in products if product.id not in self._positions]
+        if added:
+            self.extend(added)
+        return tracker.value, len(removed) + len(products)
+
+    def _matches(self, product: Product) -> bool:
+        """True if the catalog already holds exactly this version of the product."""
+        position = self._positions.get(product.id)
+        if position is None:
+            return False
+        if any(self._columns[name][position] != getattr(product, name) for name in self.COLUMNS):
+            return False
+        embedding = self.embedding(position)
+        if not product.embedding:
+            return embedding is None
+        return embedding is not None and np.array_equal(embedding, np.asarray(product.embedding, dtype=np.float32))
+
+    def save(self, path: str, high_water_mark: Optional[datetime] = None):
+        """
+        Write the catalog to a directory of ``.npy`` arrays plus ``meta.json``.
+
+        The directory is written next to the target and swapped in at the end, so
+        readers never see a half-written snapshot.
+
+        Args:
+            path (str): Snapshot directory.
+            high_water_mark (Optional[datetime]): Latest ``updatedAt`` included in the catalog.
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        for name, column in self.columns.items():
+            for part in ("buffer", "offsets", "present"):
+                np.save(os.path.join(tmp_path, f"{name}.{part}.npy"), getattr(column, part))
+        np.save(os.path.join(tmp_path, "embeddings.npy"), np.ascontiguousarray(self.embeddings))
+        np.save(os.path.join(tmp_path, "has_embedding.npy"), self.has_embedding)
+
+        meta = {
+            "format_version": self.FORMAT_VERSION,
+            "num_products": len(self),
+            "high_water_mark": high_water_mark.isoformat() if high_water_mark else None,
+        }
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> Tuple["ProductCatalog", Optional[datetime]]:
+        """
+        Load a snapshot written by ``save``.
+
+        Args:
+            path (str): Snapshot directory.
+            mmap (bool): Memory-map the embedding matrix instead of reading it into memory.
+
+        Returns:
+            Tuple[ProductCatalog, Optional[datetime]]: The catalog and its high-water mark.
+
+        Raises:
+            ValueError: If the snapshot was written by an incompatible version.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported product snapshot format {meta.get('format_version')}")
+
+        columns = {
+            name: StringColumn(*(np.load(os.path.join(path, f"{name}.{part}.npy"))
+                                 for part in ("buffer", "offsets", "present")))
+            for name in cls.COLUMNS
+        }
+        embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r" if mmap else None)
+        has_embedding = np.load(os.path.join(path, "has_embedding.npy"))
+        catalog = cls(columns, embeddings, has_embedding)
+        if len(catalog) != meta["num_products"]:
+            raise ValueError("Product snapshot is incomplete")
+
+        high_water_mark = meta.get("high_water_mark")
+        return catalog, datetime.fromisoformat(high_water_mark) if high_water_mark else None
+
+    def __len__(self) -> int:
+        self.compact()
+        return self._rows
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._positions
+
+    @property
+    def columns(self) -> Dict[str, StringColumn]:
+        self.compact()
+        return self._columns
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        self.compact()
+        return self._embeddings[:self._rows]
+
+    @property
+    def has_embedding(self) -> np.ndarray:
+        self.compact()
+        return self._has_embedding[:self._rows]
+
+    @property
+    def num_rows(self) -> int:
+        """Rows including tombstoned ones; every position is below this until the next compaction."""
+        return self._rows
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self.columns["id"])
+
+    @property
+    def embedding_dim(self) -> int:
+        return self._embeddings.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays and the embedding matrix (excluding the id dict)."""
+        return (sum(column.nbytes for column in self.columns.values())
+                + self.embeddings.nbytes + self.has_embedding.nbytes)
+
+    def position(self, product_id: str) -> int:
+        """
+        Row of a product.
+
+        Raises:
+            KeyError: If the product is not in the catalog.
+        """
+        return self._positions[product_id]
+
+    def product_id(self, position: int) -> str:
+        return self._columns["id"][position]
+
+    def value(self, name: str, position: int) -> Optional[str]:
+        """Single field of the product at ``position``."""
+        return self._columns[name][position]
+
+    def rows(self, *names: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[Optional[str], ...]]:
+        """Iterate over tuples of the given columns, in catalog order (positions start..stop - 1)."""
+        columns = self.columns
+        return zip(*(columns[name].values(start, stop) for name in names))
+
+    def embedding(self, position: int) -> Optional[np.ndarray]:
+        """Embedding row at ``position`` (a view into the matrix), or None."""
+        return self._embeddings[position] if self._has_embedding[position] else None
+
+    def product(self, position: int, include_embedding: bool = False) -> Product:
+        """
+        Materialize the Product at ``position``.
+
+        Args:
+            position (int): Catalog row.
+            include_embedding (bool): Copy the embedding into the model as a list.
+
+        Returns:
+            Product: A new model built from the columns.
+        """
+        fields = {name: self._columns[name][position] for name in self.COLUMNS}
+        if include_embedding and self._has_embedding[position]:
+            fields["embedding"] = self._embeddings[position].tolist()
+        return Product(**fields)
+
+    def get(self, product_id: str, default=None, include_embedding: bool = False):
+        """Product with the given id, or ``default`` if it is not in the catalog."""
+        position = self._positions.get(product_id)
+        if position is None:
+            return default
+        return self.product(position, include_embedding)
+
+    def products(self, product_ids: Iterable[str]) -> List[Product]:
+        """Materialize the products with the given ids, skipping unknown ids."""
+        return [self.product(self._positions[pid]) for pid in product_ids if pid in self._positions]
+
+    def extend(self, products: Sequence[Product]):
+        """
+        Append products at the end of the catalog.
+
+        Raises:
+            ValueError: If a product id is already in the catalog.
+        """
+        with self._lock:
+            duplicates = [product.id for product in products if product.id in self._positions]
+            if duplicates:
+                raise ValueError(f"Products already in the catalog: {duplicates}")
+            tail = ProductCatalog.from_products(products)
+            if tail._has_embedding.any() and self._has_embedding[:self._rows].any() \
+                    and tail.embedding_dim != self.embedding_dim:
+                raise ValueError(f"Expected embeddings of dimension {self.embedding_dim}, got {tail.embedding_dim}")
+            if tail.embedding_dim > self.embedding_dim:
+                # A catalog without any embedding has a (n, 0) matrix; widen it with zero rows
+                self._embeddings = np.zeros((self._rows, tail.embedding_dim), dtype=np.float32)
+
+            start, stop = self._rows, self._rows + len(products)
+            for name in self.COLUMNS:
+                self._columns[name].append([getattr(product, name) for product in products])
+            self._embeddings = _reserve(self._embeddings, start, stop)
+            self._has_embedding = _reserve(self._has_embedding, start, stop)
+            self._embeddings[start:stop] = tail._embeddings if tail.embedding_dim == self.embedding_dim else 0
+            self._has_embedding[start:stop] = tail._has_embedding
+            if self._live is not None:
+                self._live = _reserve(self._live, start, stop)
+                self._live[start:stop] = True
+            self._rows = stop
+            for offset, product in enumerate(products):
+                self._positions[product.id] = start + offset
+
+    def remove(self, product_ids: Iterable[str]):
+        """
+        Drop products by id. Their rows are tombstoned until the next compaction.
+
+        Raises:
+            KeyError: If a product is not in the catalog.
+        """
+        product_ids = list(product_ids)
+        with self._lock:
+            removed = [self._positions[pid] for pid in product_ids]
+            if self._live is None:
+                self._live = np.ones(len(self._has_embedding), dtype=bool)
+            for product_id, position in zip(product_ids, removed):
+                del self._positions[product_id]
+            self._live[removed] = False
+            self._num_removed += len(removed)
+            if self._num_removed > self.compaction_ratio * max(len(self._positions), 1):
+                self.compact()
+
+    def update(self, products: Sequence[Product]):
+        """Replace existing products; the new versions move to the end of the catalog."""
+        with self._lock:
+            self.remove([product.id for product in products])
+            self.extend(products)
+
+    def compact(self) -> bool:
+        """
+        Drop tombstoned rows, keeping the order of the others.
+
+        Column buffers are sliced run by run without decoding, and the embedding
+        matrix is copied once (reading it into memory if it was memory-mapped).
+
+        Returns:
+            bool: True if rows were dropped (positions changed).
+        """
+        if not self._num_removed:
+            return False
+        with self._lock:
+            if not self._num_removed:
+                return False
+            keep = np.flatnonzero(self._live[:self._rows])
+            self._columns = {name: column.take(keep) for name, column in self._columns.items()}
+            self._embeddings = self._embeddings[keep]
+            self._has_embedding = self._has_embedding[keep]
+            self._rows = len(keep)
+            self._live = None
+            self._num_removed = 0
+            self._positions = {product_id: position for position, product_id in enumerate(self._columns["id"])}
+            self.generation += 1
+            return True
+
+    def release_embeddings(self):
+        """Free the embedding matrix once it has been copied into a vector index."""
+        with self._lock:
+            self._embeddings = np.zeros((len(self._has_embedding), 0), dtype=np.float32)
+            self._has_embedding = np.zeros(len(self._has_embedding), dtype=bool)  # capacity kept for appends
@@ -4,8 +4,12 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'
 
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
+from datetime import datetime, timezone
 import json
 
+# Firestore field holding the last write time of a product; used by ProductCatalog snapshots
+UPDATED_AT = "updatedAt"
+
 class Product(BaseModel):
     id: str = Field(..., alias="productId")
     title: str = Field(..., alias="productTitle")
@@ -46,8 +50,21 @@ class Product(BaseModel):
         return cls(**product_data)
     
     @classmethod
-    def load_all(cls) -> list["Product"]:
-        """Get all products from Firestore"""
+    def load_all(cls, snapshot_path: Optional[str] = None) -> list["Product"]:
+        """
+        Get all products from Firestore
+
+        Args:
+            snapshot_path: Optional local snapshot directory. When given, products are
+                read from the snapshot and only documents changed since it was written
+                are fetched (see ProductCatalog.load_all).
+        """
+        if snapshot_path:
+            from src.models.catalog import ProductCatalog
+
+            catalog = ProductCatalog.load_all(snapshot_path=snapshot_path)
+            return [catalog.product(position, include_embedding=True) for position in range(len(catalog))]
+
         from src.db.firebase_client import db
         
         products_ref = db.collection("Products")
@@ -82,5 +99,6 @@ class Product(BaseModel):
         
         # Update Firestore document
         db.collection("Products").document(self.id).update({
-            "embedding": embedding  # Direct field name match in Firestore
+            "embedding": embedding,  # Direct field name match in Firestore
+            UPDATED_AT: datetime.now(timezone.utc)
         })
\ No newline at end of file
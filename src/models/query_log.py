@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Any, List, Optional
 # from google.cloud.firestore import ArrayUnion
 
 class RetrievalResults(BaseModel):
@@ -17,9 +17,13 @@ class QueryLog(BaseModel):
     raw_query: str = Field(..., alias="rawQuery")
     refined_query: Optional[str] = Field(None, alias="refinedQuery")
     embedding: Optional[List[float]] = Field(None, alias="queryEmbedding")
+    # Compact stand-in for the embedding written by an EmbeddingSink (hash, float16 or shard reference)
+    embedding_ref: Optional[str] = Field(None, alias="queryEmbeddingRef")
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     retrieval_results: Optional[RetrievalResults] = Field(None, alias="retrievalResults")
     final_result: Optional[List[str]] = Field(default_factory=list, alias="finalResult")
+    # Optional QueryLogWriter; when set, saves and updates are buffered by it instead of written directly
+    _writer: Any = PrivateAttr(default=None)
 
     class Config:
         populate_by_name = True
@@ -45,9 +49,15 @@ class QueryLog(BaseModel):
         raw_query: str,
         timestamp: datetime,
         refined_query: Optional[str] = None,
-        embedding: Optional[List[float]] = None
+        embedding: Optional[List[float]] = None,
+        save: bool = True,
+        writer: Optional[Any] = None
     ) -> "QueryLog":
-        """Create new query log with initial data"""
+        """Create new query log with initial data (pass save=False to write it later with save()).
+
+        With a QueryLogWriter, this and every later save/update only submits the
+        log's current state to the writer, which merges them into one document write.
+        """
         from src.db.firebase_client import db
         
         log_ref = db.collection("QueryLogs").document()
@@ -60,7 +70,9 @@ class QueryLog(BaseModel):
             refined_query=refined_query,
             embedding=embedding
         )
-        log.save()
+        log._writer = writer
+        if save:
+            log.save()
         return log
 
     @classmethod
@@ -75,6 +87,9 @@ class QueryLog(BaseModel):
 
     def save(self):
         """Full document update"""
+        if self._writer is not None:
+            self._writer.submit(self)
+            return
         from src.db.firebase_client import db
         
         db.collection("QueryLogs").document(self.id).set(
@@ -84,21 +99,32 @@ class QueryLog(BaseModel):
     
     def update_refined_query(self, refined_query: str):
         """Update the refined query"""
+        self.refined_query = refined_query
+        if self._writer is not None:
+            self._writer.submit(self)
+            return
         from src.db.firebase_client import db
         
-        self.refined_query = refined_query
         db.collection("QueryLogs").document(self.id).update({
             "refinedQuery": refined_query
         })
     
-    def update_embedding(self, embedding: List[float]):
-        """Update the query embedding"""
+    def update_embedding(self, embedding: Optional[List[float]], embedding_ref: Optional[str] = None):
+        """Update the query embedding and/or its reference; fields left as None are not written"""
+        self.embedding = embedding
+        self.embedding_ref = embedding_ref
+        if self._writer is not None:
+            self._writer.submit(self)
+            return
         from src.db.firebase_client import db
         
-        self.embedding = embedding
-        db.collection("QueryLogs").document(self.id).update({
-            "queryEmbedding": embedding
-        })
+        fields = {}
+        if embedding is not None:
+            fields["queryEmbedding"] = embedding
+        if embedding_ref is not None:
+            fields["queryEmbeddingRef"] = embedding_ref
+        if fields:
+            db.collection("QueryLogs").document(self.id).update(fields)
 
     def update_results(
         self,
@@ -112,22 +138,29 @@ class QueryLog(BaseModel):
         :param vector_results: List of product IDs from vector retrieval.
         :param final_results: List of final product titles.
         """
-        from src.db.firebase_client import db
-        from firebase_admin.firestore import ArrayUnion
-
-        # Update retrieval results if provided
+        # Update local state first; a writer persists it as one merged document
         if bm25_results is not None or vector_results is not None:
             self.retrieval_results = RetrievalResults(
                 bm25=bm25_results if bm25_results is not None else [],
                 vector=vector_results if vector_results is not None else []
             )
+        if final_results:
+            self.final_result.extend(final_results)
+        if self._writer is not None:
+            self._writer.submit(self)
+            return
+
+        from src.db.firebase_client import db
+        from firebase_admin.firestore import ArrayUnion
+
+        # Update retrieval results if provided
+        if bm25_results is not None or vector_results is not None:
             db.collection("QueryLogs").document(self.id).update({
                 "retrievalResults": self.retrieval_results.model_dump(by_alias=True)
             })
 
         # Update final results if provided and non-empty
         if final_results:
-            self.final_result.extend(final_results)
             db.collection("QueryLogs").document(self.id).update({
                 "finalResult": ArrayUnion(final_results)
             })
@@ -0,0 +1,28 @@
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+
+class RankedProduct(BaseModel):
+    product_id: str
+    title: str
+    score: float
+
+
+class SearchResult(BaseModel):
+    """
+    Outcome of one run of the search pipeline, as rendered by the UIs.
+
+    CartSearchEngine.search_stream yields it twice: once the BM25 hits are
+    known (``complete`` False, ``results`` holding the top BM25 hits) and once
+    the vector hits are fused in. Retriever lists are cut to the engine's
+    search_K; timings are in milliseconds per stage, plus "total" when complete.
+    """
+    query_log_id: str
+    raw_query: str
+    refined_query: str
+    bm25: List[RankedProduct] = []
+    vector: List[RankedProduct] = []
+    results: List[RankedProduct] = []
+    timings: Dict[str, float] = {}
+    complete: bool = False
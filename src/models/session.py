@@ -3,10 +3,13 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from datetime import datetime, timezone
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Any, List, Optional
 import math
 
+from src.utils.tracing import tracer
+
+
 class QueryNode(BaseModel):
     id: str = Field(..., alias="queryId")
     text: str
@@ -32,12 +35,22 @@ class Session(BaseModel):
     end_time: Optional[datetime] = Field(None, alias="endTime")
     queries: List[QueryNode] = []
     transitions: List[Transition] = []
+    # Incremental context (SessionContextState) kept by ContextEmbedder; transitions are append-only
+    _context_state: Any = PrivateAttr(default=None)
 
     # Add Pydantic configuration
     class Config:
         populate_by_name = True  # Allows access via both field name and alias
         validate_by_name = True
 
+    @property
+    def context_state(self):
+        return self._context_state
+
+    @context_state.setter
+    def context_state(self, state):
+        self._context_state = state
+
     @classmethod
     def create(cls, user_id: str) -> "Session":
         from src.db.firebase_client import db
@@ -67,10 +80,11 @@ class Session(BaseModel):
     def save(self):
         from src.db.firebase_client import db
         # Use self.id instead of self.sessionId
-        db.collection("Sessions").document(self.id).set(
-            self.model_dump(by_alias=True),
-            merge=True
-        )
+        with tracer.span("firestore.session.save"):
+            db.collection("Sessions").document(self.id).set(
+                self.model_dump(by_alias=True),
+                merge=True
+            )
     
     def add_query(self, query_text: str):
         from src.db.firebase_client import db
@@ -87,9 +101,10 @@ class Session(BaseModel):
         )
         
         # Update database
-        db.collection("Sessions").document(self.id).update({
-            "queries": ArrayUnion([new_query.model_dump(by_alias=True)])
-        })
+        with tracer.span("firestore.session.add_query"):
+            db.collection("Sessions").document(self.id).update({
+                "queries": ArrayUnion([new_query.model_dump(by_alias=True)])
+            })
         # print(f"Added query to DB: {new_query.model_dump(by_alias=True)}")
         
         # Update local instance
@@ -116,9 +131,10 @@ class Session(BaseModel):
             # print(f"Firestore data: {transition.model_dump(by_alias=True)}")
 
             # Update database
-            db.collection("Sessions").document(self.id).update({
-                "transitions": ArrayUnion([transition.model_dump(by_alias=True)])
-            })
+            with tracer.span("firestore.session.add_transition"):
+                db.collection("Sessions").document(self.id).update({
+                    "transitions": ArrayUnion([transition.model_dump(by_alias=True)])
+                })
             # print("Transition added to Firestore")
             self.transitions.append(transition)
     
@@ -130,6 +146,7 @@ class Session(BaseModel):
         self.end_time = datetime.now(timezone.utc)
         
         # Update both local instance and Firestore
-        db.collection("Sessions").document(self.id).update({
-            "endTime": self.end_time  # Using Firestore field alias
-        })
\ No newline at end of file
+        with tracer.span("firestore.session.terminate"):
+            db.collection("Sessions").document(self.id).update({
+                "endTime": self.end_time  # Using Firestore field alias
+            })
\ No newline at end of file
@@ -7,67 +7,148 @@ import numpy as np
 import math
 
 
+class SessionContextState:
+    """
+    Running transition-weighted sum of a session, so the session vector can be
+    updated with only the newest transition instead of re-averaging all of them.
+
+    The state also remembers the profile vector and the vector of the last
+    query text, which is the "from" side of the next transition, so each new
+    query needs a single embedding. With a ``decay_rate`` (per minute),
+    earlier transitions are down-weighted by exp(-decay_rate * minutes since)
+    by scaling the running sums, without revisiting them.
+    """
+
+    def __init__(self, decay_rate: float = 0.0):
+        self.decay_rate = decay_rate
+        self.weighted_sum = None
+        self.total_weight = 0.0
+        self.transitions_folded = 0
+        self.last_time = None
+        self.last_text = None
+        self.last_vector = None
+        self.profile_text = None
+        self.profile_vector = None
+
+    def fold(self, weight, from_vec, to_vec, timestamp=None):
+        """Add one transition with the given weight, decaying earlier ones to ``timestamp``."""
+        if self.decay_rate and timestamp is not None and self.last_time is not None and self.weighted_sum is not None:
+            minutes = (timestamp - self.last_time).total_seconds() / 60
+            scale = math.exp(-self.decay_rate * minutes)
+            self.weighted_sum *= scale
+            self.total_weight *= scale
+        transition_vec = (np.asarray(from_vec, dtype=np.float64) + np.asarray(to_vec, dtype=np.float64)) / 2.0
+        if self.weighted_sum is None:
+            self.weighted_sum = transition_vec * weight
+        else:
+            self.weighted_sum += transition_vec * weight
+        self.total_weight += weight
+        if timestamp is not None:
+            self.last_time = timestamp
+
+    def session_vector(self):
+        """Weighted average of the folded transitions, or None before the first one."""
+        if self.weighted_sum is None or self.total_weight == 0:
+            return None
+        return self.weighted_sum / self.total_weight
+
+
 class ContextEmbedder:
-    def __init__(self, embedding_service, alpha=0.5):
+    def __init__(self, embedding_service=None, alpha=0.5, decay_rate=0.0):
+        """
+        Args:
+            embedding_service: Object with ``embed_sentences(List[str]) -> List[List[float]]``;
+                None uses the backend selected in config.
+            alpha (float): Weight of the session vector against the profile vector.
+            decay_rate (float): Per-minute decay of earlier transitions (0 keeps the plain weighted average).
+        """
+        if embedding_service is None:
+            from src.services.embedding_backends import configured_embedding_service
+            embedding_service = configured_embedding_service()
         self.embedding_service = embedding_service
         self.alpha = alpha
+        self.decay_rate = decay_rate
+
+    def context_state(self, session):
+        """The incremental state attached to a session, (re)created if missing or built with another decay."""
+        state = session.context_state
+        if state is None or state.decay_rate != self.decay_rate:
+            state = SessionContextState(decay_rate=self.decay_rate)
+            session.context_state = state
+        return state
+
+    @staticmethod
+    def _find_query(session, query_id):
+        # Transitions link the latest queries, so search from the end
+        for query in reversed(session.queries):
+            if query.id == query_id:
+                return query
+        return None
 
     def embed_single_user_and_session(self, user, session, fuse=True):
+        """
+        Fused session + profile context vector, updated incrementally.
+
+        Only transitions added since the previous call are folded into the
+        session state, so the work per query does not grow with session length.
+
+        Args:
+            user (UserProfile): User whose preferences form the profile text.
+            session (Session): Session whose transitions form the session vector.
+            fuse (bool): Return the fused vector; otherwise an empty list.
+
+        Returns:
+            The fused vector, the profile vector if the session has no transitions yet,
+            or [] when fuse is False.
+        """
+        state = self.context_state(session)
+
         # --- Step 1: Create profile text
         brands = user.preferences.favorite_brands if user.preferences else []
         interests = user.preferences.interests if user.preferences else []
         profile_text = " ".join(brands + interests)
 
-        # --- Step 2: Collect unique query texts from session
-        queries = {q.id: q.text for q in session.queries}
-        transitions = session.transitions
-
-        unique_texts = set()
-        for trans in transitions:
-            from_text = queries.get(trans.from_query)
-            to_text = queries.get(trans.to)
-            if from_text:
-                unique_texts.add(from_text)
-            if to_text:
-                unique_texts.add(to_text)
-
-        session_texts = list(unique_texts)
-
-        # --- Step 3: Combine profile and session texts
-        all_texts = [profile_text] + session_texts
-
-        # --- Step 4: Embed all at once
-        all_embeddings = self.embedding_service.embed_sentences(all_texts)
-
-        # --- Step 5: Separate profile embedding
-        profile_vec = np.array(all_embeddings[0])
-        session_text_vecs = dict(zip(session_texts, all_embeddings[1:]))
-
-        # --- Step 6: Compute session embedding with transition weights
-        weighted_embeddings = []
-        total_weight = 0
-
-        for trans in transitions:
-            from_text = queries.get(trans.from_query)
-            to_text = queries.get(trans.to)
-            weight = trans.weight
-
-            if from_text and to_text:
-                from_vec = np.array(session_text_vecs[from_text])
-                to_vec = np.array(session_text_vecs[to_text])
-                transition_vec = (from_vec + to_vec) / 2.0
-                weighted_embeddings.append(transition_vec * weight)
-                total_weight += weight
-
-        if not weighted_embeddings:
-            #return None  # nothing to embed
+        # --- Step 2: Resolve the transitions not folded in yet
+        new_transitions = []
+        for trans in session.transitions[state.transitions_folded:]:
+            from_query = self._find_query(session, trans.from_query)
+            to_query = self._find_query(session, trans.to)
+            new_transitions.append((trans, from_query, to_query))
+
+        # --- Step 3: Embed only texts the state does not hold, in one call
+        known = {}
+        if state.last_text is not None:
+            known[state.last_text] = state.last_vector
+        needed = []
+        if state.profile_text != profile_text:
+            needed.append(profile_text)
+        for _, from_query, to_query in new_transitions:
+            if from_query and to_query:
+                for text in (from_query.text, to_query.text):
+                    if text not in known and text not in needed:
+                        needed.append(text)
+        if needed:
+            known.update(zip(needed, self.embedding_service.embed_sentences(needed)))
+        if state.profile_text != profile_text:
+            state.profile_text = profile_text
+            state.profile_vector = np.array(known[profile_text])
+        profile_vec = state.profile_vector
+
+        # --- Step 4: Fold the new transitions into the running sums
+        for trans, from_query, to_query in new_transitions:
+            state.transitions_folded += 1
+            if not (from_query and to_query):
+                continue
+            state.fold(trans.weight, known[from_query.text], known[to_query.text], to_query.timestamp)
+            state.last_text, state.last_vector = to_query.text, known[to_query.text]
+
+        session_vec = state.session_vector()
+        if session_vec is None:
             ## Return user profile embedding
             warnings.warn(f"No transitions found for user {user.id}. Using profile vector only.")
             return profile_vec
 
-        session_vec = np.sum(weighted_embeddings, axis=0) / total_weight
-
-        # --- Step 7: Fuse or return separately
+        # --- Step 5: Fuse or return separately
         if fuse:
             fused_vec = self.alpha * session_vec + (1 - self.alpha) * profile_vec
             return fused_vec
@@ -78,6 +159,7 @@ class ContextEmbedder:
             #     "profile": profile_vec
             # }
 
+
 class SessionGraphBuilder:
     def __init__(self, lambda_recency=0.05):
         self.lambda_recency = lambda_recency
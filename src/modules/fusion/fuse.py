@@ -1,9 +1,44 @@
-from src.utils.normalization import normalize_scores
+import numpy as np
 
+from src.modules.fusion.rank_fusion import fuse_ranked
 
-# import math
 
-def fuse_candidates(bm25_candidates, vector_candidates, beta=0.5, top_n=None):
+def fuse_candidate_lists(candidate_lists, weights=None, strategy="min-max", top_n=None):
+    """
+    Merges any number of retrieval candidate lists in a single list (see rank_fusion.fuse_ranked).
+
+    Params:
+    - candidate_lists (list): Lists of dicts, containing keys "product_id" and "score".
+    - weights (list): Weight per list; None weighs all lists equally.
+    - strategy (str): "min-max", "z-score" or "rrf".
+    - top_n (int): if provided, return only the top N candidates.
+
+    Returns:
+    - list: Final sorted candidate list of {"product_id", "score"} dicts; the input lists are not modified.
+
+    Raises:
+    - ValueError: If missing score field in candidates.
+    - ValueError: If the strategy is unknown, the weights do not match the lists or top_n is negative.
+    """
+    # Number products in order of first appearance, so ties keep the merge order
+    numbering = {}
+    ranked = []
+    for candidates in candidate_lists:
+        if any("score" not in cand for cand in candidates):
+            raise ValueError("Missing 'score' field in candidates.")
+        positions = np.fromiter((numbering.setdefault(cand["product_id"], len(numbering)) for cand in candidates),
+                                dtype=np.int64, count=len(candidates))
+        scores = np.fromiter((cand["score"] for cand in candidates), dtype=np.float64, count=len(candidates))
+        ranked.append((positions, scores))
+
+    positions, scores = fuse_ranked(ranked, weights=weights, strategy=strategy, top_n=top_n)
+    product_ids = list(numbering)
+    # Get up to 3 decimal places
+    return [{"product_id": product_ids[position], "score": round(float(score), 3)}
+            for position, score in zip(positions, scores)]
+
+
+def fuse_candidates(bm25_candidates, vector_candidates, beta=0.5, top_n=None, strategy="min-max"):
     """
     Merges BM25 and vector retrieval candidate lists in a single list using a weighted sum.
 
@@ -12,6 +47,7 @@ def fuse_candidates(bm25_candidates, vector_candidates, beta=0.5, top_n=None):
     - vector_candidates (list): List of dicts, containing keys "product_id" and "score" for vector candidates.
     - beta (float): Weight (0 <= beta <= 1) to balance BM25 and vector scores.
     - top_n (int): if provided, return only the top N candidates.
+    - strategy (str): Score normalization, "min-max" (default), "z-score" or "rrf".
 
     Returns:
     - list: Final sorted candidate list.
@@ -38,53 +74,5 @@ def fuse_candidates(bm25_candidates, vector_candidates, beta=0.5, top_n=None):
     if top_n is not None and top_n < 0:
         raise ValueError("top_n must be non-negative.")
 
-    ## Normalise BM25 scores.
-    bm25_scores = [cand["score"] for cand in bm25_candidates]
-    norm_bm25 = normalize_scores(bm25_scores, mode='min-max')
-    for idx, cand in enumerate(bm25_candidates):
-        cand["norm_BM25"] = norm_bm25[idx]
-
-    ## Normalise vector (cosine similarity) scores.
-    vector_scores = [cand["score"] for cand in vector_candidates]
-    norm_vector = normalize_scores(vector_scores, mode='min-max')
-    for idx, cand in enumerate(vector_candidates):
-        cand["norm_Vector"] = norm_vector[idx]
-
-    ## Merge candidates by productId.
-    merged = {}
-    for cand in bm25_candidates:
-        pid = cand["product_id"]
-        merged[pid] = {
-            "product_id": pid,
-            "norm_BM25": cand.get("norm_BM25", 0.0),
-            "norm_Vector": 0.0  # default if missing in vector_candidates
-        }
-
-    for cand in vector_candidates:
-        pid = cand["product_id"]
-        if pid in merged:
-            merged[pid]["norm_Vector"] = cand.get("norm_Vector", 0.0)
-        else:
-            merged[pid] = {
-                "product_id": pid,
-                "norm_BM25": 0.0,  # default if missing in bm25_candidates
-                "norm_Vector": cand.get("norm_Vector", 0.0)
-            }
-
-    # Compute final scores (get up to 3 decimal places)
-    final_candidates = []
-    for pid, scores in merged.items():
-        final_score = beta * scores["norm_BM25"] + (1 - beta) * scores["norm_Vector"]
-        final_candidates.append({
-            "product_id": pid,
-            "score": round(final_score, 3)
-        })
-
-    # Sort in descending order of finalScore.
-    final_candidates.sort(key=lambda x: x["score"], reverse=True)
-
-    # Truncate to top_n if specified.
-    if top_n is not None:
-        final_candidates = final_candidates[:top_n]
-
-    return final_candidates
+    return fuse_candidate_lists([bm25_candidates, vector_candidates], weights=[beta, 1 - beta],
+                                strategy=strategy, top_n=top_n)
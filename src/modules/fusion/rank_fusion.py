@@ -0,0 +1,114 @@
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# A retriever's result list: (m,) int positions and (m,) float scores
+RankedList = Tuple[np.ndarray, np.ndarray]
+
+
+def min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    """
+    Scale scores to [0, 1], as normalize_scores(mode='min-max').
+
+    A single score becomes 1.0 and several identical scores become 0.5.
+    """
+    low, high = scores.min(), scores.max()
+    if high == low:
+        return np.full(len(scores), 1.0 if len(scores) == 1 else 0.5)
+    return (scores - low) / (high - low)
+
+
+def z_score_normalize(scores: np.ndarray) -> np.ndarray:
+    """Standardize scores, as normalize_scores(mode='z-score'); identical scores become 0."""
+    std = scores.std()
+    return (scores - scores.mean()) / (std if std > 0 else 1.0)
+
+
+def reciprocal_ranks(scores: np.ndarray, k: float = 60.0) -> np.ndarray:
+    """
+    Reciprocal Rank Fusion contribution 1 / (k + rank) of each result.
+
+    Ranks start at 1 for the highest score; equal scores keep their list order.
+    """
+    order = np.argsort(-scores, kind="stable")
+    ranks = np.empty(len(scores))
+    ranks[order] = np.arange(1, len(scores) + 1)
+    return 1.0 / (k + ranks)
+
+
+FUSION_STRATEGIES: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "min-max": min_max_normalize,
+    "z-score": z_score_normalize,
+    "rrf": reciprocal_ranks,
+}
+
+
+def top_n_indices(scores: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    Indices of the ``top_n`` highest scores, best first.
+
+    Uses ``argpartition`` so only the selected scores are sorted. Ties go to
+    the lower index, also at the cut-off.
+    """
+    if top_n >= len(scores):
+        return np.lexsort((np.arange(len(scores)), -scores))
+    if top_n == 0:
+        return np.empty(0, dtype=np.int64)
+    # The top_n-th best score: everything above it is in, ties with it fill the remaining slots
+    cutoff = scores[np.argpartition(-scores, top_n - 1)[top_n - 1]]
+    above = np.flatnonzero(scores > cutoff)
+    tied = np.flatnonzero(scores == cutoff)[:top_n - len(above)]
+    selected = np.concatenate([above, tied])
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+
+def fuse_ranked(results: Sequence[RankedList], weights: Optional[Sequence[float]] = None,
+                strategy: str = "min-max", top_n: Optional[int] = None, rrf_k: float = 60.0) -> RankedList:
+    """
+    Fuse the result lists of any number of retrievers.
+
+    Each list's scores are normalized on their own (or turned into reciprocal
+    ranks for "rrf"), multiplied by the list's weight and summed per position;
+    a position missing from a list gets 0 from it. Inputs are not modified.
+
+    Args:
+        results (Sequence[RankedList]): (positions, scores) per retriever; positions
+            identify items across lists (e.g. catalog positions) and are unique within a list.
+        weights (Optional[Sequence[float]]): Weight per list; None weighs all lists equally.
+        strategy (str): One of FUSION_STRATEGIES: "min-max", "z-score" or "rrf".
+        top_n (Optional[int]): If provided, return only the top N items.
+        rrf_k (float): Rank offset for "rrf"; larger values flatten the rank weights.
+
+    Returns:
+        RankedList: Fused positions and scores, best first; ties go to the lower position.
+
+    Raises:
+        ValueError: If the strategy is unknown, the weights do not match the lists or top_n is negative.
+    """
+    if strategy not in FUSION_STRATEGIES:
+        raise ValueError(f"Unknown fusion strategy '{strategy}'. Use one of: {', '.join(FUSION_STRATEGIES)}.")
+    if weights is None:
+        weights = [1.0 / len(results)] * len(results) if results else []
+    if len(weights) != len(results):
+        raise ValueError(f"Expected {len(results)} weights, got {len(weights)}")
+    if top_n is not None and top_n < 0:
+        raise ValueError("top_n must be non-negative.")
+
+    normalize = FUSION_STRATEGIES[strategy]
+    positions, contributions = [], []
+    for (list_positions, list_scores), weight in zip(results, weights):
+        list_scores = np.asarray(list_scores, dtype=np.float64)
+        if len(list_scores) == 0:
+            continue
+        normalized = normalize(list_scores, rrf_k) if strategy == "rrf" else normalize(list_scores)
+        positions.append(np.asarray(list_positions, dtype=np.int64))
+        contributions.append(weight * normalized)
+    if not positions:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    # Sum the contributions per distinct position
+    fused_positions, inverse = np.unique(np.concatenate(positions), return_inverse=True)
+    fused_scores = np.bincount(inverse, weights=np.concatenate(contributions), minlength=len(fused_positions))
+
+    order = top_n_indices(fused_scores, len(fused_scores) if top_n is None else top_n)
+    return fused_positions[order], fused_scores[order]
@@ -0,0 +1,211 @@
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.models.catalog import ProductCatalog
+from src.modules.fusion.rank_fusion import RankedList, min_max_normalize, top_n_indices
+from src.utils.text_analysis import analyzer
+
+
+def tokens(text: Optional[str]) -> List[str]:
+    return analyzer.normalize(text).split() if text else []
+
+
+class CandidateReranker:
+    """
+    Second stage of a two-stage search: rescores a deep candidate pool from
+    several retrievers with a linear model over cheap per-candidate features.
+
+    Features, all in [0, 1]:
+        - one per retriever: its min-max normalized score (0 if it did not return the candidate);
+        - brand: the product brand is one of the user's favorite brands;
+        - color: the product color is mentioned in the user's preferences;
+        - session: share of the distinct terms of the session's earlier queries found in the title.
+
+    Brand and color ids and the title terms of every catalog position are
+    precomputed, so scoring a pool is a handful of array gathers and
+    weighted sums. Rows appended to the catalog are encoded on the next
+    rerank; a catalog compaction (which renumbers positions) re-encodes all.
+
+    Usage:
+        reranker = CandidateReranker(catalog)
+        results = reranker.rerank_candidates([bm25_results, vector_results], [0.65, 0.35],
+                                             user.preferences, ["running shoes"], top_n=10)
+    """
+
+    def __init__(self, catalog: ProductCatalog, brand_weight: float = 0.15, color_weight: float = 0.05,
+                 session_weight: float = 0.1):
+        """
+        Args:
+            catalog (ProductCatalog): Catalog whose positions the candidates refer to.
+            brand_weight (float): Weight of a favorite-brand match.
+            color_weight (float): Weight of a preferred-color match.
+            session_weight (float): Weight of the session affinity.
+        """
+        self.catalog = catalog
+        self.brand_weight = brand_weight
+        self.color_weight = color_weight
+        self.session_weight = session_weight
+        self._lock = threading.Lock()
+        self._build_features()
+
+    def _build_features(self):
+        """Encode every catalog position."""
+        columns = self.catalog.columns  # compacts pending removals, so read the generation after it
+        self._generation = self.catalog.generation
+        self.brands: Dict[str, int] = {}
+        self.colors: Dict[str, int] = {}
+        self.color_names: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.brand_ids = np.empty(0, dtype=np.int32)
+        self.color_ids = np.empty(0, dtype=np.int32)
+        self.title_indptr = np.zeros(1, dtype=np.int64)
+        self.title_terms = np.empty(0, dtype=np.int32)
+        self._append_features(columns["brand"], columns["color"], columns["title"])
+
+    def _append_features(self, brands, colors, titles):
+        """Encode the next positions from their brand, color and title values."""
+        self.brand_ids = np.concatenate((self.brand_ids, self._encode(brands, self.brands)))
+        self.color_ids = np.concatenate((self.color_ids, self._encode(colors, self.colors)))
+        self.color_names.extend(list(self.colors)[len(self.color_names):])
+
+        # Distinct title terms per position, CSR layout
+        rows = [sorted({self.vocabulary.setdefault(term, len(self.vocabulary)) for term in tokens(title)})
+                for title in titles]
+        indptr = np.zeros(len(rows), dtype=np.int64)
+        np.cumsum([len(row) for row in rows], out=indptr)
+        self.title_indptr = np.concatenate((self.title_indptr, indptr + self.title_indptr[-1]))
+        self.title_terms = np.concatenate((self.title_terms, np.fromiter(
+            (term for row in rows for term in row), dtype=np.int32, count=int(indptr[-1]) if len(rows) else 0)))
+
+    def _sync_features(self):
+        """Catch up with catalog changes: encode appended rows, or everything after a compaction."""
+        catalog = self.catalog
+        if catalog.generation == self._generation and catalog.num_rows == len(self.brand_ids):
+            return
+        with self._lock:
+            if catalog.generation != self._generation:
+                self._build_features()
+            elif catalog.num_rows > len(self.brand_ids):
+                # Tombstoned rows keep their (unused) features until the catalog compacts
+                new = range(len(self.brand_ids), catalog.num_rows)
+                self._append_features(*([catalog.value(name, position) for position in new]
+                                        for name in ("brand", "color", "title")))
+
+    @staticmethod
+    def _encode(column, values: Dict[str, int]) -> np.ndarray:
+        """Integer id per value of a normalized text column (-1 where missing), extending the value -> id map."""
+        ids = np.full(len(column), -1, dtype=np.int32)
+        for position, value in enumerate(column):
+            normalized = " ".join(tokens(value))
+            if normalized:
+                ids[position] = values.setdefault(normalized, len(values))
+        return ids
+
+    def _preference_ids(self, preferences):
+        """Brand ids of the favorite brands, and all preference phrases as one space-padded string."""
+        if preferences is None:
+            return np.empty(0, dtype=np.int32), ""
+        brands = [" ".join(tokens(brand)) for brand in preferences.favorite_brands]
+        brand_ids = np.array([self.brands[brand] for brand in brands if brand in self.brands], dtype=np.int32)
+        phrases = brands + [" ".join(tokens(interest)) for interest in preferences.interests]
+        return brand_ids, f" {' | '.join(phrases)} "
+
+    def _session_affinity(self, positions: np.ndarray, session_queries: Sequence[str]) -> np.ndarray:
+        term_ids = {self.vocabulary[term] for query in session_queries for term in tokens(query)
+                    if term in self.vocabulary}
+        if not term_ids:
+            return np.zeros(len(positions))
+        in_session = np.zeros(len(self.vocabulary), dtype=bool)
+        in_session[list(term_ids)] = True
+
+        # Gather the title terms of every candidate at once
+        starts = self.title_indptr[positions]
+        lengths = self.title_indptr[positions + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        gathered = np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+        owner = np.repeat(np.arange(len(positions)), lengths)
+        hits = np.bincount(owner, weights=in_session[self.title_terms[gathered]], minlength=len(positions))
+        return hits / len(term_ids)
+
+    def rerank(self, results: Sequence[RankedList], weights: Optional[Sequence[float]] = None,
+               preferences=None, session_queries: Sequence[str] = (), top_n: Optional[int] = None) -> RankedList:
+        """
+        Rescore the union of the retrievers' candidates.
+
+        Args:
+            results (Sequence[RankedList]): (catalog positions, scores) per retriever.
+            weights (Optional[Sequence[float]]): Weight per retriever; None weighs them equally.
+            preferences (Optional[Preferences]): Preferences of the searching user.
+            session_queries (Sequence[str]): Earlier queries of the session.
+            top_n (Optional[int]): If provided, return only the top N candidates.
+
+        Returns:
+            RankedList: Positions and scores, best first; ties go to the lower position.
+
+        Raises:
+            ValueError: If the weights do not match the retrievers or top_n is negative.
+        """
+        self._sync_features()
+        if weights is None:
+            weights = [1.0 / len(results)] * len(results) if results else []
+        if len(weights) != len(results):
+            raise ValueError(f"Expected {len(results)} weights, got {len(weights)}")
+        if top_n is not None and top_n < 0:
+            raise ValueError("top_n must be non-negative.")
+
+        lists = [(np.asarray(p, dtype=np.int64), np.asarray(s, dtype=np.float64)) for p, s in results]
+        if not any(len(p) for p, _ in lists):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        positions, inverse = np.unique(np.concatenate([p for p, _ in lists]), return_inverse=True)
+
+        # Retriever features: each list's scores scattered onto the candidate union
+        scores = np.zeros(len(positions))
+        start = 0
+        for (list_positions, list_scores), weight in zip(lists, weights):
+            if len(list_scores):
+                scores[inverse[start:start + len(list_scores)]] += weight * min_max_normalize(list_scores)
+            start += len(list_scores)
+
+        brand_ids, preference_text = self._preference_ids(preferences)
+        if self.brand_weight and len(brand_ids):
+            scores += self.brand_weight * np.isin(self.brand_ids[positions], brand_ids)
+        if self.color_weight and preference_text.strip():
+            # Only the few distinct colors of the pool are matched against the preference words
+            candidate_colors = self.color_ids[positions]
+            liked = [color_id for color_id in np.unique(candidate_colors[candidate_colors >= 0])
+                     if f" {self.color_names[color_id]} " in preference_text]
+            if liked:
+                scores += self.color_weight * np.isin(candidate_colors, liked)
+        if self.session_weight and session_queries:
+            scores += self.session_weight * self._session_affinity(positions, session_queries)
+
+        order = top_n_indices(scores, len(scores) if top_n is None else top_n)
+        return positions[order], scores[order]
+
+    def rerank_candidates(self, candidate_lists, weights=None, preferences=None, session_queries=(), top_n=None):
+        """
+        Dict-based rerank, in the format of fuse_candidates.
+
+        Args:
+            candidate_lists (list): Lists of dicts with "product_id" and "score"; unknown products are dropped.
+            weights (list): Weight per list; None weighs them equally.
+            preferences (Preferences): Preferences of the searching user.
+            session_queries (list): Earlier queries of the session.
+            top_n (int): if provided, return only the top N candidates.
+
+        Returns:
+            list: Sorted {"product_id", "score"} dicts.
+        """
+        self._sync_features()  # before positions are looked up, as it may compact the catalog
+        ranked = []
+        for candidates in candidate_lists:
+            known = [cand for cand in candidates if cand["product_id"] in self.catalog]
+            positions = np.fromiter((self.catalog.position(cand["product_id"]) for cand in known),
+                                    dtype=np.int64, count=len(known))
+            scores = np.fromiter((cand["score"] for cand in known), dtype=np.float64, count=len(known))
+            ranked.append((positions, scores))
+        positions, scores = self.rerank(ranked, weights, preferences, session_queries, top_n)
+        return [{"product_id": self.catalog.product_id(position), "score": round(float(score), 3)}
+                for position, score in zip(positions, scores)]
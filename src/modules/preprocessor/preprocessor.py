@@ -1,32 +1,56 @@
-from typing import Dict
+from typing import Dict, Optional, Union
 
 from src.models import UserProfile, QueryLog
 from src.modules.preprocessor.prompt_builder import PromptBuilder
+from src.modules.preprocessor.refinement_cache import RefinementCache
 from src.services.openai_client import OpenAIClient
+from src.utils.text_analysis import analyzer
 
 
 class QueryPreprocessor:
-    def __init__(self, prompt_builder: PromptBuilder, openai_client: OpenAIClient):
+    def __init__(self, prompt_builder: PromptBuilder, openai_client: OpenAIClient,
+                 cache: Optional[RefinementCache] = None, deterministic: bool = False):
+        """
+        Args:
+            prompt_builder (PromptBuilder): Builds the refinement prompt.
+            openai_client (OpenAIClient): LLM client used on cache misses.
+            cache (Optional[RefinementCache]): Refinements shared between users with the same preferences.
+            deterministic (bool): Refine at temperature 0 and pin cached results, so a query
+                always gets the same refinement.
+        """
         self.prompt_builder = prompt_builder
         self.openai_client = openai_client
-
-    def preprocess(self, query: QueryLog, user_profile: UserProfile) -> Dict[str, str]:
-        prompt = self.prompt_builder.build(query.raw_query, user_profile)
-
-        response = self.openai_client.generate_completion([
-            {"role": "user", "content": prompt}
-        ])
+        self.cache = cache
+        self.deterministic = deterministic
+
+    def preprocess(self, query: Union[QueryLog, str], user_profile: UserProfile) -> Dict[str, str]:
+        raw_query = query.raw_query if isinstance(query, QueryLog) else query
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.normalize_tokenize(raw_query),
+                                 self.prompt_builder.preference_segment(user_profile), self.deterministic)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        prompt = self.prompt_builder.build(raw_query, user_profile)
+        messages = [{"role": "user", "content": prompt}]
+        if self.deterministic:
+            response = self.openai_client.generate_completion(messages, temperature=0.0)
+        else:
+            response = self.openai_client.generate_completion(messages)
 
         normalized = self.normalize_tokenize(response)
 
-        return {
+        result = {
             "expanded_corrected_query": response,
             "normalized_query": normalized
         }
+        if key is not None:
+            self.cache.put(key, result, pinned=self.deterministic)
+        return result
 
     @staticmethod
     def normalize_tokenize(query: str) -> str:
-        import re
-        query = query.lower()
-        query = re.sub(r"[^\w\s]", "", query)
-        return " ".join(query.split()).lower()
+        return analyzer.normalize(query)
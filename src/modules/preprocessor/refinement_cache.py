@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class RefinementCache:
+    """
+    Cache of LLM query refinements, keyed on the normalized raw query and a
+    hash of the user-preference part of the prompt.
+
+    Entries live in a size-bounded in-memory LRU and expire after ``ttl``
+    seconds. With ``path`` set they are also written to a SQLite database
+    (WAL mode), so several worker processes share refinements: a miss in the
+    local LRU falls back to the database before calling the LLM. Entries
+    stored as ``pinned`` never expire, which deterministic refinement uses to
+    keep returning the first result for a key.
+
+    Usage:
+        cache = RefinementCache(max_size=10_000, ttl=3600, path="refinement_cache.sqlite")
+        preprocessor = QueryPreprocessor(PromptBuilder(), OpenAIClient(), cache=cache)
+        cache.stats  # {"hits": ..., "misses": ..., ...}
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: Optional[float] = 3600.0, path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            max_size (int): Entries kept in the in-memory LRU.
+            ttl (Optional[float]): Seconds an entry stays valid; None keeps entries until evicted.
+            path (Optional[str]): SQLite file shared across processes; None keeps the cache in memory only.
+            clock (Callable[[], float]): Time source in seconds, replaceable in tests.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS refinements "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, pinned INTEGER NOT NULL)"
+            )
+
+    @staticmethod
+    def key(normalized_query: str, preference_segment: str, deterministic: bool = False) -> str:
+        """
+        Cache key for a refinement request.
+
+        Args:
+            normalized_query (str): Raw query after QueryPreprocessor.normalize_tokenize.
+            preference_segment (str): User-preference part of the prompt (PromptBuilder.preference_segment).
+            deterministic (bool): Whether the refinement was made in deterministic mode.
+
+        Returns:
+            str: Hex digest identifying the request.
+        """
+        segment_hash = hashlib.sha256(preference_segment.encode("utf-8")).hexdigest()
+        mode = "deterministic" if deterministic else "sampled"
+        return hashlib.sha256(f"{mode}\0{normalized_query}\0{segment_hash}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float, pinned: bool) -> bool:
+        return not pinned and self.ttl is not None and self.clock() - created > self.ttl
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        Cached refinement for a key.
+
+        Args:
+            key (str): Key from RefinementCache.key.
+
+        Returns:
+            Optional[Dict[str, str]]: The cached preprocess() result, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created, pinned = entry
+                if not self._expired(created, pinned):
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return dict(value)
+                del self._entries[key]
+                self.stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created, pinned FROM refinements WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], bool(row[2])):
+                    value = json.loads(row[0])
+                    self._remember(key, (value, row[1], bool(row[2])))
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return dict(value)
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: Dict[str, str], pinned: bool = False):
+        """
+        Store a refinement.
+
+        Args:
+            key (str): Key from RefinementCache.key.
+            value (Dict[str, str]): preprocess() result to cache.
+            pinned (bool): Never expire this entry (it can still be evicted from memory).
+        """
+        created = self.clock()
+        with self._lock:
+            self._remember(key, (dict(value), created, pinned))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO refinements (key, value, created, pinned) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), created, int(pinned))
+                )
+
+    def _remember(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def prune(self) -> int:
+        """
+        Delete expired entries from memory and from the database.
+
+        Returns:
+            int: Number of database rows deleted.
+        """
+        with self._lock:
+            for key in [k for k, (_, created, pinned) in self._entries.items() if self._expired(created, pinned)]:
+                del self._entries[key]
+            if self._db is None or self.ttl is None:
+                return 0
+            cursor = self._db.execute(
+                "DELETE FROM refinements WHERE pinned = 0 AND created < ?", (self.clock() - self.ttl,)
+            )
+            return cursor.rowcount
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from src.models.product import Product
+from src.models.catalog import ProductCatalog
+
+# A filter value is one attribute value or a list of accepted values
+Filters = Mapping[str, Union[str, Sequence[str]]]
+# Product attributes that can be filtered on
+FILTER_FIELDS = ("brand", "color", "locale")
+
+
+def normalize_value(value: Optional[str]) -> str:
+    """Attribute value as indexed and matched: lowercased, whitespace collapsed."""
+    return " ".join(str(value).lower().split()) if value is not None else ""
+
+
+def check_filters(filters: Optional[Filters], fields: Sequence[str] = FILTER_FIELDS):
+    """
+    Validate a filter before it reaches the retrievers.
+
+    Raises:
+        ValueError: If the filter names an attribute that is not indexed or has no accepted value.
+    """
+    for field, accepted in (filters or {}).items():
+        if field not in fields:
+            raise ValueError(f"Cannot filter on '{field}'. Use one of: {', '.join(fields)}.")
+        if not isinstance(accepted, str) and not len(accepted):
+            raise ValueError(f"Filter on '{field}' needs at least one value.")
+
+
+class AttributeIndex:
+    """
+    Bitmap index over categorical product attributes (brand, color, locale)
+    for pushing filters down into the retrievers.
+
+    Each attribute is stored as one int32 value code per row. The boolean
+    bitmap of a value (row i is True when row i has that value) is derived
+    from the codes on first use and kept in a small LRU, so popular filter
+    values cost one array lookup. A filter ANDs its attributes and ORs the
+    values listed for one attribute; values are matched case-insensitively.
+
+    Rows follow ``keys`` when given (e.g. the positions of a BM25 or vector
+    index), otherwise catalog order.
+
+    Usage:
+        index = AttributeIndex(catalog, keys=engine.product_ids)
+        mask = index.mask({"brand": ["nike", "adidas"], "locale": "us"})
+    """
+
+    def __init__(self, products: Union[List[Product], ProductCatalog], keys: Optional[Sequence[str]] = None,
+                 fields: Sequence[str] = FILTER_FIELDS, max_cached_bitmaps: int = 256):
+        """
+        Args:
+            products (Union[List[Product], ProductCatalog]): Products whose attributes are indexed.
+            keys (Optional[Sequence[str]]): Product id of each row; unknown ids get no attribute values.
+            fields (Sequence[str]): Product attributes to index.
+            max_cached_bitmaps (int): Value bitmaps kept in memory.
+        """
+        self.fields = tuple(fields)
+        self.max_cached_bitmaps = max_cached_bitmaps
+        if isinstance(products, ProductCatalog):
+            rows = products.rows("id", *self.fields)
+        else:
+            rows = ((p.id, *(getattr(p, field) for field in self.fields)) for p in products)
+
+        values_by_id = {row[0]: row[1:] for row in rows}
+        if keys is None:
+            keys = list(values_by_id)
+        missing = (None,) * len(self.fields)
+        columns = zip(*(values_by_id.get(str(key), missing) for key in keys)) if len(keys) else []
+
+        self.size = len(keys)
+        self.values: Dict[str, Dict[str, int]] = {field: {} for field in self.fields}
+        self.codes: Dict[str, np.ndarray] = {field: np.full(self.size, -1, dtype=np.int32) for field in self.fields}
+        for field, column in zip(self.fields, columns):
+            values, codes = self.values[field], self.codes[field]
+            for row, value in enumerate(column):
+                value = normalize_value(value)
+                if value:
+                    codes[row] = values.setdefault(value, len(values))
+        self._bitmaps: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def bitmap(self, field: str, value: str) -> np.ndarray:
+        """
+        Rows having ``value`` for ``field``.
+
+        Raises:
+            ValueError: If the field is not indexed.
+        """
+        if field not in self.values:
+            raise ValueError(f"Cannot filter on '{field}'. Use one of: {', '.join(self.fields)}.")
+        code = self.values[field].get(normalize_value(value))
+        if code is None:
+            return np.zeros(self.size, dtype=bool)
+
+        key = (field, code)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            bitmap = self.codes[field] == code
+            self._bitmaps[key] = bitmap
+            while len(self._bitmaps) > self.max_cached_bitmaps:
+                self._bitmaps.popitem(last=False)
+        else:
+            self._bitmaps.move_to_end(key)
+        return bitmap
+
+    def mask(self, filters: Optional[Filters]) -> Optional[np.ndarray]:
+        """
+        Rows matching every attribute of a filter.
+
+        Args:
+            filters (Optional[Filters]): Attribute -> accepted value(s), e.g. {"brand": ["nike", "adidas"]}.
+
+        Returns:
+            Optional[np.ndarray]: Boolean mask over the rows, or None when there is nothing to filter on.
+
+        Raises:
+            ValueError: If a filter names an attribute that is not indexed.
+        """
+        if not filters:
+            return None
+        mask = None
+        for field, accepted in filters.items():
+            accepted = [accepted] if isinstance(accepted, str) else list(accepted)
+            field_mask = np.zeros(self.size, dtype=bool)
+            for value in accepted:
+                field_mask |= self.bitmap(field, value)
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
@@ -1,28 +1,43 @@
-from typing import List, Dict
-import re
-import string
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from rank_bm25 import BM25Okapi
+from typing import Iterator, List, Dict, Optional, Tuple, Union
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from src.models.product import Product
+from src.models.catalog import ProductCatalog
+from src.modules.retrieval.sparse_bm25 import SparseBM25Index, count_postings
+from src.modules.retrieval.attribute_index import AttributeIndex, Filters
+from src.utils.text_analysis import TextAnalyzer, Vocabulary, analyzer as default_analyzer
 
-# Download NLTK data
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
-nltk.download('punkt_tab', quiet=True)
+# (products, analyzer) tokenized by the worker processes of build_bm25_index, inherited through fork
+_build_source = None
 
 
 class BM25CandidateRetriever:
     """
     BM25-based retriever for ranking Product objects based on a textual query.
-    Takes a list of Product objects during initialization, builds a BM25 index
-    from their title, description, and bullet_point fields.
+    Takes a list of Product objects (or a ProductCatalog, which is shared rather
+    than copied) during initialization, builds a BM25 index from their title,
+    description, and bullet_point fields.
+
+    Scoring is done by SparseBM25Index, an inverted index that only visits the
+    documents containing the query terms. Documents and queries are tokenized
+    by the same TextAnalyzer.
 
     Usage:
         retriever = BM25CandidateRetriever(products)
         results = retriever.retrieve(refined_query)
 
+        # Keep the index in sync with catalog edits
+        retriever.update_products(edited_products)
+        retriever.remove_products(["B0883DXZYV"])
+
+        # Build once, then later processes memory-map the saved index
+        retriever = BM25CandidateRetriever(products, index_path="bm25_index")
+
     Output format:
         [
             {"product": Product, "score": float},
@@ -30,21 +45,40 @@ class BM25CandidateRetriever:
         ]
     """
 
-    def __init__(self, products: List[Product]):
+    def __init__(self, products: Union[List[Product], ProductCatalog], index_path: Optional[str] = None,
+                 analyzer: Optional[TextAnalyzer] = None, workers: int = 1):
         """
         Initialize the retriever with a list of Product instances.
 
         Args:
-            products (List[Product]): A list of Product objects to index.
+            products (Union[List[Product], ProductCatalog]): Products to index. A catalog is
+                kept by reference and updated in place by the add/update/remove methods.
+            index_path (Optional[str]): Directory of a saved index. If it exists and was
+                built from the same catalog it is loaded instead of re-tokenizing;
+                otherwise the index is rebuilt and saved there.
+            analyzer (Optional[TextAnalyzer]): Tokenizer of documents and queries, defaults to
+                the shared one of src.utils.text_analysis.
+            workers (int): Processes tokenizing the catalog when the index is (re)built; with more
+                than one the token lists are not kept in ``documents``.
         """
-        self.products = products
+        self.products = products if isinstance(products, ProductCatalog) else list(products)
         self.documents = []  # List of tokenized texts
-        self.index_to_product = {}  # Map from index to Product
         self.bm25 = None
-        self.stop_words = set(stopwords.words('english'))
+        self._attribute_index = None  # AttributeIndex over the current BM25 positions, built on first filter
+        self.analyzer = analyzer or default_analyzer
+        self.index_path = index_path
+
+        if index_path and self.load_index(index_path):
+            return
 
-        self.preprocess_data()
-        self.build_index()
+        if workers > 1:
+            self.bm25 = build_bm25_index(self.products, self.analyzer, workers)
+            self.bm25.fingerprint = self.fingerprint()
+        else:
+            self.preprocess_data()
+            self.build_index()
+        if index_path:
+            self.save_index(index_path)
 
     def preprocess_text(self, text: str) -> List[str]:
         """
@@ -56,60 +90,277 @@ class BM25CandidateRetriever:
         Returns:
             List[str]: Cleaned and tokenized list of words.
         """
-        text = text.lower()
-        text = re.sub(f"[{re.escape(string.punctuation)}]", "", text)
-        tokens = word_tokenize(text)
-        tokens = [token for token in tokens if token not in self.stop_words]
-        return tokens
+        return self.analyzer.tokens(text)
 
     def preprocess_data(self):
         """
         Preprocess product data and prepare documents for BM25 indexing.
         Combines product title, description, and bullet points into one text blob per product.
         """
-        for idx, product in enumerate(self.products):
-            text_parts = [product.title]
-            if product.description:
-                text_parts.append(product.description)
-            if product.bulletPoint:
-                text_parts.append(product.bulletPoint)
-            full_text = " ".join(text_parts)
-            tokens = self.preprocess_text(full_text)
-            self.documents.append(tokens)
-            self.index_to_product[idx] = product
+        for _, title, description, bullet_point in indexed_fields(self.products):
+            self.documents.append(self.preprocess_text(join_text(title, description, bullet_point)))
+
+    @staticmethod
+    def product_text(product: Product) -> str:
+        """
+        Combine the indexed fields of a product into one text blob.
+
+        Args:
+            product (Product): Product to index.
+
+        Returns:
+            str: Title, description and bullet points joined by spaces.
+        """
+        return join_text(product.title, product.description, product.bulletPoint)
 
     def build_index(self):
         """
         Build a BM25 index from the tokenized product documents.
         """
-        self.bm25 = BM25Okapi(self.documents)
+        self.bm25 = SparseBM25Index.from_documents(
+            self.documents, [fields[0] for fields in indexed_fields(self.products)]
+        )
+        self.bm25.fingerprint = self.fingerprint()
+
+    def fingerprint(self) -> str:
+        """Fingerprint of the current catalog under this retriever's analyzer."""
+        return catalog_fingerprint(self.products, self.analyzer.signature)
+
+    def load_index(self, index_path: str) -> bool:
+        """
+        Load a saved index if it matches the current catalog.
+
+        Args:
+            index_path (str): Directory written by SparseBM25Index.save.
+
+        Returns:
+            bool: True if the saved index was loaded, False if it is missing or stale.
+        """
+        if not os.path.exists(index_path):
+            return False
+        try:
+            index = SparseBM25Index.load(index_path)
+        except Exception as e:
+            print(f"Error loading BM25 index: {str(e)}, rebuilding...")
+            return False
+
+        if index.fingerprint != self.fingerprint():
+            print("BM25 index is stale for the current catalog, rebuilding...")
+            return False
+
+        self.bm25 = index
+        return True
 
-    def retrieve(self, refined_query: str, top_k=5) -> List[Dict[str, object]]:
+    def save_index(self, index_path: Optional[str] = None):
+        """
+        Save the index together with the fingerprint of the current catalog.
+
+        Args:
+            index_path (Optional[str]): Target directory, defaults to the one given at construction.
+        """
+        index_path = index_path or self.index_path
+        if not index_path:
+            raise ValueError("No index path provided.")
+        self.bm25.fingerprint = self.fingerprint()
+        self.bm25.save(index_path)
+
+    def add_products(self, products: List[Product]):
+        """
+        Index new products without rebuilding the whole index.
+
+        Args:
+            products (List[Product]): Products that are not indexed yet.
+        """
+        self.bm25.add_documents(
+            [product.id for product in products],
+            [self.preprocess_text(self.product_text(product)) for product in products],
+        )
+        self.products.extend(products)  # list.extend or ProductCatalog.extend
+
+    def update_products(self, products: List[Product]):
+        """
+        Re-index products whose title, description or bullet points changed.
+
+        Args:
+            products (List[Product]): New versions of already indexed products.
+        """
+        self.bm25.update_documents(
+            [product.id for product in products],
+            [self.preprocess_text(self.product_text(product)) for product in products],
+        )
+        if isinstance(self.products, ProductCatalog):
+            self.products.update(products)
+            return
+        updated_ids = {product.id for product in products}
+        self.products = [product for product in self.products if product.id not in updated_ids] + list(products)
+
+    def remove_products(self, product_ids: List[str]):
+        """
+        Remove products from the index.
+
+        Args:
+            product_ids (List[str]): Ids of indexed products.
+        """
+        self.bm25.remove_documents(product_ids)
+        if isinstance(self.products, ProductCatalog):
+            self.products.remove(product_ids)
+            return
+        removed_ids = set(product_ids)
+        self.products = [product for product in self.products if product.id not in removed_ids]
+
+    @property
+    def attribute_index(self) -> AttributeIndex:
+        """Brand/color/locale bitmaps over the BM25 positions, rebuilt after the positions change."""
+        return self._attribute_index_for(self.bm25.keys)
+
+    def _attribute_index_for(self, keys: np.ndarray) -> AttributeIndex:
+        """Attribute index over the given BM25 keys array, cached until the array is replaced."""
+        if self._attribute_index is None or self._attribute_index[0] is not keys:
+            # Added documents and compactions replace the keys array; removals only mark tombstones
+            self._attribute_index = (keys, AttributeIndex(self.products, keys=keys))
+        return self._attribute_index[1]
+
+    def retrieve(self, refined_query: str, top_k=5, filters: Optional[Filters] = None) -> List[Dict[str, object]]:
         """
         Retrieve the top k most relevant products based on BM25 scores.
 
         Args:
             refined_query (str): The cleaned query string (from QueryLog.refined_query).
+            filters (Optional[Filters]): Attribute filter, e.g. {"brand": "nike", "locale": "us"};
+                only matching products are scored, so up to top_k of them are returned.
 
         Returns:
             List[Dict[str, object]]: A list of top-k matches, each a dictionary with:
                 - "product": Product object
                 - "score": BM25 relevance score as float
         """
-        query_tokens = refined_query.split()
-        scores = self.bm25.get_scores(query_tokens)
-        top_indices = scores.argsort()[::-1][:top_k]
+        query_tokens = self.preprocess_text(refined_query)
+        # The mask is built from the keys the index scores against, under the index lock
+        mask = (lambda keys: self._attribute_index_for(keys).mask(filters)) if filters else None
+        product_ids, scores = self.bm25.top_k_keys(query_tokens, top_k, mask=mask)
 
         results = []
-        for idx in top_indices:
-            product = self.index_to_product[idx]
+        for product_id, score in zip(product_ids, scores):
             results.append({
-                "product_id": product.id,
-                "score": float(scores[idx]),
+                "product_id": str(product_id),
+                "score": float(score),
             })
         return results
 
 
+def join_text(title: str, description: Optional[str], bullet_point: Optional[str]) -> str:
+    """Title, description and bullet points joined by spaces, skipping missing fields."""
+    text_parts = [title]
+    if description:
+        text_parts.append(description)
+    if bullet_point:
+        text_parts.append(bullet_point)
+    return " ".join(text_parts)
+
+
+def indexed_fields(products: Union[List[Product], ProductCatalog], start: int = 0,
+                   stop: Optional[int] = None) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+    """Yield (id, title, description, bulletPoint) per product, in catalog order (positions start..stop - 1)."""
+    if isinstance(products, ProductCatalog):
+        return products.rows("id", "title", "description", "bulletPoint", start=start, stop=stop)
+    return ((p.id, p.title, p.description, p.bulletPoint) for p in products[start:stop])
+
+
+def build_bm25_index(products: Union[List[Product], ProductCatalog], analyzer: Optional[TextAnalyzer] = None,
+                     workers: int = 1, shard_size: int = 20_000,
+                     timings: Optional[Dict[str, float]] = None) -> SparseBM25Index:
+    """
+    Tokenize the catalog in worker processes and merge their postings into one index.
+
+    The catalog is cut into shards of ``shard_size`` products. Each worker
+    tokenizes its shards and returns their postings over a shard-local
+    vocabulary; the parent maps the shard vocabularies onto one and
+    concatenates the postings. Workers are forked, so they read the catalog
+    from the parent's memory instead of receiving it pickled. Without fork
+    support, or with one worker, the shards are tokenized in this process.
+    The result equals SparseBM25Index.from_documents over the same tokens.
+
+    Args:
+        products (Union[List[Product], ProductCatalog]): Catalog to index.
+        analyzer (Optional[TextAnalyzer]): Tokenizer, defaults to the shared one.
+        workers (int): Worker processes.
+        shard_size (int): Products per task.
+        timings (Optional[Dict[str, float]]): Filled with seconds spent in
+            "bm25_tokenize" and "bm25_merge".
+
+    Returns:
+        SparseBM25Index: The index, without a fingerprint.
+    """
+    global _build_source
+    timings = timings if timings is not None else {}
+    bounds = [(start, min(start + shard_size, len(products))) for start in range(0, len(products), shard_size)]
+
+    start = time.perf_counter()
+    _build_source = (products, analyzer or default_analyzer)
+    try:
+        if workers > 1 and len(bounds) > 1 and "fork" in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(min(workers, len(bounds)), mp_context=multiprocessing.get_context("fork")) as pool:
+                shards = list(pool.map(_shard_postings, bounds))
+        else:
+            shards = [_shard_postings(shard) for shard in bounds]
+    finally:
+        _build_source = None
+    timings["bm25_tokenize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vocabulary = Vocabulary()
+    term_ids, postings = [], []
+    for (offset, _), (terms, shard_term_ids, shard_postings, _, _) in zip(bounds, shards):
+        term_ids.append(vocabulary.intern(terms)[shard_term_ids])
+        postings.append(shard_postings + np.int32(offset))
+    empty = np.array([], dtype=np.int32)
+    keys = products.ids if isinstance(products, ProductCatalog) else [p.id for p in products]
+    index = SparseBM25Index.from_postings(
+        vocabulary.terms,
+        np.concatenate(term_ids) if shards else empty,
+        np.concatenate(postings) if shards else empty,
+        np.concatenate([shard[3] for shard in shards]) if shards else empty.astype(np.float32),
+        np.concatenate([shard[4] for shard in shards]) if shards else empty,
+        keys,
+    )
+    timings["bm25_merge"] = time.perf_counter() - start
+    return index
+
+
+def _shard_postings(bounds: Tuple[int, int]):
+    """(terms, term ids, positions, tfs, doc lengths) of one shard of the catalog being built."""
+    products, analyzer = _build_source
+    vocabulary = Vocabulary()
+    doc_terms = [vocabulary.intern(analyzer.tokens(join_text(title, description, bullet_point)))
+                 for _, title, description, bullet_point in indexed_fields(products, *bounds)]
+    return (vocabulary.terms, *count_postings(doc_terms))
+
+
+def catalog_fingerprint(products: Union[List[Product], ProductCatalog], analyzer_signature: str = "") -> str:
+    """
+    Hash the product ids and indexed text fields, in catalog order.
+
+    Any added, removed, reordered or edited product changes the fingerprint, so a
+    saved index is only reused for exactly the catalog it was built from.
+
+    Args:
+        products (Union[List[Product], ProductCatalog]): Catalog to fingerprint.
+        analyzer_signature (str): TextAnalyzer.signature of the tokenizer, so an index
+            tokenized differently is not reused either.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(analyzer_signature.encode("utf-8"))
+    for fields in indexed_fields(products):
+        for field in fields:
+            digest.update((field or "").encode("utf-8"))
+            digest.update(b"\x1f")
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
 # Sample product data
 products = [
     Product(
@@ -0,0 +1,146 @@
+from typing import Optional
+
+import numpy as np
+
+
+class QuantizedEmbeddingStore:
+    """
+    Contiguous matrix of embeddings kept as float32, float16 or int8.
+
+    int8 uses symmetric per-vector quantization: row i is stored as
+    ``codes[i] * scales[i]`` with codes in [-127, 127]. Matrices are saved as
+    .npy files and can be loaded memory-mapped, so the codes stay in the page
+    cache instead of the Python heap.
+
+    Bytes per 1536-d vector: float32 6144, float16 3072, int8 1540 (codes plus
+    scale), against roughly 49 KB for the same vector as a list of Python floats.
+
+    Usage:
+        store = QuantizedEmbeddingStore.quantize(vectors, dtype="int8")
+        similarities = store.dot(query_matrix)
+    """
+
+    DTYPES = ("float32", "float16", "int8")
+    # Rows dequantized at a time by dot(); bounds the temporary float32 copy
+    BLOCK_ROWS = 4096
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        """
+        Args:
+            codes (np.ndarray): (n, dim) matrix of float32, float16 or int8 values.
+            scales (Optional[np.ndarray]): (n,) float32 scales, required for int8 codes.
+        """
+        if codes.dtype.name not in self.DTYPES:
+            raise ValueError(f"Unsupported embedding dtype {codes.dtype}. Use one of: {', '.join(self.DTYPES)}.")
+        if codes.dtype == np.int8 and (scales is None or len(scales) != len(codes)):
+            raise ValueError("int8 codes need one scale per row")
+        self.codes = codes
+        self.scales = scales if codes.dtype == np.int8 else None
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray, dtype: str = "int8") -> "QuantizedEmbeddingStore":
+        """
+        Quantize a float matrix.
+
+        Args:
+            vectors (np.ndarray): (n, dim) float vectors.
+            dtype (str): "float32", "float16" or "int8".
+
+        Returns:
+            QuantizedEmbeddingStore: Store holding the quantized rows.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if dtype not in cls.DTYPES:
+            raise ValueError(f"Unsupported embedding dtype '{dtype}'. Use one of: {', '.join(cls.DTYPES)}.")
+        if dtype != "int8":
+            return cls(np.ascontiguousarray(vectors.astype(dtype)))
+
+        max_abs = np.abs(vectors).max(axis=1) if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return cls(np.ascontiguousarray(codes), scales)
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the stored matrix (and scales)."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def dequantize(self, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Reconstruct float32 rows.
+
+        Args:
+            positions (Optional[np.ndarray]): Rows to return, all rows when None.
+
+        Returns:
+            np.ndarray: (len(positions), dim) float32 approximation of the original rows.
+        """
+        codes = self.codes if positions is None else self.codes[positions]
+        rows = codes.astype(np.float32)
+        if self.scales is not None:
+            scales = self.scales if positions is None else self.scales[positions]
+            rows *= scales[:, None]
+        return rows
+
+    def dot(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products between queries and every stored row.
+
+        Rows are dequantized BLOCK_ROWS at a time, so the full matrix is never
+        materialized as float32.
+
+        Args:
+            queries (np.ndarray): (n_queries, dim) float32 queries.
+
+        Returns:
+            np.ndarray: (n_queries, n_rows) float32 inner products.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.codes.dtype == np.float32:
+            return queries @ self.codes.T
+
+        products = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.BLOCK_ROWS):
+            block = self.codes[start:start + self.BLOCK_ROWS].astype(np.float32)
+            products[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            # Scaling the products is the same as scaling each dequantized row
+            products *= self.scales
+        return products
+
+    def save(self, path: str):
+        """
+        Write the codes to ``path`` and int8 scales to ``<path>.scales.npy``.
+
+        Args:
+            path (str): Destination file; used as is (no ".npy" is appended).
+        """
+        # Write through a file handle so np.save does not append ".npy" to the path
+        with open(path, "wb") as f:
+            np.save(f, self.codes)
+        if self.scales is not None:
+            with open(f"{path}.scales.npy", "wb") as f:
+                np.save(f, self.scales)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "QuantizedEmbeddingStore":
+        """
+        Load a store written by ``save``.
+
+        Args:
+            path (str): File passed to ``save``.
+            mmap (bool): Memory-map the codes instead of reading them into memory.
+
+        Returns:
+            QuantizedEmbeddingStore: The loaded store.
+        """
+        codes = np.load(path, mmap_mode="r" if mmap else None)
+        scales = np.load(f"{path}.scales.npy") if codes.dtype == np.int8 else None
+        return cls(codes, scales)
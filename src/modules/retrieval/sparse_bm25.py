@@ -0,0 +1,719 @@
+import json
+import os
+import shutil
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.utils.text_analysis import Vocabulary
+
+
+class SparseBM25Index:
+    """
+    Inverted-index BM25 (Okapi) scorer backed by CSR postings arrays in NumPy.
+
+    Term ``t`` owns the slice ``indptr[t]:indptr[t + 1]`` of ``postings`` (document
+    positions) and ``term_freqs``. Document-length norms are precomputed once, so a
+    query only touches the postings of its own terms instead of every document.
+    Scores match ``rank_bm25.BM25Okapi`` (same k1, b and epsilon IDF floor).
+
+    The CSR arrays are an immutable base segment. Incremental changes go to a small
+    in-memory delta segment (added documents) and a tombstone mask (removed
+    documents), while document frequencies and lengths are kept up to date so
+    scores always equal those of a full rebuild. ``compact`` folds the delta back
+    into a fresh base segment; it runs in a background thread once the delta and
+    tombstones grow past ``compaction_ratio`` of the live documents.
+
+    Usage:
+        index = SparseBM25Index.from_documents(tokenized_docs, product_ids)
+        product_ids, scores = index.top_k_keys(["wireless", "headphones"], k=10)
+
+        index.add_documents(["P9"], [["usb", "cable"]])
+        index.remove_documents(["P1"])
+
+        index.save("bm25_index")
+        index = SparseBM25Index.load("bm25_index")  # memory-mapped, shared page cache
+    """
+
+    FORMAT_VERSION = 1
+    ARRAYS = ("vocabulary", "indptr", "postings", "term_freqs", "doc_lengths", "keys", "idf", "norms")
+
+    # Switch to a dense score accumulator once postings exceed num_documents / ratio
+    DENSE_ACCUMULATOR_RATIO = 16
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25, compaction_ratio: float = 0.2):
+        """
+        Args:
+            k1 (float): Term-frequency saturation parameter.
+            b (float): Document-length normalisation strength.
+            epsilon (float): Fraction of the average IDF used as a floor for negative IDFs.
+            compaction_ratio (float): Start a background compaction when tombstoned plus
+                delta documents exceed this fraction of the live documents.
+        """
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.compaction_ratio = compaction_ratio
+
+        self.vocabulary = np.array([], dtype=str)        # Sorted terms, term id = position
+        self.indptr = np.zeros(1, dtype=np.int64)        # CSR row pointers, one row per term
+        self.postings = np.array([], dtype=np.int32)     # Document positions per term
+        self.term_freqs = np.array([], dtype=np.float32) # Term frequency per posting
+        self.doc_lengths = np.array([], dtype=np.int32)  # Token count per document
+        self.keys = np.array([], dtype=str)              # Position -> product id
+        self.idf = np.array([], dtype=np.float32)
+        self.norms = np.array([], dtype=np.float32)
+        self.avgdl = 0.0
+        self.fingerprint: Optional[str] = None     # Catalog fingerprint the index was built from
+
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._reset_incremental_state()
+
+    def _reset_incremental_state(self):
+        """Drop the delta segment; the base segment alone describes the index."""
+        self._live: Optional[np.ndarray] = None    # Tombstone mask, created on first change
+        self._positions: Dict[str, int] = {}       # Product id -> position
+        self._doc_freqs: Optional[np.ndarray] = None
+        self._num_live = 0
+        self._total_length = 0
+        self._base_size = 0                        # Positions below this live in the CSR arrays
+        self._new_terms: Dict[str, int] = {}       # Terms missing from the base vocabulary
+        self._delta_postings: Dict[int, Tuple[List[int], List[float]]] = {}
+        self._delta_doc_terms: Dict[int, List[int]] = {}
+        self._doc_indptr: Optional[np.ndarray] = None   # Lazy forward index of the base segment
+        self._doc_terms: Optional[np.ndarray] = None
+        self._stats_dirty = False
+        self._generation = 0
+
+    @classmethod
+    def from_documents(cls, documents: List[List[str]], keys: Sequence[str], **params) -> "SparseBM25Index":
+        """
+        Build an index from tokenized documents.
+
+        Args:
+            documents (List[List[str]]): One token list per document.
+            keys (Sequence[str]): Product id for each document, in the same order.
+
+        Returns:
+            SparseBM25Index: The built index.
+        """
+        if len(documents) != len(keys):
+            raise ValueError("documents and keys must have the same length.")
+
+        vocabulary = Vocabulary()
+        term_ids, postings, term_freqs, doc_lengths = count_postings(
+            [vocabulary.intern(tokens) for tokens in documents])
+        return cls.from_postings(vocabulary.terms, term_ids, postings, term_freqs, doc_lengths, keys, **params)
+
+    @classmethod
+    def from_postings(
+        cls,
+        terms: Sequence[str],
+        term_ids: np.ndarray,
+        postings: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray,
+        keys: Sequence[str],
+        **params,
+    ) -> "SparseBM25Index":
+        """
+        Build an index from postings over an unsorted vocabulary, as produced by count_postings.
+
+        Args:
+            terms (Sequence[str]): Unique terms; term id i is ``terms[i]``.
+            term_ids (np.ndarray): Term id of each posting.
+            postings (np.ndarray): Document position of each posting, ascending within a term.
+            term_freqs (np.ndarray): Term frequency of each posting.
+            doc_lengths (np.ndarray): Token count per document.
+            keys (Sequence[str]): Product id per document position.
+
+        Returns:
+            SparseBM25Index: The built index.
+        """
+        # Re-number terms in sorted order so lookups can use binary search
+        terms = np.array(terms, dtype=str)
+        order = np.argsort(terms, kind="stable")
+        remap = np.empty(len(order), dtype=np.int64)
+        remap[order] = np.arange(len(order))
+
+        return cls.from_arrays(
+            vocabulary=terms[order],
+            term_ids=remap[np.asarray(term_ids, dtype=np.int64)],
+            postings=postings,
+            term_freqs=term_freqs,
+            doc_lengths=doc_lengths,
+            keys=keys,
+            **params,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        vocabulary: np.ndarray,
+        term_ids: np.ndarray,
+        postings: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray,
+        keys: Sequence[str],
+        **params,
+    ) -> "SparseBM25Index":
+        """
+        Build an index from flat (term id, document position, tf) posting triples.
+
+        Args:
+            vocabulary (np.ndarray): Sorted unique terms.
+            term_ids (np.ndarray): Term id of each posting.
+            postings (np.ndarray): Document position of each posting.
+            term_freqs (np.ndarray): Term frequency of each posting.
+            doc_lengths (np.ndarray): Token count per document.
+            keys (Sequence[str]): Product id per document position.
+
+        Returns:
+            SparseBM25Index: The built index.
+        """
+        index = cls(**params)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        # Stable sort keeps postings of each term in ascending document order
+        order = np.argsort(term_ids, kind="stable")
+        counts = np.bincount(term_ids, minlength=len(vocabulary))
+
+        index.vocabulary = np.asarray(vocabulary, dtype=str)
+        index.indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        index.postings = np.asarray(postings, dtype=np.int32)[order]
+        index.term_freqs = np.asarray(term_freqs, dtype=np.float32)[order]
+        index.doc_lengths = np.asarray(doc_lengths, dtype=np.int32)
+        index.keys = np.asarray(keys, dtype=str)
+        index._compute_statistics(np.diff(index.indptr), index.num_documents, int(index.doc_lengths.sum()))
+        return index
+
+    @property
+    def num_documents(self) -> int:
+        """Number of document positions, including tombstoned ones."""
+        return len(self.doc_lengths)
+
+    @property
+    def num_live(self) -> int:
+        """Number of documents that can be returned by a query."""
+        return self.num_documents if self._live is None else self._num_live
+
+    def _compute_statistics(self, doc_freqs: np.ndarray, n_docs: int, total_length: int):
+        """Derive IDF and document-length norms from corpus statistics."""
+        doc_freqs = np.asarray(doc_freqs, dtype=np.float64)
+        self.avgdl = float(total_length) / n_docs if n_docs else 0.0
+
+        idf = np.log(n_docs - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        present = doc_freqs > 0
+        if present.any():
+            # Same floor as rank_bm25: negative IDFs become epsilon * average IDF,
+            # averaged over the terms that occur in the corpus
+            idf[present & (idf < 0)] = self.epsilon * idf[present].mean()
+        self.idf = idf.astype(np.float32)
+
+        if self.avgdl > 0:
+            norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / self.avgdl)
+        else:
+            norms = np.full(self.num_documents, self.k1 * (1 - self.b))
+        self.norms = norms.astype(np.float32)
+
+    def _refresh_statistics(self):
+        if self._stats_dirty:
+            self._compute_statistics(self._doc_freqs, self._num_live, self._total_length)
+            self._stats_dirty = False
+
+    def lookup(self, tokens: Sequence[str]) -> np.ndarray:
+        """
+        Map tokens to term ids, dropping tokens that are not in the vocabulary.
+
+        Args:
+            tokens (Sequence[str]): Query tokens (duplicates are kept).
+
+        Returns:
+            np.ndarray: Term ids of the known tokens.
+        """
+        if not len(tokens):
+            return np.array([], dtype=np.int64)
+
+        ids = np.full(len(tokens), -1, dtype=np.int64)
+        if len(self.vocabulary):
+            tokens_arr = np.asarray(tokens, dtype=str)
+            found = np.minimum(np.searchsorted(self.vocabulary, tokens_arr), len(self.vocabulary) - 1)
+            hit = self.vocabulary[found] == tokens_arr
+            ids[hit] = found[hit]
+        if self._new_terms:
+            for i, token in enumerate(tokens):
+                if ids[i] < 0:
+                    ids[i] = self._new_terms.get(token, -1)
+        return ids[ids >= 0]
+
+    def _term_postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Live postings of one term across the base and delta segments."""
+        docs = tfs = None
+        if term < len(self.vocabulary):
+            start, end = self.indptr[term], self.indptr[term + 1]
+            docs, tfs = self.postings[start:end], self.term_freqs[start:end]
+        if term in self._delta_postings:
+            delta_docs, delta_tfs = self._delta_postings[term]
+            delta_docs = np.asarray(delta_docs, dtype=np.int32)
+            delta_tfs = np.asarray(delta_tfs, dtype=np.float32)
+            if docs is None:
+                docs, tfs = delta_docs, delta_tfs
+            else:
+                docs, tfs = np.concatenate((docs, delta_docs)), np.concatenate((tfs, delta_tfs))
+        if docs is None:
+            return np.array([], dtype=np.int32), np.array([], dtype=np.float32)
+        if self._live is not None:
+            alive = self._live[docs]
+            docs, tfs = docs[alive], tfs[alive]
+        return docs, tfs
+
+    def _score_candidates(self, term_ids: np.ndarray,
+                          mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every document that contains at least one of the query terms.
+
+        Args:
+            term_ids (np.ndarray): Query term ids.
+            mask (Optional[np.ndarray]): Boolean mask over positions; postings of other documents are skipped.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Unique document positions and their scores.
+        """
+        doc_parts, score_parts = [], []
+        for term in term_ids:
+            docs, tf = self._term_postings(term)
+            if mask is not None:
+                allowed = mask[docs]
+                docs, tf = docs[allowed], tf[allowed]
+            doc_parts.append(docs)
+            score_parts.append(self.idf[term] * tf * (self.k1 + 1) / (tf + self.norms[docs]))
+
+        if not doc_parts:
+            return np.array([], dtype=np.int32), np.array([], dtype=np.float32)
+        if len(doc_parts) == 1:
+            return doc_parts[0], score_parts[0]
+
+        total = sum(len(docs) for docs in doc_parts)
+        if total * self.DENSE_ACCUMULATOR_RATIO < self.num_documents:
+            # Few postings: merge them by sorting instead of touching every document
+            docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts), minlength=len(docs))
+            return docs, scores.astype(np.float32)
+
+        # Head terms: accumulate into a dense array (positions are unique within a term)
+        scores = np.zeros(self.num_documents, dtype=np.float32)
+        touched = np.zeros(self.num_documents, dtype=bool)
+        for docs, doc_scores in zip(doc_parts, score_parts):
+            scores[docs] += doc_scores
+            touched[docs] = True
+        docs = np.flatnonzero(touched)
+        return docs, scores[docs]
+
+    def get_scores(self, query_tokens: Sequence[str]) -> np.ndarray:
+        """
+        Dense BM25 scores for every document, as returned by ``BM25Okapi.get_scores``.
+
+        Args:
+            query_tokens (Sequence[str]): Tokenized query.
+
+        Returns:
+            np.ndarray: One score per document position (0 for removed documents).
+        """
+        with self._lock:
+            self._refresh_statistics()
+            scores = np.zeros(self.num_documents, dtype=np.float32)
+            docs, doc_scores = self._score_candidates(self.lookup(query_tokens))
+            scores[docs] = doc_scores
+            return scores
+
+    def top_k(self, query_tokens: Sequence[str], k: int, fill: bool = True,
+              mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the k best document positions for a query, best first.
+
+        Args:
+            query_tokens (Sequence[str]): Tokenized query.
+            k (int): Number of results.
+            fill (bool): Pad with zero-score documents when fewer than k documents
+                match, mirroring a full ``argsort`` over dense scores.
+            mask (Optional[np.ndarray]): Boolean mask over positions (e.g. from an
+                AttributeIndex); only these documents are scored and returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Document positions and their scores.
+        """
+        with self._lock:
+            self._refresh_statistics()
+            if mask is not None and len(mask) != self.num_documents:
+                raise ValueError(f"Expected a mask over {self.num_documents} documents, got {len(mask)}")
+            k = max(0, min(k, self.num_live))
+            if k == 0:
+                return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+            docs, scores = self._score_candidates(self.lookup(query_tokens), mask)
+
+            if len(docs) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+                docs, scores = docs[keep], scores[keep]
+
+            # Highest score first, ties broken by position for deterministic output
+            order = np.lexsort((docs, -scores))
+            docs, scores = docs[order].astype(np.int64), scores[order]
+
+            if fill and len(docs) < k:
+                need = k - len(docs)
+                if mask is not None:
+                    candidates = np.flatnonzero(mask if self._live is None else mask & self._live)
+                elif self._live is None:
+                    candidates = np.arange(min(self.num_documents, k + len(docs)))
+                else:
+                    candidates = np.flatnonzero(self._live)
+                pad = np.setdiff1d(candidates, docs)[:need]
+                docs = np.concatenate((docs, pad))
+                scores = np.concatenate((scores, np.zeros(len(pad), dtype=np.float32)))
+
+            return docs, scores
+
+    def top_k_keys(self, query_tokens: Sequence[str], k: int, fill: bool = True,
+                   mask: Optional[Union[np.ndarray, Callable[[np.ndarray], np.ndarray]]] = None
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the ids of the k best documents for a query, best first.
+
+        A compaction renumbers positions when it is swapped in, so positions from
+        ``top_k`` may name other documents by the time they are looked up in
+        ``keys``. Here the positions are resolved under the same lock as the scoring.
+
+        Args:
+            query_tokens (Sequence[str]): Tokenized query.
+            k (int): Number of results.
+            fill (bool): Pad with zero-score documents, as in ``top_k``.
+            mask (Optional[Union[np.ndarray, Callable[[np.ndarray], np.ndarray]]]): Boolean mask
+                over positions, or a function building one from ``keys``. The function is
+                called under the lock, so the mask and the scoring see the same positions.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Document keys and their scores.
+        """
+        with self._lock:
+            if callable(mask):
+                mask = mask(self.keys)
+            positions, scores = self.top_k(query_tokens, k, fill, mask)
+            return np.asarray(self.keys)[positions], scores
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def _ensure_mutable(self):
+        """Copy the per-document arrays out of read-only storage before the first change."""
+        if self._live is not None:
+            return
+        self._live = np.ones(self.num_documents, dtype=bool)
+        self._positions = {str(key): pos for pos, key in enumerate(self.keys)}
+        self._doc_freqs = np.diff(self.indptr).astype(np.int64)
+        self.doc_lengths = np.array(self.doc_lengths, dtype=np.int32)
+        self.keys = np.array(self.keys)
+        self._num_live = self.num_documents
+        self._total_length = int(self.doc_lengths.sum())
+        self._base_size = self.num_documents
+
+    def _document_terms(self, pos: int) -> np.ndarray:
+        """Term ids of the document at ``pos``."""
+        if pos >= self._base_size:
+            return np.asarray(self._delta_doc_terms[pos], dtype=np.int64)
+        if self._doc_indptr is None:
+            # Transpose the base postings once, the first time a base document changes
+            term_of_posting = np.repeat(np.arange(len(self.vocabulary)), np.diff(self.indptr))
+            order = np.argsort(self.postings, kind="stable")
+            self._doc_terms = term_of_posting[order]
+            counts = np.bincount(self.postings, minlength=self._base_size)
+            self._doc_indptr = np.concatenate(([0], np.cumsum(counts)))
+        return self._doc_terms[self._doc_indptr[pos]:self._doc_indptr[pos + 1]]
+
+    def add_documents(self, keys: Sequence[str], documents: List[List[str]]):
+        """
+        Append documents to the delta segment.
+
+        Args:
+            keys (Sequence[str]): Product ids of the new documents.
+            documents (List[List[str]]): Tokenized text per document.
+
+        Raises:
+            ValueError: If a key is already indexed or the inputs differ in length.
+        """
+        if len(documents) != len(keys):
+            raise ValueError("documents and keys must have the same length.")
+
+        with self._lock:
+            self._ensure_mutable()
+            keys = [str(key) for key in keys]
+            if len(set(keys)) != len(keys):
+                raise ValueError("Duplicate keys in added documents.")
+            for key in keys:
+                if key in self._positions:
+                    raise ValueError(f"Document {key} is already indexed")
+
+            counted = [Counter(tokens) for tokens in documents]
+            unseen = set()
+            for counts in counted:
+                unseen.update(term for term in counts if not len(self.lookup([term])))
+            for term in sorted(unseen):
+                self._new_terms[term] = len(self.vocabulary) + len(self._new_terms)
+            self._doc_freqs = np.concatenate((self._doc_freqs, np.zeros(len(unseen), dtype=np.int64)))
+
+            start = self.num_documents
+            for offset, (key, counts) in enumerate(zip(keys, counted)):
+                pos = start + offset
+                term_ids = self.lookup(list(counts)).tolist()
+                for term_id, tf in zip(term_ids, counts.values()):
+                    docs, tfs = self._delta_postings.setdefault(term_id, ([], []))
+                    docs.append(pos)
+                    tfs.append(float(tf))
+                self._doc_freqs[term_ids] += 1
+                self._delta_doc_terms[pos] = term_ids
+                self._positions[key] = pos
+
+            lengths = np.array([len(tokens) for tokens in documents], dtype=np.int32)
+            self.doc_lengths = np.concatenate((self.doc_lengths, lengths))
+            self.keys = np.concatenate((self.keys, np.asarray(keys, dtype=str)))
+            self._live = np.concatenate((self._live, np.ones(len(keys), dtype=bool)))
+            self._num_live += len(keys)
+            self._total_length += int(lengths.sum())
+            self._mark_changed()
+
+    def remove_documents(self, keys: Sequence[str]):
+        """
+        Tombstone documents and subtract them from the corpus statistics.
+
+        Args:
+            keys (Sequence[str]): Product ids to remove.
+
+        Raises:
+            ValueError: If a key is not indexed.
+        """
+        with self._lock:
+            self._ensure_mutable()
+            keys = [str(key) for key in keys]
+            for key in keys:
+                if key not in self._positions:
+                    raise ValueError(f"Document {key} not found")
+
+            for key in keys:
+                pos = self._positions.pop(key)
+                self._doc_freqs[self._document_terms(pos)] -= 1
+                self._live[pos] = False
+                self._num_live -= 1
+                self._total_length -= int(self.doc_lengths[pos])
+            self._mark_changed()
+
+    def update_documents(self, keys: Sequence[str], documents: List[List[str]]):
+        """
+        Replace the text of existing documents (indexed under new positions).
+
+        Args:
+            keys (Sequence[str]): Product ids to update.
+            documents (List[List[str]]): New tokenized text per document.
+        """
+        with self._lock:
+            self.remove_documents(keys)
+            self.add_documents(keys, documents)
+
+    def _mark_changed(self):
+        self._stats_dirty = True
+        self._generation += 1
+        self.fingerprint = None
+        self.maybe_compact()
+
+    def maybe_compact(self, background: bool = True) -> bool:
+        """
+        Start a compaction if the delta segment and tombstones have grown too large.
+
+        Args:
+            background (bool): Run the compaction in a daemon thread.
+
+        Returns:
+            bool: True if a compaction was started.
+        """
+        with self._lock:
+            if self._live is None or self._compacting:
+                return False
+            garbage = (self.num_documents - self._num_live) + (self.num_documents - self._base_size)
+            if garbage <= self.compaction_ratio * max(self._num_live, 1):
+                return False
+            self._compacting = True
+
+        if background:
+            self._compaction_thread = threading.Thread(target=self._run_compaction, daemon=True)
+            self._compaction_thread.start()
+        else:
+            self._run_compaction()
+        return True
+
+    def wait_for_compaction(self, timeout: Optional[float] = None):
+        """Block until a running background compaction has finished."""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run_compaction(self):
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
+
+    def compact(self) -> bool:
+        """
+        Rebuild the base segment from the live base and delta postings.
+
+        The new arrays are built without holding the lock; if the index changed in
+        the meantime the result is discarded and the next change retries.
+
+        Returns:
+            bool: True if the compacted segment was swapped in.
+        """
+        with self._lock:
+            if self._live is None:
+                return True
+            generation = self._generation
+            live = self._live.copy()
+            vocabulary, indptr = self.vocabulary, self.indptr
+            postings, term_freqs = self.postings, self.term_freqs
+            doc_lengths, keys = self.doc_lengths, self.keys
+            new_terms = sorted(self._new_terms, key=self._new_terms.get)
+            delta = {term: (list(docs), list(tfs)) for term, (docs, tfs) in self._delta_postings.items()}
+
+        # Live base postings, then live delta postings (positions stay ascending per term)
+        term_parts = [np.repeat(np.arange(len(vocabulary)), np.diff(indptr))]
+        doc_parts, tf_parts = [np.asarray(postings)], [np.asarray(term_freqs)]
+        for term, (docs, tfs) in delta.items():
+            term_parts.append(np.full(len(docs), term, dtype=np.int64))
+            doc_parts.append(np.asarray(docs, dtype=np.int32))
+            tf_parts.append(np.asarray(tfs, dtype=np.float32))
+        terms, docs, tfs = (np.concatenate(parts) for parts in (term_parts, doc_parts, tf_parts))
+        alive = live[docs]
+        terms, docs, tfs = terms[alive], docs[alive], tfs[alive]
+
+        # Drop terms without live postings and re-sort the vocabulary
+        all_terms = np.concatenate((np.asarray(vocabulary, dtype=str), np.asarray(new_terms, dtype=str)))
+        used = np.unique(terms)
+        order = np.argsort(all_terms[used], kind="stable")
+        remap = np.full(len(all_terms), -1, dtype=np.int64)
+        remap[used[order]] = np.arange(len(used))
+        new_positions = np.cumsum(live) - 1
+
+        compacted = SparseBM25Index.from_arrays(
+            vocabulary=all_terms[used[order]],
+            term_ids=remap[terms],
+            postings=new_positions[docs],
+            term_freqs=tfs,
+            doc_lengths=np.asarray(doc_lengths)[live],
+            keys=np.asarray(keys)[live],
+            k1=self.k1, b=self.b, epsilon=self.epsilon,
+        )
+
+        with self._lock:
+            if generation != self._generation:
+                return False
+            fingerprint = self.fingerprint
+            for name in self.ARRAYS:
+                setattr(self, name, getattr(compacted, name))
+            self.avgdl = compacted.avgdl
+            self.fingerprint = fingerprint
+            self._reset_incremental_state()
+            return True
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: str):
+        """
+        Write the index to a directory of ``.npy`` arrays plus ``meta.json``.
+
+        Pending incremental changes are compacted first. The directory is written
+        next to the target and swapped in at the end, so readers never see a
+        half-written index.
+
+        Args:
+            path (str): Index directory.
+        """
+        with self._lock:
+            self.compact()
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            for name in self.ARRAYS:
+                np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+
+            meta = {
+                "format_version": self.FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "epsilon": self.epsilon,
+                "avgdl": self.avgdl,
+                "num_documents": self.num_documents,
+                "fingerprint": self.fingerprint,
+            }
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "SparseBM25Index":
+        """
+        Load an index written by ``save``.
+
+        With ``mmap=True`` the arrays are memory-mapped read-only, so loading costs
+        a few page faults and every process serving the same files shares one copy
+        in the OS page cache.
+
+        Args:
+            path (str): Index directory.
+            mmap (bool): Memory-map the arrays instead of reading them into memory.
+
+        Returns:
+            SparseBM25Index: The loaded index.
+
+        Raises:
+            ValueError: If the directory was written by an incompatible format version.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format: {meta.get('format_version')}")
+
+        index = cls(k1=meta["k1"], b=meta["b"], epsilon=meta["epsilon"])
+        for name in cls.ARRAYS:
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None))
+        index.avgdl = meta["avgdl"]
+        index.fingerprint = meta["fingerprint"]
+        return index
+
+
+def count_postings(doc_terms: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Postings of documents given as interned term-id arrays (see Vocabulary.intern).
+
+    Args:
+        doc_terms (List[np.ndarray]): Term ids of each document's tokens, in order.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Term id (int32), document
+            position (int32) and term frequency (float32) per posting, sorted by term and
+            then position, and the token count (int32) per document.
+    """
+    doc_lengths = np.fromiter((len(terms) for terms in doc_terms), dtype=np.int32, count=len(doc_terms))
+    # One (term, document) key per token; counting unique keys yields the postings with their tfs
+    n_docs = max(len(doc_terms), 1)
+    all_terms = np.concatenate(doc_terms).astype(np.int64) if doc_terms else np.array([], dtype=np.int64)
+    pairs, term_freqs = np.unique(all_terms * n_docs + np.repeat(np.arange(len(doc_terms)), doc_lengths),
+                                  return_counts=True)
+    return ((pairs // n_docs).astype(np.int32), (pairs % n_docs).astype(np.int32),
+            term_freqs.astype(np.float32), doc_lengths)
@@ -0,0 +1,410 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Type
+
+import numpy as np
+from annoy import AnnoyIndex
+
+from src.modules.retrieval.embedding_store import QuantizedEmbeddingStore
+
+
+class VectorBackend:
+    """
+    Nearest-neighbour index over a matrix of item vectors.
+
+    Items are identified by their row position in the matrix passed to ``build``;
+    mapping positions back to product ids is the caller's job. Distances use
+    Annoy's angular metric, sqrt(2 - 2 * cosine), for every backend so scores
+    are comparable whichever backend produced them.
+    """
+
+    name = ""
+
+    def __init__(self, embedding_dim: int):
+        self.embedding_dim = embedding_dim
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def build(self, vectors: np.ndarray):
+        """
+        Index a (n, embedding_dim) matrix; row i becomes item i.
+
+        Args:
+            vectors (np.ndarray): Item vectors.
+        """
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest items to a query vector.
+
+        Args:
+            query (np.ndarray): Query vector of length embedding_dim.
+            k (int): Number of neighbours.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Item positions and angular distances, nearest first.
+        """
+        raise NotImplementedError
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest items for every row of a query matrix.
+
+        Rows with fewer than k hits (k larger than the index) are padded with
+        position -1 and distance inf.
+
+        Args:
+            queries (np.ndarray): (n, embedding_dim) query matrix.
+            k (int): Number of neighbours per query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (n, k) int64 positions and (n, k) float32 distances.
+        """
+        queries = self._check_queries(queries)
+        positions, distances = self._empty_batch(len(queries), k)
+        for row, query in enumerate(queries):
+            hits, dists = self.search(query, k)
+            positions[row, :len(hits)] = hits
+            distances[row, :len(hits)] = dists
+        return positions, distances
+
+    def row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Unit-length float32 vectors of the given items.
+
+        Args:
+            rows (np.ndarray): Item positions.
+
+        Returns:
+            np.ndarray: (len(rows), embedding_dim) matrix.
+        """
+        raise NotImplementedError
+
+    def row_similarities(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Cosine similarity between a query vector and the given items."""
+        return self.row_vectors(rows) @ ExactBackend.normalize(query)
+
+    def search_rows(self, query: np.ndarray, k: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact search restricted to a subset of the items, e.g. the rows allowed by a filter.
+
+        Args:
+            query (np.ndarray): Query vector of length embedding_dim.
+            k (int): Number of neighbours.
+            rows (np.ndarray): Item positions to search.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Item positions and angular distances, nearest first.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        k = min(k, len(rows))
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        similarities = self.row_similarities(query, rows)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return rows[top], ExactBackend.angular_distance(similarities[top])
+
+    def _check_queries(self, queries: np.ndarray) -> np.ndarray:
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.embedding_dim:
+            raise ValueError(f"Expected a (n, {self.embedding_dim}) query matrix, got shape {queries.shape}")
+        return queries
+
+    @staticmethod
+    def _empty_batch(n: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return np.full((n, k), -1, dtype=np.int64), np.full((n, k), np.inf, dtype=np.float32)
+
+    def save(self, path: str):
+        raise NotImplementedError
+
+    def load(self, path: str):
+        raise NotImplementedError
+
+
+class AnnoyBackend(VectorBackend):
+    """Approximate search with an Annoy forest of random-projection trees."""
+
+    name = "annoy"
+
+    def __init__(self, embedding_dim: int, n_trees: int = 100, search_k: int = -1, n_threads: Optional[int] = None):
+        """
+        Args:
+            embedding_dim (int): Vector size.
+            n_trees (int): Trees built by Annoy; more trees give better recall.
+            search_k (int): Nodes inspected per query, -1 for Annoy's default (n_trees * k).
+            n_threads (Optional[int]): Threads building the trees and running search_batch, defaults to
+                the CPU count.
+        """
+        super().__init__(embedding_dim)
+        self.n_trees = n_trees
+        self.search_k = search_k
+        self.n_threads = n_threads or os.cpu_count() or 1
+        self.index = AnnoyIndex(embedding_dim, 'angular')
+
+    def __len__(self) -> int:
+        return self.index.get_n_items()
+
+    def build(self, vectors: np.ndarray):
+        self.index = AnnoyIndex(self.embedding_dim, 'angular')
+        for i, vector in enumerate(vectors):
+            self.index.add_item(i, vector)
+        self.index.build(self.n_trees, n_jobs=self.n_threads)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        positions, distances = self.index.get_nns_by_vector(
+            query, k, search_k=self.search_k, include_distances=True
+        )
+        return np.asarray(positions, dtype=np.int64), np.asarray(distances, dtype=np.float32)
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Annoy releases the GIL inside get_nns_by_vector, so rows can be searched in parallel threads
+        queries = self._check_queries(queries)
+        positions, distances = self._empty_batch(len(queries), k)
+
+        def search_row(row: int):
+            hits, dists = self.index.get_nns_by_vector(
+                queries[row], k, search_k=self.search_k, include_distances=True
+            )
+            positions[row, :len(hits)] = hits
+            distances[row, :len(hits)] = dists
+
+        if self.n_threads == 1 or len(queries) == 1:
+            for row in range(len(queries)):
+                search_row(row)
+        else:
+            with ThreadPoolExecutor(max_workers=self.n_threads) as pool:
+                list(pool.map(search_row, range(len(queries))))
+        return positions, distances
+
+    def row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        # One call per item, so this is only meant for small subsets
+        vectors = np.array([self.index.get_item_vector(int(row)) for row in rows], dtype=np.float32)
+        return ExactBackend.normalize(vectors.reshape(len(rows), self.embedding_dim))
+
+    def save(self, path: str):
+        self.index.save(path)
+
+    def load(self, path: str):
+        self.index = AnnoyIndex(self.embedding_dim, 'angular')
+        self.index.load(path)
+
+
+class ExactBackend(VectorBackend):
+    """
+    Brute-force search: one float32 matrix-vector product over pre-normalized
+    vectors, then ``argpartition`` for the top k. Exact, builds in a single copy,
+    and costs O(n * dim) per query, so it suits small and medium catalogs.
+    """
+
+    name = "exact"
+    # Upper bound on the (queries x items) similarity block held in memory by search_batch
+    BATCH_BLOCK_SIZE = 16_000_000
+
+    def __init__(self, embedding_dim: int):
+        super().__init__(embedding_dim)
+        self.vectors = np.zeros((0, embedding_dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """Scale rows to unit length (zero rows stay zero)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def build(self, vectors: np.ndarray):
+        self.vectors = np.ascontiguousarray(self.normalize(vectors))
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self.vectors))
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        similarities = self.vectors @ self.normalize(query)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return top.astype(np.int64), self.angular_distance(similarities[top])
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        # One matrix-matrix product per block of queries instead of a matvec per query
+        queries = self.normalize(self._check_queries(queries))
+        positions, distances = self._empty_batch(len(queries), k)
+        k_found = min(k, len(self.vectors))
+        if k_found <= 0 or len(queries) == 0:
+            return positions, distances
+
+        block = max(1, self.BATCH_BLOCK_SIZE // len(self.vectors))
+        for start in range(0, len(queries), block):
+            similarities = queries[start:start + block] @ self.vectors.T
+            top, top_similarities = self.top_k_rows(similarities, k_found)
+
+            rows = slice(start, start + len(top))
+            positions[rows, :k_found] = top
+            distances[rows, :k_found] = self.angular_distance(top_similarities)
+        return positions, distances
+
+    def row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        return np.asarray(self.vectors[rows])
+
+    def row_similarities(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        query = self.normalize(query)
+        if 2 * len(rows) > len(self.vectors):
+            # A broad subset: one sequential matvec is cheaper than gathering the rows
+            return (self.vectors @ query)[rows]
+        return self.vectors[rows] @ query
+
+    @staticmethod
+    def top_k_rows(similarities: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Column indices and values of the k largest entries of each row, largest first."""
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_similarities, order, axis=1)
+
+    @staticmethod
+    def angular_distance(similarities: np.ndarray) -> np.ndarray:
+        return np.sqrt(np.maximum(2.0 - 2.0 * similarities, 0.0)).astype(np.float32)
+
+    def save(self, path: str):
+        # Write through a file handle so np.save does not append ".npy" to the path
+        with open(path, "wb") as f:
+            np.save(f, self.vectors)
+
+    def load(self, path: str):
+        self.vectors = np.load(path, mmap_mode="r")
+        if self.vectors.ndim != 2 or self.vectors.shape[1] != self.embedding_dim:
+            raise ValueError(f"Expected vectors of dimension {self.embedding_dim}, got shape {self.vectors.shape}")
+
+
+class QuantizedBackend(VectorBackend):
+    """
+    Brute-force search over a quantized copy of the vectors.
+
+    Queries are scored against a QuantizedEmbeddingStore. The best ``rescore``
+    candidates per query are then re-ranked with the float32 vectors, which are
+    kept in a memory-mapped sidecar (``<path>.f32.npy``) so only the candidate
+    rows are paged in. With ``rescore=0`` no float32 copy is written and
+    results come straight from the quantized scores.
+    """
+
+    dtype = ""
+
+    def __init__(self, embedding_dim: int, rescore: int = 200):
+        """
+        Args:
+            embedding_dim (int): Vector size.
+            rescore (int): Candidates per query re-ranked with float32 vectors, 0 to disable.
+        """
+        super().__init__(embedding_dim)
+        self.rescore = rescore
+        self.store = QuantizedEmbeddingStore.quantize(np.zeros((0, embedding_dim)), self.dtype)
+        self.full_vectors: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def build(self, vectors: np.ndarray):
+        normalized = ExactBackend.normalize(vectors)
+        self.store = QuantizedEmbeddingStore.quantize(normalized, self.dtype)
+        self.full_vectors = np.ascontiguousarray(normalized) if self.rescore else None
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        positions, distances = self.search_batch(np.asarray(query, dtype=np.float32)[None, :], k)
+        found = positions[0] >= 0
+        return positions[0][found], distances[0][found]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = ExactBackend.normalize(self._check_queries(queries))
+        positions, distances = self._empty_batch(len(queries), k)
+        k_found = min(k, len(self.store))
+        if k_found <= 0 or len(queries) == 0:
+            return positions, distances
+
+        rescoring = self.rescore > 0 and self.full_vectors is not None
+        n_candidates = min(max(k_found, self.rescore), len(self.store)) if rescoring else k_found
+        block = max(1, ExactBackend.BATCH_BLOCK_SIZE // len(self.store))
+        for start in range(0, len(queries), block):
+            query_block = queries[start:start + block]
+            top, top_similarities = ExactBackend.top_k_rows(self.store.dot(query_block), n_candidates)
+            if rescoring:
+                for row, query in enumerate(query_block):
+                    # Sorted row order keeps reads from the memory map sequential
+                    candidates = np.sort(top[row])
+                    exact = self.full_vectors[candidates] @ query
+                    best = np.argsort(-exact, kind="stable")
+                    top[row], top_similarities[row] = candidates[best], exact[best]
+
+            rows = slice(start, start + len(top))
+            positions[rows, :k_found] = top[:, :k_found]
+            distances[rows, :k_found] = ExactBackend.angular_distance(top_similarities[:, :k_found])
+        return positions, distances
+
+    def row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        if self.full_vectors is not None:
+            return np.asarray(self.full_vectors[rows])
+        return ExactBackend.normalize(self.store.dequantize(rows))
+
+    def save(self, path: str):
+        self.store.save(path)
+        if self.full_vectors is not None:
+            with open(f"{path}.f32.npy", "wb") as f:
+                np.save(f, self.full_vectors)
+            # Drop the in-memory float32 copy; rescoring reads candidate rows from disk
+            self.full_vectors = np.load(f"{path}.f32.npy", mmap_mode="r")
+
+    def load(self, path: str):
+        store = QuantizedEmbeddingStore.load(path)
+        if store.dtype != self.dtype or store.codes.ndim != 2 or store.codes.shape[1] != self.embedding_dim:
+            raise ValueError(f"Expected {self.dtype} vectors of dimension {self.embedding_dim}, "
+                             f"got {store.dtype} with shape {store.codes.shape}")
+        self.store = store
+        self.full_vectors = None
+        if self.rescore and os.path.exists(f"{path}.f32.npy"):
+            self.full_vectors = np.load(f"{path}.f32.npy", mmap_mode="r")
+
+
+class Float16Backend(QuantizedBackend):
+    """QuantizedBackend storing half-precision vectors (2x smaller than float32)."""
+
+    name = "float16"
+    dtype = "float16"
+
+
+class Int8Backend(QuantizedBackend):
+    """QuantizedBackend storing symmetric int8 codes with per-vector scales (4x smaller than float32)."""
+
+    name = "int8"
+    dtype = "int8"
+
+
+BACKENDS: Dict[str, Type[VectorBackend]] = {
+    AnnoyBackend.name: AnnoyBackend,
+    ExactBackend.name: ExactBackend,
+    Float16Backend.name: Float16Backend,
+    Int8Backend.name: Int8Backend,
+}
+
+
+def create_backend(name: str, embedding_dim: int, **kwargs) -> VectorBackend:
+    """
+    Instantiate a backend by name.
+
+    Args:
+        name (str): One of BACKENDS.
+        embedding_dim (int): Vector size.
+
+    Returns:
+        VectorBackend: The backend, not built yet.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown vector backend '{name}'. Use one of: {', '.join(BACKENDS)}.")
+    return BACKENDS[name](embedding_dim, **kwargs)
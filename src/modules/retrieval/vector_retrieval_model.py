@@ -1,130 +1,264 @@
 # annoy_search.py
-from annoy import AnnoyIndex
-import pandas as pd
+import hashlib
+import json
 import os
-from typing import List
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from src.models import Product, ProductCatalog
+from src.modules.retrieval.attribute_index import AttributeIndex, Filters
+from src.modules.retrieval.vector_backends import create_backend
+
+# Below this many vectors exact search stays within a few milliseconds per query,
+# builds in well under a second and needs no recall tuning, so "auto" prefers it
+EXACT_BACKEND_LIMIT = 20_000
+# Filters matching at most this many products, and less than this share of the index, are searched
+# exactly instead of through the Annoy forest
+FILTERED_EXACT_LIMIT = 5_000
+FILTERED_EXACT_SHARE = 0.25
+
+
+def embedding_fingerprint(vectors: np.ndarray, block_rows: int = 65_536) -> str:
+    """
+    Hash an (n, dim) embedding matrix as float32, block by block.
+
+    Args:
+        vectors (np.ndarray): Embeddings in index order (may be memory-mapped).
+        block_rows (int): Rows hashed per block, bounding the temporary copies.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256(str(vectors.shape).encode("utf-8"))
+    for start in range(0, len(vectors), block_rows):
+        digest.update(np.ascontiguousarray(vectors[start:start + block_rows], dtype=np.float32))
+    return digest.hexdigest()
 
-from src.models import Product
 
 class ProductSearchEngine:
-    def __init__(self, embedding_dim: int, index_path: str, products: List[Product]):
+    """
+    Vector search over product embeddings.
+
+    Only products with an embedding are indexed, so index positions are not
+    positions in ``products``. The position -> product id table is persisted as a
+    sidecar next to the index file (``<index_path>.ids.npy``, plus
+    ``<index_path>.meta.json`` recording backend, dimension and a fingerprint of
+    the embeddings); a saved index is reused only when its sidecars match the
+    current catalog, so re-embedded products (a backfill, a new embedding model of
+    the same dimension) trigger a rebuild even though the ids are unchanged.
+
+    Usage:
+        engine = ProductSearchEngine(embedding_dim=1536, index_path="products.ann", products=products)
+        results = engine.search(query_embedding, k=10)
+    """
+
+    def __init__(self, embedding_dim: int, index_path: str, products: Union[List[Product], ProductCatalog],
+                 backend: str = "auto"):
+        """
+        Args:
+            embedding_dim (int): Embedding size.
+            index_path (str): Index file; sidecars are written next to it.
+            products (Union[List[Product], ProductCatalog]): Catalog to search.
+            backend (str): "annoy", "exact", "float16", "int8", or "auto" (exact below
+                EXACT_BACKEND_LIMIT products, annoy above).
+        """
         self.embedding_dim = embedding_dim
         self.index_path = index_path
         self.products = products
-        self.index = AnnoyIndex(embedding_dim, 'angular')
-        
+
+        self.product_ids = self.embedded_product_ids(products)
+        self._attribute_index = None
+        if backend == "auto":
+            backend = "exact" if len(self.product_ids) < EXACT_BACKEND_LIMIT else "annoy"
+        self.index = create_backend(backend, embedding_dim)
+
         # Create directory if not exists
         if os.path.dirname(index_path):
             os.makedirs(os.path.dirname(index_path), exist_ok=True)
-        
+
         # Load or build index
-        if os.path.exists(index_path):
-            try:
-                self.index.load(index_path)
-            except Exception as e:
-                print(f"Error loading index: {str(e)}, rebuilding...")
-                self._build_new_index()
-        else:
-            print("Index file not found, building new index...")
+        if not self._load_index():
             self._build_new_index()
 
+    @property
+    def ids_path(self) -> str:
+        return f"{self.index_path}.ids.npy"
+
+    @property
+    def meta_path(self) -> str:
+        return f"{self.index_path}.meta.json"
+
+    def _load_index(self) -> bool:
+        """Load the saved index if it was built by the same backend for the same products."""
+        if not os.path.exists(self.index_path):
+            print("Index file not found, building new index...")
+            return False
+        if not (os.path.exists(self.ids_path) and os.path.exists(self.meta_path)):
+            print("Index id map not found, rebuilding...")
+            return False
+
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta.get("backend") != self.index.name or meta.get("embedding_dim") != self.embedding_dim:
+            print(f"Index was built with {meta.get('backend')}/{meta.get('embedding_dim')}, rebuilding...")
+            return False
+        if not np.array_equal(np.load(self.ids_path), self.product_ids):
+            print("Index id map does not match the current products, rebuilding...")
+            return False
+        if meta.get("embeddings") != embedding_fingerprint(self.embedding_matrix(self.products)):
+            print("Index was built from other embeddings, rebuilding...")
+            return False
+
+        try:
+            self.index.load(self.index_path)
+        except Exception as e:
+            print(f"Error loading index: {str(e)}, rebuilding...")
+            return False
+        return True
+
     def _build_new_index(self):
         """Internal method to handle index building"""
-        self.index = AnnoyIndex(self.embedding_dim, 'angular')
-        valid_products = [p for p in self.products if p.embedding]
-        
-        if not valid_products:
+        self.product_ids = self.embedded_product_ids(self.products)
+        if not len(self.product_ids):
             raise ValueError("No products with embeddings available to build index")
-            
-        for i, product in enumerate(valid_products):
-            self.index.add_item(i, product.embedding)
-        
-        self.index.build(100)
-        self.index.save(self.index_path)
-        print(f"Successfully built new index at {self.index_path}")
-
-    def search(self, query_embedding: List[float], k: int = 5) -> pd.DataFrame:
+
+        vectors = self.embedding_matrix(self.products)
+        self.index.build(vectors)
+        self._save(self.index, self.product_ids, self.index_path, self.embedding_dim, embedding_fingerprint(vectors))
+        print(f"Successfully built new {self.index.name} index at {self.index_path}")
+
+    @staticmethod
+    def embedded_product_ids(products: Union[List[Product], ProductCatalog]) -> np.ndarray:
+        """Ids of the products that have an embedding, in index order."""
+        if isinstance(products, ProductCatalog):
+            return np.array(products.ids, dtype=str)[products.has_embedding]
+        return np.array([p.id for p in products if p.embedding], dtype=str)
+
+    @staticmethod
+    def embedding_matrix(products: Union[List[Product], ProductCatalog]) -> np.ndarray:
+        """(n, dim) float32 embeddings of the products that have one, in index order."""
+        if isinstance(products, ProductCatalog):
+            if products.has_embedding.all():
+                return products.embeddings  # no copy when every product has an embedding
+            return products.embeddings[products.has_embedding]
+        return np.asarray([p.embedding for p in products if p.embedding], dtype=np.float32)
+
+    def release_product_embeddings(self):
+        """
+        Drop the product embeddings once the index is built.
+
+        A 1536-d embedding costs about 49 KB as a list of Python floats, far more
+        than its row in the index. Call this when nothing else reads
+        ``Product.embedding`` (or the catalog's embedding matrix); the index
+        keeps the only copy afterwards.
+        """
+        if isinstance(self.products, ProductCatalog):
+            self.products.release_embeddings()
+            return
+        for product in self.products:
+            product.embedding = None
+
+    @staticmethod
+    def _save(index, product_ids: np.ndarray, index_path: str, embedding_dim: int, fingerprint: str):
+        index.save(index_path)
+        with open(f"{index_path}.ids.npy", "wb") as f:
+            np.save(f, product_ids)
+        with open(f"{index_path}.meta.json", "w") as f:
+            json.dump({"backend": index.name, "embedding_dim": embedding_dim, "count": len(product_ids),
+                       "embeddings": fingerprint}, f)
+
+    @property
+    def attribute_index(self) -> AttributeIndex:
+        """Brand/color/locale bitmaps over the index positions, built on the first filtered search."""
+        if self._attribute_index is None:
+            self._attribute_index = AttributeIndex(self.products, keys=self.product_ids)
+        return self._attribute_index
+
+    def _filtered_search(self, query: np.ndarray, k: int, filters: Filters) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest neighbours among the products matching a filter."""
+        mask = self.attribute_index.mask(filters)
+        rows = np.flatnonzero(mask)
+        broad = len(rows) > FILTERED_EXACT_LIMIT or len(rows) >= FILTERED_EXACT_SHARE * len(self.product_ids)
+        if self.index.name == "annoy" and broad and len(rows):
+            # Broad filter: over-fetch from the forest in proportion to the filter's selectivity
+            fetch = min(len(self.product_ids), int(np.ceil(2 * k * len(self.product_ids) / len(rows))))
+            positions, distances = self.index.search(query, fetch)
+            allowed = mask[positions]
+            if allowed.sum() >= k:
+                return positions[allowed][:k], distances[allowed][:k]
+        # Selective filter (or too few allowed hits above): score only the allowed rows
+        return self.index.search_rows(query, k, rows)
+
+    def search(self, query_embedding: List[float], k: int = 5, filters: Optional[Filters] = None) -> List[dict]:
         """
         Search with enhanced error handling
-        
+
         Parameters:
         - query_embedding: List of floats representing the query embedding.
         - k: Number of nearest neighbors to return.
-        
+        - filters: Optional attribute filter, e.g. {"brand": "nike", "locale": "us"}; only matching
+          products are searched, so up to k of them are returned.
+
         """
         try:
-            nearest_neighbors = self.index.get_nns_by_vector(
-                query_embedding, 
-                k, 
-                include_distances=True
-            )
+            query = np.asarray(query_embedding, dtype=np.float32)
+            if filters:
+                positions, distances = self._filtered_search(query, k, filters)
+            else:
+                positions, distances = self.index.search(query, k)
         except Exception as e:
             print(f"Search failed: {str(e)}")
             return []
 
         results = []
-        for idx, dist in zip(*nearest_neighbors):
-            try:
-                product = self.products[idx]
-                results.append({
-                    "product_id": product.id,
-                    "score": round(1/(1+dist), 3)  # Convert distance to similarity score
-                })
-            except IndexError:
-                print(f"Index {idx} out of bounds for products list")
-                
+        for idx, dist in zip(positions, distances):
+            results.append({
+                "product_id": str(self.product_ids[idx]),
+                "score": round(1/(1+float(dist)), 3)  # Convert distance to similarity score
+            })
         return results
 
+    def search_batch(self, query_matrix: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search many query embeddings at once.
+
+        The exact backend scores the whole batch with one matrix product; the
+        Annoy backend searches rows on a thread pool. Use this for offline
+        evaluation and log replay instead of calling ``search`` in a loop.
+
+        Args:
+            query_matrix (np.ndarray): (n, embedding_dim) float32 query embeddings.
+            k (int): Number of nearest neighbours per query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (n, k) product ids and (n, k) float32 scores,
+            best first. Rows with fewer than k hits are padded with "" and 0.0.
+
+        Raises:
+            ValueError: If query_matrix is not (n, embedding_dim).
+        """
+        positions, distances = self.index.search_batch(query_matrix, k)
+        found = positions >= 0
+        product_ids = np.where(found, self.product_ids[np.where(found, positions, 0)], "")
+        scores = (1.0 / (1.0 + distances)).astype(np.float32)
+        return product_ids, scores
+
     @staticmethod
-    def build_index(products: List[Product], index_path: str):
-        """Public method for manual index building"""
-        if not products:
+    def build_index(products: Union[List[Product], ProductCatalog], index_path: str, backend: str = "annoy",
+                    **backend_options):
+        """Public method for manual index building; backend_options go to the backend (e.g. n_trees, n_threads)"""
+        if not len(products):
             raise ValueError("No products provided.")
 
-        valid_products = [p for p in products if p.embedding]
-        if not valid_products:
+        product_ids = ProductSearchEngine.embedded_product_ids(products)
+        if not len(product_ids):
             raise ValueError("No products with embeddings available")
-            
-        embedding_dim = len(valid_products[0].embedding)
-        index = AnnoyIndex(embedding_dim, 'angular')
 
-        for i, product in enumerate(valid_products):
-            index.add_item(i, product.embedding)
+        vectors = ProductSearchEngine.embedding_matrix(products)
+        embedding_dim = vectors.shape[1]
+        index = create_backend(backend, embedding_dim, **backend_options)
+        index.build(vectors)
 
-        index.build(100)
-        index.save(index_path)
-        print(f"Index built with {len(valid_products)} items at {index_path}")
-# class ProductSearchEngine:
-#     def __init__(self, embedding_dim, index_path, products: list[Product]):
-#         self.embedding_dim = embedding_dim
-#         self.index_path = index_path
-#         self.products = products
-#         self.index = AnnoyIndex(embedding_dim, 'angular')
-#         self.index.load(index_path)
-
-#     def search(self, query_embedding, k=5):
-#         nearest_neighbors = self.index.get_nns_by_vector(query_embedding, k, include_distances=True)
-
-#         results = []
-#         for idx, dist in zip(*nearest_neighbors):
-#             product = self.products[idx]
-#             results.append({
-#                 "product_id": product.id,
-#                 "score": round(dist, 3)
-#             })
-#         return pd.DataFrame(results)
-
-#     @staticmethod
-#     def build_index(products: list[Product], index_path: str):
-#         if not products:
-#             raise ValueError("No products provided.")
-
-#         embedding_dim = len(products[0].embedding)
-#         index = AnnoyIndex(embedding_dim, 'angular')
-
-#         for i, product in enumerate(products):
-#             if product.embedding:
-#                 index.add_item(i, product.embedding)
-
-#         index.build(100)
-#         index.save(index_path)
+        ProductSearchEngine._save(index, product_ids, index_path, embedding_dim, embedding_fingerprint(vectors))
+        print(f"Index built with {len(product_ids)} items at {index_path}")
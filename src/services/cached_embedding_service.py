@@ -0,0 +1,181 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class DiskEmbeddingCache:
+    """
+    Append-only on-disk tier: float32 vectors in a memory-mapped ``vectors.npy``
+    and their keys, one per line, in ``keys.txt`` (line number = row).
+
+    A vector is flushed before its key is appended, so after a crash every
+    listed key points at a complete row. The matrix doubles in size when full.
+    """
+
+    def __init__(self, directory: str, initial_rows: int = 4096):
+        """
+        Args:
+            directory (str): Directory holding vectors.npy and keys.txt.
+            initial_rows (int): Rows allocated when the matrix is first created.
+        """
+        self.directory = directory
+        self.initial_rows = initial_rows
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.keys_path = os.path.join(directory, "keys.txt")
+        os.makedirs(directory, exist_ok=True)
+
+        self.rows: Dict[str, int] = {}
+        self.vectors = None
+        if os.path.exists(self.vectors_path) and os.path.exists(self.keys_path):
+            self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+            with open(self.keys_path) as f:
+                for row, line in enumerate(f):
+                    key = line.strip()
+                    if key and row < len(self.vectors):
+                        self.rows[key] = row
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        return None if row is None else np.array(self.vectors[row])
+
+    def put(self, key: str, vector: np.ndarray):
+        if key in self.rows:
+            return
+        if self.vectors is None:
+            self.vectors = np.lib.format.open_memmap(self.vectors_path, mode="w+", dtype=np.float32,
+                                                     shape=(self.initial_rows, len(vector)))
+        elif vector.shape != (self.vectors.shape[1],):
+            raise ValueError(f"Expected an embedding of size {self.vectors.shape[1]}, got shape {vector.shape}")
+        elif len(self.rows) >= len(self.vectors):
+            self._grow()
+        row = len(self.rows)
+        self.vectors[row] = vector
+        self.vectors.flush()
+        with open(self.keys_path, "a") as f:
+            f.write(f"{key}\n")
+        self.rows[key] = row
+
+    def _grow(self):
+        tmp_path = self.vectors_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                          shape=(2 * len(self.vectors), self.vectors.shape[1]))
+        grown[:len(self.vectors)] = self.vectors
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp_path, self.vectors_path)
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+
+class CachedEmbeddingService:
+    """
+    Content-addressed cache in front of an embedding service.
+
+    Texts are keyed by a SHA-256 of (model, output size, text). Lookups go to an in-memory
+    LRU first, then to an optional memory-mapped on-disk tier. The misses of a
+    batch (deduplicated) are sent upstream in one ``embed_sentences`` call.
+    Vectors are cached as float32.
+
+    Usage:
+        service = CachedEmbeddingService(EmbeddingService(), max_entries=50_000, path="embedding_cache")
+        service.embed_sentences(["red mug", "blue mug"])
+        service.stats  # {"hits": ..., "misses": ..., "upstream_calls": ..., "bytes_saved": ...}
+    """
+
+    def __init__(self, service, max_entries: int = 10_000, path: Optional[str] = None):
+        """
+        Args:
+            service: Object with ``embed_sentences(List[str]) -> List[List[float]]``.
+            max_entries (int): Vectors kept in the in-memory LRU.
+            path (Optional[str]): Directory of the on-disk tier; None keeps the cache in memory only.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be positive")
+        self.service = service
+        self.model = getattr(service, "model", type(service).__name__)
+        self.max_entries = max_entries
+        self.disk = DiskEmbeddingCache(path) if path else None
+        if self.disk is not None and self.disk.vectors is not None and self.disk.vectors.shape[1] != self.embedding_dim:
+            raise ValueError(f"Disk cache at '{path}' holds embeddings of size {self.disk.vectors.shape[1]}, "
+                             f"the service returns {self.embedding_dim}")
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "upstream_calls": 0, "bytes_saved": 0}
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def embedding_dim(self) -> int:
+        """Size of the vectors of the wrapped service."""
+        return self.service.embedding_dim
+
+    def key(self, text: str) -> str:
+        """Cache key of a text for this service's model and output size."""
+        return hashlib.sha256(f"{self.model}\0{self.embedding_dim}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_sentences(self, sentences: List[str]) -> List[List[float]]:
+        keys = [self.key(sentence) for sentence in sentences]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+
+        with self._lock:
+            for key, sentence in zip(keys, sentences):
+                if key in vectors or key in missing:
+                    continue
+                vector = self._lookup(key)
+                if vector is None:
+                    missing[key] = sentence
+                else:
+                    vectors[key] = vector
+
+        if missing:
+            embeddings = self.service.embed_sentences(list(missing.values()))
+            if len(embeddings) != len(missing):
+                raise ValueError(f"Expected {len(missing)} embeddings, got {len(embeddings)}")
+            with self._lock:
+                self.stats["upstream_calls"] += 1
+                for key, embedding in zip(missing, embeddings):
+                    vector = np.asarray(embedding, dtype=np.float32)
+                    vectors[key] = vector
+                    self._remember(key, vector)
+                    if self.disk is not None:
+                        self.disk.put(key, vector)
+
+        with self._lock:
+            # Every position not sent upstream was served from the cache
+            served = len(keys) - len(missing)
+            self.stats["hits"] += served
+            self.stats["misses"] += len(missing)
+            if served:
+                self.stats["bytes_saved"] += served * next(iter(vectors.values())).nbytes
+        return [vectors[key].tolist() for key in keys]
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.stats["disk_hits"] += 1
+                self._remember(key, vector)
+                return vector
+        return None
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of requested texts served without an upstream call."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
@@ -0,0 +1,52 @@
+from typing import Dict, Optional
+
+from src.services.embedding_service import EmbeddingService
+from src.services.local_embedding_service import LocalEmbeddingService
+from src.services.stub_services import StubEmbeddingService
+
+# Every backend has ``embed_sentences(List[str]) -> List[List[float]]``, a ``model`` name and ``embedding_dim``
+EMBEDDING_BACKENDS: Dict[str, type] = {
+    "openai": EmbeddingService,
+    "local": LocalEmbeddingService,
+    "stub": StubEmbeddingService,
+}
+
+
+def create_embedding_service(name: str, model: Optional[str] = None, **kwargs):
+    """
+    Instantiate an embedding backend by name.
+
+    Args:
+        name (str): One of EMBEDDING_BACKENDS.
+        model (Optional[str]): Model for the backend; None keeps the backend's default.
+
+    Returns:
+        An embedding service.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}'. Use one of: {', '.join(EMBEDDING_BACKENDS)}.")
+    if model:
+        kwargs["model"] = model
+    return EMBEDDING_BACKENDS[name](**kwargs)
+
+
+def configured_embedding_service(name: Optional[str] = None, model: Optional[str] = None):
+    """
+    The embedding backend selected in config (EMBEDDING_BACKEND / EMBEDDING_MODEL).
+
+    Args:
+        name (Optional[str]): Overrides the configured backend.
+        model (Optional[str]): Overrides the configured model.
+
+    Returns:
+        An embedding service.
+    """
+    from config.config import EMBEDDING_BACKEND, EMBEDDING_MODEL
+    name = name or EMBEDDING_BACKEND
+    # A configured model belongs to the configured backend
+    if model is None and name == EMBEDDING_BACKEND:
+        model = EMBEDDING_MODEL
+    return create_embedding_service(name, model=model)
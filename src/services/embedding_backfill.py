@@ -0,0 +1,220 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.models.product import UPDATED_AT
+
+# Names of OpenAI exceptions worth retrying; EmbeddingService wraps them in RuntimeError
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether an embedding call failed for a transient reason (rate limit, timeout, 5xx).
+
+    Follows ``__cause__`` / ``__context__`` so errors re-raised by EmbeddingService
+    as RuntimeError are recognised too.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        message = str(error).lower()
+        if type(error).__name__ in RETRYABLE_ERRORS or "429" in message or "rate limit" in message:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def token_budget_batches(jobs: Iterable[Tuple[str, str]], max_tokens: int,
+                         max_items: int, count_tokens: Callable[[str], int] = estimate_tokens
+                         ) -> Iterator[List[Tuple[str, str]]]:
+    """
+    Group (doc_id, text) jobs into batches under a token and item budget.
+
+    A single text above ``max_tokens`` gets a batch of its own.
+
+    Args:
+        jobs (Iterable[Tuple[str, str]]): Document id and text to embed.
+        max_tokens (int): Token budget per request.
+        max_items (int): Maximum texts per request.
+        count_tokens (Callable[[str], int]): Token counter.
+
+    Yields:
+        List[Tuple[str, str]]: One embedding request worth of jobs.
+    """
+    batch, batch_tokens = [], 0
+    for job in jobs:
+        tokens = count_tokens(job[1])
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(job)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+class EmbeddingBackfill:
+    """
+    Embed many documents and write the vectors back to Firestore in bulk.
+
+    Texts are grouped into token-budgeted requests, up to ``concurrency``
+    requests run at once on a thread pool, and rate-limited or timed-out
+    requests are retried with exponential backoff and jitter. Results are
+    written with Firestore ``batch()`` commits of up to ``write_batch_size``
+    documents. After each commit the written ids are appended to a checkpoint
+    file, and ids already in it are skipped, so an interrupted run resumes
+    where it stopped.
+
+    Usage:
+        backfill = EmbeddingBackfill(EmbeddingService(), checkpoint_path="embedding_backfill.ckpt")
+        report = backfill.run((p.id, text_for(p)) for p in products if not p.embedding)
+    """
+
+    def __init__(self, embedding_service, client=None, collection: str = "Products",
+                 max_batch_tokens: int = 8000, max_batch_size: int = 256, concurrency: int = 4,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0,
+                 write_batch_size: int = 500, checkpoint_path: Optional[str] = None,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        """
+        Args:
+            embedding_service: Object with ``embed_sentences(List[str]) -> List[List[float]]``.
+            client: Firestore client, defaults to the shared one from src.db.firebase_client.
+            collection (str): Collection whose documents receive an ``embedding`` field.
+            max_batch_tokens (int): Token budget per embedding request.
+            max_batch_size (int): Maximum texts per embedding request.
+            concurrency (int): Embedding requests in flight at once.
+            max_retries (int): Retries per request for transient errors.
+            base_delay (float): First backoff delay in seconds; doubles on every retry.
+            max_delay (float): Upper bound on a single backoff delay.
+            write_batch_size (int): Documents per Firestore batch commit (Firestore allows 500).
+            checkpoint_path (Optional[str]): File recording committed document ids.
+            count_tokens (Callable[[str], int]): Token counter used for batching.
+        """
+        if client is None:
+            from src.db.firebase_client import db as client
+        if not 0 < write_batch_size <= 500:
+            raise ValueError("write_batch_size must be between 1 and 500")
+
+        self.embedding_service = embedding_service
+        self.client = client
+        self.collection = collection
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.write_batch_size = write_batch_size
+        self.checkpoint_path = checkpoint_path
+        self.count_tokens = count_tokens
+        self._lock = threading.Lock()
+
+    def completed_ids(self) -> Set[str]:
+        """Document ids committed by earlier runs, read from the checkpoint file."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path) as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def run(self, jobs: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        Embed and store every (doc_id, text) job not already in the checkpoint.
+
+        Args:
+            jobs (Iterable[Tuple[str, str]]): Document id and text to embed.
+
+        Returns:
+            Dict[str, int]: Counts of embedded, resumed (skipped via checkpoint) and
+            failed documents, embedding requests, retries and batch commits.
+        """
+        done = self.completed_ids()
+        report = {"embedded": 0, "resumed": 0, "failed": 0, "requests": 0, "retries": 0, "commits": 0}
+
+        def pending():
+            for doc_id, text in jobs:
+                if doc_id in done:
+                    report["resumed"] += 1
+                elif text and text.strip():
+                    yield doc_id, text
+
+        batches = token_budget_batches(pending(), self.max_batch_tokens, self.max_batch_size, self.count_tokens)
+        buffered: List[Tuple[str, List[float]]] = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = {}
+            for batch in batches:
+                # Bounded concurrency: wait for a request to finish before submitting another
+                while len(in_flight) >= self.concurrency:
+                    self._collect(in_flight, buffered, report)
+                in_flight[pool.submit(self._embed_with_retry, batch, report)] = batch
+                buffered = self._flush(buffered, report, final=False)
+            while in_flight:
+                self._collect(in_flight, buffered, report)
+                buffered = self._flush(buffered, report, final=False)
+        self._flush(buffered, report, final=True)
+        return report
+
+    def _collect(self, in_flight: dict, buffered: list, report: Dict[str, int]):
+        """Wait for at least one request and move its embeddings to the write buffer."""
+        finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in finished:
+            batch = in_flight.pop(future)
+            try:
+                embeddings = future.result()
+            except Exception as e:
+                report["failed"] += len(batch)
+                print(f"Embedding request for {len(batch)} documents failed: {str(e)}")
+                continue
+            buffered.extend((doc_id, embedding) for (doc_id, _), embedding in zip(batch, embeddings))
+
+    def _embed_with_retry(self, batch: List[Tuple[str, str]], report: Dict[str, int]) -> List[List[float]]:
+        texts = [text for _, text in batch]
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                report["requests"] += 1
+            try:
+                embeddings = self.embedding_service.embed_sentences(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                with self._lock:
+                    report["retries"] += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                continue
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+            return embeddings
+
+    def _flush(self, buffered: List[Tuple[str, List[float]]], report: Dict[str, int], final: bool):
+        """Commit full write batches (and the remainder when final); return what is left."""
+        while len(buffered) >= self.write_batch_size or (final and buffered):
+            chunk, buffered = buffered[:self.write_batch_size], buffered[self.write_batch_size:]
+            self._commit(chunk)
+            report["embedded"] += len(chunk)
+            report["commits"] += 1
+        return buffered
+
+    def _commit(self, chunk: List[Tuple[str, List[float]]]):
+        collection = self.client.collection(self.collection)
+        batch = self.client.batch()
+        updated_at = datetime.now(timezone.utc)
+        for doc_id, embedding in chunk:
+            batch.update(collection.document(doc_id), {"embedding": embedding, UPDATED_AT: updated_at})
+        batch.commit()
+
+        if self.checkpoint_path:
+            with open(self.checkpoint_path, "a") as f:
+                f.write("".join(f"{doc_id}\n" for doc_id, _ in chunk))
+                f.flush()
+                os.fsync(f.fileno())
@@ -1,17 +1,45 @@
 import openai
-from typing import List
+from typing import List, Optional
+
+from src.utils.tracing import tracer
+
+# Native output size of the OpenAI embedding models
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
 
 
 class EmbeddingService:
-    def __init__(self, model: str = "text-embedding-3-small"):
+    def __init__(self, model: str = "text-embedding-3-small", dimensions: Optional[int] = None):
+        """
+        Args:
+            model (str): OpenAI embedding model.
+            dimensions (Optional[int]): Shortened output size (text-embedding-3 models only); None keeps the native size.
+        """
         self.model = model
+        self.dimensions = dimensions
+
+    @property
+    def embedding_dim(self) -> int:
+        """Size of the vectors this service returns."""
+        if self.dimensions:
+            return self.dimensions
+        if self.model not in MODEL_DIMENSIONS:
+            raise ValueError(f"Unknown embedding size for model '{self.model}'; pass dimensions explicitly")
+        return MODEL_DIMENSIONS[self.model]
 
     def embed_sentences(self, sentences: List[str]) -> List[List[float]]:
         try:
-            response = openai.embeddings.create(
-                model=self.model,
-                input=sentences
-            )
+            options = {"dimensions": self.dimensions} if self.dimensions else {}
+            with tracer.span("embedding.request", model=self.model, texts=len(sentences)):
+                response = openai.embeddings.create(
+                    model=self.model,
+                    input=sentences,
+                    **options
+                )
+            tracer.count("embedding.texts", len(sentences))
             # Sort to ensure outputs are in the same order as inputs
             embeddings = [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
             return embeddings
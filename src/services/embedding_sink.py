@@ -0,0 +1,174 @@
+import base64
+import glob
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+
+class EmbeddingSink:
+    """
+    Policy for how a query embedding is persisted with its QueryLog.
+
+    store() returns the two log fields to write: the inline float list
+    (``queryEmbedding``) and a compact reference string (``queryEmbeddingRef``).
+    Either may be None, in which case the field is not written.
+    """
+
+    name = "base"
+
+    def store(self, embedding: List[float]) -> Tuple[Optional[List[float]], Optional[str]]:
+        """
+        Persist an embedding according to the policy.
+
+        Args:
+            embedding (List[float]): Query embedding.
+
+        Returns:
+            Tuple[Optional[List[float]], Optional[str]]: Inline embedding and reference for the log.
+        """
+        raise NotImplementedError
+
+    def load(self, ref: str) -> Optional[np.ndarray]:
+        """Embedding behind a reference written by this sink, or None if it cannot be recovered."""
+        return None
+
+
+class InlineSink(EmbeddingSink):
+    """Full float list in the log document (the previous behaviour, about 12 KB per 1536-d query)."""
+
+    name = "inline"
+
+    def store(self, embedding):
+        return embedding, None
+
+
+class NoneSink(EmbeddingSink):
+    """Do not persist query embeddings."""
+
+    name = "none"
+
+    def store(self, embedding):
+        return None, None
+
+
+class HashSink(EmbeddingSink):
+    """Only a SHA-256 of the float32 vector, enough to match queries against a content-addressed cache."""
+
+    name = "hash"
+
+    def store(self, embedding):
+        digest = hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+        return None, f"sha256:{digest}"
+
+
+class Float16Sink(EmbeddingSink):
+    """Half-precision vector as base64 in the reference (about 4 KB per 1536-d query)."""
+
+    name = "float16"
+
+    def store(self, embedding):
+        encoded = base64.b64encode(np.asarray(embedding, dtype="<f2").tobytes()).decode("ascii")
+        return None, f"f16:{encoded}"
+
+    def load(self, ref):
+        if not ref.startswith("f16:"):
+            return None
+        return np.frombuffer(base64.b64decode(ref[4:]), dtype="<f2").astype(np.float32)
+
+
+class ShardSink(EmbeddingSink):
+    """
+    Append embeddings to local float32 ``.npy`` shards; the log stores ``shard:<file>:<row>``.
+
+    Shards are pre-allocated with ``shard_rows`` rows and memory-mapped, so an
+    append is a row copy. Unused rows are all zeros (query embeddings never
+    are), which is how the next free row is found when a directory is reopened.
+    """
+
+    name = "shard"
+    PREFIX = "query_embeddings_"
+
+    def __init__(self, directory: str = "query_embeddings", embedding_dim: int = 1536, shard_rows: int = 65_536):
+        """
+        Args:
+            directory (str): Directory holding the shards.
+            embedding_dim (int): Embedding size.
+            shard_rows (int): Rows per shard file.
+        """
+        self.directory = directory
+        self.embedding_dim = embedding_dim
+        self.shard_rows = shard_rows
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        shards = sorted(glob.glob(os.path.join(directory, f"{self.PREFIX}*.npy")))
+        if shards:
+            self._shard_index = len(shards) - 1
+            self._shard = np.load(shards[-1], mmap_mode="r+")
+            if self._shard.shape[1] != embedding_dim:
+                raise ValueError(f"Shard {shards[-1]} has dim {self._shard.shape[1]}, expected {embedding_dim}")
+            used = np.flatnonzero(np.any(self._shard != 0, axis=1))
+            self._row = int(used[-1]) + 1 if len(used) else 0
+        else:
+            self._shard_index = -1
+            self._shard = None
+            self._row = shard_rows
+
+    def _shard_name(self, index: int) -> str:
+        return f"{self.PREFIX}{index:05d}.npy"
+
+    def store(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.embedding_dim,):
+            raise ValueError(f"Expected an embedding of size {self.embedding_dim}, got shape {vector.shape}")
+        with self._lock:
+            if self._row >= self.shard_rows:
+                if self._shard is not None:
+                    self._shard.flush()
+                self._shard_index += 1
+                self._shard = np.lib.format.open_memmap(
+                    os.path.join(self.directory, self._shard_name(self._shard_index)), mode="w+",
+                    dtype=np.float32, shape=(self.shard_rows, self.embedding_dim)
+                )
+                self._row = 0
+            ref = f"shard:{self._shard_name(self._shard_index)}:{self._row}"
+            self._shard[self._row] = vector
+            self._shard.flush()
+            self._row += 1
+        return None, ref
+
+    def load(self, ref):
+        if not ref.startswith("shard:"):
+            return None
+        _, name, row = ref.split(":")
+        return np.array(np.load(os.path.join(self.directory, name), mmap_mode="r")[int(row)])
+
+
+SINKS: Dict[str, Type[EmbeddingSink]] = {
+    InlineSink.name: InlineSink,
+    NoneSink.name: NoneSink,
+    HashSink.name: HashSink,
+    Float16Sink.name: Float16Sink,
+    ShardSink.name: ShardSink,
+}
+
+
+def create_sink(name: str, **kwargs) -> EmbeddingSink:
+    """
+    Instantiate an embedding sink by name.
+
+    Args:
+        name (str): One of SINKS.
+
+    Returns:
+        EmbeddingSink: The sink.
+
+    Raises:
+        ValueError: If the sink name is unknown.
+    """
+    if name not in SINKS:
+        raise ValueError(f"Unknown embedding sink '{name}'. Use one of: {', '.join(SINKS)}.")
+    return SINKS[name](**kwargs)
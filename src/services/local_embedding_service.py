@@ -0,0 +1,79 @@
+import threading
+from typing import List, Optional
+
+
+class LocalEmbeddingService:
+    """
+    Embeds text on the local CPU with a small sentence-transformers model, so
+    the query path makes no network call.
+
+    Sentences are encoded in batches of ``batch_size``. ``num_threads`` caps
+    the torch intra-op thread pool (useful when several worker processes
+    share a machine) and ``quantize`` applies int8 dynamic quantization to
+    the model's Linear layers, which roughly halves CPU latency for a small
+    loss in accuracy. The model is loaded on first use.
+
+    Vectors have a different size from the OpenAI ones (384 for the default
+    model), so products and users must be re-embedded with the same backend
+    before the vector index can be built.
+
+    Usage:
+        service = LocalEmbeddingService(num_threads=2, quantize=True)
+        embeddings = service.embed_sentences(["red mug", "blue mug"])
+    """
+
+    def __init__(self, model: str = "sentence-transformers/all-MiniLM-L6-v2", batch_size: int = 64,
+                 num_threads: Optional[int] = None, quantize: bool = False, normalize: bool = True):
+        """
+        Args:
+            model (str): sentence-transformers model name or local path.
+            batch_size (int): Sentences per forward pass.
+            num_threads (Optional[int]): Torch CPU threads; None keeps the torch default.
+            quantize (bool): Apply int8 dynamic quantization to Linear layers.
+            normalize (bool): Return unit-length vectors, like the OpenAI embeddings.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        self.model = f"{model}+int8" if quantize else model
+        self.model_name = model
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.quantize = quantize
+        self.normalize = normalize
+        self._encoder = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._encoder is None:
+                try:
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise RuntimeError(
+                        "The local embedding backend needs torch and sentence-transformers "
+                        "(pip install -r requirements.txt)"
+                    ) from e
+
+                if self.num_threads:
+                    torch.set_num_threads(self.num_threads)
+                encoder = SentenceTransformer(self.model_name, device="cpu")
+                encoder.eval()
+                if self.quantize:
+                    encoder = torch.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+                self._encoder = encoder
+        return self._encoder
+
+    @property
+    def embedding_dim(self) -> int:
+        """Size of the vectors this service returns."""
+        return self._load().get_sentence_embedding_dimension()
+
+    def embed_sentences(self, sentences: List[str]) -> List[List[float]]:
+        encoder = self._load()
+        try:
+            embeddings = encoder.encode(sentences, batch_size=self.batch_size, convert_to_numpy=True,
+                                        normalize_embeddings=self.normalize, show_progress_bar=False)
+        except Exception as e:
+            raise RuntimeError(f"Local embedding error: {str(e)}")
+        return embeddings.tolist()
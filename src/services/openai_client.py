@@ -1,5 +1,7 @@
 import openai
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from src.utils.tracing import tracer
 
 
 class OpenAIClient:
@@ -7,13 +9,14 @@ class OpenAIClient:
         self.model = model
         self.temperature = temperature
 
-    def generate_completion(self, messages: List[Dict[str, str]]) -> str:
+    def generate_completion(self, messages: List[Dict[str, str]], temperature: Optional[float] = None) -> str:
         try:
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-            )
+            with tracer.span("llm.completion", model=self.model):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature if temperature is None else temperature,
+                )
             return response.choices[0].message.content.strip()
         except Exception as e:
             raise RuntimeError(f"OpenAI API call failed: {str(e)}")
@@ -0,0 +1,297 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.tracing import tracer
+
+
+class QueryLogWriter:
+    """
+    Write-behind persistence for QueryLog documents.
+
+    A search updates its query log several times (create, refined query,
+    embedding, results). With a writer attached, each update only stores the
+    log's current state in memory, keyed by log id, so all updates of one log
+    coalesce into a single merged ``set``. A background thread commits pending
+    logs in Firestore ``batch()`` writes of up to ``batch_size`` documents.
+
+    The number of pending logs is bounded: submitting a new log while
+    ``max_pending`` logs are waiting blocks for up to ``submit_timeout``
+    seconds (backpressure), after which the log is spilled to disk instead.
+    Batches that fail to commit are appended to ``spill_path`` as JSON lines
+    and re-submitted once the store accepts writes again, and on the next
+    start. Every submitted state carries a sequence number, so a spilled state
+    is not re-submitted over a newer state of the same log that was written or
+    buffered in the meantime. Pending logs are flushed on close() and at
+    interpreter exit.
+
+    Usage:
+        writer = QueryLogWriter(spill_path="query_log_spill.jsonl")
+        query_log = QueryLog.create(..., writer=writer)
+        query_log.update_refined_query("red mug")   # no round-trip
+        writer.close()
+    """
+
+    def __init__(self, client=None, collection: str = "QueryLogs", batch_size: int = 500,
+                 max_pending: int = 10_000, flush_interval: float = 0.5, submit_timeout: float = 1.0,
+                 spill_path: Optional[str] = None, retry_interval: float = 30.0):
+        """
+        Args:
+            client: Firestore client, defaults to the shared one from src.db.firebase_client.
+            collection (str): Collection the logs are written to.
+            batch_size (int): Documents per batch commit (Firestore allows 500).
+            max_pending (int): Logs held in memory before submit() applies backpressure.
+            flush_interval (float): Seconds the worker waits to fill a batch before committing.
+            submit_timeout (float): Seconds submit() blocks on a full buffer before spilling.
+            spill_path (Optional[str]): JSON-lines file for logs that could not be written.
+                Without it, such logs are dropped and counted in ``stats["dropped"]``.
+            retry_interval (float): Seconds after a failed commit before spilled logs are retried.
+        """
+        if client is None:
+            from src.db.firebase_client import db as client
+        if not 0 < batch_size <= 500:
+            raise ValueError("batch_size must be between 1 and 500")
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+
+        self.client = client
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.spill_path = spill_path
+        self.retry_interval = retry_interval
+        self.stats = {"submitted": 0, "written": 0, "commits": 0, "failed_commits": 0,
+                      "spilled": 0, "recovered": 0, "dropped": 0}
+
+        self._pending: "OrderedDict[str, Tuple[int, dict]]" = OrderedDict()
+        # Submit counter, and the sequence last committed per log id while a spill file exists
+        self._sequence = 0
+        self._written: Dict[str, int] = {}
+        self._in_flight = 0
+        self._flushers = 0
+        self._closed = False
+        self._last_failure = None
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+
+        self.recover()
+        self._worker = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, query_log) -> bool:
+        """
+        Buffer the current state of a query log for writing.
+
+        Args:
+            query_log (QueryLog): Log to persist; later submits of the same id replace this one.
+
+        Returns:
+            bool: True if buffered, False if the buffer stayed full and the log was spilled.
+        """
+        return self._submit(query_log.id, query_log.model_dump(by_alias=True))
+
+    def _submit(self, log_id: str, document: dict) -> bool:
+        with self._condition:
+            if self._closed:
+                raise ValueError("QueryLogWriter is closed")
+            self.stats["submitted"] += 1
+            self._sequence += 1
+            sequence = self._sequence
+            if log_id not in self._pending:
+                # Backpressure: wait for the worker to make room, then give up and spill
+                deadline = time.monotonic() + self.submit_timeout
+                while len(self._pending) >= self.max_pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            if log_id in self._pending or len(self._pending) < self.max_pending:
+                self._pending[log_id] = (sequence, document)
+                self._condition.notify_all()
+                return True
+        self._spill([(log_id, sequence, document)])
+        return False
+
+    def pending(self) -> int:
+        """Number of logs waiting to be written, including the batch being committed."""
+        with self._condition:
+            return len(self._pending) + self._in_flight
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every buffered log has been committed or spilled.
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait.
+
+        Returns:
+            bool: True if the buffer drained in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._flushers += 1
+            self._condition.notify_all()
+            try:
+                while self._pending or self._in_flight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self._flushers -= 1
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush pending logs and stop the background worker."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join(timeout)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def recover(self) -> int:
+        """
+        Re-submit logs from the spill file.
+
+        A spilled state is skipped if a newer state of the same log has been
+        written or is buffered. Lines without a sequence number count as older
+        than anything submitted since.
+
+        Returns:
+            int: Number of logs read back.
+        """
+        from src.models.query_log import QueryLog
+
+        with self._spill_lock:
+            if not self.spill_path or not os.path.exists(self.spill_path):
+                return 0
+            with open(self.spill_path) as f:
+                lines = [line for line in f if line.strip()]
+            os.remove(self.spill_path)
+
+        # Keep the newest spilled state of each log
+        documents = OrderedDict()
+        for line in lines:
+            entry = json.loads(line)
+            sequence, entry = (entry["seq"], entry["log"]) if "log" in entry else (0, entry)
+            document = QueryLog(**entry).model_dump(by_alias=True)
+            if sequence >= documents.get(document["logId"], (-1, None))[0]:
+                documents[document["logId"]] = (sequence, document)
+        with self._condition:
+            # Spilled sequences come from an earlier run after a restart; later submits must stay newer
+            self._sequence = max([self._sequence] + [sequence for sequence, _ in documents.values()])
+            for log_id, (sequence, document) in documents.items():
+                newest = max(self._written.get(log_id, -1), self._pending.get(log_id, (-1, None))[0])
+                if sequence > newest:
+                    self._pending[log_id] = (sequence, document)
+            # Anything spilled from now on is newer than the writes recorded so far
+            self._written.clear()
+            self.stats["recovered"] += len(documents)
+            self._condition.notify_all()
+        return len(documents)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                # Give the batch flush_interval to fill up unless someone is waiting on it
+                deadline = time.monotonic() + self.flush_interval
+                while not (self._closed or self._flushers or len(self._pending) >= self.batch_size):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._pending:
+                    return
+                batch = []
+                for _ in range(min(self.batch_size, len(self._pending))):
+                    log_id, (sequence, document) = self._pending.popitem(last=False)
+                    batch.append((log_id, sequence, document))
+                self._in_flight = len(batch)
+                self._condition.notify_all()
+
+            try:
+                written = self._commit(batch)
+                if written and self._should_retry_spill():
+                    self.recover()
+            except Exception as e:
+                # flush() and close() wait on this thread, so no failure may end it
+                print(f"Query log writer error: {str(e)}")
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+
+    def _commit(self, batch: List[Tuple[str, int, dict]]) -> bool:
+        try:
+            collection = self.client.collection(self.collection)
+            write_batch = self.client.batch()
+            for log_id, _, document in batch:
+                write_batch.set(collection.document(log_id), document, merge=True)
+            with tracer.span("firestore.query_log.commit", documents=len(batch)):
+                write_batch.commit()
+        except Exception as e:
+            print(f"Query log batch of {len(batch)} failed, spilling to disk: {str(e)}")
+            self.stats["failed_commits"] += 1
+            self._last_failure = time.monotonic()
+            self._spill(batch)
+            return False
+        # Only a spill file that recover() has not read yet can hold older states of these logs
+        with self._condition:
+            if self.spill_path and os.path.exists(self.spill_path):
+                for log_id, sequence, _ in batch:
+                    self._written[log_id] = sequence
+        self.stats["commits"] += 1
+        self.stats["written"] += len(batch)
+        return True
+
+    def _should_retry_spill(self) -> bool:
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return False
+        return self._last_failure is None or time.monotonic() - self._last_failure >= self.retry_interval
+
+    def _spill(self, batch: List[Tuple[str, int, dict]]):
+        with self._spill_lock:
+            if not self.spill_path:
+                self.stats["dropped"] += len(batch)
+                return
+            lines = []
+            for log_id, sequence, document in batch:
+                try:
+                    lines.append(json.dumps({"seq": sequence, "log": document}, default=_json_default) + "\n")
+                except (TypeError, ValueError) as e:
+                    print(f"Query log {log_id} cannot be spilled, dropping it: {str(e)}")
+                    self.stats["dropped"] += 1
+            try:
+                with open(self.spill_path, "a") as f:
+                    f.write("".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                print(f"Query log spill file unavailable, dropping {len(lines)} logs: {str(e)}")
+                self.stats["dropped"] += len(lines)
+                return
+            self.stats["spilled"] += len(lines)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
@@ -0,0 +1,93 @@
+import hashlib
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class StubEmbeddingService:
+    """
+    Offline stand-in for EmbeddingService.
+
+    Each sentence maps to a deterministic unit vector derived from its SHA-256,
+    so the same text always gets the same embedding. Calls can be slowed down
+    and made to fail, to exercise batching, concurrency and retry code without
+    the OpenAI API.
+
+    Usage:
+        service = StubEmbeddingService(dim=1536, latency=0.05, rate_limit_failures=2)
+        embeddings = service.embed_sentences(["red mug", "blue mug"])
+    """
+
+    def __init__(self, dim: int = 1536, latency: float = 0.0, rate_limit_failures: int = 0):
+        """
+        Args:
+            dim (int): Embedding size.
+            latency (float): Seconds each call sleeps, like a network round-trip.
+            rate_limit_failures (int): Number of initial calls that fail with a rate-limit error.
+        """
+        self.dim = dim
+        self.latency = latency
+        self.rate_limit_failures = rate_limit_failures
+        self.calls = 0
+        self.sentences_embedded = 0
+        self._lock = threading.Lock()
+
+    def embed_sentences(self, sentences: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            fail = self.rate_limit_failures > 0
+            if fail:
+                self.rate_limit_failures -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("OpenAI Embedding API error: Error code: 429 - Rate limit reached")
+
+        with self._lock:
+            self.sentences_embedded += len(sentences)
+        return [self.embed(sentence).tolist() for sentence in sentences]
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.dim
+
+    def embed(self, sentence: str) -> np.ndarray:
+        """Deterministic unit vector for one sentence."""
+        seed = int.from_bytes(hashlib.sha256(sentence.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).normal(size=self.dim)
+        return vector / np.linalg.norm(vector)
+
+
+class StubOpenAIClient:
+    """
+    Offline stand-in for OpenAIClient used by query refinement.
+
+    Echoes the quoted search query from the refinement prompt (or the whole
+    last message) after ``latency`` seconds, like a chat completion round-trip.
+
+    Usage:
+        preprocessor = QueryPreprocessor(PromptBuilder(), StubOpenAIClient(latency=0.4))
+    """
+
+    QUERY_PATTERN = re.compile(r"search query: '(.*?)'\.")
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency (float): Seconds each completion sleeps.
+        """
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_completion(self, messages: List[Dict[str, str]], temperature: Optional[float] = None) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        content = messages[-1]["content"]
+        match = self.QUERY_PATTERN.search(content)
+        return match.group(1) if match else content
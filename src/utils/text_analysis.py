@@ -0,0 +1,121 @@
+import hashlib
+import re
+from typing import Dict, FrozenSet, Iterable, List, Sequence
+
+import numpy as np
+
+# NLTK's English stopword list, plus each contraction without its apostrophe
+# (punctuation is removed before stopwords are filtered, so "don't" arrives as "dont")
+_NLTK_ENGLISH_STOPWORDS = (
+    "i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves he him "
+    "his himself she she's her hers herself it it's its itself they them their theirs themselves what which who "
+    "whom this that that'll these those am is are was were be been being have has had having do does did doing a "
+    "an the and but if or because as until while of at by for with about against between into through during "
+    "before after above below to from up down in out on off over under again further then once here there when "
+    "where why how all any both each few more most other some such no nor not only own same so than too very s t "
+    "can will just don don't should should've now d ll m o re ve y ain aren aren't couldn couldn't didn didn't "
+    "doesn doesn't hadn hadn't hasn hasn't haven haven't isn isn't ma mightn mightn't mustn mustn't needn needn't "
+    "shan shan't shouldn shouldn't wasn wasn't weren weren't won won't wouldn wouldn't"
+).split()
+STOPWORDS: FrozenSet[str] = frozenset(_NLTK_ENGLISH_STOPWORDS) | frozenset(
+    word.replace("'", "") for word in _NLTK_ENGLISH_STOPWORDS)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+class TextAnalyzer:
+    """
+    The one text pipeline shared by BM25 indexing, BM25 queries and the
+    embedding texts, so query and document terms always line up.
+
+    ``normalize`` lowercases, deletes punctuation and collapses whitespace
+    (the form embedded and used in cache keys). ``tokens`` splits that into
+    terms, drops stopwords and optionally applies a light plural stemmer.
+
+    Usage:
+        analyzer = TextAnalyzer()
+        analyzer.normalize("Wi-Fi Headphones, Black!")   # "wifi headphones black"
+        analyzer.tokens("headphones for the gym")         # ["headphones", "gym"]
+    """
+
+    def __init__(self, stopwords: Iterable[str] = STOPWORDS, stem: bool = False):
+        """
+        Args:
+            stopwords (Iterable[str]): Lowercase terms dropped by tokens().
+            stem (bool): Strip plural endings ("headphones" -> "headphone", "batteries" -> "battery").
+        """
+        self.stopwords = frozenset(stopwords)
+        self.stem = stem
+        words = "\n".join(sorted(self.stopwords)).encode("utf-8")
+        self.signature = f"v1:stem={int(stem)}:stopwords={hashlib.sha256(words).hexdigest()[:12]}"
+
+    def normalize(self, text: str) -> str:
+        """Lowercase text without punctuation, words separated by single spaces."""
+        return " ".join(_PUNCTUATION.sub("", text.lower()).split())
+
+    def tokens(self, text: str) -> List[str]:
+        """Index and query terms of a text."""
+        stopwords = self.stopwords
+        terms = [term for term in _PUNCTUATION.sub("", text.lower()).split() if term not in stopwords]
+        if self.stem:
+            return [stem_plural(term) for term in terms]
+        return terms
+
+
+def stem_plural(term: str) -> str:
+    """
+    Light "S" stemmer (Harman, 1991): undo English plural endings only.
+
+    The first matching rule applies: "ies" -> "y" unless after "a" or "e",
+    "es" -> "e" unless after "a", "e" or "o", "s" -> "" unless after "u" or
+    "s". Terms of three letters or fewer are left alone.
+    """
+    if len(term) <= 3 or term[-1] != "s":
+        return term
+    if term.endswith("ies") and term[-4] not in "ae":
+        return term[:-3] + "y"
+    if term.endswith("es") and term[-3] not in "aeo":
+        return term[:-1]
+    if term[-2] not in "us":
+        return term[:-1]
+    return term
+
+
+class Vocabulary:
+    """
+    Interns terms as dense int32 ids, in first-seen order.
+
+    Usage:
+        vocabulary = Vocabulary()
+        ids = vocabulary.intern(["red", "mug", "red"])   # array([0, 1, 0], dtype=int32)
+        vocabulary.terms                                 # ["red", "mug"]
+    """
+
+    def __init__(self, terms: Sequence[str] = ()):
+        """
+        Args:
+            terms (Sequence[str]): Terms given ids 0..len(terms) - 1 up front.
+        """
+        self.ids: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def terms(self) -> List[str]:
+        """Term of every id."""
+        return list(self.ids)
+
+    def intern(self, tokens: Sequence[str]) -> np.ndarray:
+        """Ids of the tokens, adding unseen ones."""
+        ids = self.ids
+        return np.fromiter([ids.setdefault(token, len(ids)) for token in tokens], dtype=np.int32, count=len(tokens))
+
+    def lookup(self, tokens: Sequence[str]) -> np.ndarray:
+        """Ids of the known tokens; unseen tokens are dropped."""
+        ids = self.ids
+        return np.fromiter([ids[token] for token in tokens if token in ids], dtype=np.int32)
+
+
+# Analyzer of the search pipeline
+analyzer = TextAnalyzer()
@@ -0,0 +1,361 @@
+import contextvars
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Spans of the trace running in the current thread / asyncio task
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+# Upper bounds (seconds) of the OpenMetrics histogram buckets
+EXPORT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram in microseconds.
+
+    Values below 2^SUB_BUCKET_BITS us get one bucket each; above that every
+    power of two is split into 2^(SUB_BUCKET_BITS - 1) linear buckets, so any
+    recorded value is known to within 1/64 (about 1.6%) of itself from a
+    few kilobytes of counters. Recording is O(1).
+
+    Usage:
+        histogram = LatencyHistogram()
+        histogram.record(0.0123)          # seconds
+        histogram.percentile(99)          # seconds
+    """
+
+    SUB_BUCKET_BITS = 7
+    MAX_MICROS = 2 ** 36  # about 19 hours; longer values are clamped
+
+    def __init__(self):
+        half = 1 << (self.SUB_BUCKET_BITS - 1)
+        self.counts: List[int] = [0] * self._index(self.MAX_MICROS) + [0] * half
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _index(cls, micros: int) -> int:
+        if micros < 1 << cls.SUB_BUCKET_BITS:
+            return micros
+        shift = micros.bit_length() - cls.SUB_BUCKET_BITS
+        return (shift << (cls.SUB_BUCKET_BITS - 1)) + (micros >> shift)
+
+    @classmethod
+    def _upper_bound(cls, index: int) -> int:
+        """Largest value (microseconds) counted in a bucket."""
+        if index < 1 << cls.SUB_BUCKET_BITS:
+            return index
+        shift = (index >> (cls.SUB_BUCKET_BITS - 1)) - 1
+        mantissa = index - (shift << (cls.SUB_BUCKET_BITS - 1))
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        micros = min(int(seconds * 1e6), self.MAX_MICROS)
+        index = self._index(max(micros, 0))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """
+        Value at or below which ``q`` percent of the recordings fall, in seconds.
+
+        Returns the upper end of the bucket holding that rank (never above the
+        recorded maximum), or 0.0 when nothing was recorded.
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(q / 100.0 * self.count))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(self._upper_bound(index) / 1e6, self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds=EXPORT_BUCKETS) -> List[int]:
+        """Recordings at or below each bound (seconds), for histogram exporters."""
+        cumulative, seen, index = [], 0, 0
+        with self._lock:
+            for bound in bounds:
+                limit = self._index(min(int(bound * 1e6), self.MAX_MICROS))
+                while index <= limit:
+                    seen += self.counts[index]
+                    index += 1
+                cumulative.append(seen)
+        return cumulative
+
+
+class JsonlTraceSink:
+    """Appends finished spans to a JSON-lines file, one object per span."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): File the spans are appended to.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Span:
+    """A timed operation of a sampled trace; use through Tracer.span."""
+
+    __slots__ = ("tracer", "name", "attributes", "trace_id", "span_id", "parent_id", "start", "duration",
+                 "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict, parent: Optional["Span"]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(64):016x}"
+        self.duration = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        self.tracer._finish(self, exc_type)
+        return False
+
+
+class _UnsampledRoot:
+    """Root of a trace that was not sampled: marks the context so nested spans are skipped too."""
+
+    __slots__ = ("tracer", "name", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def set(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        self._token = _current_span.set(_UNSAMPLED)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.tracer._count_error(self.name)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_UNSAMPLED = object()
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    """
+    Spans, latency histograms and counters for the search pipeline.
+
+    ``span(name)`` times a block. Whether a trace is recorded is decided once
+    at its root span with probability ``sample_rate``; the spans nested in it
+    (also across asyncio tasks and ``asyncio.to_thread``) follow that decision,
+    so an unsampled search costs one context switch at its root and a no-op
+    per nested span. Sampled spans feed a LatencyHistogram per span name and
+    the optional JSONL sink. Calls and errors per span name are counted for
+    every span, sampled or not.
+
+    Usage:
+        tracer = Tracer(sample_rate=0.1, sink=JsonlTraceSink("traces.jsonl"))
+        with tracer.span("search", query="red mug"):
+            with tracer.span("stage.bm25"):
+                ...
+        print(tracer.export_openmetrics())
+    """
+
+    def __init__(self, sample_rate: float = 1.0, sink: Optional[JsonlTraceSink] = None,
+                 namespace: str = "cart_search", enabled: bool = True):
+        """
+        Args:
+            sample_rate (float): Share of traces recorded, in [0, 1].
+            sink (Optional[JsonlTraceSink]): Receives every span of the sampled traces.
+            namespace (str): Prefix of the exported metric names.
+            enabled (bool): False turns every span into a no-op and stops counting.
+
+        Raises:
+            ValueError: If sample_rate is outside [0, 1].
+        """
+        self.namespace = namespace
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.configure(sample_rate, sink, enabled)
+
+    def configure(self, sample_rate: Optional[float] = None, sink: Optional[JsonlTraceSink] = None,
+                  enabled: Optional[bool] = None):
+        """Change sampling, sink or enabled state in place (instrumented modules keep their reference)."""
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError("sample_rate must be between 0 and 1")
+            self.sample_rate = sample_rate
+        if sink is not None or not hasattr(self, "sink"):
+            self.sink = sink
+        if enabled is not None or not hasattr(self, "enabled"):
+            self.enabled = True if enabled is None else enabled
+
+    def span(self, name: str, **attributes):
+        """
+        Context manager timing a block as span ``name``.
+
+        Args:
+            name (str): Span name, e.g. "stage.bm25" or "llm.completion".
+            **attributes: Extra fields written to the trace sink.
+        """
+        if not self.enabled:
+            return _NOOP
+        with self._lock:
+            self._calls[name] = self._calls.get(name, 0) + 1
+        parent = _current_span.get()
+        if parent is _UNSAMPLED:
+            return _NOOP
+        if parent is None and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return _UnsampledRoot(self, name)
+        return Span(self, name, attributes, parent)
+
+    def count(self, name: str, value: float = 1):
+        """Add ``value`` to counter ``name``."""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        """Spans started per name, sampled or not."""
+        with self._lock:
+            return dict(self._calls)
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def _count_error(self, name: str):
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def _finish(self, span: Span, exc_type):
+        self.histogram(span.name).record(span.duration)
+        if exc_type is not None:
+            self._count_error(span.name)
+        if self.sink is not None:
+            self.sink.write({
+                "trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+                "name": span.name, "duration_ms": span.duration * 1000,
+                "end": time.time(), "error": exc_type.__name__ if exc_type is not None else None,
+                **({"attributes": span.attributes} if span.attributes else {}),
+            })
+
+    def reset(self):
+        """Forget all recorded histograms and counts."""
+        with self._lock:
+            self.histograms, self.counters, self._calls, self.errors = {}, {}, {}, {}
+
+    @staticmethod
+    def _metric_name(name: str) -> str:
+        return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+    def export_openmetrics(self) -> str:
+        """
+        Histograms and counters in the OpenMetrics text format.
+
+        Span durations are one histogram family labelled by span name, in
+        seconds; span calls and errors and the named counters are counter
+        families.
+        """
+        prefix = self._metric_name(self.namespace)
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            calls, errors, counters = sorted(self._calls.items()), sorted(self.errors.items()), \
+                sorted(self.counters.items())
+
+        lines = [f"# TYPE {prefix}_span_duration_seconds histogram",
+                 f"# UNIT {prefix}_span_duration_seconds seconds",
+                 f"# HELP {prefix}_span_duration_seconds Duration of sampled spans."]
+        for name, histogram in histograms:
+            label = f'span="{name}"'
+            for bound, cumulative in zip(EXPORT_BUCKETS, histogram.cumulative_counts()):
+                lines.append(f'{prefix}_span_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_span_duration_seconds_bucket{{{label},le="+Inf"}} {histogram.count}')
+            lines.append(f"{prefix}_span_duration_seconds_count{{{label}}} {histogram.count}")
+            lines.append(f"{prefix}_span_duration_seconds_sum{{{label}}} {histogram.sum}")
+
+        for family, values, help_text in (("span_calls", calls, "Spans started, sampled or not."),
+                                          ("span_errors", errors, "Spans that raised.")):
+            lines += [f"# TYPE {prefix}_{family} counter", f"# HELP {prefix}_{family} {help_text}"]
+            lines += [f'{prefix}_{family}_total{{span="{name}"}} {value}' for name, value in values]
+
+        for name, value in counters:
+            metric = f"{prefix}_{self._metric_name(name)}"
+            lines += [f"# TYPE {metric} counter", f"{metric}_total {value}"]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def configured_tracer() -> Tracer:
+    """Tracer with the sampling rate and trace file of config (TRACE_SAMPLE_RATE / TRACE_PATH)."""
+    from config.config import TRACE_PATH, TRACE_SAMPLE_RATE
+
+    return Tracer(sample_rate=TRACE_SAMPLE_RATE, sink=JsonlTraceSink(TRACE_PATH) if TRACE_PATH else None)
+
+
+# Process-wide tracer of the instrumented pipeline and clients
+tracer = configured_tracer()
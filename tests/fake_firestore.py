@@ -0,0 +1,170 @@
+"""
+In-memory stand-in for the subset of the Firestore client API used by the models.
+
+Supports collection().document().get/set/update/delete, stream(), where() with
+comparison operators, limit(), list_documents() and batch() writes. Documents
+are deep-copied on the way in and out, like a real client deserializing a
+response, and every document returned to the caller counts towards ``reads``.
+"""
+import copy
+import operator
+from typing import Any, Dict, List, Optional
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection: "FakeCollection", doc_id: str):
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self, transaction=None) -> FakeDocumentSnapshot:
+        data = self.collection.documents.get(self.id)
+        if data is not None:
+            self.collection.client.reads += 1
+        return FakeDocumentSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data: dict, merge: bool = False):
+        if merge and self.id in self.collection.documents:
+            self.collection.documents[self.id].update(copy.deepcopy(data))
+        else:
+            self.collection.documents[self.id] = copy.deepcopy(data)
+
+    def update(self, data: dict):
+        if self.id not in self.collection.documents:
+            raise ValueError(f"No document to update: {self.collection.name}/{self.id}")
+        self.collection.documents[self.id].update(copy.deepcopy(data))
+
+    def delete(self):
+        self.collection.documents.pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, collection: "FakeCollection", filters=(), limit_count: Optional[int] = None):
+        self.collection = collection
+        self.filters = list(filters)
+        self.limit_count = limit_count
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        return FakeQuery(self.collection, self.filters + [(field, OPERATORS[op], value)], self.limit_count)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return FakeQuery(self.collection, self.filters, count)
+
+    def _matches(self, data: dict) -> bool:
+        # Like Firestore, a filter never matches documents that lack the field
+        return all(field in data and op(data[field], value) for field, op, value in self.filters)
+
+    def stream(self):
+        returned = 0
+        for doc_id, data in list(self.collection.documents.items()):
+            if self.limit_count is not None and returned >= self.limit_count:
+                break
+            if self._matches(data):
+                returned += 1
+                self.collection.client.reads += 1
+                yield FakeDocumentSnapshot(FakeDocumentReference(self.collection, doc_id), copy.deepcopy(data))
+
+    def get(self) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client: "FakeFirestoreClient", name: str):
+        self.client = client
+        self.name = name
+        self.documents: Dict[str, dict] = {}
+        super().__init__(self)
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        if doc_id is None:
+            self.client.auto_ids += 1
+            doc_id = f"auto{self.client.auto_ids:06d}"
+        return FakeDocumentReference(self, doc_id)
+
+    def list_documents(self, page_size: Optional[int] = None):
+        # Firestore lists references without reading document data
+        return [FakeDocumentReference(self, doc_id) for doc_id in list(self.documents)]
+
+
+class FakeWriteBatch:
+    """Buffers writes and applies them together on commit, like a Firestore WriteBatch."""
+
+    MAX_WRITES = 500
+
+    def __init__(self, client: "FakeFirestoreClient"):
+        self.client = client
+        self.writes = []
+
+    def _add(self, write):
+        if len(self.writes) >= self.MAX_WRITES:
+            raise ValueError(f"A batch can hold at most {self.MAX_WRITES} writes")
+        self.writes.append(write)
+
+    def set(self, reference: FakeDocumentReference, data: dict, merge: bool = False):
+        self._add(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference: FakeDocumentReference, data: dict):
+        self._add(lambda: reference.update(data))
+
+    def delete(self, reference: FakeDocumentReference):
+        self._add(reference.delete)
+
+    def commit(self):
+        if self.client.fail_next_commits > 0:
+            self.client.fail_next_commits -= 1
+            raise RuntimeError("Simulated commit failure")
+        for write in self.writes:
+            write()
+        self.client.commits += 1
+        self.client.writes += len(self.writes)
+        self.writes = []
+
+
+class FakeFirestoreClient:
+    """
+    Usage:
+        client = FakeFirestoreClient()
+        client.collection("Products").document("P1").set({"title": "Mug"})
+        catalog = ProductCatalog.load_all(client=client)
+    """
+
+    def __init__(self):
+        self.collections: Dict[str, FakeCollection] = {}
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+        self.fail_next_commits = 0
+        self.auto_ids = 0
+
+    def collection(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self, name)
+        return self.collections[name]
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
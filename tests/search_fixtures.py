@@ -0,0 +1,167 @@
+"""
+Offline stand-ins for running CartSearchEngine end to end without Firestore
+or OpenAI.
+
+LocalSession and LocalQueryLog keep the model behaviour but record their
+Firestore writes in ``WRITES`` instead, sleeping ``WRITES.latency`` seconds per
+write like a round-trip. LocalSession also applies its writes to the copy
+stored in ``SESSIONS``, which plays the Sessions collection.
+"""
+import math
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from cart_search_engine import CartSearchEngine
+from src.models import Preferences, QueryLog, QueryNode, RetrievalResults, Session, Transition, UserProfile
+from src.models.catalog import ProductCatalog
+from src.modules.retrieval.bm25_retriever import BM25CandidateRetriever
+from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
+from src.services.stub_services import StubEmbeddingService, StubOpenAIClient
+
+
+class WriteLog:
+    """Thread-safe record of (collection, document id, field) writes."""
+
+    def __init__(self):
+        self.latency = 0.0
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def reset(self, latency: float = 0.0):
+        with self._lock:
+            self.latency = latency
+            self.entries = []
+
+    def record(self, collection: str, doc_id: str, field: str):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.entries.append((collection, doc_id, field))
+
+
+WRITES = WriteLog()
+# Sessions "stored" by LocalSession, by id
+SESSIONS = {}
+
+
+class LocalSession(Session):
+    @classmethod
+    def create(cls, user_id: str) -> "LocalSession":
+        session = cls(id=f"S-{user_id}", user_id=user_id, start_time=datetime.now(timezone.utc))
+        WRITES.record("Sessions", session.id, "*")
+        SESSIONS[session.id] = session.model_copy(deep=True)
+        return session
+
+    @classmethod
+    def load(cls, session_id: str) -> "LocalSession":
+        if session_id not in SESSIONS:
+            raise ValueError(f"Session {session_id} not found")
+        return SESSIONS[session_id].model_copy(deep=True)
+
+    def _stored(self) -> Optional["LocalSession"]:
+        stored = SESSIONS.get(self.id)
+        return stored if stored is not self else None
+
+    def terminate(self):
+        self.end_time = datetime.now(timezone.utc)
+        WRITES.record("Sessions", self.id, "endTime")
+        if self._stored():
+            self._stored().end_time = self.end_time
+
+    def add_query(self, query_text: str):
+        new_query = QueryNode(
+            queryId=f"q{len(self.queries)+1}",
+            text=query_text,
+            timestamp=datetime.now(timezone.utc)
+        )
+        WRITES.record("Sessions", self.id, "queries")
+        self.queries.append(new_query)
+        if self._stored():
+            self._stored().queries.append(new_query.model_copy())
+
+        if len(self.queries) > 1:
+            prev_query = self.queries[-2]
+            time_diff = (new_query.timestamp - prev_query.timestamp).total_seconds() / 60
+            WRITES.record("Sessions", self.id, "transitions")
+            self.transitions.append(Transition(
+                from_query=prev_query.id,
+                to=new_query.id,
+                count=1,
+                time_difference=time_diff,
+                weight=math.exp(-0.1 * time_diff)
+            ))
+            if self._stored():
+                self._stored().transitions.append(self.transitions[-1].model_copy())
+
+
+class LocalQueryLog(QueryLog):
+    def save(self):
+        WRITES.record("QueryLogs", self.id, "*")
+
+    def update_refined_query(self, refined_query: str):
+        self.refined_query = refined_query
+        WRITES.record("QueryLogs", self.id, "refinedQuery")
+
+    def update_embedding(self, embedding: Optional[List[float]], embedding_ref: Optional[str] = None):
+        self.embedding = embedding
+        self.embedding_ref = embedding_ref
+        WRITES.record("QueryLogs", self.id, "queryEmbedding")
+
+    def update_results(self, bm25_results: Optional[List[str]] = None, vector_results: Optional[List[str]] = None,
+                       final_results: Optional[List[str]] = None):
+        self.retrieval_results = RetrievalResults(bm25=bm25_results or [], vector=vector_results or [])
+        WRITES.record("QueryLogs", self.id, "retrievalResults")
+        if final_results:
+            self.final_result.extend(final_results)
+            WRITES.record("QueryLogs", self.id, "finalResult")
+
+
+class LocalCartSearchEngine(CartSearchEngine):
+    def _create_query_log(self, raw_query, query=None):
+        self.current_session.add_query(raw_query)
+        query_log = LocalQueryLog(
+            logId=f"L{len(self.current_session.queries)}",
+            userId=self.current_user.id,
+            sessionId=self.current_session.id,
+            rawQuery=raw_query,
+            timestamp=self.current_session.queries[-1].timestamp
+        )
+        self._persist(query_log.save)
+        return query_log
+
+
+def local_engine(records: List[dict], dim: int = 64, embedding_latency: float = 0.0,
+                 llm_latency: float = 0.0) -> LocalCartSearchEngine:
+    """
+    A ready-to-search engine over product records, with stub services.
+
+    Args:
+        records (List[dict]): Product records (data/processed/products.json layout).
+        dim (int): Embedding size of the stub embedding service.
+        embedding_latency (float): Seconds per embedding call.
+        llm_latency (float): Seconds per query refinement call.
+
+    Returns:
+        LocalCartSearchEngine: Engine with a logged-in user and an open session.
+    """
+    service = StubEmbeddingService(dim=dim, latency=embedding_latency)
+    catalog = ProductCatalog.from_records(
+        {**record, "bulletPoint": record.get("bullet_point"), "embedding": service.embed(record["title"]).tolist()}
+        for record in records
+    )
+    engine = LocalCartSearchEngine(embedding_service=service, openai_client=StubOpenAIClient(latency=llm_latency))
+    engine.catalog = catalog
+    engine.search_engine = ProductSearchEngine(embedding_dim=dim, index_path=f"{tempfile.mkdtemp()}/products.ann",
+                                               products=catalog, backend="exact")
+    engine.bm25_retriever = BM25CandidateRetriever(catalog)
+    engine._search_initialized = True
+    engine.current_user = UserProfile(
+        userId="U00001", name="Test User", email="user@example.com",
+        preferences=Preferences(favoriteBrands=["KORANGE"], interests=["home decor"]),
+        userEmbedding=service.embed("home decor").tolist()
+    )
+    engine.current_session = LocalSession.create(engine.current_user.id)
+    return engine
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import unittest
+
+from tests.search_fixtures import WRITES, local_engine
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+QUERIES = ["blue ceramic vase", "ginger jar with lid", "floral table decor"]
+
+
+def load_records(n=200):
+    with open(DATA_PATH) as f:
+        return json.load(f)[:n]
+
+
+class TestAsyncSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.records = load_records()
+
+    def setUp(self):
+        WRITES.reset()
+
+    def test_async_matches_sync_results_and_writes(self):
+        sync_engine = local_engine(self.records)
+        sync_results = [sync_engine.perform_search(query) for query in QUERIES]
+        sync_writes = list(WRITES.entries)
+
+        WRITES.reset()
+        async_engine = local_engine(self.records)
+
+        async def run():
+            results = [await async_engine.perform_search_async(query) for query in QUERIES]
+            await async_engine.flush_writes()
+            return results
+
+        async_results = asyncio.run(run())
+        self.assertEqual(async_results, sync_results)
+        self.assertTrue(all(results for results in async_results))
+        # Session writes stay on the critical path, query-log writes are deferred,
+        # so only the order within each collection is comparable
+        for collection in ("Sessions", "QueryLogs"):
+            self.assertEqual([entry for entry in WRITES.entries if entry[0] == collection],
+                             [entry for entry in sync_writes if entry[0] == collection])
+
+    def test_query_log_writes_leave_the_critical_path(self):
+        engine = local_engine(self.records)
+
+        async def run():
+            WRITES.reset(latency=0.05)
+            await engine.perform_search_async(QUERIES[0])
+            written_before_flush = [entry for entry in WRITES.entries if entry[0] == "QueryLogs"]
+            await engine.flush_writes()
+            return written_before_flush
+
+        written_before_flush = asyncio.run(run())
+        self.assertEqual(written_before_flush, [])
+        fields = [field for collection, _, field in WRITES.entries if collection == "QueryLogs"]
+        self.assertEqual(fields, ["*", "refinedQuery", "queryEmbedding", "retrievalResults", "finalResult"])
+
+    def test_refinement_overlaps_context(self):
+        engine = local_engine(self.records, embedding_latency=0.05, llm_latency=0.1)
+        engine.perform_search(QUERIES[0])
+        sync_timings = dict(engine.last_timings)
+        asyncio.run(engine.perform_search_async(QUERIES[1]))
+        async_timings = engine.last_timings
+
+        for stage in ("query_log", "refinement", "query_embedding", "context", "bm25", "vector", "fusion", "total"):
+            self.assertIn(stage, sync_timings)
+            self.assertIn(stage, async_timings)
+        # Context (one embedding call) runs while the LLM refines the query
+        overlapped = async_timings["refinement"] + async_timings["query_embedding"]
+        self.assertLess(async_timings["total"], overlapped + async_timings["context"] * 0.8)
+        self.assertLess(async_timings["total"], sync_timings["total"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+
+from src.models.catalog import ProductCatalog
+from src.models.product import Product
+from src.modules.retrieval import vector_retrieval_model
+from src.modules.retrieval.attribute_index import AttributeIndex, check_filters
+from src.modules.retrieval.sparse_bm25 import SparseBM25Index
+from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
+from tests.search_fixtures import WRITES, local_engine
+
+DIM = 8
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+
+PRODUCTS = [
+    {"productId": "P0", "productTitle": "Blue Ceramic Vase", "productBrand": "Korange", "productColor": "Blue",
+     "productLocale": "us"},
+    {"productId": "P1", "productTitle": "Ceramic Ginger Jar", "productBrand": "Acme", "productColor": "navy  blue",
+     "productLocale": "us"},
+    {"productId": "P2", "productTitle": "Organic Baby Swaddle", "productBrand": "ACME", "productLocale": "uk"},
+    {"productId": "P3", "productTitle": "Fishing Reel", "productBrand": None, "productColor": "Red",
+     "productLocale": "us"},
+]
+
+
+class TestAttributeIndex(unittest.TestCase):
+    def setUp(self):
+        self.catalog = ProductCatalog.from_records(PRODUCTS)
+        self.index = AttributeIndex(self.catalog)
+
+    def test_values_are_matched_case_insensitively(self):
+        self.assertEqual(np.flatnonzero(self.index.bitmap("brand", "acme")).tolist(), [1, 2])
+        self.assertEqual(np.flatnonzero(self.index.bitmap("color", "Navy Blue")).tolist(), [1])
+        self.assertFalse(self.index.bitmap("brand", "unknown").any())
+
+    def test_mask_ands_fields_and_ors_values(self):
+        mask = self.index.mask({"brand": ["acme", "korange"], "locale": "US"})
+        self.assertEqual(np.flatnonzero(mask).tolist(), [0, 1])
+        self.assertIsNone(self.index.mask({}))
+
+    def test_rows_follow_keys(self):
+        products = [Product(**record) for record in PRODUCTS]
+        index = AttributeIndex(products, keys=["P3", "gone", "P0"])
+        self.assertEqual(index.mask({"locale": "us"}).tolist(), [True, False, True])
+
+    def test_bitmap_cache_is_bounded(self):
+        index = AttributeIndex(self.catalog, max_cached_bitmaps=2)
+        for color in ("blue", "red", "navy blue", "blue"):
+            index.bitmap("color", color)
+        self.assertEqual(len(index._bitmaps), 2)
+
+    def test_invalid_filters(self):
+        with self.assertRaises(ValueError):
+            self.index.mask({"size": "xl"})
+        with self.assertRaises(ValueError):
+            check_filters({"size": "xl"})
+        with self.assertRaises(ValueError):
+            check_filters({"brand": []})
+        check_filters({"brand": ["acme"], "locale": "us"})
+        check_filters(None)
+
+
+class TestFilteredBM25(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        vocabulary = [f"t{i}" for i in range(40)]
+        self.documents = [list(rng.choice(vocabulary, size=rng.integers(3, 12))) for _ in range(300)]
+        self.index = SparseBM25Index.from_documents(self.documents, [f"P{i}" for i in range(300)])
+        self.mask = rng.random(300) < 0.2
+
+    def test_matches_post_filtered_scores(self):
+        query = ["t1", "t7", "t12"]
+        scores = self.index.get_scores(query)
+        allowed = np.flatnonzero(self.mask)
+        expected = allowed[np.argsort(-scores[allowed], kind="stable")][:10]
+        positions, top_scores = self.index.top_k(query, 10, mask=self.mask)
+        self.assertTrue(self.mask[positions].all())
+        np.testing.assert_allclose(top_scores, scores[expected], rtol=1e-6)
+
+    def test_fill_pads_with_allowed_documents_only(self):
+        positions, _ = self.index.top_k(["t1"], 60, mask=self.mask)
+        self.assertEqual(len(positions), min(60, int(self.mask.sum())))
+        self.assertTrue(self.mask[positions].all())
+
+    def test_removed_documents_stay_excluded(self):
+        allowed = np.flatnonzero(self.mask)
+        self.index.remove_documents([f"P{allowed[0]}"])
+        positions, _ = self.index.top_k(["t1", "t2"], len(allowed), mask=self.mask)
+        self.assertNotIn(allowed[0], positions.tolist())
+
+    def test_mask_length_is_checked(self):
+        with self.assertRaises(ValueError):
+            self.index.top_k(["t1"], 5, mask=self.mask[:-1])
+
+
+class TestFilteredVectorSearch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        brands = ["acme", "korange", "zenith"]
+        self.products = [
+            Product(id=f"P{i}", title=f"Product {i}", brand=brands[i % 3], color="red" if i % 5 else "blue",
+                    locale="us", embedding=rng.normal(size=DIM).tolist() if i % 7 else None)
+            for i in range(120)
+        ]
+        self.query = rng.normal(size=DIM).astype(np.float32)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def expected(self, allowed, k):
+        """Product ids of the k nearest allowed products, by brute force."""
+        candidates = [p for p in self.products if p.embedding and allowed(p)]
+        vectors = np.array([p.embedding for p in candidates])
+        cosine = vectors @ self.query / np.linalg.norm(vectors, axis=1)
+        return [candidates[i].id for i in np.argsort(-cosine)[:k]]
+
+    def engine(self, backend):
+        return ProductSearchEngine(DIM, os.path.join(self.tmp.name, f"products.{backend}"), self.products,
+                                   backend=backend)
+
+    def test_selective_filter_is_searched_exactly(self):
+        for backend in ("exact", "annoy", "int8"):
+            engine = self.engine(backend)
+            results = engine.search(self.query, k=5, filters={"brand": "korange", "color": "blue"})
+            expected = self.expected(lambda p: p.brand == "korange" and p.color == "blue", 5)
+            self.assertEqual([r["product_id"] for r in results], expected, backend)
+
+    def test_broad_filter_over_fetches_from_annoy(self):
+        engine = self.engine("annoy")
+        engine.index.search_k = 10_000
+        with mock.patch.object(vector_retrieval_model, "FILTERED_EXACT_LIMIT", 10), \
+                mock.patch.object(engine.index, "search_rows", wraps=engine.index.search_rows) as search_rows:
+            results = engine.search(self.query, k=5, filters={"brand": ["acme", "zenith"]})
+        search_rows.assert_not_called()
+        expected = self.expected(lambda p: p.brand in ("acme", "zenith"), 5)
+        self.assertEqual([r["product_id"] for r in results], expected)
+
+    def test_filter_without_matches(self):
+        self.assertEqual(self.engine("exact").search(self.query, k=5, filters={"brand": "unknown"}), [])
+
+
+class TestFilteredSearch(unittest.TestCase):
+    def setUp(self):
+        with open(DATA) as f:
+            self.records = json.load(f)
+        WRITES.reset()
+
+    def test_results_match_the_filter(self):
+        engine = local_engine(self.records)
+        brand = engine.catalog.columns["brand"][0]
+        allowed = {product_id for product_id, product_brand in engine.catalog.rows("id", "brand")
+                   if product_brand == brand}
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            results = engine.perform_search("ceramic vase", filters={"brand": brand.upper()})
+        self.assertTrue(results)
+        self.assertLessEqual({result["product_id"] for result in results}, allowed)
+
+    def test_unknown_filter_field(self):
+        engine = local_engine(self.records[:50])
+        with self.assertRaises(ValueError):
+            engine.perform_search("ceramic vase", filters={"size": "xl"})
+        self.assertEqual(WRITES.entries, [("Sessions", engine.current_session.id, "*")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import random
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from src.modules.retrieval.sparse_bm25 import SparseBM25Index
+
+VOCABULARY = [
+    "wireless", "headphones", "bluetooth", "earbuds", "noise", "cancelling", "sound", "bass",
+    "laptop", "stand", "usb", "cable", "charger", "case", "leather", "black", "white", "red",
+    "ceramic", "vase", "jar", "chair", "cover", "spandex", "navy", "blue", "baby", "swaddle",
+]
+QUERIES = [
+    ["wireless"], ["wireless", "headphones"], ["usb", "cable", "charger"], ["blue", "vase"],
+    ["bass", "bass"], ["swaddle", "baby", "organic"], ["newterm"], ["xylophone"],
+]
+
+
+def random_document(rng, extra_terms=()):
+    terms = VOCABULARY + list(extra_terms)
+    return [rng.choice(terms) for _ in range(rng.randint(1, 12))]
+
+
+class TestIncrementalBM25(unittest.TestCase):
+    """
+    An index maintained through add/update/remove must score exactly like a
+    full rebuild over the same final catalog.
+    """
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.catalog = {f"P{i}": random_document(self.rng) for i in range(40)}
+        self.next_id = len(self.catalog)
+        # High ratio: compaction only runs when the test asks for it
+        self.index = SparseBM25Index.from_documents(
+            list(self.catalog.values()), list(self.catalog), compaction_ratio=100.0
+        )
+
+    def apply_random_changes(self, index, rounds=6):
+        for _ in range(rounds):
+            added = {}
+            for _ in range(self.rng.randint(1, 5)):
+                added[f"P{self.next_id}"] = random_document(self.rng, extra_terms=["newterm", "organic"])
+                self.next_id += 1
+            index.add_documents(list(added), list(added.values()))
+            self.catalog.update(added)
+
+            updated = {key: random_document(self.rng) for key in self.rng.sample(sorted(self.catalog), 3)}
+            index.update_documents(list(updated), list(updated.values()))
+            self.catalog.update(updated)
+
+            removed = self.rng.sample(sorted(self.catalog), 4)
+            index.remove_documents(removed)
+            for key in removed:
+                del self.catalog[key]
+
+    def assert_matches_rebuild(self, index):
+        rebuilt = SparseBM25Index.from_documents(list(self.catalog.values()), list(self.catalog))
+        self.assertEqual(index.num_live, rebuilt.num_documents)
+        for query in QUERIES:
+            expected = dict(zip(rebuilt.keys.tolist(), rebuilt.get_scores(query).tolist()))
+            scores = index.get_scores(query)
+            live = {str(index.keys[pos]): scores[pos] for pos in index.top_k([], index.num_live)[0]}
+            self.assertEqual(set(live), set(expected))
+            for key, score in expected.items():
+                self.assertAlmostEqual(live[key], score, places=5, msg=f"{query} {key}")
+
+            # Positions differ from the rebuild, so ties may pick other keys; scores may not differ
+            _, top_scores = index.top_k(query, 5, fill=False)
+            _, rebuilt_scores = rebuilt.top_k(query, 5, fill=False)
+            np.testing.assert_allclose(top_scores, rebuilt_scores, rtol=1e-6)
+
+    def test_incremental_matches_rebuild(self):
+        self.apply_random_changes(self.index)
+        self.assert_matches_rebuild(self.index)
+
+    def test_compaction_preserves_scores(self):
+        self.apply_random_changes(self.index)
+        self.assertTrue(self.index.compact())
+        self.assertEqual(self.index.num_documents, len(self.catalog))
+        self.assert_matches_rebuild(self.index)
+
+        # Keep changing the compacted index
+        self.apply_random_changes(self.index, rounds=2)
+        self.assert_matches_rebuild(self.index)
+
+    def test_background_compaction(self):
+        self.index.compaction_ratio = 0.1
+        self.apply_random_changes(self.index)
+        self.index.wait_for_compaction(timeout=10)
+        self.assert_matches_rebuild(self.index)
+
+    def test_changes_to_memory_mapped_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bm25_index")
+            self.index.save(path)
+            loaded = SparseBM25Index.load(path)
+            loaded.compaction_ratio = 100.0
+            self.apply_random_changes(loaded)
+            self.assert_matches_rebuild(loaded)
+
+            loaded.save(path)
+            self.assert_matches_rebuild(SparseBM25Index.load(path))
+
+    def test_remove_every_document(self):
+        self.index.remove_documents(list(self.catalog))
+        self.assertEqual(self.index.num_live, 0)
+        self.assertEqual(len(self.index.top_k(["wireless"], 5)[0]), 0)
+        self.index.add_documents(["P100"], [["wireless", "mouse"]])
+        positions, scores = self.index.top_k(["wireless"], 5)
+        self.assertEqual(self.index.keys[positions].tolist(), ["P100"])
+
+    def test_query_during_compaction(self):
+        keys = [f"P{i}" for i in range(200)]
+        index = SparseBM25Index.from_documents([["shared", f"unique{i}"] for i in range(200)], keys,
+                                               compaction_ratio=100.0)
+        index.remove_documents(keys[:100:2])  # compaction will shift every later position
+        top_k, compactions = index.top_k, []
+
+        def top_k_racing_compaction(*args, **kwargs):
+            result = top_k(*args, **kwargs)
+            # A compaction swapped in here renumbers the positions just scored
+            compaction = threading.Thread(target=index.compact)
+            compaction.start()
+            compaction.join(timeout=0.5)
+            compactions.append(compaction)
+            return result
+
+        index.top_k = top_k_racing_compaction
+        for i in (101, 150, 199):
+            product_ids, _ = index.top_k_keys([f"unique{i}"], 1)
+            self.assertEqual(product_ids.tolist(), [f"P{i}"])
+        index.top_k = top_k
+        for compaction in compactions:
+            compaction.join()
+        self.assertEqual(index.num_documents, 150)  # the compactions did run
+        self.assertEqual(index.top_k_keys(["unique8"], 1, fill=False)[0].tolist(), [])
+
+    def test_invalid_changes(self):
+        with self.assertRaises(ValueError):
+            self.index.add_documents(["P0"], [["duplicate"]])
+        with self.assertRaises(ValueError):
+            self.index.remove_documents(["missing"])
+        with self.assertRaises(ValueError):
+            self.index.update_documents(["missing"], [["text"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+from src.models import Preferences, UserProfile
+from src.modules.dynamic_context_modelling.session_graph_builder import ContextEmbedder
+from src.services.cached_embedding_service import CachedEmbeddingService, DiskEmbeddingCache
+from src.services.stub_services import StubEmbeddingService
+from tests.search_fixtures import WRITES, LocalSession
+
+
+class TestCachedEmbeddingService(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        WRITES.reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_batch_misses_go_upstream_in_one_call(self):
+        upstream = StubEmbeddingService(dim=16)
+        service = CachedEmbeddingService(upstream)
+        service.embed_sentences(["red mug", "blue mug"])
+        result = service.embed_sentences(["blue mug", "green mug", "green mug", "red mug", "tea pot"])
+
+        self.assertEqual(upstream.calls, 2)
+        self.assertEqual(upstream.sentences_embedded, 4)
+        np.testing.assert_allclose(result[1], upstream.embed("green mug"), rtol=1e-6)
+        self.assertEqual(result[1], result[2])
+        self.assertEqual(service.stats["hits"], 3)
+        self.assertEqual(service.stats["misses"], 4)
+        self.assertEqual(service.stats["bytes_saved"], 3 * 16 * 4)
+        self.assertAlmostEqual(service.hit_rate, 3 / 7)
+
+    def test_fully_cached_batch_makes_no_call(self):
+        upstream = StubEmbeddingService(dim=16)
+        service = CachedEmbeddingService(upstream)
+        service.embed_sentences(["red mug"])
+        service.embed_sentences(["red mug", "red mug"])
+        self.assertEqual(upstream.calls, 1)
+
+    def test_model_is_part_of_the_key(self):
+        upstream = StubEmbeddingService(dim=16)
+        small, large = CachedEmbeddingService(upstream), CachedEmbeddingService(upstream)
+        large.model = "text-embedding-3-large"
+        self.assertNotEqual(small.key("red mug"), large.key("red mug"))
+
+    def test_output_size_is_part_of_the_key(self):
+        upstream = StubEmbeddingService(dim=16)
+        service = CachedEmbeddingService(upstream)
+        service.embed_sentences(["red mug"])
+        upstream.dim = 8
+        result = service.embed_sentences(["red mug"])
+        self.assertEqual(upstream.calls, 2)
+        self.assertEqual(len(result[0]), 8)
+
+    def test_disk_tier_of_another_size_is_rejected(self):
+        CachedEmbeddingService(StubEmbeddingService(dim=16), path=self.tmpdir).embed_sentences(["red mug"])
+        with self.assertRaises(ValueError):
+            CachedEmbeddingService(StubEmbeddingService(dim=8), path=self.tmpdir)
+
+    def test_lru_falls_back_to_disk_tier(self):
+        upstream = StubEmbeddingService(dim=16)
+        service = CachedEmbeddingService(upstream, max_entries=2, path=self.tmpdir)
+        texts = [f"text {i}" for i in range(5)]
+        expected = service.embed_sentences(texts)
+
+        # A new process reopens the disk tier; nothing goes upstream
+        reopened = CachedEmbeddingService(upstream, max_entries=2, path=self.tmpdir)
+        self.assertEqual(reopened.embed_sentences(texts), expected)
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual(reopened.stats["disk_hits"], 5)
+
+    def test_disk_tier_grows(self):
+        disk = DiskEmbeddingCache(self.tmpdir, initial_rows=2)
+        vectors = np.random.default_rng(0).normal(size=(5, 8)).astype(np.float32)
+        for i, vector in enumerate(vectors):
+            disk.put(f"k{i}", vector)
+        reopened = DiskEmbeddingCache(self.tmpdir)
+        self.assertEqual(len(reopened), 5)
+        np.testing.assert_array_equal(reopened.get("k4"), vectors[4])
+        with self.assertRaises(ValueError):
+            disk.put("bad", np.zeros(3, dtype=np.float32))
+
+    def session_calls(self, embedding_service, upstream, n_queries=20):
+        """Upstream texts embedded per new query while building the session context."""
+        user = UserProfile(userId="U00001", name="Test User", email="user@example.com",
+                           preferences=Preferences(favoriteBrands=["Nike"], interests=["running"]))
+        session = LocalSession.create(user.id)
+        embedder = ContextEmbedder(embedding_service=embedding_service, alpha=0.65)
+        per_query = []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for i in range(n_queries):
+                session.add_query(f"query number {i}")
+                # Rebuild the context from scratch, as for a session reloaded from Firestore
+                session.context_state = None
+                before = upstream.sentences_embedded
+                embedder.embed_single_user_and_session(user=user, session=session, fuse=True)
+                embedding_service.embed_sentences([f"refined query number {i}"])
+                per_query.append(upstream.sentences_embedded - before)
+        return per_query
+
+    def test_session_makes_constant_embedding_calls_per_query(self):
+        upstream = StubEmbeddingService(dim=16)
+        uncached = self.session_calls(upstream, upstream)
+        self.assertEqual(uncached, [2] + [i + 3 for i in range(1, 20)])  # profile + session queries + refined
+
+        upstream = StubEmbeddingService(dim=16)
+        cached = self.session_calls(CachedEmbeddingService(upstream), upstream)
+        # Only the new query and its refinement reach the API, however long the session is
+        # (the second query also embeds the first, which joins the context with the first transition)
+        self.assertEqual(cached, [2, 3] + [2] * 18)
+        self.assertEqual(upstream.calls, 2 * 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import importlib.util
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from cart_search_engine import CartSearchEngine
+from src.models.catalog import ProductCatalog
+from src.modules.dynamic_context_modelling.session_graph_builder import ContextEmbedder
+from src.services.cached_embedding_service import CachedEmbeddingService
+from src.services.embedding_backends import create_embedding_service, configured_embedding_service
+from src.services.embedding_service import EmbeddingService
+from src.services.local_embedding_service import LocalEmbeddingService
+from src.services.stub_services import StubEmbeddingService
+
+HAS_SENTENCE_TRANSFORMERS = importlib.util.find_spec("sentence_transformers") is not None
+
+
+class TestEmbeddingBackends(unittest.TestCase):
+
+    def test_create_by_name(self):
+        self.assertIsInstance(create_embedding_service("openai"), EmbeddingService)
+        self.assertIsInstance(create_embedding_service("local", quantize=True), LocalEmbeddingService)
+        self.assertEqual(create_embedding_service("stub", dim=384).embedding_dim, 384)
+        with self.assertRaises(ValueError):
+            create_embedding_service("onnx")
+
+    def test_configured_backend_can_be_overridden(self):
+        service = configured_embedding_service("local", model="sentence-transformers/paraphrase-MiniLM-L3-v2")
+        self.assertEqual(service.model, "sentence-transformers/paraphrase-MiniLM-L3-v2")
+        with patch("config.config.EMBEDDING_BACKEND", "stub"), patch("config.config.EMBEDDING_MODEL", None):
+            self.assertIsInstance(ContextEmbedder(alpha=0.65).embedding_service, StubEmbeddingService)
+
+    def test_openai_dimensions(self):
+        self.assertEqual(EmbeddingService().embedding_dim, 1536)
+        self.assertEqual(EmbeddingService("text-embedding-3-large").embedding_dim, 3072)
+        self.assertEqual(EmbeddingService(dimensions=256).embedding_dim, 256)
+        with self.assertRaises(ValueError):
+            EmbeddingService("custom-model").embedding_dim
+
+    def test_cache_reports_wrapped_dimension(self):
+        self.assertEqual(CachedEmbeddingService(StubEmbeddingService(dim=384)).embedding_dim, 384)
+
+    @unittest.skipIf(HAS_SENTENCE_TRANSFORMERS, "sentence-transformers is installed")
+    def test_local_backend_without_torch(self):
+        with self.assertRaises(RuntimeError):
+            LocalEmbeddingService().embed_sentences(["red mug"])
+
+    @unittest.skipUnless(HAS_SENTENCE_TRANSFORMERS, "sentence-transformers is not installed")
+    def test_local_backend(self):
+        service = LocalEmbeddingService(batch_size=2, num_threads=1)
+        embeddings = np.array(service.embed_sentences(["red mug", "blue mug", "running shoes"]))
+        self.assertEqual(embeddings.shape, (3, service.embedding_dim))
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-5)
+
+
+class TestEngineDimension(unittest.TestCase):
+
+    def catalog(self, dim):
+        records = [{"productId": f"P{i}", "productTitle": f"product {i}", "productLocale": "us",
+                    "embedding": np.random.default_rng(i).normal(size=dim).tolist()} for i in range(3)]
+        return ProductCatalog.from_records(records)
+
+    def test_mismatched_product_embeddings_are_rejected(self):
+        engine = CartSearchEngine(embedding_service=StubEmbeddingService(dim=384))
+        with patch.object(ProductCatalog, "load_all", return_value=self.catalog(1536)):
+            with self.assertRaises(ValueError) as raised:
+                engine._initialize_search_components()
+        self.assertIn("one_time_product_embedding.py --all", str(raised.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.models.product import UPDATED_AT
+from src.services.embedding_backfill import EmbeddingBackfill, is_retryable, token_budget_batches
+from src.services.stub_services import StubEmbeddingService
+from tests.fake_firestore import FakeFirestoreClient
+
+DIM = 8
+
+
+class TestBatching(unittest.TestCase):
+
+    def test_batches_respect_token_and_item_budgets(self):
+        jobs = [(f"P{i}", "x" * 39) for i in range(10)]  # 10 tokens each
+        batches = list(token_budget_batches(jobs, max_tokens=35, max_items=100))
+        self.assertEqual([len(b) for b in batches], [3, 3, 3, 1])
+        batches = list(token_budget_batches(jobs, max_tokens=1000, max_items=4))
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual([job for batch in batches for job in batch], jobs)
+
+    def test_oversized_text_gets_its_own_batch(self):
+        jobs = [("A", "short"), ("B", "x" * 400), ("C", "short")]
+        self.assertEqual([[doc for doc, _ in b] for b in token_budget_batches(jobs, 50, 10)], [["A"], ["B"], ["C"]])
+
+    def test_retryable_errors(self):
+        try:
+            try:
+                raise ValueError("Error code: 429 - Rate limit reached")
+            except ValueError as e:
+                raise RuntimeError(f"OpenAI Embedding API error: {str(e)}")
+        except RuntimeError as wrapped:
+            self.assertTrue(is_retryable(wrapped))
+        self.assertFalse(is_retryable(RuntimeError("Invalid input")))
+
+
+class TestEmbeddingBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeFirestoreClient()
+        self.collection = self.client.collection("Products")
+        for i in range(1200):
+            self.collection.document(f"P{i:04d}").set({"title": f"Product {i}"})
+        self.jobs = [(f"P{i:04d}", f"product number {i}") for i in range(1200)]
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmp.name, "backfill.ckpt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def backfill(self, service, **kwargs):
+        kwargs.setdefault("checkpoint_path", self.checkpoint)
+        return EmbeddingBackfill(service, client=self.client, max_batch_size=50, concurrency=4,
+                                 base_delay=0.001, **kwargs)
+
+    def test_embeds_in_batches_and_bulk_writes(self):
+        service = StubEmbeddingService(dim=DIM)
+        report = self.backfill(service).run(self.jobs)
+
+        self.assertEqual(report["embedded"], 1200)
+        self.assertEqual(service.calls, 24)
+        self.assertEqual(self.client.commits, 3)  # 500 + 500 + 200
+        for doc_id, text in self.jobs:
+            stored = self.collection.documents[doc_id]
+            np.testing.assert_allclose(stored["embedding"], service.embed(text))
+            self.assertIn(UPDATED_AT, stored)
+
+    def test_rate_limits_are_retried(self):
+        service = StubEmbeddingService(dim=DIM, rate_limit_failures=3)
+        report = self.backfill(service).run(self.jobs)
+        self.assertEqual(report["embedded"], 1200)
+        self.assertEqual(report["retries"], 3)
+        self.assertEqual(report["failed"], 0)
+
+    def test_permanent_errors_are_reported_and_not_checkpointed(self):
+        class BrokenService(StubEmbeddingService):
+            def embed_sentences(self, sentences):
+                if "product number 7" in sentences:
+                    raise RuntimeError("Invalid input")
+                return super().embed_sentences(sentences)
+
+        report = self.backfill(BrokenService(dim=DIM)).run(self.jobs)
+        self.assertEqual(report["failed"], 50)
+        self.assertEqual(report["embedded"], 1150)
+        self.assertNotIn("embedding", self.collection.documents["P0007"])
+
+        # A second run only retries the failed batch
+        service = StubEmbeddingService(dim=DIM)
+        report = self.backfill(service).run(self.jobs)
+        self.assertEqual((report["embedded"], report["resumed"], service.calls), (50, 1150, 1))
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        backfill = self.backfill(StubEmbeddingService(dim=DIM))
+        original_commit = backfill._commit
+        commits = []
+
+        def commit_then_crash(chunk):
+            if commits:
+                raise KeyboardInterrupt
+            original_commit(chunk)
+            commits.append(len(chunk))
+
+        backfill._commit = commit_then_crash
+        with self.assertRaises(KeyboardInterrupt):
+            backfill.run(self.jobs)
+        self.assertEqual(len(backfill.completed_ids()), 500)
+
+        service = StubEmbeddingService(dim=DIM)
+        report = self.backfill(service).run(self.jobs)
+        self.assertEqual((report["resumed"], report["embedded"]), (500, 700))
+        self.assertEqual(service.sentences_embedded, 700)
+        self.assertTrue(all("embedding" in doc for doc in self.collection.documents.values()))
+
+    def test_write_batch_size_is_capped(self):
+        with self.assertRaises(ValueError):
+            EmbeddingBackfill(StubEmbeddingService(), client=self.client, write_batch_size=501)
+
+
+if __name__ == "__main__":
+    unittest.main()
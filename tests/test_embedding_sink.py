@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.models.query_log import QueryLog
+from src.services.embedding_sink import SINKS, ShardSink, create_sink
+from src.services.query_log_writer import QueryLogWriter
+from tests.fake_firestore import FakeFirestoreClient
+
+
+class TestEmbeddingSinks(unittest.TestCase):
+    def setUp(self):
+        self.embedding = np.random.default_rng(0).normal(size=32).astype(np.float32)
+        self.embedding /= np.linalg.norm(self.embedding)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_inline_and_none(self):
+        self.assertEqual(create_sink("inline").store(self.embedding.tolist()), (self.embedding.tolist(), None))
+        self.assertEqual(create_sink("none").store(self.embedding.tolist()), (None, None))
+
+    def test_hash_is_deterministic(self):
+        sink = create_sink("hash")
+        inline, ref = sink.store(self.embedding.tolist())
+        self.assertIsNone(inline)
+        self.assertTrue(ref.startswith("sha256:"))
+        self.assertEqual(ref, sink.store(list(self.embedding))[1])
+        self.assertNotEqual(ref, sink.store((self.embedding * 2).tolist())[1])
+
+    def test_float16_round_trip(self):
+        sink = create_sink("float16")
+        _, ref = sink.store(self.embedding.tolist())
+        np.testing.assert_allclose(sink.load(ref), self.embedding, atol=1e-3)
+
+    def test_shard_appends_rolls_and_reopens(self):
+        sink = ShardSink(self.tmpdir, embedding_dim=32, shard_rows=2)
+        vectors = [self.embedding * (i + 1) for i in range(3)]
+        refs = [sink.store(v.tolist())[1] for v in vectors]
+        self.assertEqual(refs, ["shard:query_embeddings_00000.npy:0", "shard:query_embeddings_00000.npy:1",
+                                "shard:query_embeddings_00001.npy:0"])
+
+        reopened = ShardSink(self.tmpdir, embedding_dim=32, shard_rows=2)
+        self.assertEqual(reopened.store(self.embedding.tolist())[1], "shard:query_embeddings_00001.npy:1")
+        for ref, vector in zip(refs, vectors):
+            np.testing.assert_array_equal(reopened.load(ref), vector)
+
+    def test_shard_rejects_wrong_dim(self):
+        with self.assertRaises(ValueError):
+            ShardSink(self.tmpdir, embedding_dim=32).store([0.1, 0.2])
+
+    def test_unknown_sink(self):
+        self.assertEqual(set(SINKS), {"inline", "none", "hash", "float16", "shard"})
+        with self.assertRaises(ValueError):
+            create_sink("parquet")
+
+    def test_query_log_stores_reference_only(self):
+        client = FakeFirestoreClient()
+        writer = QueryLogWriter(client=client, flush_interval=0.01)
+        self.addCleanup(writer.close)
+        log = QueryLog(logId="L1", userId="U1", sessionId="S1", rawQuery="red mug",
+                       timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        log._writer = writer
+
+        sink = create_sink("float16")
+        log.update_embedding(*sink.store(self.embedding.tolist()))
+        self.assertTrue(writer.flush(timeout=5))
+        document = client.collection("QueryLogs").documents["L1"]
+        self.assertIsNone(document["queryEmbedding"])
+        np.testing.assert_allclose(sink.load(document["queryEmbeddingRef"]), self.embedding, atol=1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
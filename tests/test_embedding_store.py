@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.modules.retrieval.embedding_store import QuantizedEmbeddingStore
+
+
+class TestQuantizedEmbeddingStore(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(300, 16)).astype(np.float32)
+        self.queries = rng.normal(size=(4, 16)).astype(np.float32)
+
+    def test_int8_error_is_bounded_by_half_a_step(self):
+        store = QuantizedEmbeddingStore.quantize(self.vectors, "int8")
+        self.assertEqual(store.codes.dtype, np.int8)
+        step = np.abs(self.vectors).max(axis=1) / 127
+        error = np.abs(store.dequantize() - self.vectors).max(axis=1)
+        self.assertTrue(np.all(error <= step / 2 + 1e-6))
+
+    def test_dot_matches_dequantized_rows(self):
+        for dtype in QuantizedEmbeddingStore.DTYPES:
+            store = QuantizedEmbeddingStore.quantize(self.vectors, dtype)
+            store.BLOCK_ROWS = 64  # several blocks
+            np.testing.assert_allclose(
+                store.dot(self.queries), self.queries @ store.dequantize().T, rtol=1e-4, atol=1e-4
+            )
+
+    def test_memory_footprint(self):
+        float32 = QuantizedEmbeddingStore.quantize(self.vectors, "float32").nbytes
+        self.assertEqual(QuantizedEmbeddingStore.quantize(self.vectors, "float16").nbytes * 2, float32)
+        int8 = QuantizedEmbeddingStore.quantize(self.vectors, "int8").nbytes
+        self.assertEqual(int8, self.vectors.size + 4 * len(self.vectors))
+
+    def test_zero_rows(self):
+        vectors = np.zeros((2, 16), dtype=np.float32)
+        store = QuantizedEmbeddingStore.quantize(vectors, "int8")
+        np.testing.assert_array_equal(store.dequantize(), vectors)
+
+    def test_save_and_load_memory_mapped(self):
+        store = QuantizedEmbeddingStore.quantize(self.vectors, "int8")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "vectors.bin")
+            store.save(path)
+            loaded = QuantizedEmbeddingStore.load(path)
+            self.assertIsInstance(loaded.codes, np.memmap)
+            np.testing.assert_array_equal(loaded.dequantize([3, 7]), store.dequantize([3, 7]))
+            del loaded
+
+    def test_unknown_dtype(self):
+        with self.assertRaises(ValueError):
+            QuantizedEmbeddingStore.quantize(self.vectors, "int4")
+
+
+if __name__ == "__main__":
+    unittest.main()
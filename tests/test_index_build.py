@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from build_indexes import build_indexes
+from src.models.catalog import ProductCatalog
+from src.modules.retrieval.bm25_retriever import BM25CandidateRetriever, build_bm25_index
+from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+ARRAYS = ["vocabulary", "indptr", "postings", "term_freqs", "doc_lengths", "keys", "idf", "norms"]
+
+
+class TestIndexBuild(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(DATA_PATH) as f:
+            records = json.load(f)[:500]
+        rng = np.random.default_rng(0)
+        cls.catalog = ProductCatalog.from_records(
+            {**record, "bulletPoint": record.get("bullet_point"), "embedding": rng.normal(size=16).tolist()}
+            for record in records)
+
+    def assertSameIndex(self, actual, expected):
+        for name in ARRAYS:
+            np.testing.assert_array_equal(getattr(actual, name), getattr(expected, name), err_msg=name)
+        self.assertAlmostEqual(actual.avgdl, expected.avgdl)
+
+    def test_parallel_build_matches_serial_build(self):
+        serial = BM25CandidateRetriever(self.catalog).bm25
+        timings = {}
+        parallel = build_bm25_index(self.catalog, workers=2, shard_size=64, timings=timings)
+        self.assertSameIndex(parallel, serial)
+        self.assertEqual(set(timings), {"bm25_tokenize", "bm25_merge"})
+        # Product lists shard the same way as catalogs
+        self.assertSameIndex(build_bm25_index(self.catalog.products(self.catalog.ids), shard_size=100), serial)
+
+    def test_parallel_retriever_matches_serial_retriever(self):
+        serial = BM25CandidateRetriever(self.catalog)
+        parallel = BM25CandidateRetriever(self.catalog, workers=2)
+        self.assertEqual(parallel.bm25.fingerprint, serial.fingerprint())
+        for query in ["ginger jar", "wireless headphones", "nothing matches zzqx"]:
+            self.assertEqual(parallel.retrieve(query, 10), serial.retrieve(query, 10))
+
+    def test_catalog_rows_slice(self):
+        ids = self.catalog.ids
+        self.assertEqual([row[0] for row in self.catalog.rows("id", start=10, stop=20)], list(ids[10:20]))
+        self.assertEqual(len(list(self.catalog.rows("id", "title", start=490))), 10)
+        self.assertEqual(list(self.catalog.rows("id", start=600)), [])
+
+    def test_built_indexes_are_loaded_without_rebuilding(self):
+        with tempfile.TemporaryDirectory() as path:
+            timings = build_indexes(self.catalog, f"{path}/bm25_index", f"{path}/products.ann", workers=2,
+                                    backend="annoy", n_trees=5)
+            self.assertEqual(set(timings), {"bm25_tokenize", "bm25_merge", "bm25_save", "vector_build"})
+
+            retriever = BM25CandidateRetriever(self.catalog, index_path=f"{path}/bm25_index")
+            self.assertEqual(retriever.documents, [])  # loaded, not tokenized again
+            engine = ProductSearchEngine(16, f"{path}/products.ann", self.catalog, backend="annoy")
+            self.assertTrue(engine._load_index())
+            hits = engine.search(self.catalog.embeddings[3], k=1)
+            self.assertEqual(hits[0]["product_id"], self.catalog.ids[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
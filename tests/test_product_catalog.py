@@ -0,0 +1,180 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.models.catalog import ProductCatalog, StringColumn
+from src.models.product import Product
+from src.modules.retrieval.bm25_retriever import catalog_fingerprint
+from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
+
+
+def make_products(n, dim=4, start=0):
+    rng = np.random.default_rng(start)
+    return [
+        Product(
+            id=f"P{i}",
+            title=f"Product {i} – café",
+            description=f"Description {i}" if i % 2 else None,
+            bulletPoint=None if i % 3 else f"Bullet {i}",
+            brand="Brand",
+            color="Red" if i % 2 else None,
+            locale="us",
+            embedding=rng.normal(size=dim).tolist() if i % 4 else None,
+        )
+        for i in range(start, start + n)
+    ]
+
+
+class TestStringColumn(unittest.TestCase):
+
+    def test_round_trip_with_missing_and_unicode_values(self):
+        values = ["a", None, "", "naïve ☕", None, "z"]
+        column = StringColumn.from_values(values)
+        self.assertEqual(list(column), values)
+        self.assertEqual([column[i] for i in range(len(values))], values)
+        self.assertEqual(list(column.take(np.array([5, 1, 3]))), ["z", None, "naïve ☕"])
+        self.assertEqual(list(column.concat(["tail", None])), values + ["tail", None])
+        self.assertEqual(list(column.take(np.array([0, 1, 2, 4, 5]))), ["a", None, "", None, "z"])
+        self.assertEqual(list(column.take(np.array([], dtype=np.int64))), [])
+
+    def test_append_in_place(self):
+        column = StringColumn.from_values(["a", None])
+        for i in range(50):
+            column.append([f"v{i}", None])
+        self.assertEqual(len(column), 102)
+        self.assertEqual(column[100], "v49")
+        self.assertEqual(list(column.values(98)), ["v48", None, "v49", None])
+        self.assertEqual(len(column.offsets), 103)
+        with self.assertRaises(IndexError):
+            column[102]
+
+
+class TestProductCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.products = make_products(10)
+        self.catalog = ProductCatalog.from_products(self.products)
+
+    def test_products_round_trip(self):
+        self.assertEqual(len(self.catalog), 10)
+        for position, product in enumerate(self.products):
+            self.assertEqual(self.catalog.position(product.id), position)
+            self.assertEqual(self.catalog.product_id(position), product.id)
+            self.assertEqual(self.catalog.get(product.id, include_embedding=True), Product(
+                **{**product.model_dump(), "embedding": (
+                    np.asarray(product.embedding, dtype=np.float32).tolist() if product.embedding else None
+                )}
+            ))
+
+    def test_lazy_lookup_without_embeddings(self):
+        product = self.catalog.get("P1")
+        self.assertEqual(product.title, self.products[1].title)
+        self.assertIsNone(product.embedding)
+        self.assertIsNone(self.catalog.get("missing"))
+        self.assertEqual([p.id for p in self.catalog.products(["P3", "missing", "P0"])], ["P3", "P0"])
+
+    def test_embedding_matrix_and_mask(self):
+        self.assertEqual(self.catalog.embeddings.shape, (10, 4))
+        self.assertEqual(self.catalog.has_embedding.tolist(), [bool(p.embedding) for p in self.products])
+        np.testing.assert_allclose(self.catalog.embedding(1), self.products[1].embedding, rtol=1e-6)
+        self.assertIsNone(self.catalog.embedding(0))
+
+    def test_from_records_accepts_firestore_aliases(self):
+        records = [
+            {"productId": "A", "productTitle": "Alpha", "productLocale": "us", "embedding": "[1.0, 2.0]"},
+            {"id": "B", "title": "Beta", "locale": "us", "productColor": "Blue"},
+        ]
+        catalog = ProductCatalog.from_records(records)
+        self.assertEqual(catalog.ids, ["A", "B"])
+        self.assertEqual(catalog.get("B").color, "Blue")
+        self.assertEqual(catalog.embedding(0).tolist(), [1.0, 2.0])
+        self.assertFalse(catalog.has_embedding[1])
+
+    def test_invalid_catalogs(self):
+        with self.assertRaises(ValueError):
+            ProductCatalog.from_products(self.products + self.products[:1])
+        with self.assertRaises(ValueError):
+            ProductCatalog.from_products(make_products(2, dim=4) + make_products(2, dim=3, start=5))
+
+    def test_extend_remove_update(self):
+        self.catalog.extend(make_products(3, start=10))
+        self.catalog.remove(["P2", "P5"])
+        edited = self.products[7].model_copy(update={"title": "Edited"})
+        self.catalog.update([edited])
+
+        expected = [p for p in self.products if p.id not in {"P2", "P5", "P7"}] + make_products(3, start=10) + [edited]
+        self.assertEqual(self.catalog.ids, [p.id for p in expected])
+        self.assertEqual(catalog_fingerprint(self.catalog), catalog_fingerprint(expected))
+        for product in expected:
+            self.assertEqual(self.catalog.has_embedding[self.catalog.position(product.id)], bool(product.embedding))
+        with self.assertRaises(ValueError):
+            self.catalog.extend(self.products[:1])
+
+    def test_changes_tombstone_rows_until_compaction(self):
+        catalog = ProductCatalog.from_products(make_products(100))
+        catalog.remove(["P2", "P5"])
+        edited = catalog.get("P7").model_copy(update={"title": "Edited"})
+        catalog.update([edited])
+        # Positions of untouched products are stable until a compaction
+        self.assertEqual(catalog.generation, 0)
+        self.assertEqual(catalog.position("P9"), 9)
+        self.assertEqual(catalog.position("P7"), 100)
+        self.assertNotIn("P2", catalog)
+        self.assertEqual(catalog.get("P7").title, "Edited")
+
+        # Whole-catalog views compact first
+        self.assertEqual(len(catalog), 98)
+        self.assertEqual(catalog.generation, 1)
+        self.assertEqual(catalog.position("P9"), 6)
+        self.assertEqual(catalog.ids[-1], "P7")
+        self.assertEqual(catalog.embeddings.shape, (98, 4))
+
+    def test_compaction_in_batches(self):
+        catalog = ProductCatalog.from_products(make_products(100))
+        catalog.compaction_ratio = 0.1
+        catalog.remove([f"P{i}" for i in range(9)])
+        self.assertEqual(catalog.generation, 0)
+        catalog.remove(["P9"])  # 10 tombstones > 0.1 * 90 live products
+        self.assertEqual(catalog.generation, 1)
+        self.assertEqual(catalog.position("P10"), 0)
+
+    def test_removal_leaves_memory_mapped_embeddings_alone(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshot")
+            ProductCatalog.from_products(make_products(100)).save(path)
+            catalog, _ = ProductCatalog.load(path)
+            catalog.remove(["P1", "P2"])
+            self.assertIsInstance(catalog._embeddings, np.memmap)
+
+            # The first append copies the matrix once; later ones fill its spare capacity
+            catalog.update([catalog.get("P3", include_embedding=True)])
+            embeddings = catalog._embeddings
+            catalog.extend(make_products(3, start=100))
+            self.assertIs(catalog._embeddings, embeddings)
+            np.testing.assert_array_equal(catalog.embedding(catalog.position("P3")), catalog.embedding(3))
+            self.assertEqual(len(catalog), 101)
+
+    def test_extend_catalog_without_embeddings(self):
+        catalog = ProductCatalog.from_products([Product(id="A", title="Alpha", locale="us")])
+        catalog.extend(make_products(2, start=1))
+        self.assertEqual(catalog.embeddings.shape, (3, 4))
+        self.assertEqual(catalog.has_embedding.tolist(), [False, True, True])
+
+    def test_fingerprint_matches_product_list(self):
+        self.assertEqual(catalog_fingerprint(self.catalog), catalog_fingerprint(self.products))
+
+    def test_vector_search_over_catalog(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = ProductSearchEngine(4, os.path.join(tmp, "products.ann"), self.catalog, backend="exact")
+            for product in self.products:
+                if product.embedding:
+                    self.assertEqual(engine.search(product.embedding, k=1)[0]["product_id"], product.id)
+            engine.release_product_embeddings()
+            self.assertEqual(self.catalog.embeddings.size, 0)
+            self.assertEqual(self.catalog.get("P1").title, self.products[1].title)
+
+
+if __name__ == "__main__":
+    unittest.main()
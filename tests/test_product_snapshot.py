@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.models.catalog import ProductCatalog
+from src.models.product import Product, UPDATED_AT
+from tests.fake_firestore import FakeFirestoreClient
+
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def product_document(i, updated_at):
+    return {
+        "id": f"P{i}",
+        "title": f"Product {i}",
+        "description": f"Description {i}",
+        "locale": "us",
+        "embedding": [float(i), 1.0, 0.5],
+        UPDATED_AT: updated_at,
+    }
+
+
+class TestProductSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeFirestoreClient()
+        self.products = self.client.collection("Products")
+        for i in range(20):
+            self.products.document(f"P{i}").set(product_document(i, START + timedelta(hours=i)))
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.tmp.name, "product_snapshot")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self):
+        self.client.reads = 0
+        return ProductCatalog.load_all(snapshot_path=self.snapshot_path, client=self.client)
+
+    def assert_matches_firestore(self, catalog):
+        expected = ProductCatalog.load_all(client=self.client)
+        self.assertEqual(sorted(catalog.ids), sorted(expected.ids))
+        for product_id in expected.ids:
+            self.assertEqual(catalog.get(product_id, include_embedding=True),
+                             expected.get(product_id, include_embedding=True))
+
+    def test_first_load_writes_snapshot(self):
+        catalog = self.load()
+        self.assertEqual(self.client.reads, 20)
+        self.assertEqual(len(catalog), 20)
+        with open(os.path.join(self.snapshot_path, "meta.json")) as f:
+            meta = json.load(f)
+        self.assertEqual(datetime.fromisoformat(meta["high_water_mark"]), START + timedelta(hours=19))
+
+    def test_unchanged_collection_reads_only_recent_documents(self):
+        self.load()
+        catalog = self.load()
+        # Only documents inside the clock-skew window before the high-water mark are re-read
+        self.assertEqual(self.client.reads, 1)
+        self.assertIsInstance(catalog.embeddings, np.memmap)
+        self.assert_matches_firestore(catalog)
+
+    def test_changes_since_snapshot_are_applied(self):
+        self.load()
+        later = START + timedelta(days=2)
+        self.products.document("P3").update({"title": "Edited", UPDATED_AT: later})
+        self.products.document("P5").delete()
+        self.products.document("P20").set(product_document(20, later))
+        legacy = product_document(21, None)
+        del legacy[UPDATED_AT]
+        self.products.document("P21").set(legacy)
+
+        catalog = self.load()
+        self.assertEqual(self.client.reads, 4)  # P3 and P20 by updatedAt, P19 in the skew window, P21 by id
+        self.assertEqual(catalog.get("P3").title, "Edited")
+        self.assertNotIn("P5", catalog)
+        self.assert_matches_firestore(catalog)
+
+        # The applied changes were written back, so the next start reads nothing new
+        catalog = self.load()
+        self.assertEqual(self.client.reads, 2)
+        self.assert_matches_firestore(catalog)
+
+    def test_unreadable_snapshot_falls_back_to_full_stream(self):
+        self.load()
+        with open(os.path.join(self.snapshot_path, "meta.json"), "w") as f:
+            json.dump({"format_version": -1}, f)
+        catalog = self.load()
+        self.assertEqual(self.client.reads, 20)
+        self.assert_matches_firestore(catalog)
+
+    def test_product_load_all_from_snapshot(self):
+        from unittest.mock import patch
+
+        with patch.object(ProductCatalog, "load_all", return_value=ProductCatalog.load_all(client=self.client)):
+            products = Product.load_all(snapshot_path=self.snapshot_path)
+        self.assertEqual([p.id for p in products], [f"P{i}" for i in range(20)])
+        self.assertEqual(products[2].embedding, [2.0, 1.0, 0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from src.models.query_log import QueryLog
+from src.services.query_log_writer import QueryLogWriter
+from tests.fake_firestore import FakeFirestoreClient, FakeWriteBatch
+
+
+def make_log(writer, i=0):
+    log = QueryLog(logId=f"L{i:05d}", userId="U1", sessionId="S1", rawQuery=f"query {i}",
+                   timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    log._writer = writer
+    return log
+
+
+class TestQueryLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeFirestoreClient()
+        self.tmpdir = tempfile.mkdtemp()
+        self.spill_path = os.path.join(self.tmpdir, "spill.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def writer(self, **kwargs):
+        params = {"client": self.client, "spill_path": self.spill_path, "flush_interval": 10.0}
+        params.update(kwargs)
+        writer = QueryLogWriter(**params)
+        self.addCleanup(writer.close)
+        return writer
+
+    def documents(self):
+        return self.client.collection("QueryLogs").documents
+
+    def test_updates_merge_into_one_write(self):
+        writer = self.writer()
+        log = make_log(writer)
+        log.save()
+        log.update_refined_query("red mug")
+        log.update_embedding([0.1, 0.2])
+        log.update_results(["B1"], ["B2"], ["Red Mug"])
+        self.assertTrue(writer.flush(timeout=5))
+
+        self.assertEqual(self.client.commits, 1)
+        self.assertEqual(self.client.writes, 1)
+        document = self.documents()["L00000"]
+        self.assertEqual(document["refinedQuery"], "red mug")
+        self.assertEqual(document["queryEmbedding"], [0.1, 0.2])
+        self.assertEqual(document["retrievalResults"], {"BM25": ["B1"], "Vector": ["B2"]})
+        self.assertEqual(document["finalResult"], ["Red Mug"])
+
+    def test_logs_are_batched(self):
+        writer = self.writer(batch_size=500)
+        for i in range(1200):
+            make_log(writer, i).save()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(len(self.documents()), 1200)
+        self.assertEqual(self.client.commits, 3)
+
+    def test_full_buffer_spills_after_timeout(self):
+        writer = self.writer(max_pending=2, submit_timeout=0.05)
+        make_log(writer, 0).save()
+        make_log(writer, 1).save()
+        # Updating a buffered log never blocks
+        self.assertTrue(writer.submit(make_log(writer, 1)))
+        self.assertFalse(writer.submit(make_log(writer, 2)))
+        self.assertEqual(writer.stats["spilled"], 1)
+        self.assertTrue(os.path.exists(self.spill_path))
+
+    def test_failed_commit_spills_and_recovers_on_restart(self):
+        writer = self.writer()
+        self.client.fail_next_commits = 1
+        log = make_log(writer)
+        log.update_refined_query("red mug")
+        self.assertTrue(writer.flush(timeout=5))
+        writer.close()
+        self.assertEqual(self.documents(), {})
+        self.assertEqual(writer.stats["spilled"], 1)
+
+        restarted = self.writer()
+        self.assertTrue(restarted.flush(timeout=5))
+        document = self.documents()["L00000"]
+        self.assertEqual(document["refinedQuery"], "red mug")
+        self.assertIsInstance(document["timestamp"], datetime)
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_spilled_logs_retried_after_store_recovers(self):
+        writer = self.writer(retry_interval=0.0)
+        self.client.fail_next_commits = 1
+        make_log(writer, 0).save()
+        self.assertTrue(writer.flush(timeout=5))
+        make_log(writer, 1).save()
+        # The next successful commit re-submits the spilled log before the flush returns
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(set(self.documents()), {"L00000", "L00001"})
+        self.assertEqual(writer.stats["recovered"], 1)
+
+    def test_recovered_log_does_not_overwrite_a_newer_write(self):
+        writer = self.writer(retry_interval=0.0)
+        self.client.fail_next_commits = 1
+        log = make_log(writer)
+        log.save()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(writer.stats["spilled"], 1)
+
+        # The newer state commits, and the retry that follows must not revert it
+        log.update_refined_query("red mug")
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(writer.stats["recovered"], 1)
+        self.assertEqual(self.client.writes, 1)
+        self.assertEqual(self.documents()["L00000"]["refinedQuery"], "red mug")
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_log_spilled_by_backpressure_does_not_overwrite_a_newer_write(self):
+        writer = self.writer(max_pending=1, submit_timeout=0.0)
+        make_log(writer, 1).save()
+        log = make_log(writer, 0)
+        self.assertFalse(writer.submit(log))
+        # Write the newer state before the spill file is retried
+        with mock.patch.object(QueryLogWriter, "_should_retry_spill", return_value=False):
+            self.assertTrue(writer.flush(timeout=5))
+            log.update_refined_query("red mug")
+            self.assertTrue(writer.flush(timeout=5))
+
+        self.assertEqual(writer.recover(), 1)
+        self.assertEqual(writer.pending(), 0)
+        self.assertEqual(self.documents()["L00000"]["refinedQuery"], "red mug")
+
+    def test_spill_lines_without_sequence_are_recovered(self):
+        with open(self.spill_path, "w") as f:
+            f.write('{"logId": "L00000", "userId": "U1", "sessionId": "S1", "rawQuery": "query 0", '
+                    '"timestamp": "2024-01-01T00:00:00+00:00", "refinedQuery": "red mug"}\n')
+        writer = self.writer()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(writer.stats["recovered"], 1)
+        document = self.documents()["L00000"]
+        self.assertEqual(document["refinedQuery"], "red mug")
+        self.assertNotIn("seq", document)
+
+    def test_failure_building_a_batch_spills_and_keeps_the_worker_alive(self):
+        writer = self.writer()
+        with mock.patch.object(FakeWriteBatch, "set", side_effect=ValueError("Invalid document")):
+            make_log(writer, 0).save()
+            self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(writer.stats["failed_commits"], 1)
+        self.assertEqual(writer.stats["spilled"], 1)
+
+        # The worker is still running: later logs are written and flush() returns without a timeout
+        make_log(writer, 1).save()
+        self.assertTrue(writer.flush())
+        self.assertIn("L00001", self.documents())
+
+    def test_unserializable_log_is_dropped_when_spilling(self):
+        writer = self.writer()
+        self.client.fail_next_commits = 1
+        writer._submit("L00000", {"logId": "L00000", "rawQuery": object()})
+        make_log(writer, 1).save()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual((writer.stats["spilled"], writer.stats["dropped"]), (1, 1))
+        make_log(writer, 2).save()
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertIn("L00002", self.documents())
+
+    def test_close_flushes_pending_logs(self):
+        writer = self.writer()
+        make_log(writer).save()
+        writer.close()
+        self.assertIn("L00000", self.documents())
+        with self.assertRaises(ValueError):
+            make_log(writer, 1).save()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import copy
+import unittest
+
+import numpy as np
+
+from src.modules.fusion.fuse import fuse_candidate_lists, fuse_candidates
+from src.modules.fusion.rank_fusion import fuse_ranked, top_n_indices
+from src.utils.normalization import normalize_scores
+
+
+def reference_fusion(candidate_lists, weights, mode="min-max"):
+    """Dict-based merge of the previous fuse_candidates, for any number of lists."""
+    merged = {}
+    for candidates, weight in zip(candidate_lists, weights):
+        normalized = normalize_scores([cand["score"] for cand in candidates], mode=mode)
+        for cand, score in zip(candidates, normalized):
+            merged[cand["product_id"]] = merged.get(cand["product_id"], 0.0) + weight * score
+    return sorted(merged.items(), key=lambda item: item[1], reverse=True)
+
+
+def random_candidates(rng, n, pool, prefix="P"):
+    ids = rng.choice(pool, size=n, replace=False)
+    return [{"product_id": f"{prefix}{i}", "score": float(s)} for i, s in zip(ids, rng.gamma(2.0, 5.0, n))]
+
+
+class TestRankFusion(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(7)
+
+    def test_matches_dict_merge(self):
+        for mode in ("min-max", "z-score"):
+            lists = [random_candidates(self.rng, 50, 120) for _ in range(3)]
+            weights = [0.5, 0.3, 0.2]
+            expected = reference_fusion(lists, weights, mode)
+            result = fuse_candidate_lists(lists, weights=weights, strategy=mode)
+            self.assertEqual([c["product_id"] for c in result], [pid for pid, _ in expected])
+            np.testing.assert_allclose([c["score"] for c in result], [s for _, s in expected], atol=5e-4)
+
+    def test_inputs_are_not_modified(self):
+        bm25 = random_candidates(self.rng, 20, 40)
+        vector = random_candidates(self.rng, 20, 40)
+        before = copy.deepcopy((bm25, vector))
+        fuse_candidates(bm25, vector, beta=0.65, top_n=5)
+        self.assertEqual((bm25, vector), before)
+
+    def test_top_n_is_prefix_of_full_ranking(self):
+        scores = np.round(self.rng.random(1000), 2)  # plenty of ties
+        full = top_n_indices(scores, len(scores))
+        for top_n in (0, 1, 10, 137, 999, 1000, 5000):
+            np.testing.assert_array_equal(top_n_indices(scores, top_n), full[:top_n])
+        # Best first, ties in index order
+        self.assertTrue(all((scores[a], -a) > (scores[b], -b) for a, b in zip(full, full[1:])))
+
+    def test_reciprocal_rank_fusion(self):
+        first = (np.array([3, 1, 2]), np.array([9.0, 5.0, 1.0]))
+        second = (np.array([2, 3]), np.array([0.9, 0.1]))
+        positions, scores = fuse_ranked([first, second], weights=[1.0, 1.0], strategy="rrf", rrf_k=60)
+        np.testing.assert_array_equal(positions, [3, 2, 1])
+        np.testing.assert_allclose(scores, [1 / 61 + 1 / 62, 1 / 63 + 1 / 61, 1 / 62])
+
+    def test_beta_extremes(self):
+        bm25 = [{"product_id": "A", "score": 25.4}, {"product_id": "B", "score": 22.1},
+                {"product_id": "C", "score": 19.7}]
+        vector = [{"product_id": "C", "score": 0.95}, {"product_id": "D", "score": 0.89},
+                  {"product_id": "E", "score": 0.82}]
+        self.assertEqual([c["product_id"] for c in fuse_candidates(bm25, vector, beta=1.0)[:2]], ["A", "B"])
+        self.assertEqual([c["product_id"] for c in fuse_candidates(bm25, vector, beta=0.0)[:2]], ["C", "D"])
+        result = fuse_candidates(bm25, vector, beta=0.6)
+        self.assertEqual(result[:2], [{"product_id": "A", "score": 0.6}, {"product_id": "C", "score": 0.4}])
+        self.assertEqual(result[-1], {"product_id": "E", "score": 0.0})
+
+    def test_invalid_inputs(self):
+        vector = [{"product_id": "A", "score": 0.5}]
+        with self.assertRaises(ValueError):
+            fuse_candidates([], vector)
+        with self.assertRaises(ValueError):
+            fuse_candidates([{"product_id": "B"}], vector)
+        with self.assertRaises(ValueError):
+            fuse_candidates(vector, vector, top_n=-1)
+        with self.assertRaises(ValueError):
+            fuse_candidate_lists([vector], strategy="borda")
+        with self.assertRaises(ValueError):
+            fuse_candidate_lists([vector, vector], weights=[1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from src.models import Preferences, UserProfile
+from src.modules.preprocessor.preprocessor import QueryPreprocessor
+from src.modules.preprocessor.prompt_builder import PromptBuilder
+from src.modules.preprocessor.refinement_cache import RefinementCache
+from src.services.openai_client import OpenAIClient
+from src.services.stub_services import StubOpenAIClient
+
+
+def user(user_id, brands=("Nike",), interests=("running",)):
+    return UserProfile(userId=user_id, name="Test User", email="test@example.com",
+                       preferences=Preferences(favoriteBrands=list(brands), interests=list(interests)))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRefinementCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_users_with_same_preferences_share_refinements(self):
+        client = StubOpenAIClient()
+        cache = RefinementCache(clock=self.clock)
+        preprocessor = QueryPreprocessor(PromptBuilder(), client, cache=cache)
+
+        first = preprocessor.preprocess("Running Shoes", user("U1"))
+        second = preprocessor.preprocess("running shoes!", user("U2"))
+        preprocessor.preprocess("running shoes", user("U3", brands=("Adidas",)))
+
+        self.assertEqual(first, second)
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["misses"], 2)
+        self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+
+    def test_lru_eviction(self):
+        cache = RefinementCache(max_size=2, clock=self.clock)
+        cache.put("a", {"normalized_query": "a"})
+        cache.put("b", {"normalized_query": "b"})
+        cache.get("a")
+        cache.put("c", {"normalized_query": "c"})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_ttl_expiry_and_pinned_entries(self):
+        cache = RefinementCache(ttl=60, clock=self.clock)
+        cache.put("sampled", {"normalized_query": "x"})
+        cache.put("pinned", {"normalized_query": "y"}, pinned=True)
+        self.clock.now += 61
+        self.assertIsNone(cache.get("sampled"))
+        self.assertEqual(cache.get("pinned"), {"normalized_query": "y"})
+        self.assertEqual(cache.stats["expired"], 1)
+
+    def test_deterministic_mode(self):
+        client = MagicMock(spec=OpenAIClient)
+        client.generate_completion.return_value = "Running shoes for trail running"
+        cache = RefinementCache(ttl=60, clock=self.clock)
+        preprocessor = QueryPreprocessor(PromptBuilder(), client, cache=cache, deterministic=True)
+
+        first = preprocessor.preprocess("running shoes", user("U1"))
+        self.assertEqual(client.generate_completion.call_args.kwargs, {"temperature": 0.0})
+        self.clock.now += 3600
+        client.generate_completion.return_value = "Something else"
+        self.assertEqual(preprocessor.preprocess("running shoes", user("U1")), first)
+        self.assertEqual(client.generate_completion.call_count, 1)
+
+        # Sampled refinements are never served in deterministic mode, or the other way round
+        sampled = QueryPreprocessor(PromptBuilder(), client, cache=cache)
+        self.assertEqual(sampled.preprocess("running shoes", user("U1"))["normalized_query"], "something else")
+
+    def test_sqlite_shared_between_instances(self):
+        path = os.path.join(self.tmpdir, "refinements.sqlite")
+        writer = RefinementCache(path=path, ttl=60, clock=self.clock)
+        reader = RefinementCache(path=path, ttl=60, clock=self.clock)
+        self.addCleanup(writer.close)
+        self.addCleanup(reader.close)
+
+        writer.put("k", {"normalized_query": "running shoes"})
+        self.assertEqual(reader.get("k"), {"normalized_query": "running shoes"})
+        self.assertEqual(reader.stats["disk_hits"], 1)
+
+        self.clock.now += 61
+        self.assertIsNone(reader.get("k"))
+        self.assertEqual(writer.prune(), 1)
+        self.assertEqual(len(writer), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
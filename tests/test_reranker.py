@@ -0,0 +1,139 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+import warnings
+
+import numpy as np
+
+from src.models import Preferences, Product
+from src.models.catalog import ProductCatalog
+from src.modules.fusion.rank_fusion import fuse_ranked
+from src.modules.fusion.reranker import CandidateReranker, tokens
+from tests.search_fixtures import WRITES, local_engine
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+
+PRODUCTS = [
+    {"productId": "P0", "productTitle": "Blue Ceramic Vase", "productBrand": "Korange", "productColor": "Blue",
+     "productLocale": "us"},
+    {"productId": "P1", "productTitle": "Ceramic Ginger Jar", "productBrand": "Acme", "productColor": "navy blue",
+     "productLocale": "us"},
+    {"productId": "P2", "productTitle": "Organic Baby Swaddle", "productBrand": "aden + anais",
+     "productLocale": "us"},
+    {"productId": "P3", "productTitle": "Fishing Reel", "productBrand": None, "productColor": "Red",
+     "productLocale": "us"},
+]
+
+
+class TestCandidateReranker(unittest.TestCase):
+    def setUp(self):
+        self.catalog = ProductCatalog.from_records(PRODUCTS)
+        self.flat = (np.arange(4), np.ones(4))
+
+    def test_without_features_matches_min_max_fusion(self):
+        rng = np.random.default_rng(3)
+        bm25 = (rng.permutation(4)[:3], rng.random(3))
+        vector = (rng.permutation(4)[:3], rng.random(3))
+        reranker = CandidateReranker(self.catalog, brand_weight=0, color_weight=0, session_weight=0)
+        positions, scores = reranker.rerank([bm25, vector], [0.65, 0.35], Preferences(favoriteBrands=["Acme"]))
+        expected_positions, expected_scores = fuse_ranked([bm25, vector], [0.65, 0.35], "min-max")
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_allclose(scores, expected_scores)
+
+    def test_brand_and_color_preferences(self):
+        reranker = CandidateReranker(self.catalog, brand_weight=0.2, color_weight=0.1, session_weight=0)
+        preferences = Preferences(favoriteBrands=["ADEN + ANAIS"], interests=["navy blue decor"])
+        positions, scores = reranker.rerank([self.flat], preferences=preferences)
+        # "blue" and "navy blue" are both named in the interests; "red" is not
+        self.assertEqual(positions.tolist(), [2, 0, 1, 3])
+        np.testing.assert_allclose(scores, [0.7, 0.6, 0.6, 0.5])
+
+    def test_session_affinity(self):
+        reranker = CandidateReranker(self.catalog, brand_weight=0, color_weight=0, session_weight=1.0)
+        positions, scores = reranker.rerank([self.flat], session_queries=["ceramic vase!", "unknown words"])
+        self.assertEqual(positions.tolist(), [0, 1, 2, 3])
+        np.testing.assert_allclose(scores - 0.5, [1.0, 0.5, 0.0, 0.0])
+
+    def test_session_affinity_matches_set_intersection(self):
+        with open(DATA) as f:
+            catalog = ProductCatalog.from_records(json.load(f))
+        reranker = CandidateReranker(catalog)
+        session = ["handmade nursery decor", "organic baby clothes", "blue ceramic jar"]
+        positions = np.random.default_rng(0).choice(len(catalog), size=400, replace=False)
+        session_terms = {term for query in session for term in tokens(query)} & set(reranker.vocabulary)
+        expected = [len(session_terms & set(tokens(catalog.columns["title"][p]))) / len(session_terms)
+                    for p in positions]
+        np.testing.assert_allclose(reranker._session_affinity(positions, session), expected)
+
+    def test_dict_candidates(self):
+        reranker = CandidateReranker(self.catalog)
+        results = reranker.rerank_candidates(
+            [[{"product_id": "P3", "score": 12.0}, {"product_id": "gone", "score": 9.0}],
+             [{"product_id": "P0", "score": 0.9}, {"product_id": "P3", "score": 0.4}]],
+            [0.5, 0.5], Preferences(favoriteBrands=["korange"]), top_n=2)
+        self.assertEqual(results, [{"product_id": "P0", "score": 0.65}, {"product_id": "P3", "score": 0.5}])
+        with self.assertRaises(ValueError):
+            reranker.rerank([self.flat], weights=[0.5, 0.5])
+
+    def test_catalog_changes_after_construction(self):
+        reranker = CandidateReranker(self.catalog, brand_weight=0.2, color_weight=0, session_weight=0.1)
+        preferences = Preferences(favoriteBrands=["aden + anais", "Zeta"])
+        candidates = [[{"product_id": "P2", "score": 1.0}, {"product_id": "P1", "score": 1.0}]]
+
+        # Appended product: encoded on the next rerank
+        self.catalog.extend([Product(id="P4", title="Zeta Swaddle", brand="Zeta", locale="us")])
+        results = reranker.rerank_candidates([candidates[0] + [{"product_id": "P4", "score": 1.0}]],
+                                             preferences=preferences, session_queries=["swaddle"])
+        self.assertEqual(results, [{"product_id": "P2", "score": 0.8}, {"product_id": "P4", "score": 0.8},
+                                   {"product_id": "P1", "score": 0.5}])
+
+        # Tombstoned and updated rows, without a compaction
+        self.catalog.compaction_ratio = 10.0
+        self.catalog.remove(["P0"])
+        self.catalog.update([self.catalog.get("P1").model_copy(update={"brand": "Zeta"})])
+        self.assertEqual(self.catalog.generation, 0)
+        results = reranker.rerank_candidates(candidates, preferences=preferences)
+        # Both brands are favorites now; the tie goes to P2, as the new P1 moved to the end
+        self.assertEqual(results, [{"product_id": "P2", "score": 0.7}, {"product_id": "P1", "score": 0.7}])
+
+        # A compaction renumbers every position
+        self.assertTrue(self.catalog.compact())
+        results = reranker.rerank_candidates(candidates, preferences=preferences, session_queries=["swaddle"])
+        self.assertEqual(results, [{"product_id": "P2", "score": 0.8}, {"product_id": "P1", "score": 0.7}])
+
+
+class TestTwoStageSearch(unittest.TestCase):
+    def setUp(self):
+        with open(DATA) as f:
+            self.records = json.load(f)
+        WRITES.reset()
+
+    def test_deep_pool_reranked_to_search_k(self):
+        engine = local_engine(self.records)
+        engine.reranker = CandidateReranker(engine.catalog)
+        engine.candidate_pool_size = 50
+        depths = []
+        retrieve = engine.bm25_retriever.retrieve
+        engine.bm25_retriever.retrieve = lambda query, k, filters=None: depths.append(k) or retrieve(query, k, filters)
+        logged = []
+        persist = engine._persist
+        engine._persist = lambda write, *args: (write.__name__ == "update_results" and logged.append(args),
+                                                persist(write, *args))
+
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            engine.perform_search("ceramic vase")
+            results = engine.perform_search("ginger jar with lid")
+
+        self.assertEqual(depths, [50, 50])
+        self.assertEqual(len(results), engine.search_K)
+        scores = [result["score"] for result in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        bm25_titles, vector_titles, final_titles = logged[-1]
+        self.assertEqual((len(bm25_titles), len(vector_titles), len(final_titles)), (engine.search_K,) * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
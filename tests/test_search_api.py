@@ -0,0 +1,177 @@
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import unittest
+import warnings
+
+from cart_search_api import SearchIndexes, SearchService, create_app
+from src.models import Preferences, UserProfile
+from src.modules.fusion.reranker import CandidateReranker
+from src.services.stub_services import StubEmbeddingService, StubOpenAIClient
+from tests.search_fixtures import SESSIONS, WRITES, LocalCartSearchEngine, LocalSession, local_engine
+
+HAS_FASTAPI = all(importlib.util.find_spec(name) is not None for name in ("fastapi", "httpx"))
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+DIM = 64
+
+
+def user(user_id, brand, interest):
+    service = StubEmbeddingService(dim=DIM)
+    return UserProfile(userId=user_id, name=user_id, email=f"{user_id.lower()}@example.com",
+                       preferences=Preferences(favoriteBrands=[brand], interests=[interest]),
+                       userEmbedding=service.embed(interest).tolist())
+
+
+USERS = {"U00001": user("U00001", "KORANGE", "home decor"), "U00002": user("U00002", "ACME", "fishing gear")}
+
+
+class TestSearchService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(DATA_PATH) as f:
+            records = json.load(f)[:300]
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine = local_engine(records, dim=DIM)
+        cls.indexes = SearchIndexes(engine.catalog, engine.bm25_retriever, engine.search_engine,
+                                    CandidateReranker(engine.catalog))
+
+    def setUp(self):
+        WRITES.reset()
+        SESSIONS.clear()
+        quiet = contextlib.ExitStack()
+        quiet.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        quiet.enter_context(warnings.catch_warnings())
+        warnings.simplefilter("ignore")
+        self.addCleanup(quiet.close)
+
+    def service(self, **kwargs):
+        return SearchService(self.indexes, StubEmbeddingService(dim=DIM), StubOpenAIClient(), users=USERS.get,
+                             sessions=LocalSession, engine_class=LocalCartSearchEngine, **kwargs)
+
+    def test_concurrent_sessions_keep_their_own_state(self):
+        queries = {"U00001": ["ceramic vase", "ginger jar", "table lamp"],
+                   "U00002": ["fishing reel", "spinning rod", "tackle box"]}
+
+        def run(service, interleave):
+            sessions = {user_id: service.start_session(user_id).id for user_id in queries}
+
+            async def session_searches(user_id):
+                results = []
+                for query in queries[user_id]:
+                    results.append(await service.search(sessions[user_id], query))
+                    if interleave:
+                        await asyncio.sleep(0)
+                return results
+
+            async def all_sessions():
+                if interleave:
+                    return await asyncio.gather(*(session_searches(user_id) for user_id in queries))
+                return [await session_searches(user_id) for user_id in queries]
+
+            return sessions, asyncio.run(all_sessions())
+
+        _, serial = run(self.service(), interleave=False)
+        SESSIONS.clear()
+        sessions, concurrent = run(self.service(), interleave=True)
+
+        strip = lambda runs: [[response["results"] for response in responses] for responses in runs]
+        self.assertEqual(strip(concurrent), strip(serial))
+        for user_id, session_id in sessions.items():
+            self.assertEqual([query.text for query in SESSIONS[session_id].queries], queries[user_id])
+        self.assertEqual(len(concurrent[0][0]["results"]), 10)
+        self.assertIn("total", concurrent[0][0]["timings"])
+
+    def test_session_is_picked_up_by_another_worker(self):
+        first, second = self.service(), self.service()
+        session_id = first.start_session("u00001").id
+        asyncio.run(first.search(session_id, "ceramic vase"))
+        asyncio.run(second.search(session_id, "ginger jar"))
+        engine, _ = second._session_view(session_id)
+        self.assertEqual([query.text for query in engine.current_session.queries], ["ceramic vase", "ginger jar"])
+        self.assertEqual(engine.current_user.id, "U00001")
+
+    def test_workers_alternating_on_one_session(self):
+        first, second = self.service(), self.service()
+        session_id = first.start_session("U00001").id
+        for service, query in [(first, "ceramic vase"), (second, "ginger jar"), (first, "table lamp"),
+                               (second, "blue vase")]:
+            asyncio.run(service.search(session_id, query))
+
+        expected = ["ceramic vase", "ginger jar", "table lamp", "blue vase"]
+        stored = SESSIONS[session_id]
+        self.assertEqual([query.text for query in stored.queries], expected)
+        self.assertEqual([query.id for query in stored.queries], ["q1", "q2", "q3", "q4"])
+        self.assertEqual([(t.from_query, t.to) for t in stored.transitions], [("q1", "q2"), ("q2", "q3"), ("q3", "q4")])
+        engine, _ = first._session_view(session_id)
+        asyncio.run(first.search(session_id, "ginger jar lid"))
+        self.assertEqual([query.text for query in engine.current_session.queries], expected + ["ginger jar lid"])
+
+        # The context embedding of a stale view equals that of a view fresh from the store
+        fresh = self.service()
+        results = asyncio.run(second.search(session_id, "lamp shade"))["results"]
+        SESSIONS[session_id].queries.pop()
+        SESSIONS[session_id].transitions.pop()
+        self.assertEqual(asyncio.run(fresh.search(session_id, "lamp shade"))["results"], results)
+
+        second.end_session(session_id)
+        with self.assertRaises(KeyError):
+            asyncio.run(first.search(session_id, "vase"))
+
+    def test_unknown_and_ended_sessions(self):
+        service = self.service()
+        with self.assertRaises(KeyError):
+            service.start_session("U99999")
+        with self.assertRaises(KeyError):
+            asyncio.run(service.search("missing", "vase"))
+
+        session_id = service.start_session("U00001").id
+        service.end_session(session_id)
+        self.assertEqual(len(service), 0)
+        with self.assertRaises(KeyError):
+            asyncio.run(service.search(session_id, "vase"))
+
+    def test_invalid_filter_is_rejected_before_logging(self):
+        service = self.service()
+        session_id = service.start_session("U00001").id
+        WRITES.reset()
+        with self.assertRaises(ValueError):
+            asyncio.run(service.search(session_id, "vase", {"size": "xl"}))
+        self.assertEqual(WRITES.entries, [])
+
+    def test_session_views_are_bounded(self):
+        service = self.service(max_sessions=1)
+        first = service.start_session("U00001").id
+        service.start_session("U00002")
+        self.assertEqual(len(service), 1)
+        # The evicted session is reloaded on its next search
+        asyncio.run(service.search(first, "vase"))
+        self.assertEqual(len(service), 1)
+
+    def test_embedding_dimension_must_match_index(self):
+        with self.assertRaises(ValueError):
+            SearchService(self.indexes, StubEmbeddingService(dim=DIM + 1), StubOpenAIClient())
+
+    @unittest.skipUnless(HAS_FASTAPI, "fastapi and httpx are not installed")
+    def test_http_endpoints(self):
+        from fastapi.testclient import TestClient
+
+        with TestClient(create_app(self.service())) as client:
+            self.assertEqual(client.get("/healthz").json()["products"], len(self.indexes.catalog))
+            self.assertEqual(client.post("/session", json={"user_id": "U99999"}).status_code, 404)
+            session_id = client.post("/session", json={"user_id": "U00001"}).json()["session_id"]
+
+            response = client.post("/search", json={"session_id": session_id, "query": "ceramic vase"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["results"]), 10)
+            self.assertEqual(client.post("/search", json={"session_id": session_id, "query": "vase",
+                                                          "filters": {"size": "xl"}}).status_code, 400)
+            self.assertEqual(client.post("/search", json={"session_id": "missing", "query": "vase"}).status_code,
+                             404)
+            self.assertEqual(client.delete(f"/session/{session_id}").json()["queries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+import warnings
+
+from src.models import SearchResult
+from tests.search_fixtures import WRITES, local_engine
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+
+
+class TestSearchStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(DATA_PATH) as f:
+            cls.records = json.load(f)[:300]
+
+    def setUp(self):
+        WRITES.reset()
+        quiet = contextlib.ExitStack()
+        quiet.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        quiet.enter_context(warnings.catch_warnings())
+        warnings.simplefilter("ignore")
+        self.addCleanup(quiet.close)
+
+    def test_bm25_hits_first_then_fused_results(self):
+        engine = local_engine(self.records)
+        partial, final = list(engine.search_stream("ceramic vase"))
+
+        self.assertIsInstance(partial, SearchResult)
+        self.assertFalse(partial.complete)
+        self.assertEqual(partial.refined_query, "ceramic vase")
+        self.assertEqual(partial.results, partial.bm25)
+        self.assertEqual(partial.vector, [])
+        self.assertNotIn("vector", partial.timings)
+
+        self.assertTrue(final.complete)
+        self.assertEqual(final.query_log_id, partial.query_log_id)
+        self.assertEqual(final.bm25, partial.bm25)
+        self.assertEqual(len(final.results), engine.search_K)
+        self.assertEqual(len(final.vector), engine.search_K)
+        self.assertEqual({"bm25", "vector", "fusion", "total"} - set(final.timings), set())
+        title = engine.catalog.value("title", engine.catalog.position(final.results[0].product_id))
+        self.assertEqual(final.results[0].title, title)
+
+    def test_one_pass_per_search(self):
+        engine = local_engine(self.records)
+        engine.search("ceramic vase")
+        self.assertEqual(engine.openai_client.calls, 1)
+        self.assertEqual([query.text for query in engine.current_session.queries], ["ceramic vase"])
+        self.assertEqual(sum(1 for collection, _, field in WRITES.entries if (collection, field) == ("QueryLogs", "*")),
+                         1)
+
+    def test_perform_search_returns_the_fused_results(self):
+        results = local_engine(self.records).perform_search("ginger jar")
+        WRITES.reset()
+        expected = local_engine(self.records).search("ginger jar").results
+        self.assertEqual(results, [{"product_id": p.product_id, "score": p.score} for p in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
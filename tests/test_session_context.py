@@ -0,0 +1,101 @@
+import math
+import unittest
+import warnings
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.models import Preferences, QueryNode, Session, Transition, UserProfile
+from src.modules.dynamic_context_modelling.session_graph_builder import ContextEmbedder
+from src.services.stub_services import StubEmbeddingService
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def batch_context(service, user, session, alpha, decay_rate=0.0):
+    """Full recomputation over every transition (the previous ContextEmbedder algorithm)."""
+    profile_text = " ".join(user.preferences.favorite_brands + user.preferences.interests)
+    queries = {q.id: q for q in session.queries}
+    now = max(q.timestamp for q in session.queries)
+    weighted, total = [], 0.0
+    for trans in session.transitions:
+        from_vec = np.array(service.embed_sentences([queries[trans.from_query].text])[0])
+        to_query = queries[trans.to]
+        to_vec = np.array(service.embed_sentences([to_query.text])[0])
+        weight = trans.weight * math.exp(-decay_rate * (now - to_query.timestamp).total_seconds() / 60)
+        weighted.append((from_vec + to_vec) / 2.0 * weight)
+        total += weight
+    profile_vec = np.array(service.embed_sentences([profile_text])[0])
+    return alpha * np.sum(weighted, axis=0) / total + (1 - alpha) * profile_vec
+
+
+def add_query(session, text, minutes):
+    """Session.add_query without Firestore, at a fixed time."""
+    node = QueryNode(queryId=f"q{len(session.queries) + 1}", text=text, timestamp=START + timedelta(minutes=minutes))
+    session.queries.append(node)
+    if len(session.queries) > 1:
+        prev = session.queries[-2]
+        time_diff = (node.timestamp - prev.timestamp).total_seconds() / 60
+        session.transitions.append(Transition(from_query=prev.id, to=node.id, count=1,
+                                              time_difference=time_diff, weight=math.exp(-0.1 * time_diff)))
+
+
+class TestIncrementalSessionContext(unittest.TestCase):
+    def setUp(self):
+        self.service = StubEmbeddingService(dim=16)
+        self.user = UserProfile(userId="U1", name="Test User", email="test@example.com",
+                                preferences=Preferences(favoriteBrands=["Nike"], interests=["running"]))
+        self.session = Session(id="S1", user_id="U1", start_time=START)
+        warnings.simplefilter("ignore")
+        self.addCleanup(warnings.resetwarnings)
+
+    def run_session(self, embedder, n_queries=20, decay_rate=0.0):
+        texts = ["running shoes", "trail shoes", "running shoes"] + [f"query {i}" for i in range(n_queries)]
+        for i, text in enumerate(texts[:n_queries]):
+            add_query(self.session, text, minutes=3 * i + (i % 4))
+            result = embedder.embed_single_user_and_session(self.user, self.session, fuse=True)
+            if self.session.transitions:
+                expected = batch_context(self.service, self.user, self.session, embedder.alpha, decay_rate)
+                np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+
+    def test_matches_batch_computation(self):
+        self.run_session(ContextEmbedder(self.service, alpha=0.65))
+
+    def test_matches_batch_computation_with_time_decay(self):
+        self.run_session(ContextEmbedder(self.service, alpha=0.65, decay_rate=0.05), decay_rate=0.05)
+
+    def test_one_new_text_per_query(self):
+        embedder = ContextEmbedder(self.service, alpha=0.65)
+        sizes = []
+        original = self.service.embed_sentences
+
+        def counting(sentences):
+            sizes.append(len(sentences))
+            return original(sentences)
+
+        self.service.embed_sentences = counting
+        for i in range(20):
+            add_query(self.session, f"query {i}", minutes=i)
+            embedder.embed_single_user_and_session(self.user, self.session, fuse=True)
+
+        # Profile on the first query, both sides of the first transition, then only the new query
+        self.assertEqual(sizes, [1, 2] + [1] * 18)
+        self.assertEqual(self.session.context_state.transitions_folded, 19)
+
+    def test_no_transitions_returns_profile_vector(self):
+        add_query(self.session, "running shoes", minutes=0)
+        result = ContextEmbedder(self.service).embed_single_user_and_session(self.user, self.session)
+        np.testing.assert_allclose(result, self.service.embed("Nike running"))
+
+    def test_state_rebuilt_when_decay_changes(self):
+        for i in range(5):
+            add_query(self.session, f"query {i}", minutes=2 * i)
+        ContextEmbedder(self.service, alpha=0.65).embed_single_user_and_session(self.user, self.session)
+        decayed = ContextEmbedder(self.service, alpha=0.65, decay_rate=0.2)
+        result = decayed.embed_single_user_and_session(self.user, self.session)
+        expected = batch_context(self.service, self.user, self.session, 0.65, decay_rate=0.2)
+        np.testing.assert_allclose(result, expected, rtol=1e-10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from src.models.product import Product
+from src.modules.retrieval.bm25_retriever import catalog_fingerprint
+from src.modules.retrieval.sparse_bm25 import SparseBM25Index
+
+
+class TestSparseBM25Index(unittest.TestCase):
+    """
+    Unit tests for SparseBM25Index.
+    Scores are checked against rank_bm25.BM25Okapi, which the index replaces.
+    """
+
+    def setUp(self):
+        self.documents = [
+            ["wireless", "headphones", "noise", "cancellation", "wireless"],
+            ["wired", "earphones", "clear", "sound"],
+            ["smartphone", "advanced", "features"],
+            ["lightweight", "laptop", "battery", "life"],
+            ["wireless", "mouse", "ergonomic"],
+            ["headphones", "stand", "wood"],
+        ]
+        self.keys = ["1", "2", "3", "4", "5", "6"]
+        self.index = SparseBM25Index.from_documents(self.documents, self.keys)
+        self.reference = BM25Okapi(self.documents)
+
+    def test_scores_match_rank_bm25(self):
+        """Dense scores are the same as BM25Okapi.get_scores for several queries."""
+        for query in (["wireless"], ["wireless", "headphones"], ["headphones", "headphones"], ["xylophone"], []):
+            expected = self.reference.get_scores(query)
+            actual = self.index.get_scores(query)
+            np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
+
+    def test_sorted_merge_matches_dense_accumulator(self):
+        """Both ways of merging postings across query terms give the same scores."""
+        query = ["wireless", "headphones", "sound"]
+        dense = self.index.get_scores(query)
+        self.index.DENSE_ACCUMULATOR_RATIO = 0
+        np.testing.assert_allclose(self.index.get_scores(query), dense, rtol=1e-6)
+
+    def test_negative_idf_floor(self):
+        """Terms in most documents get the epsilon * average IDF floor, as in BM25Okapi."""
+        documents = [doc + ["common"] for doc in self.documents]
+        index = SparseBM25Index.from_documents(documents, self.keys)
+        expected = BM25Okapi(documents).get_scores(["common", "laptop"])
+        np.testing.assert_allclose(index.get_scores(["common", "laptop"]), expected, rtol=1e-5)
+
+    def test_top_k_order(self):
+        """top_k returns positions sorted by descending score."""
+        positions, scores = self.index.top_k(["wireless", "headphones"], 3)
+        expected = np.argsort(-self.reference.get_scores(["wireless", "headphones"]), kind="stable")[:3]
+        self.assertEqual(list(positions), list(expected))
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_top_k_pads_with_zero_scores(self):
+        """When fewer than k documents match, the rest are filled with zero scores."""
+        positions, scores = self.index.top_k(["laptop"], 4)
+        self.assertEqual(len(positions), 4)
+        self.assertEqual(len(set(positions.tolist())), 4)
+        self.assertEqual(self.keys[positions[0]], "4")
+        self.assertTrue(np.all(scores[1:] == 0.0))
+
+    def test_top_k_without_fill(self):
+        positions, _ = self.index.top_k(["laptop"], 4, fill=False)
+        self.assertEqual(list(positions), [3])
+
+    def test_top_k_bounds(self):
+        """k larger than the corpus, or zero, is clamped."""
+        self.assertEqual(len(self.index.top_k(["wireless"], 100)[0]), len(self.documents))
+        self.assertEqual(len(self.index.top_k(["wireless"], 0)[0]), 0)
+
+    def test_empty_index(self):
+        index = SparseBM25Index.from_documents([], [])
+        positions, scores = index.top_k(["wireless"], 5)
+        self.assertEqual(len(positions), 0)
+        self.assertEqual(len(index.get_scores(["wireless"])), 0)
+
+
+    def test_save_and_load_round_trip(self):
+        """A saved index loads memory-mapped and scores exactly like the original."""
+        self.index.fingerprint = "abc"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bm25_index")
+            self.index.save(path)
+            self.index.save(path)  # Overwriting an existing index is allowed
+            loaded = SparseBM25Index.load(path)
+
+            self.assertIsInstance(loaded.postings, np.memmap)
+            self.assertEqual(loaded.fingerprint, "abc")
+            self.assertEqual(list(loaded.keys), self.keys)
+            for query in (["wireless"], ["wireless", "headphones"], ["xylophone"]):
+                np.testing.assert_array_equal(loaded.get_scores(query), self.index.get_scores(query))
+            self.assertEqual(loaded.top_k(["wireless"], 3)[0].tolist(), self.index.top_k(["wireless"], 3)[0].tolist())
+
+    def test_catalog_fingerprint_detects_changes(self):
+        products = [
+            Product(id="1", title="Wireless Headphones", locale="us"),
+            Product(id="2", title="Wired Earphones", description="Clear sound", locale="us"),
+        ]
+        original = catalog_fingerprint(products)
+        self.assertEqual(original, catalog_fingerprint(list(products)))
+
+        edited = [products[0], products[1].model_copy(update={"description": "Deep bass"})]
+        self.assertNotEqual(original, catalog_fingerprint(edited))
+        self.assertNotEqual(original, catalog_fingerprint(products[::-1]))
+        self.assertNotEqual(original, catalog_fingerprint(products[:1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import unittest
+
+import numpy as np
+
+from one_time_product_embedding import product_embedding_text
+from src.models.catalog import ProductCatalog
+from src.modules.preprocessor.preprocessor import QueryPreprocessor
+from src.modules.retrieval.bm25_retriever import BM25CandidateRetriever, indexed_fields
+from src.utils.text_analysis import STOPWORDS, TextAnalyzer, Vocabulary, analyzer, stem_plural
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+
+
+class TestTextAnalyzer(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(analyzer.normalize("  Wi-Fi Headphones,\tBLACK!  "), "wifi headphones black")
+        self.assertEqual(analyzer.normalize("Crème Brûlée — 2-Pack"), "crème brûlée 2pack")
+        self.assertEqual(QueryPreprocessor.normalize_tokenize("Ginger Jar (Blue)"), "ginger jar blue")
+
+    def test_tokens_drop_stopwords(self):
+        self.assertEqual(analyzer.tokens("Headphones for the GYM, don't they?"), ["headphones", "gym"])
+        self.assertEqual(analyzer.tokens("the and of"), [])
+        self.assertIn("dont", STOPWORDS)
+
+    def test_plural_stemmer(self):
+        cases = {"headphones": "headphone", "batteries": "battery", "toys": "toy", "shoes": "shoe",
+                 "glass": "glass", "bus": "bus", "gas": "gas", "mugs": "mug"}
+        self.assertEqual({term: stem_plural(term) for term in cases}, cases)
+        stemming = TextAnalyzer(stem=True)
+        self.assertEqual(stemming.tokens("Red Mugs"), stemming.tokens("red mug"))
+        self.assertNotEqual(stemming.signature, analyzer.signature)
+
+    def test_product_text_tokens(self):
+        # Punctuation is deleted rather than split on, as in the former NLTK pipeline
+        self.assertEqual(
+            analyzer.tokens("Women's Running Shoes – Size 7.5, Ultra-Light (Navy/Pink) | 2-Pack; "
+                            "100% Cotton Socks & Café Latte Mug, 12oz"),
+            ["womens", "running", "shoes", "size", "75", "ultralight", "navypink", "2pack", "100", "cotton",
+             "socks", "café", "latte", "mug", "12oz"])
+        self.assertEqual(
+            analyzer.tokens("USB-C Cable 6ft [2 Pack], Fast Charging; Compatible with iPhone 15/Galaxy S23!"),
+            ["usbc", "cable", "6ft", "2", "pack", "fast", "charging", "compatible", "iphone", "15galaxy", "s23"])
+
+    def test_vocabulary_interns_int32_ids(self):
+        vocabulary = Vocabulary()
+        ids = vocabulary.intern(["red", "mug", "red"])
+        self.assertEqual(ids.dtype, np.int32)
+        self.assertEqual(ids.tolist(), [0, 1, 0])
+        self.assertEqual(vocabulary.terms, ["red", "mug"])
+        self.assertEqual(vocabulary.lookup(["mug", "vase", "red"]).tolist(), [1, 0])
+
+
+class TestQueryDocumentParity(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(DATA_PATH) as f:
+            records = json.load(f)[:300]
+        cls.catalog = ProductCatalog.from_records({**record, "bulletPoint": record.get("bullet_point")}
+                                                  for record in records)
+        cls.retriever = BM25CandidateRetriever(cls.catalog)
+
+    def test_query_terms_line_up_with_document_terms(self):
+        vocabulary = set(self.retriever.bm25.vocabulary)
+        for position, (product_id, title, description, bullet_point) in enumerate(indexed_fields(self.catalog)):
+            document = set(self.retriever.documents[position])
+            # Users type titles in any case, with punctuation and filler words
+            query = f"the {title.upper()}, for me!"
+            terms = self.retriever.analyzer.tokens(query)
+            self.assertTrue(terms, product_id)
+            self.assertEqual(set(terms) - document, set(), product_id)
+            self.assertEqual(set(terms) - vocabulary, set(), product_id)
+
+    def test_title_queries_find_their_product(self):
+        missed = [product_id for product_id, title in self.catalog.rows("id", "title")
+                  if product_id not in {hit["product_id"] for hit in self.retriever.retrieve(f"{title}!", 10)}]
+        self.assertLess(len(missed), 0.02 * len(self.catalog))
+
+    def test_embedding_text_uses_the_same_normalization(self):
+        text = product_embedding_text("Ginger Jar, Blue", None, "Hand-painted", "Blue", "KORANGE")
+        self.assertEqual(text, "ginger jar blue handpainted color blue brand korange")
+        self.assertEqual(analyzer.tokens(text), analyzer.tokens("Ginger Jar, Blue Hand-painted Color: Blue Brand: KORANGE"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import unittest
+import warnings
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+from src.services.openai_client import OpenAIClient
+from src.utils.tracing import JsonlTraceSink, LatencyHistogram, Tracer, tracer
+from tests.search_fixtures import WRITES, local_engine
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products.json")
+
+STAGES = ["query_log", "refinement", "bm25", "query_embedding", "context", "unified_embedding", "vector", "fusion",
+          "logging"]
+
+
+def trace(tracer, children=13):
+    """One trace shaped like a search: a root span and its nested stage and write spans."""
+    with tracer.span("search"):
+        for _ in range(children):
+            with tracer.span("stage"):
+                pass
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_within_bucket_precision(self):
+        values = np.random.default_rng(0).lognormal(mean=-4, sigma=1.5, size=20_000)
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(float(value))
+
+        self.assertEqual(histogram.count, len(values))
+        self.assertAlmostEqual(histogram.sum, float(values.sum()), places=6)
+        for q in (50, 90, 99, 99.9):
+            expected = float(np.percentile(values, q, method="inverted_cdf"))
+            self.assertAlmostEqual(histogram.percentile(q), expected, delta=expected / 64 + 1e-6)
+        self.assertEqual(histogram.percentile(100), histogram.max)
+
+    def test_cumulative_counts(self):
+        histogram = LatencyHistogram()
+        for seconds in (0.0002, 0.003, 0.003, 0.2, 50.0):
+            histogram.record(seconds)
+        self.assertEqual(histogram.cumulative_counts((0.001, 0.01, 1.0, 10.0)), [1, 3, 4, 4])
+        self.assertEqual(LatencyHistogram().percentile(50), 0.0)
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+
+    def spans(self, sink):
+        sink.close()
+        with open(sink.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_nested_spans_share_the_trace(self):
+        sink = JsonlTraceSink(os.path.join(self.tmpdir, "traces.jsonl"))
+        tracer = Tracer(sink=sink)
+        with tracer.span("search", query="red mug"):
+            with tracer.span("stage.bm25"):
+                pass
+            with self.assertRaises(RuntimeError), tracer.span("llm.completion"):
+                raise RuntimeError("timeout")
+
+        bm25, llm, root = self.spans(sink)
+        self.assertEqual(root["attributes"], {"query": "red mug"})
+        self.assertIsNone(root["parent_id"])
+        self.assertEqual({bm25["trace_id"], llm["trace_id"]}, {root["trace_id"]})
+        self.assertEqual({bm25["parent_id"], llm["parent_id"]}, {root["span_id"]})
+        self.assertEqual(llm["error"], "RuntimeError")
+        self.assertEqual(tracer.errors, {"llm.completion": 1})
+        self.assertEqual(tracer.histograms["stage.bm25"].count, 1)
+
+    def test_spans_follow_asyncio_tasks_and_threads(self):
+        sink = JsonlTraceSink(os.path.join(self.tmpdir, "traces.jsonl"))
+        tracer = Tracer(sink=sink)
+
+        def blocking():
+            with tracer.span("llm.completion"):
+                pass
+
+        async def search():
+            with tracer.span("search"):
+                await asyncio.gather(asyncio.to_thread(blocking), asyncio.to_thread(blocking))
+
+        asyncio.run(search())
+        *children, root = self.spans(sink)
+        self.assertEqual([span["parent_id"] for span in children], [root["span_id"]] * 2)
+
+    def test_sampling_is_decided_per_trace(self):
+        sink = JsonlTraceSink(os.path.join(self.tmpdir, "traces.jsonl"))
+        tracer = Tracer(sample_rate=0.25, sink=sink)
+        for _ in range(400):
+            trace(tracer, children=3)
+
+        spans = self.spans(sink)
+        traces = {span["trace_id"] for span in spans}
+        self.assertEqual(len(spans), 4 * len(traces))
+        self.assertTrue(50 < len(traces) < 150)
+        self.assertEqual(tracer.calls, {"search": 400, "stage": 1200})
+        self.assertEqual(tracer.histograms["search"].count, len(traces))
+
+        silent = Tracer(sample_rate=0.0)
+        trace(silent)
+        self.assertEqual(silent.histograms, {})
+        self.assertEqual(silent.calls, {"search": 1, "stage": 13})
+
+    def test_export_openmetrics(self):
+        tracer = Tracer()
+        with tracer.span("stage.bm25"):
+            time.sleep(0.002)
+        tracer.count("embedding.texts", 3)
+        text = tracer.export_openmetrics()
+
+        self.assertTrue(text.endswith("# EOF\n"))
+        self.assertIn("# TYPE cart_search_span_duration_seconds histogram", text)
+        buckets = [int(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+                   if line.startswith('cart_search_span_duration_seconds_bucket{span="stage.bm25"')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[0], 0)
+        self.assertEqual(buckets[-1], 1)
+        self.assertIn('cart_search_span_duration_seconds_count{span="stage.bm25"} 1', text)
+        self.assertIn('cart_search_span_calls_total{span="stage.bm25"} 1', text)
+        self.assertIn("# TYPE cart_search_embedding_texts counter\ncart_search_embedding_texts_total 3", text)
+
+    def test_llm_calls_are_traced(self):
+        response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" red mug "))])
+        tracer.reset()
+        with patch("openai.chat.completions.create", return_value=response):
+            self.assertEqual(OpenAIClient().generate_completion([{"role": "user", "content": "mug"}]), "red mug")
+        self.assertEqual(tracer.calls, {"llm.completion": 1})
+
+
+class TestSearchTracing(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(DATA_PATH) as f:
+            cls.records = json.load(f)[:300]
+
+    def setUp(self):
+        WRITES.reset()
+        quiet = contextlib.ExitStack()
+        quiet.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        quiet.enter_context(warnings.catch_warnings())
+        warnings.simplefilter("ignore")
+        self.addCleanup(quiet.close)
+        self.addCleanup(tracer.configure, sample_rate=tracer.sample_rate)
+        tracer.configure(sample_rate=1.0)
+        tracer.reset()
+
+    def test_every_stage_and_write_is_a_span(self):
+        engine = local_engine(self.records)
+        engine.search("ceramic vase")
+        spans = set(tracer.histograms)
+        self.assertEqual({f"stage.{stage}" for stage in STAGES} - spans, set())
+        self.assertIn("search", spans)
+        self.assertIn("query_log.save", spans)
+        self.assertIn("query_log.update_results", spans)
+
+        tracer.reset()
+        asyncio.run(self.search_async(engine))
+        self.assertEqual({f"stage.{stage}" for stage in STAGES} - set(tracer.histograms), set())
+        self.assertEqual(tracer.calls["query_log.save"], 1)
+
+    async def search_async(self, engine):
+        await engine.perform_search_async("ceramic vase")
+        await engine.flush_writes()
+
+    def test_sampled_overhead_under_one_percent(self):
+        engine = local_engine(self.records)
+        engine.search("ceramic vase")
+        tracer.reset()
+        durations = []
+        for _ in range(20):
+            start = time.perf_counter()
+            engine.search("ceramic vase")
+            durations.append(time.perf_counter() - start)
+        spans_per_search = sum(tracer.calls.values()) // 20
+
+        def cost(tracer, repeat=2000):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                trace(tracer, children=spans_per_search - 1)
+            return (time.perf_counter() - start) / repeat
+
+        overhead = min(cost(Tracer(sample_rate=0.1)) - cost(Tracer(enabled=False)) for _ in range(3))
+        self.assertLess(overhead / statistics.median(durations), 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
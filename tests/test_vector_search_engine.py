@@ -0,0 +1,207 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.models.product import Product
+from src.modules.retrieval.vector_backends import AnnoyBackend, ExactBackend, Int8Backend, create_backend
+from src.modules.retrieval.vector_retrieval_model import ProductSearchEngine
+
+DIM = 8
+
+
+class TestVectorBackends(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(50, DIM)).astype(np.float32)
+        self.query = rng.normal(size=DIM).astype(np.float32)
+
+    def test_exact_backend_matches_brute_force(self):
+        backend = ExactBackend(DIM)
+        backend.build(self.vectors)
+        positions, distances = backend.search(self.query, 5)
+
+        normalized = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        cosine = normalized @ (self.query / np.linalg.norm(self.query))
+        self.assertEqual(positions.tolist(), np.argsort(-cosine)[:5].tolist())
+        np.testing.assert_allclose(distances, np.sqrt(2 - 2 * cosine[positions]), rtol=1e-5)
+
+    def test_exact_and_annoy_distances_agree(self):
+        exact, annoy = ExactBackend(DIM), AnnoyBackend(DIM, n_trees=10, search_k=10_000)
+        exact.build(self.vectors)
+        annoy.build(self.vectors)
+        exact_positions, exact_distances = exact.search(self.query, 5)
+        annoy_positions, annoy_distances = annoy.search(self.query, 5)
+        self.assertEqual(exact_positions.tolist(), annoy_positions.tolist())
+        np.testing.assert_allclose(exact_distances, annoy_distances, rtol=1e-4)
+
+    def test_exact_backend_k_larger_than_catalog(self):
+        backend = ExactBackend(DIM)
+        backend.build(self.vectors[:3])
+        self.assertEqual(len(backend.search(self.query, 10)[0]), 3)
+
+    def test_search_batch_matches_single_queries(self):
+        queries = np.random.default_rng(2).normal(size=(7, DIM)).astype(np.float32)
+        for backend in (ExactBackend(DIM), AnnoyBackend(DIM, n_trees=10, search_k=10_000, n_threads=4)):
+            backend.build(self.vectors)
+            positions, distances = backend.search_batch(queries, 5)
+            self.assertEqual(positions.shape, (7, 5))
+            self.assertEqual(distances.dtype, np.float32)
+            for row, query in enumerate(queries):
+                single_positions, single_distances = backend.search(query, 5)
+                self.assertEqual(positions[row].tolist(), single_positions.tolist())
+                np.testing.assert_allclose(distances[row], single_distances, rtol=1e-5)
+
+    def test_search_batch_pads_short_rows(self):
+        backend = ExactBackend(DIM)
+        backend.build(self.vectors[:3])
+        positions, distances = backend.search_batch(self.vectors[:2], 5)
+        self.assertEqual(positions[:, 3:].tolist(), [[-1, -1], [-1, -1]])
+        self.assertTrue(np.isinf(distances[:, 3:]).all())
+
+    def test_search_batch_in_blocks(self):
+        backend = ExactBackend(DIM)
+        backend.build(self.vectors)
+        queries = self.vectors[:9]
+        expected_positions, expected_distances = backend.search_batch(queries, 4)
+        backend.BATCH_BLOCK_SIZE = 2 * len(self.vectors)  # two queries per block
+        positions, distances = backend.search_batch(queries, 4)
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+    def test_search_batch_rejects_wrong_shape(self):
+        backend = ExactBackend(DIM)
+        backend.build(self.vectors)
+        with self.assertRaises(ValueError):
+            backend.search_batch(self.query, 5)
+
+    def test_quantized_backends_with_rescore_match_exact(self):
+        queries = np.random.default_rng(3).normal(size=(6, DIM)).astype(np.float32)
+        exact = ExactBackend(DIM)
+        exact.build(self.vectors)
+        expected_positions, expected_distances = exact.search_batch(queries, 5)
+        for name in ("float16", "int8"):
+            backend = create_backend(name, DIM, rescore=20)
+            backend.build(self.vectors)
+            positions, distances = backend.search_batch(queries, 5)
+            np.testing.assert_array_equal(positions, expected_positions)
+            np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+            self.assertEqual(backend.search(queries[0], 5)[0].tolist(), expected_positions[0].tolist())
+
+    def test_quantized_backend_without_rescore_is_approximate(self):
+        backend = Int8Backend(DIM, rescore=0)
+        backend.build(self.vectors)
+        positions, distances = backend.search(self.vectors[7], 3)
+        self.assertEqual(positions[0], 7)
+        self.assertLess(distances[0], 0.1)
+        self.assertIsNone(backend.full_vectors)
+
+    def test_quantized_backend_save_and_load(self):
+        backend = Int8Backend(DIM)
+        backend.build(self.vectors)
+        expected = backend.search(self.query, 5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "products.ann")
+            backend.save(path)
+            self.assertIsInstance(backend.full_vectors, np.memmap)
+
+            loaded = Int8Backend(DIM)
+            loaded.load(path)
+            self.assertIsInstance(loaded.store.codes, np.memmap)
+            self.assertEqual(loaded.search(self.query, 5)[0].tolist(), expected[0].tolist())
+            with self.assertRaises(ValueError):
+                create_backend("float16", DIM).load(path)
+            del backend, loaded
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_backend("faiss", DIM)
+
+
+class TestProductSearchEngine(unittest.TestCase):
+    """Hits must map back to the right product even when some products have no embedding."""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.products = []
+        for i in range(20):
+            embedding = rng.normal(size=DIM).tolist() if i % 3 else None
+            self.products.append(Product(id=f"P{i}", title=f"Product {i}", locale="us", embedding=embedding))
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp.name, "products.ann")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ids_stay_aligned_when_embeddings_are_missing(self):
+        for backend in ("exact", "annoy"):
+            engine = ProductSearchEngine(DIM, f"{self.index_path}.{backend}", self.products, backend=backend)
+            for product in self.products:
+                if product.embedding:
+                    results = engine.search(product.embedding, k=1)
+                    self.assertEqual(results[0]["product_id"], product.id)
+                    self.assertAlmostEqual(results[0]["score"], 1.0, places=2)
+
+    def test_saved_index_is_reused_and_rebuilt_when_stale(self):
+        ProductSearchEngine(DIM, self.index_path, self.products, backend="exact")
+        self.assertTrue(os.path.exists(f"{self.index_path}.ids.npy"))
+        mtime = os.path.getmtime(self.index_path)
+
+        engine = ProductSearchEngine(DIM, self.index_path, self.products, backend="exact")
+        self.assertEqual(os.path.getmtime(self.index_path), mtime)
+        self.assertIsInstance(engine.index.vectors, np.memmap)
+
+        # Dropping a product changes the id map, so the index must be rebuilt
+        engine = ProductSearchEngine(DIM, self.index_path, self.products[2:], backend="exact")
+        self.assertNotIsInstance(engine.index.vectors, np.memmap)
+        target = self.products[4]
+        self.assertEqual(engine.search(target.embedding, k=1)[0]["product_id"], target.id)
+
+    def test_reembedded_products_trigger_rebuild(self):
+        ProductSearchEngine(DIM, self.index_path, self.products, backend="exact")
+        # Same ids and dimension, new vectors (a backfill or a different embedding model)
+        rng = np.random.default_rng(2)
+        reembedded = [p.model_copy(update={"embedding": rng.normal(size=DIM).tolist() if p.embedding else None})
+                      for p in self.products]
+        engine = ProductSearchEngine(DIM, self.index_path, reembedded, backend="exact")
+        self.assertNotIsInstance(engine.index.vectors, np.memmap)
+        target = reembedded[4]
+        self.assertEqual(engine.search(target.embedding, k=1)[0]["product_id"], target.id)
+        self.assertIsInstance(ProductSearchEngine(DIM, self.index_path, reembedded, backend="exact").index.vectors,
+                              np.memmap)
+
+    def test_backend_change_triggers_rebuild(self):
+        ProductSearchEngine(DIM, self.index_path, self.products, backend="exact")
+        engine = ProductSearchEngine(DIM, self.index_path, self.products, backend="annoy")
+        target = self.products[1]
+        self.assertEqual(engine.search(target.embedding, k=1)[0]["product_id"], target.id)
+
+    def test_search_batch_returns_product_ids(self):
+        with_embeddings = [p for p in self.products if p.embedding]
+        queries = np.array([p.embedding for p in with_embeddings], dtype=np.float32)
+        for backend in ("exact", "annoy"):
+            engine = ProductSearchEngine(DIM, f"{self.index_path}.{backend}", self.products, backend=backend)
+            product_ids, scores = engine.search_batch(queries, k=3)
+            self.assertEqual(product_ids[:, 0].tolist(), [p.id for p in with_embeddings])
+            np.testing.assert_allclose(scores[:, 0], 1.0, atol=1e-3)
+            single = engine.search(with_embeddings[0].embedding, k=3)
+            self.assertEqual(product_ids[0].tolist(), [r["product_id"] for r in single])
+
+    def test_release_product_embeddings(self):
+        engine = ProductSearchEngine(DIM, self.index_path, self.products, backend="int8")
+        target = self.products[1]
+        query = list(target.embedding)
+        engine.release_product_embeddings()
+        self.assertTrue(all(p.embedding is None for p in self.products))
+        self.assertEqual(engine.search(query, k=1)[0]["product_id"], target.id)
+
+    def test_no_embeddings(self):
+        products = [Product(id="P1", title="No vector", locale="us")]
+        with self.assertRaises(ValueError):
+            ProductSearchEngine(DIM, self.index_path, products)
+
+
+if __name__ == "__main__":
+    unittest.main()